@@ -0,0 +1,100 @@
+"""
+Times the combat simulator on a fixed set of generated battles.
+
+Run from the repository root:
+    python -m Benchmarks.combat_benchmark --battles 150
+"""
+import argparse
+import random
+import statistics
+import time
+import numpy as np
+from Simulator import champion
+from Simulator.battle_context import BattleContext
+from Simulator.battle_generator import BattleGenerator
+
+GENERATOR_CONFIG = {
+    "num_unique_champions": 12,
+    "max_cost": 5,
+    "num_items": 1,
+    "current_level": 6,
+    "chosen": True,
+    "sample_from_pool": True,
+    "two_star_unit_percentage": 0.3,
+    "three_star_unit_percentage": 0.05,
+    "scenario_info": False,
+    "extra_randomness": True,
+    "stationary": False
+}
+
+
+def generate_battles(num_battles, seed, level=None, num_items=None):
+    """
+    Generates pairs of players to fight. Levels and item counts are spread over the whole game unless given.
+
+    returns:
+        List[(player_1, player_2)]
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    battles = []
+    attempt = 0
+    while len(battles) < num_battles:
+        generator_config = dict(GENERATOR_CONFIG)
+        generator_config["current_level"] = level if level is not None else 3 + attempt % 7
+        generator_config["num_items"] = num_items if num_items is not None else attempt % 3
+        attempt += 1
+        try:
+            player_1, player_2, _ = BattleGenerator(generator_config).generate_battle()
+        except IndexError:
+            # The generator sometimes runs out of item bench slots. Just roll a new battle.
+            continue
+        battles.append((player_1, player_2))
+    return battles
+
+
+def time_battles(battles, seed, repeat=1, event_skipping=None):
+    """
+    Runs every battle with its own seeded rng.
+
+    returns:
+        List of the wall time of every battle in seconds. With repeat > 1 the fastest run of each battle is kept.
+    """
+    times = []
+    for i, (player_1, player_2) in enumerate(battles):
+        best = None
+        for _ in range(repeat):
+            battle = BattleContext(player_1.win_streak, player_2.win_streak, random.Random(seed + i), event_skipping)
+            start = time.perf_counter()
+            champion.run(champion.champion, player_1, player_2, 3, battle)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        times.append(best)
+    return times
+
+
+def report(times):
+    print("battles: {}".format(len(times)))
+    print("total:   {:.2f} s".format(sum(times)))
+    print("mean:    {:.2f} ms / battle".format(statistics.mean(times) * 1000))
+    print("median:  {:.2f} ms / battle".format(statistics.median(times) * 1000))
+    print("max:     {:.2f} ms / battle".format(max(times) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per battle wall time of the combat simulator')
+    parser.add_argument('--battles', type=int, default=150, help='Number of generated battles')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the battle generation and the battles')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per battle, the fastest one is reported')
+    parser.add_argument('--level', type=int, default=None, help='Board level of every battle, e.g. 9 for late game')
+    parser.add_argument('--items', type=int, default=None, help='Items per unit in every battle')
+    parser.add_argument('--fixed-ticks', action='store_true', help='Run every 25 ms tick instead of skipping ahead')
+    args = parser.parse_args()
+
+    battles = generate_battles(args.battles, args.seed, args.level, args.items)
+    event_skipping = False if args.fixed_ticks else None
+    report(time_battles(battles, args.seed, args.repeat, event_skipping))
+
+
+if __name__ == "__main__":
+    main()
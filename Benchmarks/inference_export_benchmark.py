@@ -0,0 +1,87 @@
+"""
+Moves per second of MCTS with the network and with its inference exports.
+
+Every move is one search of all players on random observations with every action legal. The output differences are
+the largest absolute difference to the network over the recurrent inference of one batch.
+
+Run from the repository root:
+    python -m Benchmarks.inference_export_benchmark --simulations 50 --moves 5
+"""
+import argparse
+import time
+import numpy as np
+import torch
+import config
+
+OBSERVATION_SIZES = {
+    "scalars": config.SCALAR_INPUT_SIZE,
+    "shop": config.SHOP_INPUT_SIZE,
+    "board": config.BOARD_INPUT_SIZE,
+    "bench": config.BENCH_INPUT_SIZE,
+    "items": config.ITEMS_INPUT_SIZE,
+    "traits": config.TRAIT_INPUT_SIZE,
+    "other_players": config.OTHER_PLAYER_INPUT_SIZE
+}
+
+
+def observation(players, seed):
+    rng = np.random.default_rng(seed)
+    return {key: rng.random((players, size), dtype=np.float32) for key, size in OBSERVATION_SIZES.items()}
+
+
+def time_mcts(network, model_config, players, moves, seed):
+    from Models.MCTS_torch import MCTS
+    mcts = MCTS(network, model_config)
+    masks = np.ones((players, config.POLICY_HEAD_SIZE), dtype=np.float32)
+    np.random.seed(seed)
+    # Warm up
+    mcts.policy([observation(players, seed), masks])
+    start = time.perf_counter()
+    for move in range(moves):
+        mcts.policy([observation(players, seed + move), masks])
+    return moves * players / (time.perf_counter() - start)
+
+
+def difference(network, exported, players, seed):
+    rng = np.random.default_rng(seed)
+    action = np.stack([rng.integers(0, config.ACTION_DIM[0], players), rng.integers(0, config.ACTION_DIM[1], players),
+                       rng.integers(0, config.ACTION_DIM[1], players)], axis=-1)
+    with torch.no_grad():
+        hidden_state = network.initial_inference(observation(players, seed))["hidden_state"]
+        expected = network.recurrent_inference(hidden_state, action)
+        output = exported.recurrent_inference(hidden_state, action)
+    return {key: (output[key].float() - expected[key].float()).abs().max().item()
+            for key in ("hidden_state", "policy_logits", "value", "reward")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Moves per second of MCTS with the inference exports of the network')
+    parser.add_argument('--players', type=int, default=config.NUM_PLAYERS, help='Searches run together in one batch')
+    parser.add_argument('--moves', type=int, default=5, help='Timed moves')
+    parser.add_argument('--simulations', type=int, default=50, help='Simulations per move')
+    parser.add_argument('--threads', type=int, default=0, help='Torch threads, 0 keeps the default')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the network and the observations')
+    args = parser.parse_args()
+
+    config.DEVICE = 'cpu'
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    from Models.MuZero_torch_agent import MuZeroNetwork
+    from Models.inference_export import ExportedNetwork, PRECISIONS
+    model_config = type("BenchmarkConfig", (config.ModelConfig,), {"NUM_SIMULATIONS": args.simulations})
+    torch.manual_seed(args.seed)
+    network = MuZeroNetwork(model_config()).eval()
+
+    print("{:>8} {:>10} {:>13} {:>10} {:>10} {:>10}".format("network", "moves / s", "hidden state", "policy",
+                                                               "value", "reward"))
+    print("{:>8} {:>10.2f}".format("eager", time_mcts(network, model_config, args.players, args.moves, args.seed)))
+    for precision in PRECISIONS:
+        exported = ExportedNetwork(network, model_config, precision)
+        moves = time_mcts(exported, model_config, args.players, args.moves, args.seed)
+        errors = difference(network, exported, args.players, args.seed)
+        print("{:>8} {:>10.2f} {:>13.4f} {:>10.4f} {:>10.4f} {:>10.4f}".format(
+            precision, moves, errors["hidden_state"], errors["policy_logits"], errors["value"], errors["reward"]))
+
+
+if __name__ == "__main__":
+    main()
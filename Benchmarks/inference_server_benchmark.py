@@ -0,0 +1,84 @@
+"""
+Throughput of the inference server batcher for several numbers of data workers.
+
+Every worker sends recurrent inferences of one batch of players at a time and waits for the result like MCTS does.
+The workers run as coroutines next to the batcher, so this measures the batching itself and not the ray transport.
+The first line is the network called directly with one worker's batch, which is what every data worker does without
+the server.
+
+Run from the repository root:
+    python -m Benchmarks.inference_server_benchmark --workers 1 4 16 32
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+import torch
+import config
+
+
+def inputs(rows, hidden_size, seed):
+    rng = np.random.default_rng(seed)
+    hidden_state = torch.from_numpy(rng.standard_normal((rows, hidden_size), dtype=np.float32))
+    action = np.stack([rng.integers(0, config.ACTION_DIM[0], rows), rng.integers(0, config.ACTION_DIM[1], rows),
+                       rng.integers(0, config.ACTION_DIM[1], rows)], axis=-1)
+    return hidden_state, action
+
+
+def time_direct(network, rows, calls, hidden_size):
+    hidden_state, action = inputs(rows, hidden_size, 0)
+    with torch.no_grad():
+        start = time.perf_counter()
+        for _ in range(calls):
+            network.recurrent_inference(hidden_state, action)
+    return rows * calls / (time.perf_counter() - start)
+
+
+def time_server(network, workers, rows, calls, hidden_size, batch_size, timeout, think):
+    from Concurrency.inference_server import InferenceBatcher
+    batcher = InferenceBatcher(network, batch_size, timeout)
+
+    async def worker(rank):
+        hidden_state, action = inputs(rows, hidden_size, rank)
+        for _ in range(calls):
+            await batcher.recurrent_inference(hidden_state, action)
+            # The tree work of the worker between two inferences
+            await asyncio.sleep(think)
+
+    async def run():
+        await asyncio.gather(*[worker(rank) for rank in range(workers)])
+
+    asyncio.run(run())
+    return batcher.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inferences per second and batch size of the inference server')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16, 32], help='Numbers of data workers')
+    parser.add_argument('--rows', type=int, default=config.NUM_PLAYERS, help='Players in the batch of a worker')
+    parser.add_argument('--calls', type=int, default=50, help='Inferences sent by every worker')
+    parser.add_argument('--batch-size', type=int, default=config.INFERENCE_BATCH_SIZE, help='Rows of a full batch')
+    parser.add_argument('--timeout', type=float, default=config.INFERENCE_TIMEOUT, help='Seconds a batch waits')
+    parser.add_argument('--think', type=float, default=0.001, help='Seconds of tree work between inferences')
+    parser.add_argument('--device', default='cpu', help='Device of the network')
+    args = parser.parse_args()
+
+    config.DEVICE = args.device
+    from Models.MuZero_torch_agent import MuZeroNetwork
+    model_config = config.ModelConfig()
+    network = MuZeroNetwork(model_config).to(args.device)
+    hidden_size = model_config.HIDDEN_STATE_SIZE
+    # Warm up
+    time_direct(network, args.rows, 3, hidden_size)
+
+    print("{:>8} {:>16} {:>11}".format("workers", "inferences / s", "mean batch"))
+    print("{:>8} {:>16.0f} {:>11}".format("direct", time_direct(network, args.rows, args.calls, hidden_size),
+                                          args.rows))
+    for workers in args.workers:
+        stats = time_server(network, workers, args.rows, args.calls, hidden_size, args.batch_size, args.timeout,
+                            args.think)
+        print("{:>8} {:>16.0f} {:>11.1f}".format(workers, stats['inferences_per_second'], stats['mean_batch_size']))
+
+
+if __name__ == "__main__":
+    main()
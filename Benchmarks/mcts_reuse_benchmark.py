@@ -0,0 +1,115 @@
+"""
+Compares MCTS with and without tree reuse between the moves of an action phase.
+
+The search plays a fixed random model that is its own environment, so the state observed after a move is exactly the
+one the search predicted for it. For every move the root value is compared to the root value of a much longer search
+from the same state.
+
+Run from the repository root:
+    python -m Benchmarks.mcts_reuse_benchmark --simulations 50 --reference 400
+"""
+import argparse
+import time
+import numpy as np
+import torch
+import config
+import Models.MCTS_Util as util
+from Models.MCTS_torch import MCTS
+
+
+class ToyModel:
+    """
+    Fixed random model. The observation of a state is the hidden state itself and a step of the environment is a
+    step of the dynamics, so predictions and observations always match.
+    """
+    def __init__(self, hidden_size, seed):
+        generator = torch.Generator().manual_seed(seed)
+        scale = hidden_size ** -0.5
+        self.dynamics = torch.randn(hidden_size, hidden_size, generator=generator) * scale
+        # Embeddings of the action type, x1 and x2
+        self.action_embeddings = torch.randn(3, 64, hidden_size, generator=generator)
+        self.policy = torch.randn(hidden_size, config.POLICY_HEAD_SIZE, generator=generator) * 2 * scale
+        self.value = torch.randn(hidden_size, generator=generator)
+        self.reward = torch.randn(hidden_size, generator=generator) * scale
+
+    def output(self, hidden_state, reward):
+        return {
+            "hidden_state": hidden_state,
+            "reward": reward,
+            "value": hidden_state @ self.value,
+            "policy_logits": hidden_state @ self.policy
+        }
+
+    # MCTS counts the players by the shop of the observation, here it holds the states
+    def initial_inference(self, observation):
+        hidden_state = torch.as_tensor(observation["shop"])
+        return self.output(hidden_state, torch.zeros(hidden_state.shape[0]))
+
+    def recurrent_inference(self, hidden_state, action):
+        hidden_state = self.step(hidden_state, action)
+        return self.output(hidden_state, torch.tanh(hidden_state @ self.reward))
+
+    def step(self, states, actions):
+        actions = torch.as_tensor(np.asarray(actions), dtype=torch.long)
+        embedding = sum(self.action_embeddings[i][actions[:, i]] for i in range(3))
+        return torch.tanh(states @ self.dynamics + embedding)
+
+
+def model_config(simulations, samples, reuse):
+    return type("BenchmarkConfig", (config.ModelConfig,), {
+        "NUM_SIMULATIONS": simulations,
+        "NUM_SAMPLES": samples,
+        "TREE_REUSE": reuse
+    })
+
+
+def play(model, mcts, reference, players, turns, hidden_size, seed):
+    """
+    Plays turns action phases of config.ACTIONS_PER_TURN moves for every player.
+
+    returns:
+        seconds spent in mcts.policy, number of moves, mean absolute error of the root values
+    """
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    masks = np.ones((players, config.POLICY_HEAD_SIZE), dtype=np.float32)
+    elapsed = 0
+    errors = []
+    for turn in range(turns):
+        # Every phase starts from new states, like a round starts after a battle
+        states = torch.randn(players, hidden_size, generator=torch.Generator().manual_seed(seed + turn))
+        phases = [(player, turn) for player in range(players)]
+        for _ in range(config.ACTIONS_PER_TURN):
+            observation = [{"shop": states}, masks]
+            start = time.perf_counter()
+            actions, _, _, root_values = mcts.policy(observation, phases)
+            elapsed += time.perf_counter() - start
+            _, _, _, reference_values = reference.policy(observation)
+            errors.extend(abs(value - expected) for value, expected in zip(root_values, reference_values))
+            states = model.step(states, util.decode_action_codes(actions))
+    return elapsed, turns * config.ACTIONS_PER_TURN * players, float(np.mean(errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Value error and speed of MCTS with and without tree reuse')
+    parser.add_argument('--players', type=int, default=8, help='Searches run together in one batch')
+    parser.add_argument('--turns', type=int, default=2, help='Action phases played by every player')
+    parser.add_argument('--simulations', type=int, default=50, help='Simulations per move')
+    parser.add_argument('--samples', type=int, default=30, help='Sampled actions per node')
+    parser.add_argument('--reference', type=int, default=400, help='Simulations of the reference search')
+    parser.add_argument('--hidden', type=int, default=64, help='Hidden state size of the toy model')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the model and the searches')
+    args = parser.parse_args()
+
+    model = ToyModel(args.hidden, args.seed)
+    reference = MCTS(model, model_config(args.reference, args.samples, False))
+    print("{:>11} {:>6} {:>10} {:>12}".format("simulations", "reuse", "moves / s", "value error"))
+    for simulations in (args.simulations, args.simulations // 2):
+        for reuse in (False, True):
+            mcts = MCTS(model, model_config(simulations, args.samples, reuse))
+            elapsed, moves, error = play(model, mcts, reference, args.players, args.turns, args.hidden, args.seed)
+            print("{:>11} {:>6} {:>10.1f} {:>12.4f}".format(simulations, str(reuse), moves / elapsed, error))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Memory per combat unit and simulated combat ticks per second.
+
+Run from the repository root:
+    python -m Benchmarks.unit_benchmark --units 5000 --battles 50
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from Simulator import champion
+from Simulator.battle_context import BattleContext, TICK_LENGTH
+from Benchmarks.combat_benchmark import generate_battles
+
+# These need a battle or an overlord to be created
+SPECIAL_UNITS = ['construct', 'galio', 'aphelios_turret']
+
+
+def unit_memory(num_units):
+    """
+    Creates units of every name and star level and measures how much memory they take.
+
+    returns:
+        (bytes per unit including everything it allocates, bytes of the bare object)
+    """
+    names = [name for name in champion.BASE_STATS if name not in SPECIAL_UNITS]
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    units = [champion.champion(names[i % len(names)], stars=1 + i % 3) for i in range(num_units)]
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (end - start) / len(units), sys.getsizeof(units[0])
+
+
+def ticks_per_second(battles, seed, event_skipping=None):
+    """
+    Runs the battles and counts how many 25 ms ticks of combat they simulated.
+
+    returns:
+        (simulated ticks, wall time in seconds)
+    """
+    ticks = 0
+    elapsed = 0
+    for i, (player_1, player_2) in enumerate(battles):
+        battle = BattleContext(player_1.win_streak, player_2.win_streak, random.Random(seed + i), event_skipping)
+        start = time.perf_counter()
+        champion.run(champion.champion, player_1, player_2, 3, battle)
+        elapsed += time.perf_counter() - start
+        ticks += battle.millis() // TICK_LENGTH
+    return ticks, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory per combat unit and simulated ticks per second')
+    parser.add_argument('--units', type=int, default=5000, help='Number of units to create for the memory test')
+    parser.add_argument('--battles', type=int, default=50, help='Number of generated battles for the tick test')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the battle generation and the battles')
+    parser.add_argument('--fixed-ticks', action='store_true', help='Run every 25 ms tick instead of skipping ahead')
+    args = parser.parse_args()
+
+    per_unit, bare = unit_memory(args.units)
+    print("memory:  {:.0f} bytes / unit ({} bytes for the object itself)".format(per_unit, bare))
+
+    battles = generate_battles(args.battles, args.seed)
+    ticks, elapsed = ticks_per_second(battles, args.seed, False if args.fixed_ticks else None)
+    print("ticks:   {} in {:.2f} s".format(ticks, elapsed))
+    print("speed:   {:.0f} ticks / s".format(ticks / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ from Models.MuZero_torch_agent import MuZeroNetwork as TFTNetwork
 from Models.Muzero_default_agent import MuZeroDefaultNetwork as DefaultNetwork
 from Models.rllib_ppo import PPO_Position_Model, PPO_Item_Model, Base_PPO_Position_Model
 from Concurrency.data_worker import DataWorker
+from Concurrency.inference_server import InferenceServer
 from Concurrency.training_manager import TrainingManager
 from Concurrency.queue_storage import QueueStorage
 
@@ -38,7 +39,10 @@ class AIInterface:
 
             workers = []
             model_config = config.ModelConfig()
-            data_workers = [DataWorker.remote(rank, model_config) for rank in range(config.CONCURRENT_GAMES)]
+            inference_server = InferenceServer.remote(model_config) \
+                if config.INFERENCE_SERVER and not config.CHAMP_DECIDER else None
+            data_workers = [DataWorker.remote(rank, model_config, inference_server)
+                            for rank in range(config.CONCURRENT_GAMES)]
             storage = Storage.remote(train_step)
             if config.CHAMP_DECIDER:
                 global_agent = DefaultNetwork(model_config)
@@ -60,11 +64,22 @@ class AIInterface:
             buffers = [BufferWrapper.remote()
                        for _ in range(config.CONCURRENT_GAMES)]
 
+            if config.GAMES_PER_WORKER > 1:
+                # Every game of a worker needs its own environment and buffers
+                game_envs = [[parallel_env(tftConfig) for _ in range(config.GAMES_PER_WORKER)]
+                             for _ in range(config.CONCURRENT_GAMES)]
+                game_buffers = [[buffers[i]] + [BufferWrapper.remote() for _ in range(config.GAMES_PER_WORKER - 1)]
+                                for i in range(config.CONCURRENT_GAMES)]
+
             weights = ray.get(storage.get_target_model.remote())
 
             for i, worker in enumerate(data_workers):
-                workers.append(worker.collect_gameplay_experience.remote(env, buffers[i], training_manager,
-                                                                         storage, weights))
+                if config.GAMES_PER_WORKER > 1:
+                    workers.append(worker.collect_batched_experience.remote(game_envs[i], game_buffers[i],
+                                                                            training_manager, storage, weights))
+                else:
+                    workers.append(worker.collect_gameplay_experience.remote(env, buffers[i], training_manager,
+                                                                             storage, weights))
                 time.sleep(0.5)
 
             training_manager.loop(storage, train_step)
@@ -0,0 +1,98 @@
+import time
+import asyncio
+import numpy as np
+import torch
+import config
+
+# Entries of the batches of GlobalBuffer.sample_batch that go to the device ahead of time: the observation, the actions,
+# the masks, the policy targets and the importance weights. The value and reward targets, the labels, the position
+# and the sample ids stay on the host, the trainer uses them there.
+DEVICE_ENTRIES = [0, 1, 2, 3, 4, 7, 8, 9]
+
+
+class BatchPrefetcher:
+    """
+    Keeps up to depth batches of the global buffer assembled ahead of the trainer.
+
+    It runs as a task on the event loop of the global buffer, so the batches are sampled between the stores of new
+    samples. Once the buffer has a batch worth of samples the task samples batches until depth are waiting and
+    then waits for the trainer to take one. On a cuda device the arrays of the batch are pinned and copied to the
+    device on a separate stream, so the copies overlap the training step before.
+
+    The batches are sampled with the priorities from up to depth training steps before, the priority updates of the
+    samples that were overwritten since are dropped by the buffer.
+
+    args:
+        global_buffer: GlobalBuffer
+        depth: int, batches kept ready
+        device: device of the trainer
+    """
+    def __init__(self, global_buffer, depth=config.PREFETCH_BATCHES, device=config.DEVICE):
+        self.global_buffer = global_buffer
+        self.batches = asyncio.Queue(maxsize=depth)
+        self.device = torch.device(device)
+        self.copy_stream = torch.cuda.Stream(self.device) \
+            if self.device.type == "cuda" and torch.cuda.is_available() else None
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def ready(self):
+        """Batches that are waiting for the trainer"""
+        return self.batches.qsize()
+
+    async def run(self):
+        while True:
+            await self.global_buffer.wait_for_batch()
+            batch = await self.global_buffer.sample_batch()
+            await self.batches.put(self.to_device(batch))
+            # Sampling doesn't wait on anything, this lets the stores of new samples in between batches
+            await asyncio.sleep(0)
+
+    async def get(self):
+        """
+        Returns:
+            The next batch and the seconds the trainer waited for it.
+        """
+        start = time.perf_counter()
+        batch, copied = await self.batches.get()
+        waited = time.perf_counter() - start
+        if copied is not None:
+            # The trainer uses the copies on its own stream
+            stream = torch.cuda.current_stream(self.device)
+            stream.wait_event(copied)
+            for entry in DEVICE_ENTRIES:
+                for tensor in device_tensors(batch[entry]):
+                    tensor.record_stream(stream)
+        return batch, waited
+
+    def to_device(self, batch):
+        """The batch with the DEVICE_ENTRIES on the device and the cuda event of their copies, None without cuda"""
+        if self.copy_stream is None:
+            return batch, None
+        with torch.cuda.stream(self.copy_stream):
+            for entry in DEVICE_ENTRIES:
+                batch[entry] = self.copy(batch[entry])
+            copied = torch.cuda.Event()
+            copied.record(self.copy_stream)
+        return batch, copied
+
+    def copy(self, value):
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            return {key: self.copy(array) for key, array in value.items()}
+        return torch.from_numpy(np.ascontiguousarray(value)).pin_memory().to(self.device, non_blocking=True)
+
+
+def device_tensors(value):
+    if isinstance(value, dict):
+        return list(value.values())
+    return [] if value is None else [value]
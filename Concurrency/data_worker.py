@@ -9,6 +9,8 @@ from Models.MCTS_torch import MCTS
 from Models.MCTS_default_torch import Default_MCTS
 from Models.MuZero_torch_agent import MuZeroNetwork as TFTNetwork
 from Models.Muzero_default_agent import MuZeroDefaultNetwork as DefaultNetwork
+from Models.inference_export import ExportedNetwork
+from Concurrency.inference_server import RemoteNetwork
 from Simulator.tft_item_simulator import TFT_Item_Simulator
 from Simulator.tft_position_simulator import TFT_Position_Simulator
 from config import GPU_SIZE_PER_WORKER
@@ -22,17 +24,53 @@ Description -
 '''
 
 
+class SelfPlayGame:
+    """
+    One of the games that a data worker plays in lockstep with others, see DataWorker.collect_batched_experience.
+    """
+    def __init__(self, env, buffers, rank):
+        self.env = env
+        self.buffers = buffers
+        self.rank = rank
+        self.observation = None
+        self.info = None
+        self.terminated = {}
+        self.position = config.NUM_PLAYERS
+        self.current_comp = {}
+        self.current_champs = {}
+
+    def reset(self):
+        """Starts a new game and returns its first observation"""
+        observation, self.info = self.env.reset(options={"default_agent": [False for _ in range(config.NUM_PLAYERS)]})
+        self.terminated = {player_id: False for player_id in self.env.possible_agents}
+        self.position = config.NUM_PLAYERS
+        self.current_comp = {key: self.info[key]["player"].get_tier_labels() for key in self.terminated.keys()}
+        self.current_champs = {key: self.info[key]["player"].get_champion_labels() for key in self.terminated.keys()}
+        return observation
+
+    def done(self):
+        return all(self.terminated.values())
+
+
 @ray.remote(num_gpus=GPU_SIZE_PER_WORKER)
 class DataWorker(object):
-    def __init__(self, rank, model_config):
+    def __init__(self, rank, model_config, inference_server=None):
         if config.CHAMP_DECIDER:
             self.temp_model = DefaultNetwork(model_config)
+            self.agent_model = self.temp_model
             self.agent_network = Default_MCTS(self.temp_model, model_config)
             self.past_network = Default_MCTS(self.temp_model, model_config)
             self.default_agent = [False for _ in range(config.NUM_PLAYERS)]
         else:
             self.temp_model = TFTNetwork(model_config)
-            self.agent_network = MCTS(self.temp_model, model_config)
+            # The current agent plays through the inference server when there is one, past agents stay local
+            if inference_server is not None:
+                self.agent_model = RemoteNetwork(inference_server)
+            elif config.INFERENCE_EXPORT:
+                self.agent_model = ExportedNetwork(self.temp_model, model_config, config.INFERENCE_EXPORT)
+            else:
+                self.agent_model = self.temp_model
+            self.agent_network = MCTS(self.agent_model, model_config)
             self.past_network = MCTS(self.temp_model, model_config)
             self.default_agent = [False for _ in range(config.NUM_PLAYERS)]
             # self.default_agent = [np.random.rand() < 0.5 for _ in range(config.NUM_PLAYERS)]
@@ -154,9 +192,9 @@ class DataWorker(object):
             # if all(self.default_agent):
             #     self.default_agent[0] = False
 
-            # This is just to try to give the buffer some time to train on the data we have and not slow down our
-            # buffers by sending thousands of store commands when the buffer is already full.
-            while global_buffer.buffer_size() > config.GLOBAL_BUFFER_SIZE * 0.8:
+            # This is just to try to give the trainer some time to train on the data we have. The buffer is a ring
+            # that stays full, so hold back on the samples stored since the trainer last caught up instead.
+            while global_buffer.untrained_samples() > config.GLOBAL_BUFFER_SIZE * 0.8:
                 time.sleep(5)
 
             # So if I do not have a live game, I need to sample a past model
@@ -164,10 +202,104 @@ class DataWorker(object):
             # All the probability distributions will be within the storage class as well.
             temp_weights = ray.get(storage.get_model.remote())
             weights = copy.deepcopy(temp_weights)
-            self.agent_network = MCTS(self.temp_model, self.model_config)
+            self.agent_network = MCTS(self.agent_model, self.model_config)
             self.agent_network.network.set_weights(weights)
             self.rank += config.CONCURRENT_GAMES
 
+    '''
+    Description -
+        Same as collect_gameplay_experience but the worker plays one game per environment in lockstep. The players of
+        every game search together in one call to the agent, so the batches of the network stay large when players
+        die. Each game restarts on its own when it finishes and then the worker fetches the latest agent.
+        Every player is the current agent, there are no past or default agents in this mode.
+    Inputs -
+        envs
+            One parallel environment of our tft simulator per game.
+        buffers
+            One buffer wrapper per game.
+        global_buffer
+            A buffer that all the individual game buffers send their information to.
+        storage
+            An object that stores global information like the weights of the global model and current training progress
+        weights
+            Weights of the initial model for the agent to play the game with.
+    '''
+
+    def collect_batched_experience(self, envs, buffers, global_buffer, storage, weights):
+        self.agent_network.network.set_weights(weights)
+        self.live_game = True
+        self.past_version = [False for _ in range(config.NUM_PLAYERS)]
+        self.default_agent = [False for _ in range(config.NUM_PLAYERS)]
+        games = [SelfPlayGame(env, game_buffers, self.rank + i * config.CONCURRENT_GAMES)
+                 for i, (env, game_buffers) in enumerate(zip(envs, buffers))]
+        for game in games:
+            game.observation = self.observation_to_input(game.reset())
+
+        while True:
+            # One search for the players of every game, the phases of a game are told apart by its rank
+            player_observation = self.stack_observations([game.observation for game in games])
+            phases = [(game.rank,) + phase for game in games
+                      for phase in self.action_phases(game.observation, game.info)]
+            actions, policy, string_samples, root_values = self.agent_network.policy(player_observation[:2], phases)
+
+            start = 0
+            for game in games:
+                end = start + len(game.observation[2])
+                self.step_game(game, actions[start:end], policy[start:end], string_samples[start:end],
+                               root_values[start:end])
+                start = end
+
+            if not any(game.done() for game in games):
+                continue
+            for game in games:
+                if game.done():
+                    game.buffers.store_global_buffer.remote(global_buffer)
+                    game.buffers.reset_buffers.remote()
+                    game.rank += config.CONCURRENT_GAMES * len(games)
+                    game.observation = self.observation_to_input(game.reset())
+
+            # This is just to try to give the trainer some time to train on the data we have. The buffer is a ring
+            # that stays full, so hold back on the samples stored since the trainer last caught up instead.
+            while global_buffer.untrained_samples() > config.GLOBAL_BUFFER_SIZE * 0.8:
+                time.sleep(5)
+
+            # The weights are refreshed in place, the search keeps its node pool, its buffers and the subtrees of the
+            # games that are still going.
+            temp_weights = ray.get(storage.get_model.remote())
+            weights = copy.deepcopy(temp_weights)
+            self.agent_network.network.set_weights(weights)
+
+    '''
+    Description -
+        Takes one step of a game of collect_batched_experience with the outputs of the search for its players.
+    '''
+
+    def step_game(self, game, actions, policy, string_samples, root_values):
+        storage_actions = utils.decode_action(actions)
+        step_actions = self.getStepActions(game.terminated, storage_actions)
+
+        next_observation, reward, game.terminated, _, game.info = game.env.step(step_actions)
+        info = game.info
+        # store the action for MuZero
+        for i, key in enumerate(game.terminated.keys()):
+            if not info[key]["state_empty"] and np.random.rand() <= config.CHANCE_BUFFER_SEND:
+                if info[key]["player"]:
+                    game.current_comp[key] = info[key]["player"].get_tier_labels()
+                    game.current_champs[key] = info[key]["player"].get_champion_labels()
+                # Store the information in a buffer to train on later.
+                game.buffers.store_replay_buffer.remote(key, self.get_obs_idx(game.observation[0], i),
+                                                        storage_actions[i], reward[key], policy[i],
+                                                        string_samples[i], root_values[i], game.current_comp[key],
+                                                        game.current_champs[key])
+
+        for key, terminate in game.terminated.items():
+            if terminate:
+                game.buffers.set_ending_position.remote(key, game.position)
+                game.position -= 1
+
+        # Set up the observation for the next action
+        game.observation = self.observation_to_input(next_observation)
+
     '''
     Description -
         Each worker runs one full game and will restart after the game finishes. At the end of the game, 
@@ -378,6 +510,19 @@ class DataWorker(object):
         masks = np.array(masks)
         return [tensors, masks, keys]
 
+    '''
+    Description -
+        Stacks the inputs of several games from observation_to_input into one, the players of the first game first.
+    '''
+
+    @staticmethod
+    def stack_observations(player_observations):
+        tensors = {key: np.concatenate([observation[0][key] for observation in player_observations])
+                   for key in player_observations[0][0]}
+        masks = np.concatenate([observation[1] for observation in player_observations])
+        keys = [key for observation in player_observations for key in observation[2]]
+        return [tensors, masks, keys]
+
     '''
         Description -
             Turns a dictionary of player observations into a list of list format that the model can use.
@@ -446,7 +591,8 @@ class DataWorker(object):
             actions, policy, string_samples, root_values = self.imitation_learning(info, player_observation[1])
         # If all of our agents are current versions
         elif (self.live_game or not any(self.past_version)) and not any(self.default_agent):
-            actions, policy, string_samples, root_values = self.agent_network.policy(player_observation[:2])
+            actions, policy, string_samples, root_values = \
+                self.agent_network.policy(player_observation[:2], self.action_phases(player_observation, info))
         # Ff all of our agents are past versions. (Should exceedingly rarely come here)
         elif all(self.past_version) and not any(self.default_agent):
             actions, policy, string_samples, root_values = self.past_network.policy(player_observation[:2])
@@ -464,6 +610,17 @@ class DataWorker(object):
             actions, policy, string_samples, root_values = self.default_model_call(info)
         return actions, policy, string_samples, root_values
 
+    """
+    Description -
+        The action phase of every player, the search of a player can be reused within its phase.
+        Other than through a refresh, which MCTS checks itself, the state of a player only changes by chance when
+        the round ends, so a player stays in one phase for the whole round.
+    """
+
+    @staticmethod
+    def action_phases(player_observation, info):
+        return [(key, info[key]["game_round"]) for key in player_observation[2]]
+
     """
     Description - 
         Model call if some of the players are current agents and some of the players are past agents.
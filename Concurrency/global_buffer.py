@@ -2,25 +2,30 @@ import time
 import numpy as np
 import asyncio
 import config
-from Concurrency.priority_queue import PriorityBuffer
+from Concurrency.sum_tree import SumTreeBuffer
+from Concurrency.replay_columns import ReplayColumns, OBSERVATION_SIZES
 
 
 class GlobalBuffer(object):
     """
     Global Buffer that all of the data workers send samples from completed games to.
-    Uses a priority buffer. Also does all batch assembly for the trainer.
+    Uses a prioritized replay buffer, samples stay in it until newer ones overwrite them and the trainer updates their
+    priorities. The samples are stored field by field in preallocated arrays, so a batch for the trainer is one fancy
+    index per field.
 
-    Args:
-        storage_ptr (pointer): Pointer to the storage object to keep track of the current trainer status.
+    The trainer takes its batches through a BatchPrefetcher, which waits on wait_for_batch until the buffer holds a
+    batch worth of samples.
     """
 
-    def __init__(self, storage_ptr):
-        self.gameplay_experiences = PriorityBuffer(config.GLOBAL_BUFFER_SIZE)
+    def __init__(self):
+        # The priorities and the slots of the samples, the samples are the rows of those slots in replay_columns
+        self.gameplay_experiences = SumTreeBuffer(config.GLOBAL_BUFFER_SIZE, config.PRIORITY_ALPHA)
+        self.replay_columns = ReplayColumns(config.GLOBAL_BUFFER_SIZE)
         self.batch_size = config.BATCH_SIZE
-        self.storage_ptr = storage_ptr
-        self.average_position = PriorityBuffer(config.GLOBAL_BUFFER_SIZE)
-        self.current_batch = []
-        self.batch_full = False
+        # Set once the buffer holds a batch worth of samples, samples are never taken out so it stays set
+        self.batch_ready = asyncio.Event()
+        # Samples in the batches of the training steps so far, see untrained_samples
+        self.trained_samples = 0
         self.ckpt_time = time.time_ns()
 
     async def sample_batch(self):
@@ -32,99 +37,68 @@ class GlobalBuffer(object):
             - There is enough data in the buffer to train on.
 
         Returns:
-            A prepared batch ready for training.
+            A prepared batch ready for training. The last entry is the ids of the samples for update_priorities.
         """
-        obs_tensor_batch, action_history_batch, target_value_batch, policy_mask_batch = [], [], [], []
-        target_reward_batch, target_policy_batch, value_mask_batch, reward_mask_batch = [], [], [], []
-        sample_set_batch, tier_batch, final_tier_batch, champion_batch, position_batch = [], [], [], [], []
-        importance_weights = []
-        for batch_num in range(self.batch_size):
-            # Setting the position gameplay_experiences get and position get next to each other to minimize
-            # the number of multiprocessing errors that could occur by having them too far apart.
-            # If these two commands become out of sync, it would cause the position logging to not match the rest
-            # of the training logs, but it would not break training.
-            [observation, action_history, value_mask, reward_mask, policy_mask, value, reward, policy,
-             sample_set, tier_set, final_tier_set, champion_set], priority = self.gameplay_experiences.extractMax()
-            position, _ = self.average_position.extractMax()
-            position_batch.append(position)
-            obs_tensor_batch.append(observation)
-            action_history_batch.append(action_history[1:])
-            value_mask_batch.append(value_mask)
-            reward_mask_batch.append(reward_mask)
-            policy_mask_batch.append(policy_mask)
-            target_value_batch.append(value)
-            target_reward_batch.append(reward)
-            target_policy_batch.append(policy)
-            sample_set_batch.append(sample_set)
-            tier_batch.append(tier_set)
-            final_tier_batch.append(final_tier_set)
-            champion_batch.append(champion_set)
-            importance_weights.append(1 / self.batch_size / priority)
-
-        observation_batch = self.reshape_observation(obs_tensor_batch)
-        action_history_batch = np.asarray(action_history_batch)
-        target_value_batch = np.asarray(target_value_batch).astype('float32')
-        target_reward_batch = np.asarray(target_reward_batch).astype('float32')
-        value_mask_batch = np.asarray(value_mask_batch).astype('float32')
-        reward_mask_batch = np.asarray(reward_mask_batch).astype('float32')
-        policy_mask_batch = np.asarray(policy_mask_batch).astype('float32')
-        importance_weights_batch = np.asarray(importance_weights).astype('float32')
-        importance_weights_batch = importance_weights_batch / np.max(importance_weights_batch)
-        position_batch = np.asarray(position_batch)
-        position_batch = np.mean(position_batch)
+        slots, sample_ids, importance_weights_batch = \
+            self.gameplay_experiences.sample(self.batch_size, config.PRIORITY_BETA)
+        batch = self.replay_columns.read(slots)
 
+        # The model takes the observation as a dictionary of [batch_size, size] arrays
+        observation_batch = {key: batch[key] for key in OBSERVATION_SIZES}
         data_list = [
-            observation_batch, action_history_batch, value_mask_batch, reward_mask_batch,
-            policy_mask_batch, target_value_batch, target_reward_batch, target_policy_batch, sample_set_batch,
-            importance_weights_batch, tier_batch, final_tier_batch, champion_batch, np.array(position_batch)
+            observation_batch, batch["action"].astype(np.int64), batch["value_mask"], batch["reward_mask"],
+            batch["policy_mask"], batch["value"], batch["reward"], batch["policy"], batch.get("policy_index"),
+            importance_weights_batch, batch["tier"], batch["final_tier"], batch["champion"],
+            np.array(np.mean(batch["position"])), sample_ids
         ]
         return np.array(data_list, dtype=object)
 
-    def reshape_observation(self, obs_batch):
+    async def store_replay_sequence(self, samples):
         """
         Description:
-            Switches the batch and dictionary axis.
-            The model requires the dictionary to be in the first axis and the batch to be the second axis.
-        """
-        obs_reshaped = {}
-
-        for obs in obs_batch:
-            for key in obs:
-                if key not in obs_reshaped:
-                    obs_reshaped[key] = []
-                obs_reshaped[key].append(obs[key])
-
-        for key in obs_reshaped:
-            obs_reshaped[key] = np.stack(obs_reshaped[key], axis=0)
-
-        return obs_reshaped
+            Async method to store data into the global buffer. Some quick checking to ensure data validity.
 
-    async def store_replay_sequence(self, samples):
+        Args:
+            samples (list): The priorities of the samples of one game, the samples, a dictionary of arrays with a row
+                for every sample, see replay_schema, and the table of the opponent observations of the game.
+        """
+        priorities, columns, opponents = samples
+        stored = np.isfinite(priorities)
+        if not stored.all():
+            priorities = priorities[stored]
+            columns = {key: column[stored] for key, column in columns.items()}
+        sample_ids = self.gameplay_experiences.insert(priorities)
+        # Only the newest samples are kept if there are more than fit into the buffer
+        dropped = len(priorities) - len(sample_ids)
+        self.replay_columns.write(sample_ids % config.GLOBAL_BUFFER_SIZE,
+                                  {key: column[dropped:] for key, column in columns.items()}, opponents)
+        if self.gameplay_experiences.size >= self.batch_size and not self.batch_ready.is_set():
+            print("QUEUE_LENGTH {} at time {}".format(self.gameplay_experiences.size, time.time_ns()))
+            self.batch_ready.set()
+
+    def update_priorities(self, sample_ids, priorities):
         """
         Description:
-            Async method to store data into the global buffer. Some quick checking to ensure data validity.
+            Sets the priorities of the samples of a batch from their errors in the last training step.
 
         Args:
-            samples (list): All samples from one game from one agent.
+            sample_ids (np.ndarray): The last entry of the batch from sample_batch.
+            priorities (np.ndarray): New priority of every sample.
         """
-        for sample in samples[0]:
-            if sample[0] > 1:
-                self.gameplay_experiences.insert(sample[0], sample[1])
-                self.average_position.insert(sample[0], samples[1])
+        self.gameplay_experiences.update_priorities(sample_ids, priorities)
+        self.trained_samples += len(sample_ids)
 
-    async def available_batch(self):
+    def untrained_samples(self):
         """
         Description:
-            Async method to determine if there is enough data in the buffer to start up the trainer.
+            How far the stored samples are ahead of the trainer, the samples stored so far less the samples in the
+            batches the trainer took. The ring never empties, so this is what the data workers hold back on.
+        """
+        return max(self.gameplay_experiences.stored - self.trained_samples, 0)
 
-        Outputs:
-            - True if there is enough data and the trainer is free, false otherwise.
+    async def wait_for_batch(self):
+        """
+        Description:
+            Async method that returns once there is enough data in the buffer to train on.
         """
-        queue_length = self.gameplay_experiences.size
-        if queue_length >= self.batch_size and not await self.storage_ptr.get_trainer_busy.remote():
-            print("QUEUE_LENGTH {} at time {}".format(queue_length, time.time_ns()))
-            await self.storage_ptr.set_trainer_busy.remote(True)
-            return True
-        await asyncio.sleep(2)
-        print("QUEUE_LENGTH_SLEEPY {} at time {}".format(queue_length, time.time_ns()))
-        return False
+        await self.batch_ready.wait()
@@ -0,0 +1,163 @@
+import asyncio
+import time
+import ray
+import numpy as np
+import torch
+import config
+from Models.MuZero_torch_agent import MuZeroNetwork as TFTNetwork
+from Models.inference_export import ExportedNetwork
+from config import INFERENCE_SERVER_GPU_SIZE
+
+INITIAL = "initial"
+RECURRENT = "recurrent"
+
+
+class InferenceBatcher:
+    """
+    Collects inference requests and runs them through the network in batches.
+
+    Requests of one kind wait until max_batch_size rows are pending or the first of them has waited timeout seconds.
+    Then they run as one batch and every request gets its own rows of the outputs back.
+    It runs in a single asyncio event loop, which the network blocks while a batch runs.
+
+    args:
+        network: AbstractNetwork
+        max_batch_size: int, pending rows that start a batch right away
+        timeout: float, seconds the first request of a batch waits for others
+        device: where the network is, config.DEVICE by default
+    """
+    def __init__(self, network, max_batch_size, timeout, device=None):
+        self.network = network
+        self.device = device if device is not None else config.DEVICE
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+        self.pending = {INITIAL: [], RECURRENT: []}
+        self.pending_rows = {INITIAL: 0, RECURRENT: 0}
+        self.timers = {}
+        self.requests = 0
+        self.batches = 0
+        self.rows = 0
+        self.busy_time = 0
+        self.start_time = None
+
+    async def initial_inference(self, observation):
+        return await self.submit(INITIAL, observation, len(observation["shop"]))
+
+    async def recurrent_inference(self, hidden_state, action):
+        return await self.submit(RECURRENT, (hidden_state, action), len(action))
+
+    async def submit(self, kind, inputs, rows):
+        loop = asyncio.get_running_loop()
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+        future = loop.create_future()
+        self.pending[kind].append((inputs, rows, future))
+        self.pending_rows[kind] += rows
+        if self.pending_rows[kind] >= self.max_batch_size:
+            self.flush(kind)
+        elif kind not in self.timers:
+            self.timers[kind] = loop.call_later(self.timeout, self.flush, kind)
+        return await future
+
+    def flush(self, kind):
+        """Runs every pending request of the kind as one batch"""
+        timer = self.timers.pop(kind, None)
+        if timer is not None:
+            timer.cancel()
+        requests = self.pending[kind]
+        self.pending[kind] = []
+        self.pending_rows[kind] = 0
+        if not requests:
+            return
+
+        start = time.perf_counter()
+        try:
+            outputs = self.run(kind, [inputs for inputs, _, _ in requests])
+        except Exception as error:
+            for _, _, future in requests:
+                future.set_exception(error)
+            return
+        sizes = [rows for _, rows, _ in requests]
+        parts = {key: torch.split(value, sizes) for key, value in outputs.items()}
+        for i, (_, _, future) in enumerate(requests):
+            # Copies, a view would send the whole batch back with every request
+            future.set_result({key: values[i].clone() for key, values in parts.items()})
+
+        self.busy_time += time.perf_counter() - start
+        self.requests += len(requests)
+        self.batches += 1
+        self.rows += sum(sizes)
+
+    def run(self, kind, inputs):
+        with torch.no_grad():
+            if kind == INITIAL:
+                observation = {key: np.concatenate([observation[key] for observation in inputs])
+                               for key in inputs[0]}
+                outputs = self.network.initial_inference(observation)
+            else:
+                hidden_state = torch.cat([hidden_state.to(self.device) for hidden_state, _ in inputs])
+                action = np.concatenate([action for _, action in inputs])
+                outputs = self.network.recurrent_inference(hidden_state, action)
+        return {key: torch.as_tensor(value).cpu() for key, value in outputs.items()}
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.start_time if self.start_time is not None else 0
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'inferences': self.rows,
+            'mean_batch_size': self.rows / self.batches if self.batches else 0,
+            'inferences_per_second': self.rows / elapsed if elapsed else 0,
+            'busy': self.busy_time / elapsed if elapsed else 0,
+        }
+
+
+@ray.remote(num_gpus=INFERENCE_SERVER_GPU_SIZE)
+class InferenceServer:
+    """
+    The one copy of the network that the data workers run their searches through, see InferenceBatcher.
+    It's an async actor, so the calls of many workers wait for their batch at the same time.
+    The server plays the latest weights a worker handed it.
+    """
+    def __init__(self, model_config, max_batch_size=config.INFERENCE_BATCH_SIZE, timeout=config.INFERENCE_TIMEOUT):
+        network = TFTNetwork(model_config)
+        network.to(config.DEVICE)
+        if config.INFERENCE_EXPORT:
+            network = ExportedNetwork(network, model_config, config.INFERENCE_EXPORT)
+        self.batcher = InferenceBatcher(network, max_batch_size, timeout)
+
+    async def initial_inference(self, observation):
+        return await self.batcher.initial_inference(observation)
+
+    async def recurrent_inference(self, hidden_state, action):
+        return await self.batcher.recurrent_inference(hidden_state, action)
+
+    async def set_weights(self, weights):
+        self.batcher.network.set_weights(weights)
+
+    async def get_weights(self):
+        return self.batcher.network.get_weights()
+
+    async def stats(self):
+        return self.batcher.stats()
+
+
+class RemoteNetwork:
+    """
+    Network client for MCTS that runs the inferences on an InferenceServer.
+    MCTS only calls initial_inference and recurrent_inference, so a local network and this client are interchangeable.
+    """
+    def __init__(self, server):
+        self.server = server
+
+    def initial_inference(self, observation):
+        return ray.get(self.server.initial_inference.remote(observation))
+
+    def recurrent_inference(self, hidden_state, action):
+        return ray.get(self.server.recurrent_inference.remote(hidden_state.cpu(), action))
+
+    def set_weights(self, weights):
+        ray.get(self.server.set_weights.remote(weights))
+
+    def get_weights(self):
+        return ray.get(self.server.get_weights.remote())
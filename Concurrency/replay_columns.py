@@ -0,0 +1,159 @@
+import numpy as np
+import config
+
+OBSERVATION_SIZES = {
+    "scalars": config.SCALAR_INPUT_SIZE,
+    "shop": config.SHOP_INPUT_SIZE,
+    "board": config.BOARD_INPUT_SIZE,
+    "bench": config.BENCH_INPUT_SIZE,
+    "items": config.ITEMS_INPUT_SIZE,
+    "traits": config.TRAIT_INPUT_SIZE,
+    "other_players": config.OTHER_PLAYER_INPUT_SIZE
+}
+
+# other_players is the public observations of the NUM_PLAYERS - 1 opponents one after the other
+NUM_OPPONENTS = config.NUM_PLAYERS - 1
+OPPONENT_SIZE = config.OTHER_PLAYER_INPUT_SIZE // NUM_OPPONENTS
+
+# The observation fields of a replay sample, other_players is stored as the rows of its opponents in an OpponentTable
+STORED_OBSERVATION_KEYS = [key for key in OBSERVATION_SIZES if key != "other_players"] + ["opponents"]
+
+# Where the flat tier labels split into the labels of the TEAM_TIERS_VECTOR heads
+TIER_SPLITS = np.cumsum(config.TEAM_TIERS_VECTOR)[:-1]
+
+
+def policy_width():
+    """Most sampled actions a root can have, the root policies are padded with zeros to this length"""
+    return max(config.ModelConfig.NUM_SAMPLES, config.ModelConfig.GUMBEL_ACTIONS)
+
+
+def replay_schema():
+    """
+    Shape without the sample axis and dtype of every field of a replay sample.
+
+    The targets of the UNROLL_STEPS + 1 steps of a sample are along its second axis, the actions only for the
+    UNROLL_STEPS unrolled steps. The policy holds the probabilities of the sampled actions of the root and policy_index
+    their action codes, both padded with zeros. With CHAMP_DECIDER the policy is the concatenated probabilities of the
+    CHAMP_DECIDER_ACTION_DIM heads and there is no policy_index. The other_players observation is replaced by the rows
+    of the opponents in the OpponentTable of the game.
+    """
+    steps = config.UNROLL_STEPS + 1
+    schema = {key: ((size,), np.float32) for key, size in OBSERVATION_SIZES.items() if key != "other_players"}
+    schema["opponents"] = ((NUM_OPPONENTS,), np.int32)
+    if config.CHAMP_DECIDER:
+        schema["action"] = ((config.UNROLL_STEPS, len(config.CHAMP_DECIDER_ACTION_DIM)), np.int8)
+        schema["policy"] = ((steps, sum(config.CHAMP_DECIDER_ACTION_DIM)), np.float32)
+    else:
+        schema["action"] = ((config.UNROLL_STEPS, len(config.ACTION_DIM)), np.int8)
+        schema["policy"] = ((steps, policy_width()), np.float32)
+        schema["policy_index"] = ((steps, policy_width()), np.int16)
+    for key in ("value_mask", "reward_mask", "policy_mask", "value", "reward"):
+        schema[key] = ((steps,), np.float32)
+    schema["tier"] = ((steps, config.TIERS_FLATTEN_LENGTH), np.int8)
+    schema["final_tier"] = ((config.TIERS_FLATTEN_LENGTH,), np.int8)
+    schema["champion"] = ((steps, len(config.CHAMPION_LIST_DIM), 2), np.int8)
+    schema["position"] = ((), np.float32)
+    return schema
+
+
+def allocate_columns(length, schema=None):
+    """One zeroed array of length samples for every field of the schema"""
+    if schema is None:
+        schema = replay_schema()
+    return {key: np.zeros((length,) + shape, dtype=dtype) for key, (shape, dtype) in schema.items()}
+
+
+class OpponentTable:
+    """
+    Every different public observation of an opponent in the other_players observations of a game, stored once.
+
+    The players of a game see the same public observations of their opponents, which only change when the opponent
+    acts, so the other_players of all players and steps of a game have few different opponent observations between
+    them. The ReplayBuffers of the players of a game share one table.
+    """
+    def __init__(self):
+        self.rows = {}
+        self.observations = []
+
+    def add(self, other_players):
+        """Adds the opponent observations of other_players that aren't in the table yet and returns their rows"""
+        rows = np.empty(NUM_OPPONENTS, dtype=np.int32)
+        opponents = np.asarray(other_players, dtype=np.float32).reshape(NUM_OPPONENTS, OPPONENT_SIZE)
+        for i, opponent in enumerate(opponents):
+            key = opponent.tobytes()
+            row = self.rows.get(key)
+            if row is None:
+                row = self.rows[key] = len(self.observations)
+                # A copy, a view would keep all of other_players alive
+                self.observations.append(opponent.copy())
+            rows[i] = row
+        return rows
+
+    def table(self):
+        """[rows, OPPONENT_SIZE] array of the opponent observations"""
+        if not self.observations:
+            return np.zeros((0, OPPONENT_SIZE), dtype=np.float32)
+        return np.stack(self.observations)
+
+
+class ReplayColumns:
+    """
+    Replay samples stored field by field in preallocated numpy arrays, one row per slot of the replay ring.
+    Storing writes rows and reading a batch is one fancy index per field, so the batch comes out as stacked arrays.
+
+    The opponent tables of the games with samples in the ring are kept next to the fields, a table is dropped when the
+    last sample of its game is overwritten. Reading puts the other_players observation back together from them.
+
+    args:
+        capacity: int, rows of every field
+        schema: dict of field to (shape, dtype), replay_schema by default
+    """
+    def __init__(self, capacity, schema=None):
+        self.columns = allocate_columns(capacity, schema)
+        # The game of the sample in every slot, -1 for empty slots
+        self.slot_games = np.full(capacity, -1, dtype=np.int64)
+        self.opponent_tables = {}
+        self.game_samples = {}
+        self.games = 0
+
+    def write(self, slots, samples, opponents=None):
+        """
+        Writes the fields of samples, arrays with a row for every slot, into the slots.
+        The samples are from one game and opponents is the table of its opponent observations, see OpponentTable.
+        """
+        for key, column in self.columns.items():
+            column[slots] = samples[key]
+        self.release(self.slot_games[slots])
+        self.slot_games[slots] = self.games
+        if opponents is not None and len(slots):
+            self.opponent_tables[self.games] = opponents
+            self.game_samples[self.games] = len(slots)
+        self.games += 1
+
+    def release(self, games):
+        """Drops the opponent tables of the games without samples left, games has an entry per overwritten sample"""
+        games, counts = np.unique(games[games >= 0], return_counts=True)
+        for game, count in zip(games.tolist(), counts.tolist()):
+            if game in self.game_samples:
+                self.game_samples[game] -= count
+                if self.game_samples[game] == 0:
+                    del self.game_samples[game]
+                    del self.opponent_tables[game]
+
+    def read(self, slots):
+        batch = {key: column[slots] for key, column in self.columns.items()}
+        if "opponents" in batch:
+            batch["other_players"] = self.other_players(self.slot_games[slots], batch.pop("opponents"))
+        return batch
+
+    def other_players(self, games, rows):
+        """The other_players observations of samples of the games with the opponent rows"""
+        other_players = np.empty((len(games), NUM_OPPONENTS, OPPONENT_SIZE), dtype=np.float32)
+        for game in np.unique(games).tolist():
+            in_game = games == game
+            other_players[in_game] = self.opponent_tables[game][rows[in_game]]
+        return other_players.reshape(len(games), NUM_OPPONENTS * OPPONENT_SIZE)
+
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values()) + \
+            sum(table.nbytes for table in self.opponent_tables.values())
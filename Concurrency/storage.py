@@ -13,7 +13,7 @@ from config import STORAGE_GPU_SIZE
 class Storage:
     """
     Class that stores the global agent and other meta data that all of the data workers can access.
-    Stores all checkpoints. Also stores a boolean to know if the trainer is currently busy or not.
+    Stores all checkpoints.
 
     Args:
         episode (int): Checkpoint number to load in for the global agent.
@@ -26,7 +26,6 @@ class Storage:
         self.episode_played = 0
         self.placements = {"player_" + str(r): [0 for _ in range(config.NUM_PLAYERS)]
                            for r in range(config.NUM_PLAYERS)}
-        self.trainer_busy = False
         self.checkpoint_list = np.array([], dtype=object)
         self.max_q_value = 1
         self.store_base_checkpoint()
@@ -93,25 +92,6 @@ class Storage:
     def increment_episode_played(self):
         self.episode_played += 1
 
-    """
-    Description - 
-        Updates the trainer_busy status. Called by available_batch and training loop after training.
-    Inputs      - 
-        status - boolean
-            New status
-    """
-    def set_trainer_busy(self, status):
-        self.trainer_busy = status
-
-    """
-    Description - 
-        Returns the trainer_busy status. Called by available_batch.
-    Outputs     - 
-        current status
-    """
-    def get_trainer_busy(self):
-        return self.trainer_busy
-
     """
     Description - 
     Inputs      - 
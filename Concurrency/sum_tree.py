@@ -0,0 +1,99 @@
+import numpy as np
+
+
+class SumTreeBuffer:
+    """
+    Priorities of a prioritized replay buffer, "Prioritized Experience Replay" (Schaul et al. 2016).
+
+    The samples sit in the slots of a ring that overwrites the oldest one when it is full, the samples themselves are
+    kept by the caller, see ReplayColumns. Their priorities are the leaves of a sum tree and a min tree in flat numpy
+    arrays, node i has the children 2i and 2i + 1 and the leaves start at the capacity rounded up to a power of 2.
+    Sampling is proportional to priority ** alpha and doesn't remove anything.
+
+    Every stored sample gets an id, the number of samples stored before it, and sits in the slot id % capacity.
+    Priority updates name the samples by their id, so an update for a sample that has been overwritten since it was
+    sampled is dropped.
+
+    args:
+        capacity: int, samples kept
+        alpha: float, how much the priorities count, 0 is uniform sampling
+        min_priority: float, priorities are at least this, so that every sample can be drawn
+    """
+    def __init__(self, capacity, alpha=1.0, min_priority=1e-3):
+        self.capacity = capacity
+        self.alpha = alpha
+        self.min_priority = min_priority
+        self.leaf_start = 1
+        while self.leaf_start < capacity:
+            self.leaf_start *= 2
+        self.depth = self.leaf_start.bit_length() - 1
+        self.sum_tree = np.zeros(2 * self.leaf_start, dtype=np.float64)
+        self.min_tree = np.full(2 * self.leaf_start, np.inf, dtype=np.float64)
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.size = 0
+        self.stored = 0
+
+    def qsize(self):
+        return self.size
+
+    def total(self):
+        return self.sum_tree[1]
+
+    def insert(self, priorities):
+        """Adds a sample for every priority and returns their ids, the samples go into the slots ids % capacity"""
+        priorities = np.asarray(priorities, dtype=np.float64).reshape(-1)
+        sample_ids = np.arange(self.stored, self.stored + len(priorities), dtype=np.int64)
+        # More samples than slots only keeps the newest ones
+        sample_ids = sample_ids[-self.capacity:]
+        slots = sample_ids % self.capacity
+        self.ids[slots] = sample_ids
+        self.stored += len(priorities)
+        self.size = min(self.size + len(priorities), self.capacity)
+        self.set_priorities(slots, priorities[len(priorities) - len(sample_ids):])
+        return sample_ids
+
+    def set_priorities(self, slots, priorities):
+        nodes = slots + self.leaf_start
+        self.sum_tree[nodes] = np.maximum(priorities, self.min_priority) ** self.alpha
+        self.min_tree[nodes] = self.sum_tree[nodes]
+        # One level of the trees at a time, for all of the changed leaves together
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.sum_tree[nodes] = self.sum_tree[2 * nodes] + self.sum_tree[2 * nodes + 1]
+            self.min_tree[nodes] = np.minimum(self.min_tree[2 * nodes], self.min_tree[2 * nodes + 1])
+
+    def update_priorities(self, sample_ids, priorities):
+        """Sets the priorities of the samples that are still in the buffer"""
+        sample_ids = np.asarray(sample_ids, dtype=np.int64)
+        slots = sample_ids % self.capacity
+        current = self.ids[slots] == sample_ids
+        if current.any():
+            self.set_priorities(slots[current], np.asarray(priorities, dtype=np.float64)[current])
+
+    def find(self, values):
+        """The slots of the samples at the prefix sums values, walking down all of them together"""
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            # Never into an empty subtree, rounding could point past the last sample
+            right = (values >= self.sum_tree[left]) & (self.sum_tree[left + 1] > 0)
+            values = np.where(right, values - self.sum_tree[left], values)
+            nodes = left + right
+        return nodes - self.leaf_start
+
+    def sample(self, batch_size, beta=1.0):
+        """
+        Draws batch_size samples proportionally to their priority, one from each of batch_size equal ranges of the
+        total priority.
+
+        returns:
+            the slots of the samples, their ids and the importance weights, (size * probability) ** -beta scaled by the largest
+            weight any sample in the buffer can have
+        """
+        total = self.total()
+        values = (np.arange(batch_size) + np.random.random_sample(batch_size)) * (total / batch_size)
+        slots = self.find(np.minimum(values, total))
+        probabilities = self.sum_tree[slots + self.leaf_start] / total
+        max_weight = (self.size * self.min_tree[1] / total) ** -beta
+        weights = (self.size * probabilities) ** -beta / max_weight
+        return slots, self.ids[slots], weights.astype(np.float32)
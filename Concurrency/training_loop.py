@@ -1,8 +1,10 @@
 import time
+import asyncio
 import datetime
 import config
 from torch.utils.tensorboard import SummaryWriter
 from Models.MuZero_torch_trainer import Trainer
+from Concurrency.batch_prefetcher import BatchPrefetcher
 
 
 """
@@ -22,6 +24,7 @@ class TrainingLoop:
         self.trainer = Trainer(global_agent, self.summary_writer)
         self.batch_size = config.BATCH_SIZE
         self.global_buffer = global_buffer
+        self.prefetcher = BatchPrefetcher(global_buffer)
         self.ckpt_time = time.time_ns()
         self.checkpoint_steps = config.CHECKPOINT_STEPS
         self.champ_decider = config.CHAMP_DECIDER
@@ -37,21 +40,35 @@ class TrainingLoop:
             Current episode that is used for logging and labelling the checkpoints.
     """
     async def loop(self, global_agent, storage, train_step):
+        self.prefetcher.start()
         while True:
-            if await self.global_buffer.available_batch():
-                gameplay_experience_batch = await self.global_buffer.sample_batch()
+            gameplay_experience_batch, idle_time = await self.prefetcher.get()
+            ready = self.prefetcher.ready()
 
-                self.trainer.train_network(gameplay_experience_batch, train_step)
-                # Leaving these comments here because they are benchmarking times for debugging.
-                # print("One round in the trainer took {} time".format(time.time_ns() - self.ckpt_time))
-                # self.ckpt_time = time.time_ns()
-                storage.set_trainer_busy.remote(False)
-                storage.set_target_model.remote(global_agent.get_weights())
-                train_step += 1
+            # Training runs in a thread so that the global buffer keeps storing samples and assembling the next
+            # batches in the meantime.
+            start = time.perf_counter()
+            priorities = await asyncio.to_thread(self.trainer.train_network, gameplay_experience_batch, train_step)
+            train_time = time.perf_counter() - start
+            self.global_buffer.update_priorities(gameplay_experience_batch[-1], priorities)
+            self.write_pipeline_summaries(idle_time, train_time, ready, train_step)
+            storage.set_target_model.remote(global_agent.get_weights())
+            train_step += 1
 
-                # Because the champ decider produces 125 samples per game whereas the standard trainer produces
-                # closer to 3000, setting the checkpoints to be produced more rapidly.
-                if (train_step % self.checkpoint_steps == 0) or \
-                        (self.champ_decider and train_step % self.checkpoint_steps % 10 == 0):
-                    storage.store_checkpoint.remote(train_step)
-                    global_agent.tft_save_model(train_step)
+            # Because the champ decider produces 125 samples per game whereas the standard trainer produces
+            # closer to 3000, setting the checkpoints to be produced more rapidly.
+            if (train_step % self.checkpoint_steps == 0) or \
+                    (self.champ_decider and train_step % self.checkpoint_steps % 10 == 0):
+                storage.store_checkpoint.remote(train_step)
+                global_agent.tft_save_model(train_step)
+
+    """
+    Description - 
+        Logs how long the trainer waited for the batch of a training step and how many batches were ready after it.
+        Once the buffer is warm the prefetcher keeps batches ready and the idle time stays near 0.
+    """
+    def write_pipeline_summaries(self, idle_time, train_time, ready, train_step):
+        self.summary_writer.add_scalar('trainer/idle_seconds', idle_time, train_step)
+        self.summary_writer.add_scalar('trainer/idle_fraction', idle_time / max(idle_time + train_time, 1e-9),
+                                       train_step)
+        self.summary_writer.add_scalar('trainer/batches_ready', ready, train_step)
@@ -58,6 +58,15 @@ class TrainingManager:
     def buffer_size(self):
         return ray.get(self.training_ray_manager.buffer_size.remote())
 
+    """
+    Description - 
+        Outward facing call for how many samples the global buffer holds that the trainer hasn't caught up with.
+    Outputs     - 
+        Untrained samples - int
+    """
+    def untrained_samples(self):
+        return ray.get(self.training_ray_manager.untrained_samples.remote())
+
 
 """
 Description - 
@@ -72,7 +81,7 @@ Inputs      -
 @ray.remote(num_gpus=TRAINER_GPU_SIZE)
 class _TrainActor:
     def __init__(self, global_agent, storage):
-        self.global_buffer = GlobalBuffer(storage)
+        self.global_buffer = GlobalBuffer()
         self.training_loop = TrainingLoop(global_agent, self.global_buffer)
 
     """
@@ -108,3 +117,12 @@ class _TrainActor:
     """
     def buffer_size(self):
         return self.global_buffer.gameplay_experiences.size
+
+    """
+    Description - 
+        Inward facing call for the samples stored ahead of the trainer, see GlobalBuffer.untrained_samples.
+    Outputs     - 
+        Untrained samples - int
+    """
+    def untrained_samples(self):
+        return self.global_buffer.untrained_samples()
@@ -1,32 +1,20 @@
 import config
+import functools
+import math
 import torch
 import numpy as np
 import time
+from Simulator.observation.token.action import ActionToken
 
+# Actions are passed around the search as their flat index in the 55x38 action space.
+# Row i is the 3 dimensional action [type, x1, x2] of index i that the simulator and the dynamics network use.
+ACTION_CODES = np.asarray([ActionToken.action_space_to_action(code) for code in range(config.POLICY_HEAD_SIZE)])
 
-def create_default_mapping():
-    mappings = []
 
-    for a in range(38):
-        for b in range(37):
-            if a == 37:
-                mappings.append(f"4_{b}")
-            else:
-                mappings.append(f"5_{a}_{b}")
+def decode_action_codes(codes):
+    """Flat action indices to an array of [type, x1, x2] actions"""
+    return ACTION_CODES[np.asarray(codes, dtype=np.int64)]
 
-        for b in range(10):
-            mappings.append(f"6_{a}_{b}")
-
-        for b in range(5):
-            mappings.append(f"3_{a}")
-
-        mappings.append(f"0")
-        mappings.append(f"1")
-        mappings.append(f"2")
-
-    mappings = [mappings] * config.NUM_PLAYERS
-
-    return mappings
 
 def split_sample_decide(sample_mapping, target_policy):
     if config.CHAMP_DECIDER:
@@ -34,8 +22,8 @@ def split_sample_decide(sample_mapping, target_policy):
     else:
         return split_sample_set(sample_mapping, target_policy)
 
-# ["0", "1_0", "2_20_20", "3_4_20", "4_10", "5", "6"] ->
-# [["0", "1", "2", "3", "4", "5", "6"], ["_0"], ["_20_20"], ["_4_20"], ["_10"]]
+# [1976, 1786, 798, 1599] ->
+# [[0, 3, 5, 6], [], [], [1786], []]
 def split_sample_set(sample_mapping, target_policy):
     split_sample = [[], [], [], [], []]
     split_policy = [[], [], [], [], []]
@@ -43,27 +31,22 @@ def split_sample_set(sample_mapping, target_policy):
     # split_policy[0] = [0] * config.POLICY_HEAD_SIZES[0]
 
     for i, sample in enumerate(sample_mapping):
-        base = sample[0]
-        idx = int(base)
+        idx = int(ACTION_CODES[sample][0])
 
         if idx in config.NEEDS_2ND_DIM:
-            location = sample[1:]
-
-            if base not in split_sample[0]:
-                split_sample[0].append(base)
+            if idx not in split_sample[0]:
+                split_sample[0].append(idx)
                 split_policy[0].append(0)
 
-            split_sample[idx].append(location)
+            split_sample[idx].append(sample)
             split_policy[idx].append(target_policy[i])
             # split_policy[0][idx] += target_policy[i]
         else:
-            split_sample[0].append(sample)
+            split_sample[0].append(idx)
             split_policy[0].append(target_policy[i])
 
     # Accumulate the policy for each multidim action
-    for i, base in enumerate(split_sample[0]):
-        idx = int(base)
-
+    for i, idx in enumerate(split_sample[0]):
         if idx in config.NEEDS_2ND_DIM:
             policy_sum = sum(split_policy[idx])
             split_policy[0][i] += policy_sum
@@ -83,119 +66,6 @@ def split_sample_set_champ_decider(sample_mapping, target_policy):
             split_policy[int(k/2)][idx] += target_policy[i]
     return split_sample, split_policy
 
-# [batch_size, unroll_steps, num_samples] to [unroll_steps, num dims, (batch_size, dim)]
-def split_batch(mapping_batch, policy_batch):
-    batch_size = len(mapping_batch)  # config.BATCH_SIZE
-    unroll_steps = len(mapping_batch[0])  # config.UNROLL_STEPS
-
-    mapping = []
-    policy = []
-
-    for unroll_idx in range(unroll_steps):
-        if config.CHAMP_DECIDER:
-            unroll_mapping = [[] for _ in range(len(config.CHAMP_DECIDER_ACTION_DIM))]
-            unroll_policy = [[] for _ in range(len(config.CHAMP_DECIDER_ACTION_DIM))]
-
-            for batch_idx in range(batch_size):
-                local_mapping = mapping_batch[batch_idx][unroll_idx]
-                local_policy = policy_batch[batch_idx][unroll_idx]
-
-                for dim_idx in range(len(local_mapping)):
-                    unroll_mapping[dim_idx].append(local_mapping[dim_idx])
-                    unroll_policy[dim_idx].append(local_policy[dim_idx])
-
-        else:
-            unroll_mapping = []
-            unroll_policy = []
-
-            for batch_idx in range(batch_size):
-                unroll_mapping.append(mapping_batch[batch_idx][unroll_idx])
-                unroll_policy.append(policy_batch[batch_idx][unroll_idx])
-
-        mapping.append(unroll_mapping)
-        policy.append(unroll_policy)
-
-    return mapping, policy
-
-def action_to_idx(sample):
-    mapped_idx = None
-    split_action = sample.split("_")
-    first_idx = int(split_action[0])
-
-    if first_idx < 3:  # type dim; 7; "0", "1", ... "6"
-        mapped_idx = 1977 + 38 * first_idx
-
-    elif first_idx == 3:  # shop dim; 5; "_0", "_1", ... "_4"
-        mapped_idx = 1939 + int(split_action[1])  # "_1" -> "1"
-
-    elif first_idx == 4:  # board dim; 630; "_0_1", "_0_2", ... "_37_28"
-        mapped_idx = 37 + 38 * int(split_action[1])
-
-    elif first_idx == 5:  # item dim; 370; "_0_0", "_0_1", ... "_9_36"
-        mapped_idx = 38 * int(split_action[1]) + int(split_action[2])
-
-    elif first_idx == 6:  # sell dim; 37; "_0", "_1", "_36"
-        mapped_idx = 1559 + 38 * int(split_action[1]) + int(split_action[2])
-
-    return mapped_idx
-
-# Sample set is [ [batch_size, dim], [batch_size, dim] ...]
-# Convert the sample set string to the corresponding idx
-def sample_set_to_idx(sample_set):
-    idx_set = []
-
-    for batch in sample_set:  # [batch_size, dim]
-        dim_idx = []
-        for sample in batch:  # [dim]
-            dim_idx.append(action_to_idx(sample))
-        idx_set.append(dim_idx)
-
-    return idx_set
-
-# target [ [batch_size, sampled_dim], [batch_size, sampled_dim] ...]
-# idx_set [ [batch_size, sampled_dim], [batch_size, sampled_dim] ...]
-# Create filled target with zeros as well as mask
-def create_target_and_mask(target, idx_set):
-    batch_size = config.BATCH_SIZE
-
-    target_filled = np.zeros((batch_size, config.POLICY_HEAD_SIZE), dtype=np.float32)
-
-    # TODO: Find a native numpy function to do this
-    for batch_idx, batch in enumerate(idx_set):  # [batch_size, dim]
-        for sample_idx, sample in enumerate(batch):
-            target_filled[batch_idx][sample] = target[batch_idx][sample_idx]
-
-    return target_filled
-
-
-# both are (num_dims, [(batch_size, dim) ...] )
-# TODO: Add a description of what this does
-def map_output_to_distribution(mapping, policy_logits):
-    num_dims = len(config.POLICY_HEAD_SIZES)
-    batch_size = len(mapping[0])
-
-    sampled_policy = []
-
-    for dim in range(num_dims):
-        batch_sampled_dim = []
-        for batch_idx in range(batch_size):
-            softmax_op = torch.nn.LogSoftmax(dim=-1)  # This may be able to be called outside this loop
-            local_dim = softmax_op(policy_logits[dim][batch_idx])
-            local_mapping = mapping[dim][batch_idx]
-
-            sampled_dim = []
-
-            for action in local_mapping:
-                mapped_idx = action_to_idx(action, dim)
-                sampled_dim.append(local_dim[mapped_idx])
-
-            batch_sampled_dim.append(sampled_dim)
-
-        sampled_policy.append(batch_sampled_dim)
-
-    return sampled_policy
-
-
 """
 Description - Turns the output_policy from shape [batch, num_samples] to [batch, encoding_size] to allow the trainer
               to train on the improved policy. 0s for everywhere that was not sampled.
@@ -339,4 +209,179 @@ def action_to_3d(action):
             cube_action[5, :, :] = np.ones((1, 4, 7))
         elif action_selector == 6:
             cube_action[6, :, :] = np.ones((1, 4, 7))
-    return cube_action
\ No newline at end of file
+    return cube_action
+
+# Root exploration and action selection of the searches, batched over padded [num, width] arrays where valid tells
+# which entries of a row are real.
+
+def dirichlet_noise(alpha, valid):
+    """
+    Dirichlet(alpha) noise over the valid entries of every row and 0 on the others.
+    A dirichlet draw is a gamma(alpha) draw for every entry divided by their sum.
+
+    args:
+        alpha: float
+        valid: np.ndarray of bool [num, width]
+    returns:
+        float32 [num, width]
+    """
+    noise = np.zeros(valid.shape)
+    noise[valid] = np.random.gamma(alpha, size=np.count_nonzero(valid))
+    total = noise.sum(axis=1, keepdims=True)
+    return (noise / np.where(total > 0, total, 1)).astype(np.float32)
+
+
+def add_exploration_noise(logits, noise, fraction, valid=None):
+    """Blends noise into the logits of the roots, -inf outside of valid when it is given"""
+    noisy = logits * (1 - fraction) + noise * fraction
+    return noisy if valid is None else np.where(valid, noisy, -np.inf)
+
+
+def visit_distribution(visits, valid, temperature=1.0):
+    """
+    visits ** (1 / temperature) of the children of every root, normalised over its valid children.
+    A root without visits gets a uniform distribution.
+
+    returns:
+        float64 [num, width]
+    """
+    counts = np.where(valid, visits, 0).astype(np.float64)
+    if temperature != 1:
+        # Scaled by the most visits first so that low temperatures don't overflow
+        counts = (counts / np.maximum(counts.max(axis=1, keepdims=True), 1)) ** (1 / temperature)
+    total = counts.sum(axis=1, keepdims=True)
+    uniform = valid / np.maximum(valid.sum(axis=1, keepdims=True), 1)
+    return np.where(total > 0, counts / np.where(total > 0, total, 1), uniform)
+
+
+def select_actions(visits, valid, temperature=1.0, deterministic=False):
+    """
+    The child every root plays, the most visited one or a draw from visit_distribution.
+
+    returns:
+        int64 [num], the column of the child in visits
+    """
+    if deterministic:
+        return np.argmax(np.where(valid, visits, -1), axis=1)
+    probs = visit_distribution(visits, valid, temperature)
+    cdf = np.cumsum(probs, axis=1)
+    uniform = np.random.random_sample((len(probs), 1)) * cdf[:, -1:]
+    picked = np.count_nonzero(cdf <= uniform, axis=1)
+    # Rounding can put the draw at the very end of the cdf, it belongs to the last child that can be picked
+    last = probs.shape[1] - 1 - np.argmax(probs[:, ::-1] > 0, axis=1)
+    return np.minimum(picked, last)
+
+
+# Gumbel MuZero root search, "Policy improvement by planning with Gumbel" (Danihelka et al. 2022).
+# The schedule and the completed q values follow mctx, which the PoroX agent uses.
+
+@functools.lru_cache(maxsize=None)
+def considered_visits(num_considered, num_simulations):
+    """
+    Sequential halving as a sequence: the visit count a root child has to have to be visited by every simulation.
+    The children start with num_considered candidates, every phase the better half of them gets the visits.
+    """
+    if num_considered <= 1:
+        return tuple(range(num_simulations))
+    phases = int(math.ceil(math.log2(num_considered)))
+    sequence = []
+    visits = [0] * num_considered
+    considered = num_considered
+    while len(sequence) < num_simulations:
+        extra_visits = max(1, int(num_simulations / (phases * considered)))
+        for _ in range(extra_visits):
+            sequence.extend(visits[:considered])
+            for i in range(considered):
+                visits[i] += 1
+        considered = max(2, considered // 2)
+    return tuple(sequence[:num_simulations])
+
+
+def gumbel_top_k(logits, k):
+    """
+    Draws k actions of every row without replacement, by the top k of logits + gumbel noise.
+
+    args:
+        logits: np.ndarray [num, width], -inf on the actions that can't be picked
+    returns:
+        gumbel and logits of the picked actions as padded float32 [num, k] arrays, their int32 [num, k] columns in
+        logits and the int32 number of actions of every row
+    """
+    gumbel = np.random.gumbel(size=logits.shape)
+    k = min(k, logits.shape[1])
+    columns = np.argsort(-(logits + gumbel), axis=1, kind="stable")[:, :k]
+    sizes = np.minimum(np.isfinite(logits).sum(axis=1), k).astype(np.int32)
+    valid = np.arange(k) < sizes[:, None]
+    picked_logits = np.where(valid, np.take_along_axis(logits, columns, axis=1), 0)
+    picked_gumbel = np.where(valid, np.take_along_axis(gumbel, columns, axis=1), 0)
+    return picked_gumbel.astype(np.float32), picked_logits.astype(np.float32), \
+        np.where(valid, columns, 0).astype(np.int32), sizes
+
+
+class GumbelRoot:
+    """
+    Root action selection of Gumbel MuZero for one search of the c++ tree.
+
+    The children of the roots are the actions of gumbel_top_k. Every simulation takes, at every root, the child with
+    the best gumbel + logit + sigma(completed q) among the children that have the visit count considered_visits asks
+    for. Below the roots the tree picks its children as usual. The action played is the best of the most visited
+    children and the policy target is softmax(logits + sigma(completed q)).
+
+    args:
+        gumbel, logits, sizes: the output of gumbel_top_k
+        root_values: np.ndarray [num], value of the roots from the prediction network
+        num_simulations: int
+        discount: float
+        c_visit, c_scale: constants of sigma, the defaults are the ones of the paper
+    """
+    def __init__(self, gumbel, logits, sizes, root_values, num_simulations, discount, c_visit=50., c_scale=0.1):
+        self.gumbel = gumbel
+        self.logits = logits
+        self.sizes = sizes
+        self.valid = np.arange(logits.shape[1]) < sizes[:, None]
+        self.root_values = np.asarray(root_values, dtype=np.float32).reshape(-1)
+        self.discount = discount
+        self.c_visit = c_visit
+        self.c_scale = c_scale
+        self.schedule = np.array([considered_visits(int(size), num_simulations) for size in sizes],
+                                 dtype=np.int32).reshape(len(sizes), num_simulations)
+
+    def sigma(self, visits, qvalues):
+        """Completed q values of the children, unvisited ones get the mixed value of their root, scaled to [0, 1]"""
+        probs = np.exp(self.logits - np.where(self.valid, self.logits, -np.inf).max(axis=1, keepdims=True))
+        probs = np.where(self.valid, probs, 0)
+        probs /= probs.sum(axis=1, keepdims=True)
+        visited = visits > 0
+        visit_sum = visits.sum(axis=1)
+        visited_probs = np.where(visited, probs, 0).sum(axis=1)
+        weighted_q = np.where(visited, probs * qvalues, 0).sum(axis=1) / np.maximum(visited_probs, 1e-12)
+        mixed_value = (self.root_values + visit_sum * weighted_q) / (visit_sum + 1)
+        completed = np.where(visited, qvalues, mixed_value[:, None])
+
+        low = np.where(self.valid, completed, np.inf).min(axis=1, keepdims=True)
+        high = np.where(self.valid, completed, -np.inf).max(axis=1, keepdims=True)
+        completed = (completed - low) / np.maximum(high - low, 1e-8)
+        return (self.c_visit + visits.max(axis=1, keepdims=True)) * self.c_scale * completed
+
+    def best_children(self, visits, qvalues, considered):
+        scores = self.gumbel + self.logits + self.sigma(visits, qvalues)
+        scores = np.where(self.valid & (visits == considered[:, None]), scores, -np.inf)
+        return np.argmax(scores, axis=1).astype(np.int32)
+
+    def root_actions(self, roots, simulation):
+        """The child every root visits in the simulation"""
+        visits, qvalues = roots.get_children_stats(self.discount, self.logits.shape[1])
+        return self.best_children(visits, qvalues, self.schedule[:, simulation])
+
+    def select(self, roots):
+        """The child every root plays"""
+        visits, qvalues = roots.get_children_stats(self.discount, self.logits.shape[1])
+        return self.best_children(visits, qvalues, visits.max(axis=1))
+
+    def target_policy(self, roots):
+        """The improved policy of every root over its children"""
+        visits, qvalues = roots.get_children_stats(self.discount, self.logits.shape[1])
+        improved = np.where(self.valid, self.logits + self.sigma(visits, qvalues), -np.inf)
+        improved = np.exp(improved - improved.max(axis=1, keepdims=True))
+        improved /= improved.sum(axis=1, keepdims=True)
+        return [improved[i, :self.sizes[i]].tolist() for i in range(len(self.sizes))]
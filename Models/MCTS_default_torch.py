@@ -3,50 +3,64 @@ import torch
 import time
 import numpy as np
 import core.ctree.cytree as tree
+import Models.MCTS_Util as util
 from Models.MCTS_torch import MCTS
 
 class Default_MCTS(MCTS):
     def __init__(self, network, model_config):
         super().__init__(network, model_config)
-        self.default_string_mapping = []
+        self.default_mapping = []
         self.champ_decider_action_dim = config.CHAMP_DECIDER_ACTION_DIM
         self.model_config = model_config
 
-    def policy(self, observation):
+    # The champion decider does not reuse its tree, phases is only there to match MCTS.policy
+    def policy(self, observation, phases=None):
         with torch.no_grad():
             self.NUM_ALIVE = observation[0]["shop"].shape[0]
 
             # 0.02 seconds
             network_output = self.network.initial_inference(observation[0])
 
-            reward_pool = np.array(network_output["reward"]).reshape(-1).tolist()
+            reward_pool = np.array(network_output["reward"], dtype=np.float32).reshape(-1)
 
             policy_logits = [output_head.cpu().numpy() for output_head in network_output["policy_logits"]]
 
             # 0.01 seconds
             policy_logits_pool, string_mapping = self.encode_action_to_str(policy_logits, observation[1])
 
-            noises = [
-                [
-                    np.random.dirichlet([self.model_config.ROOT_DIRICHLET_ALPHA] * len(policy_logits_pool[i][j])
-                                        ).astype(np.float32).tolist()
-                    for j in range(self.NUM_ALIVE)
+            gumbel_root = None
+            if self.model_config.GUMBEL:
+                # The joint action space is too large for a top k over all of it, the candidates are the sampled
+                # actions with the log probability of all of their heads.
+                _, string_mapping, mappings, _ = \
+                    self.sample(policy_logits_pool, string_mapping, self.model_config.NUM_SAMPLES)
+                log_probs = self.joint_log_probs(policy_logits_pool, string_mapping)
+                gumbel, policy_logits_pool, columns, policy_sizes = \
+                    util.gumbel_top_k(log_probs, self.model_config.GUMBEL_ACTIONS)
+                string_mapping = [[string_mapping[i][column] for column in columns[i][:policy_sizes[i]]]
+                                  for i in range(self.NUM_ALIVE)]
+                mappings = np.ascontiguousarray(np.take_along_axis(mappings, columns, axis=1))
+                gumbel_root = util.GumbelRoot(gumbel, policy_logits_pool, policy_sizes,
+                                              network_output["value"].reshape(-1).cpu().numpy(),
+                                              self.model_config.NUM_SIMULATIONS, config.DISCOUNT)
+            else:
+                # Every head gets its own noise
+                policy_logits_pool = [
+                    util.add_exploration_noise(head, util.dirichlet_noise(self.model_config.ROOT_DIRICHLET_ALPHA,
+                                                                          np.ones(head.shape, dtype=bool)),
+                                               self.model_config.ROOT_EXPLORATION_FRACTION)
+                    for head in policy_logits_pool
                 ]
-                for i in range(len(policy_logits_pool))
-            ]
 
-            # Policy Logits -> [ [], [], [], [], [], [], [], [],]
-
-            policy_logits_pool = self.add_exploration_noise(policy_logits_pool, noises)
-
-            # 0.003 seconds
-            policy_logits_pool, string_mapping, mappings, policy_sizes = \
-                self.sample(policy_logits_pool, string_mapping, self.model_config.NUM_SAMPLES)
+                # 0.003 seconds
+                policy_logits_pool, string_mapping, mappings, policy_sizes = \
+                    self.sample(policy_logits_pool, string_mapping, self.model_config.NUM_SAMPLES)
 
             # less than 0.0001 seconds
             # Setup specialised roots datastructures, format: env_nums, action_space_size, num_simulations
             # Number of agents, previous action, number of simulations for memory purposes
-            roots_cpp = tree.Roots(self.NUM_ALIVE, self.model_config.NUM_SIMULATIONS, self.model_config.NUM_SAMPLES)
+            roots_cpp = self.roots_cpp
+            roots_cpp.reset(self.NUM_ALIVE)
 
             # 0.0002 seconds
             # prepare the nodes to feed them into batch_mcts,
@@ -57,26 +71,27 @@ class Default_MCTS(MCTS):
             hidden_state_pool = network_output["hidden_state"]
 
             # set up nodes to be able to find and select actions
-            self.run_batch_mcts(roots_cpp, hidden_state_pool)
-            roots_distributions = roots_cpp.get_distributions()
+            self.run_batch_mcts(roots_cpp, hidden_state_pool, gumbel_root)
 
             root_values = roots_cpp.get_values()
 
-            actions = []
-            target_policy = []
             temp = self.visit_softmax_temperature()  # controls the way actions are chosen
             deterministic = False  # False = sample distribution, True = argmax
-            for i in range(self.NUM_ALIVE):
-                distributions = roots_distributions[i]
-                action = self.select_action(distributions, temperature=temp, deterministic=deterministic)
-                actions.append(string_mapping[i][action])
-                target_policy.append([x / self.model_config.NUM_SIMULATIONS for x in distributions])
+            if gumbel_root is not None:
+                picked = gumbel_root.select(roots_cpp)
+                target_policy = gumbel_root.target_policy(roots_cpp)
+            else:
+                visits, valid = self.root_visits(roots_cpp, policy_sizes, mappings.shape[1])
+                picked = util.select_actions(visits, valid, temp, deterministic)
+                target_policy = self.visit_targets(visits, np.full(self.NUM_ALIVE, self.model_config.NUM_SIMULATIONS),
+                                                   policy_sizes)
+            actions = [string_mapping[i][picked[i]] for i in range(self.NUM_ALIVE)]
 
             # Notes on possibilities for other dimensions at the bottom
             self.num_actions += 1
             return actions, target_policy, string_mapping, root_values
 
-    def run_batch_mcts(self, roots_cpp, hidden_state_pool):
+    def run_batch_mcts(self, roots_cpp, hidden_state_pool, gumbel_root=None):
         # preparation
         num = roots_cpp.num
         # config variables
@@ -86,65 +101,60 @@ class Default_MCTS(MCTS):
         hidden_state_index_x = 0
 
         # minimax value storage data structure
-        min_max_stats_lst = tree.MinMaxStatsList(num)
-        hidden_state_pool = [hidden_state_pool]
+        min_max_stats_lst = self.min_max_stats_lst
+        min_max_stats_lst.reset(num)
+        # prepare a result wrapper to transport results between python and c++ parts
+        results = self.search_results
+        # Same layout as in MCTS.run_batch_mcts, one slot of hidden states per simulation
+        root_hidden_states = hidden_state_pool
+        hidden_state_pool = self.hidden_state_buffer(root_hidden_states)
+        hidden_state_pool[0] = root_hidden_states
+        flat_hidden_states = hidden_state_pool.view(-1, root_hidden_states.shape[-1])
         # go through the tree NUM_SIMULATIONS times
-        for _ in range(self.model_config.NUM_SIMULATIONS):
-            # prepare a result wrapper to transport results between python and c++ parts
-            results = tree.ResultsWrapper(num)
+        for simulation in range(self.model_config.NUM_SIMULATIONS):
+            root_actions = gumbel_root.root_actions(roots_cpp, simulation) if gumbel_root is not None else None
+
             # 0.001 seconds
             # evaluation for leaf nodes, traversing across the tree and updating values
             hidden_state_index_x_lst, hidden_state_index_y_lst, last_action = \
-                tree.batch_traverse(roots_cpp, pb_c_base, pb_c_init, discount, min_max_stats_lst, results)
+                tree.batch_traverse(roots_cpp, pb_c_base, pb_c_init, discount, min_max_stats_lst, results,
+                                    root_actions)
 
             self.max_depth_search = sum(results.get_search_len()) / len(results.get_search_len())
-            num_states = len(hidden_state_index_x_lst)
-            tensors_states = torch.empty((num_states, self.model_config.HIDDEN_STATE_SIZE)).to(config.DEVICE)
 
             # obtain the states for leaf nodes
-            for ix, iy, idx in zip(hidden_state_index_x_lst, hidden_state_index_y_lst, range(num_states)):
-                tensors_states[idx] = hidden_state_pool[ix][iy]
+            leaf_index = torch.from_numpy(hidden_state_index_x_lst * num + hidden_state_index_y_lst)
+            tensors_states = torch.index_select(flat_hidden_states, 0, leaf_index.to(flat_hidden_states.device))
 
             # Inside the search tree we use the dynamics function to obtain the next
             # hidden state given an action and the previous hidden state.
-            last_action = np.asarray(last_action)
+            last_action = self.decode_actions(last_action)
 
             # 0.003 seconds
             network_output = self.network.recurrent_inference(tensors_states, last_action)
 
-            reward_pool = network_output["reward"].reshape(-1).tolist()
-            value_pool = network_output["value"].reshape(-1).tolist()
-            diff = max(value_pool) - min(value_pool)
+            reward_pool = network_output["reward"].reshape(-1).cpu().numpy()
+            value_pool = network_output["value"].reshape(-1).cpu().numpy()
+            diff = value_pool.max() - value_pool.min()
             if diff > 150.:
-                print(f"EUREKA, VALUES MAX: {max(value_pool)}, AND MIN: {min(value_pool)}, RANGE {diff}")
+                print(f"EUREKA, VALUES MAX: {value_pool.max()}, AND MIN: {value_pool.min()}, RANGE {diff}")
 
             policy_logits = [output_head.cpu().numpy() for output_head in network_output["policy_logits"]]
 
             # 0.014 seconds
             policy_logits, _, mappings, policy_sizes = \
-                self.sample(policy_logits, self.default_string_mapping, self.model_config.NUM_SAMPLES)
+                self.sample(policy_logits, self.default_mapping, self.model_config.NUM_SAMPLES)
 
             # These assignments take 0.0001 > time
             # add nodes to the pool after each search
-            hidden_states_nodes = network_output["hidden_state"]
-            hidden_state_pool.append(hidden_states_nodes)
-
             hidden_state_index_x += 1
+            hidden_state_pool[hidden_state_index_x] = network_output["hidden_state"]
 
             # 0.001 seconds
             # backpropagation along the search path to update the attributes
             tree.batch_back_propagate(hidden_state_index_x, discount, reward_pool, value_pool, policy_logits,
                                       min_max_stats_lst, results, mappings, policy_sizes)
 
-    def add_exploration_noise(self, policy_logits, noises):
-        exploration_fraction = self.model_config.ROOT_EXPLORATION_FRACTION
-        for i in range(len(noises)):  # Batch
-            for j in range(len(noises[i])):  # Policy Dims
-                for k in range(len(noises[i][j])):
-                    policy_logits[i][j][k] = policy_logits[i][j][k] * (1 - exploration_fraction) + \
-                                             noises[i][j][k] * exploration_fraction
-        return policy_logits
-
     def encode_action_to_str(self, policy_logits, mask):
         return policy_logits, []
 
@@ -155,16 +165,17 @@ class Default_MCTS(MCTS):
 
         output_logits = []
         output_string_mapping = []
-        output_byte_mapping = []
+        output_mapping = []
         policy_sizes = []
 
         for idx in range(batch_size):
-            local_byte = []
             sampled_action = []
+            dim_samples = []
             probs = self.softmax_stable(policy_logits[0][idx])
             policy_range = np.arange(stop=len(policy_logits[0][idx]))
 
             samples = np.random.choice(a=policy_range, p=probs, size=num_samples)
+            dim_samples.append(samples)
             for sample in samples:
                 sampled_action.append(str(sample))
 
@@ -173,16 +184,37 @@ class Default_MCTS(MCTS):
                 policy_range = np.arange(stop=len(policy_logits[i][idx]))
 
                 samples = np.random.choice(a=policy_range, p=probs, size=num_samples)
+                dim_samples.append(samples)
 
                 for k, sample in enumerate(samples):
                     sampled_action[k] = sampled_action[k] + "_" + str(sample)
 
-            for sample in enumerate(sampled_action):
-                local_byte.append(bytes(str(sample[1]), "utf-8"))
-
-            output_logits.append([((1 / num_samples) * num_samples)])
+            output_logits.append([1 / num_samples] * num_samples)
             output_string_mapping.append(sampled_action)
-            output_byte_mapping.append(local_byte)
+            output_mapping.append(self.encode_actions(dim_samples))
             policy_sizes.append(num_samples)
 
-        return output_logits, output_string_mapping, output_byte_mapping, policy_sizes
+        return np.asarray(output_logits, dtype=np.float32), output_string_mapping, \
+            np.asarray(output_mapping, dtype=np.int32), np.asarray(policy_sizes, dtype=np.int32)
+
+    def joint_log_probs(self, policy_logits, string_mapping):
+        """Log probability of every sampled action over all of the heads, -inf for samples that are repeats"""
+        log_probs = np.zeros((len(string_mapping), len(string_mapping[0])))
+        for i, samples in enumerate(string_mapping):
+            dim_samples = np.array([sample.split("_") for sample in samples], dtype=np.int64)
+            for head in range(dim_samples.shape[1]):
+                logits = np.asarray(policy_logits[head][i], dtype=np.float64)
+                log_softmax = logits - logits.max() - np.log(np.exp(logits - logits.max()).sum())
+                log_probs[i] += log_softmax[dim_samples[:, head]]
+            repeated = np.ones(len(samples), dtype=bool)
+            repeated[np.unique(samples, return_index=True)[1]] = False
+            log_probs[i][repeated] = -np.inf
+        return log_probs
+
+    # The c++ tree keeps a single int per action and the dynamics network only reads the first 3 dimensions
+    # of an action, so those are the ones packed into the int.
+    def encode_actions(self, dim_samples):
+        return np.ravel_multi_index(dim_samples[:3], self.champ_decider_action_dim[:3]).tolist()
+
+    def decode_actions(self, last_actions):
+        return np.stack(np.unravel_index(last_actions, self.champ_decider_action_dim[:3]), axis=-1)
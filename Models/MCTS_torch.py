@@ -24,46 +24,65 @@ class MCTS:
         self.NUM_ALIVE = config.NUM_PLAYERS
         self.num_actions = 0
         self.ckpt_time = time.time_ns()
-        self.default_string_mapping = util.create_default_mapping()
         self.max_depth_search = 0
         self.model_config = model_config
 
-    def policy(self, observation):
+        # The search structures are made once and reset for every move
+        self.roots_cpp = tree.Roots(config.NUM_PLAYERS, model_config.NUM_SIMULATIONS, model_config.NUM_SAMPLES)
+        self.min_max_stats_lst = tree.MinMaxStatsList(config.NUM_PLAYERS)
+        self.search_results = tree.ResultsWrapper(config.NUM_PLAYERS)
+        self.hidden_state_pool = None
+        # Action phase -> (root, child) picked by the last search, see keep_subtrees
+        self.kept_children = {}
+
+    """
+    Description - runs the search for every player and picks their actions.
+    Inputs      - observation: list
+                    [observations, action masks] of the players
+                  phases: list
+                    Optional id of the action phase of every player, e.g. (player, game round). With
+                    TREE_REUSE on, a player that is in the same phase as in the last call starts from the subtree
+                    of the action it picked then.
+    Outputs     - actions, target policies, sampled actions and root values of every player
+    """
+    def policy(self, observation, phases=None):
         with torch.no_grad():
             self.NUM_ALIVE = observation[0]["shop"].shape[0]
 
             # 0.013 seconds
             network_output = self.network.initial_inference(observation[0])
 
-            reward_pool = np.array(network_output["reward"]).reshape(-1).tolist()
+            reward_pool = np.array(network_output["reward"], dtype=np.float32).reshape(-1)
 
             policy_logits = network_output["policy_logits"].cpu().numpy()
 
             # 0.005 seconds
-            policy_logits_pool, string_mapping = self.encode_action_to_str(policy_logits, observation[1])
-
-            noises = [
-                    np.random.dirichlet([self.model_config.ROOT_DIRICHLET_ALPHA] * len(policy_logits_pool[j])
-                                        ).astype(np.float32).tolist()
-                    for j in range(self.NUM_ALIVE)
-                ]
-
-            # policy_logits_pool = policy_logits_pool.cpu().numpy()
-            # print(policy_logits_pool)
-            # print(policy_logits_pool.shape)
-
-            # Policy Logits -> [ [], [], [], [], [], [], [], [],]
-
-            policy_logits_pool = self.add_exploration_noise(policy_logits_pool, noises)
-
-            # 0.001 seconds
-            policy_logits_pool, string_mapping, mappings, policy_sizes = \
-                self.sample(policy_logits_pool, string_mapping, self.model_config.NUM_SAMPLES)
+            policy_logits_pool, legal_actions = self.encode_action_to_str(policy_logits, observation[1])
+
+            gumbel_root = None
+            if self.model_config.GUMBEL:
+                # The gumbel noise of the top k draw takes the place of the dirichlet noise
+                gumbel, policy_logits_pool, mappings, policy_sizes = \
+                    util.gumbel_top_k(policy_logits_pool, self.model_config.GUMBEL_ACTIONS)
+                gumbel_root = util.GumbelRoot(gumbel, policy_logits_pool, policy_sizes,
+                                              network_output["value"].reshape(-1).cpu().numpy(),
+                                              self.model_config.NUM_SIMULATIONS, config.DISCOUNT)
+            else:
+                noise = util.dirichlet_noise(self.model_config.ROOT_DIRICHLET_ALPHA, legal_actions)
+                policy_logits_pool = util.add_exploration_noise(policy_logits_pool, noise,
+                                                                self.model_config.ROOT_EXPLORATION_FRACTION,
+                                                                legal_actions)
+
+                # 0.001 seconds
+                policy_logits_pool, mappings, policy_sizes = \
+                    self.sample(policy_logits_pool, self.model_config.NUM_SAMPLES)
 
             # less than 0.0001 seconds
             # Setup specialised roots datastructures, format: env_nums, action_space_size, num_simulations
             # Number of agents, previous action, number of simulations for memory purposes
-            roots_cpp = tree.Roots(self.NUM_ALIVE, self.model_config.NUM_SIMULATIONS, self.model_config.NUM_SAMPLES)
+            roots_cpp = self.roots_cpp
+            reuse = self.keep_subtrees(phases)
+            roots_cpp.reset(self.NUM_ALIVE)
 
             # 0.0002 seconds
             # prepare the nodes to feed them into batch_mcts,
@@ -74,26 +93,59 @@ class MCTS:
             hidden_state_pool = network_output["hidden_state"]
 
             # set up nodes to be able to find and select actions
-            self.run_batch_mcts(roots_cpp, hidden_state_pool)
-            roots_distributions = roots_cpp.get_distributions()
+            self.run_batch_mcts(roots_cpp, hidden_state_pool, reuse, gumbel_root)
 
             root_values = roots_cpp.get_values()
 
-            actions = []
-            target_policy = []
             temp = self.visit_softmax_temperature()  # controls the way actions are chosen
             deterministic = False  # False = sample distribution, True = argmax
-            for i in range(self.NUM_ALIVE):
-                distributions = roots_distributions[i]
-                action = self.select_action(distributions, temperature=temp, deterministic=deterministic)
-                actions.append(string_mapping[i][action])
-                target_policy.append([x / self.model_config.NUM_SIMULATIONS for x in distributions])
+            if gumbel_root is not None:
+                picked = gumbel_root.select(roots_cpp).tolist()
+                target_policy = gumbel_root.target_policy(roots_cpp)
+            else:
+                visits, valid = self.root_visits(roots_cpp, policy_sizes, mappings.shape[1])
+                picked = util.select_actions(visits, valid, temp, deterministic).tolist()
+                # Grafted subtrees bring their visits with them, so the root can have more than NUM_SIMULATIONS
+                target_policy = self.visit_targets(visits, visits.sum(axis=1), policy_sizes)
+            actions = [int(mappings[i][picked[i]]) for i in range(self.NUM_ALIVE)]
+
+            self.remember_children(phases, actions, picked)
 
             # Notes on possibilities for other dimensions at the bottom
             self.num_actions += 1
-            return actions, target_policy, string_mapping, root_values
-
-    def run_batch_mcts(self, roots_cpp, hidden_state_pool):
+            mappings = [mappings[i][:policy_sizes[i]].tolist() for i in range(self.NUM_ALIVE)]
+            return actions, target_policy, mappings, root_values
+
+    def keep_subtrees(self, phases):
+        """
+        Hands the subtrees picked by the last search to the tree for the players still in the same action phase.
+        Has to be called before the tree is reset.
+
+        returns:
+            True when the next search has subtrees to graft
+        """
+        if not self.model_config.TREE_REUSE or self.model_config.GUMBEL or phases is None or \
+                not self.kept_children:
+            return False
+        kept = np.array([self.kept_children.get(phase, (-1, -1)) for phase in phases], dtype=np.int32).reshape(-1, 2)
+        roots = np.ascontiguousarray(kept[:, 0])
+        self.roots_cpp.keep(roots, np.ascontiguousarray(kept[:, 1]))
+        return bool((roots >= 0).any())
+
+    def remember_children(self, phases, actions, picked):
+        """
+        Remembers the child every player picked so the next move in the same action phase can start from it.
+        The state after a refresh depends on the new shop, so the search of a refresh is thrown away.
+        """
+        self.kept_children = {}
+        if not self.model_config.TREE_REUSE or self.model_config.GUMBEL or phases is None:
+            return
+        action_types = util.decode_action_codes(actions)[:, 0]
+        for i, phase in enumerate(phases):
+            if action_types[i] != 2:
+                self.kept_children[phase] = (i, picked[i])
+
+    def run_batch_mcts(self, roots_cpp, hidden_state_pool, reuse=False, gumbel_root=None):
         # preparation
         num = roots_cpp.num
         # config variables
@@ -103,157 +155,128 @@ class MCTS:
         hidden_state_index_x = 0
 
         # minimax value storage data structure
-        min_max_stats_lst = tree.MinMaxStatsList(num)
-        hidden_state_pool = [hidden_state_pool]
+        min_max_stats_lst = self.min_max_stats_lst
+        min_max_stats_lst.reset(num)
+        # prepare a result wrapper to transport results between python and c++ parts
+        results = self.search_results
+        # Hidden states of the roots and of the leaves of every simulation, hidden state index x and y of a node
+        # are its place in here. The states of the next leaves are gathered with a single index_select.
+        root_hidden_states = hidden_state_pool
+        rows = self.model_config.NUM_SIMULATIONS + 1
+        if reuse:
+            # The hidden states of the grafted nodes go after the ones of this search. They are read from the buffer
+            # of the last search before anything is written to it.
+            sources, targets, kept_rows = roots_cpp.graft(rows, discount, min_max_stats_lst)
+            last_hidden_states = self.hidden_state_pool.view(-1, root_hidden_states.shape[-1])
+            kept_states = torch.index_select(last_hidden_states, 0,
+                                             torch.from_numpy(sources).to(last_hidden_states.device))
+            rows += kept_rows
+        hidden_state_pool = self.hidden_state_buffer(root_hidden_states, rows)
+        hidden_state_pool[0] = root_hidden_states
+        flat_hidden_states = hidden_state_pool.view(-1, root_hidden_states.shape[-1])
+        if reuse:
+            flat_hidden_states[torch.from_numpy(targets).to(flat_hidden_states.device).long()] = \
+                kept_states.to(flat_hidden_states.dtype)
         # go through the tree NUM_SIMULATIONS times
-        for _ in range(self.model_config.NUM_SIMULATIONS):
-            # prepare a result wrapper to transport results between python and c++ parts
-            results = tree.ResultsWrapper(num)
+        for simulation in range(self.model_config.NUM_SIMULATIONS):
+            # With a gumbel root the schedule picks the child of every root
+            root_actions = gumbel_root.root_actions(roots_cpp, simulation) if gumbel_root is not None else None
+
             # basically 0 seconds (3e-5)
             # evaluation for leaf nodes, traversing across the tree and updating values
             hidden_state_index_x_lst, hidden_state_index_y_lst, last_action = \
-                tree.batch_traverse(roots_cpp, pb_c_base, pb_c_init, discount, min_max_stats_lst, results)
+                tree.batch_traverse(roots_cpp, pb_c_base, pb_c_init, discount, min_max_stats_lst, results,
+                                    root_actions)
 
             self.max_depth_search = sum(results.get_search_len()) / len(results.get_search_len())
-            num_states = len(hidden_state_index_x_lst)
-            tensors_states = torch.empty((num_states, self.model_config.HIDDEN_STATE_SIZE)).to(config.DEVICE)
 
             # obtain the states for leaf nodes
-            for ix, iy, idx in zip(hidden_state_index_x_lst, hidden_state_index_y_lst, range(num_states)):
-                tensors_states[idx] = hidden_state_pool[ix][iy]
+            leaf_index = torch.from_numpy(hidden_state_index_x_lst * num + hidden_state_index_y_lst)
+            tensors_states = torch.index_select(flat_hidden_states, 0, leaf_index.to(flat_hidden_states.device))
 
             # Inside the search tree we use the dynamics function to obtain the next
             # hidden state given an action and the previous hidden state.
-            last_action = np.asarray(last_action)
+            last_action = self.decode_actions(last_action)
 
             # 0.005 to 0.01 seconds
             network_output = self.network.recurrent_inference(tensors_states, last_action)
 
-            reward_pool = network_output["reward"].reshape(-1).tolist()
-            value_pool = network_output["value"].reshape(-1).tolist()
-            diff = max(value_pool) - min(value_pool)
+            reward_pool = network_output["reward"].reshape(-1).cpu().numpy()
+            value_pool = network_output["value"].reshape(-1).cpu().numpy()
+            diff = value_pool.max() - value_pool.min()
             if diff > 150.:
-                print(f"EUREKA, VALUES MAX: {max(value_pool)}, AND MIN: {min(value_pool)}, RANGE {diff}")
+                print(f"EUREKA, VALUES MAX: {value_pool.max()}, AND MIN: {value_pool.min()}, RANGE {diff}")
 
             policy_logits = network_output["policy_logits"].cpu().numpy()
 
             # 0.003 to 0.01 seconds
-            policy_logits, _, mappings, policy_sizes = \
-                self.sample(policy_logits, self.default_string_mapping, self.model_config.NUM_SAMPLES)
+            policy_logits, mappings, policy_sizes = self.sample(policy_logits, self.model_config.NUM_SAMPLES)
 
             # These assignments take 0.0001 > time
             # add nodes to the pool after each search
-            hidden_states_nodes = network_output["hidden_state"]
-            hidden_state_pool.append(hidden_states_nodes)
-
             hidden_state_index_x += 1
+            hidden_state_pool[hidden_state_index_x] = network_output["hidden_state"]
 
             # 0.001 seconds
             # backpropagation along the search path to update the attributes
             tree.batch_back_propagate(hidden_state_index_x, discount, reward_pool, value_pool, policy_logits,
                                       min_max_stats_lst, results, mappings, policy_sizes)
 
-    def add_exploration_noise(self, policy_logits, noises):
-        exploration_fraction = self.model_config.ROOT_EXPLORATION_FRACTION
-        for i in range(len(noises)):  # Batch
-            for k in range(len(noises[i])):
-                policy_logits[i][k] = policy_logits[i][k] * (1 - exploration_fraction) + \
-                                         noises[i][k] * exploration_fraction
-        return policy_logits
+    def hidden_state_buffer(self, root_hidden_states, rows=None):
+        """
+        The [rows, num, H] tensor for the hidden states of a search, NUM_SIMULATIONS + 1 rows by default. It's kept
+        between moves and only made again when it's too small or the number of players or the hidden states change.
+        """
+        if rows is None:
+            rows = self.model_config.NUM_SIMULATIONS + 1
+        shape = (rows,) + tuple(root_hidden_states.shape)
+        pool = self.hidden_state_pool
+        if pool is None or pool.shape[0] < rows or pool.shape[1:] != shape[1:] or \
+                pool.dtype != root_hidden_states.dtype or pool.device != root_hidden_states.device:
+            pool = self.hidden_state_pool = torch.empty(shape, dtype=root_hidden_states.dtype,
+                                                        device=root_hidden_states.device)
+        return pool
 
     """
-    Description - select action from the root visit counts.
-    Inputs      - visit_counts: list
-                    visit counts for each child
-                  temperature: float
-                    the temperature for the distribution
-                  deterministic: bool
-                    True -> select the argmax
-                    False -> sample from the distribution
-    Outputs     - action_pos
-                    position of the action in the policy and string array.
-                  count_entropy
-                    entropy of the improved policy.
+    Description - Visit counts of the children of every root, padded to width.
+    Inputs      - roots_cpp: Roots
+                  policy_sizes: np.ndarray [batch]
+                      Number of children of every root
+                  width: int
+    Outputs     - visits: np.ndarray [batch, width]
+                  valid: np.ndarray [batch, width]
+                      True on the children of the root, False on the padding
     """
     @staticmethod
-    def select_action(visit_counts, temperature=1.0, deterministic=True):
-        action_probs = [visit_count_i ** (1 / temperature)
-                        for visit_count_i in visit_counts]
-        total_count = sum(action_probs)
-        action_probs = [x / total_count for x in action_probs]
-        if deterministic:
-            action_pos = np.argmax([v for v in visit_counts])
-        else:
-            action_pos = np.random.choice(len(visit_counts), p=action_probs)
-
-        return action_pos
+    def root_visits(roots_cpp, policy_sizes, width):
+        visits, _ = roots_cpp.get_children_stats(config.DISCOUNT, width)
+        return visits, np.arange(width) < np.asarray(policy_sizes)[:, None]
+
+    @staticmethod
+    def visit_targets(visits, total, policy_sizes):
+        # The policy target of every root, its visits over total without the padding
+        target = visits / np.asarray(total, dtype=np.float64).reshape(-1, 1)
+        return [target[i, :policy_sizes[i]].tolist() for i in range(len(policy_sizes))]
 
     """
-    Description - Turns a 1081 action into a policy that includes only actions that are legal in the current state
-                  This also creates a mask for both the c++ side and python side to convert the legal action set into
-                  a single action that we can give to the buffers and the trainer.
+    Description - Turns a 2090 action into a policy that includes only actions that are legal in the current state
+                  This also creates a mapping for both the c++ side and python side to convert the legal action set
+                  into a single action that we can give to the buffers and the trainer.
                   Masks for this method are generated in the player and observation classes.
                   This is only called by the root node since that is the only node that has access to the observation
     Inputs      - Policy logits: List
                       output of the prediction network, initial_inference in this case
                   Mappings: List
                       A mask of binary values that tell the policy what actions are legal and what actions are not.
-    Outputs     - Actions: List
-                      A policy including actions that are legal in the field.
-                  Mappings: List
-                      A byte mapping that maps those actions to a single 3 dimensional action that can be used in the 
-                      simulator as well as in the recurrent inference. This gets sent to the c++ side
-                  Seconds Mappings: List
-                      A string mapping that is used in the same way but for the python side. This gets used on the 
-                      values that get sent back to the AI_Interface
+    Outputs     - Actions: np.ndarray [batch, 2090]
+                      The policy with -inf on every action that is not legal in the field. The column of a logit is
+                      the flat index of its action in the 55x38 action space.
+                  Legal actions: np.ndarray [batch, 2090]
+                      True for every legal action.
     """
     def encode_action_to_str(self, policy_logits, mask):
-        batch_size = policy_logits.shape[0]  # 8
-        flat_mask = np.reshape(mask, (self.NUM_ALIVE, -1))
-        policy_logits = policy_logits * flat_mask
-
-        masked_policy_mappings = []
-        masked_policy_logits = []
-
-        for batch in range(batch_size):
-            masked_dim_mapping = []
-            masked_pol_logits = []
-            for dim in range(len(mask[batch])):
-                if dim < 37:
-                    for idx in range(len(mask[batch][dim])):
-                        if mask[batch][dim][idx]:
-                            if idx < 37:
-                                masked_dim_mapping.append(f"5_{dim}_{idx}")
-                                masked_pol_logits.append(policy_logits[batch][dim * 38 + idx])
-                            else:
-                                masked_dim_mapping.append(f"4_{dim}")
-                                masked_pol_logits.append(policy_logits[batch][dim * 38 + 37])
-                elif dim < 47:
-                    for idx in range(len(mask[batch][dim])):
-                        if mask[batch][dim][idx]:
-                            masked_dim_mapping.append(f"6_{dim - 37}_{idx}")
-                            masked_pol_logits.append(policy_logits[batch][dim * 38 + idx])
-                elif dim < 52:
-                    for idx in range(5):
-                        if mask[batch][dim][idx]:
-                            masked_dim_mapping.append(f"3_{dim - 47}")
-                            masked_pol_logits.append(policy_logits[batch][dim * 38])
-                elif dim == 52:
-                    if mask[batch][dim][0]:
-                        masked_dim_mapping.append(f"0")
-                        masked_pol_logits.append(policy_logits[batch][dim * 38])
-                elif dim == 53:
-                    if mask[batch][dim][0]:
-                        masked_dim_mapping.append(f"1")
-                        masked_pol_logits.append(policy_logits[batch][dim * 38])
-                elif dim == 54:
-                    if mask[batch][dim][0]:
-                        masked_dim_mapping.append(f"2")
-                        masked_pol_logits.append(policy_logits[batch][dim * 38])
-            masked_policy_mappings.append(masked_dim_mapping)
-            masked_policy_logits.append(masked_pol_logits)
-
-        return masked_policy_logits, masked_policy_mappings
+        legal_actions = np.reshape(mask, (self.NUM_ALIVE, -1)) > 0
+        return np.where(legal_actions, policy_logits, -np.inf), legal_actions
 
     """
     Description - This is the core to the Complex Action Spaces paper. We take a set number of sample actions from the 
@@ -262,63 +285,53 @@ class MCTS:
                   to 0 and comment out the following for loops or keep those variables at 6 and 2 and leave the for
                   loops in. The first option is a pure sample with no specific core actions. The second option gives 
                   you a set of core options to use. 
-    Inputs      - policy_logits - List
-                      Output to either initial_inference or recurrent_inference for policy
-                  string_mapping - List
-                      A map that is equal to policy_logits.shape[-1] in size to map to the specified action
-                  byte_mapping - List
-                      Same as string mapping but used on the c++ side of the code
+    Inputs      - policy_logits - np.ndarray [batch, 2090]
+                      Output to either initial_inference or recurrent_inference for policy, -inf on illegal actions
                   num_samples - Int
                       Typically set to config.NUM_SAMPLES. Number of samples to use per expansion of the tree
-    Outputs     - output_logits - List
-                      The sampled policy logits 
-                  output_string_mapping - List
-                      The sampled string mapping. Size = output.logits.shape
-                  output_byte_mapping - List
-                      Same as output_string_mapping but for c++ side
-                  policy_sizes - List
-                      Number of samples per player, can change if legal actions < num_samples
+    Outputs     - output_logits - np.ndarray [batch, max policy size]
+                      The sampled policy logits, padded with 0
+                  output_mapping - np.ndarray [batch, max policy size]
+                      The flat action index of each sample, padded with 0
+                  policy_sizes - np.ndarray [batch]
+                      Number of unique samples per player, can change if legal actions < num_samples
     """
-    def sample(self, policy_logits, string_mapping, num_samples):
-        # policy_logits [(8, 7), (8, 5), (8, 667), (8, 370), (8, 38)]
-        batch_size = len(policy_logits)  # 8
+    def sample(self, policy_logits, num_samples):
+        batch_size, num_actions = policy_logits.shape  # 8, 2090
 
-        output_logits = []
-        output_string_mapping = []
-        output_byte_mapping = []
-        policy_sizes = []
+        # Inverse transform sampling of every player at once.
+        # The index of a sample is the number of entries of the cdf that are not above the uniform draw.
+        cdf = np.cumsum(self.softmax_stable(policy_logits), axis=-1)
+        cdf /= cdf[:, -1:]
+        uniform = np.random.random_sample((batch_size, num_samples, 1))
+        samples = np.count_nonzero(cdf[:, None, :] <= uniform, axis=-1)  # [batch, num_samples]
 
-        for idx in range(batch_size):
-            local_logits = []
-            local_string = []
-            local_byte = []
+        offsets = np.arange(batch_size)[:, None] * num_actions
+        counts = np.bincount((samples + offsets).ravel(), minlength=batch_size * num_actions)
+        counts = counts.reshape(batch_size, num_actions)
 
-            probs = self.softmax_stable(policy_logits[idx])
-            policy_range = np.arange(stop=len(policy_logits[idx]))
+        # Move the sampled actions of every player to the front of its row, in the order of the action index
+        rows, actions = np.nonzero(counts)
+        policy_sizes = np.count_nonzero(counts, axis=-1).astype(np.int32)
+        row_starts = np.cumsum(policy_sizes) - policy_sizes
+        columns = np.arange(len(rows)) - row_starts[rows]
 
-            samples = np.random.choice(a=policy_range, p=probs, size=num_samples)  # size 25
-            counts = np.bincount(samples, minlength=len(policy_logits[idx]))
+        output_logits = np.zeros((batch_size, policy_sizes.max()), dtype=np.float32)
+        output_logits[rows, columns] = counts[rows, actions] / num_samples
+        output_mapping = np.zeros((batch_size, policy_sizes.max()), dtype=np.int32)
+        output_mapping[rows, columns] = actions
 
-            for i, count in enumerate(counts):
-                if count > 0:
-                    dim_base_string = string_mapping[idx][i]
-                    local_logits.append(((1 / num_samples) * count))
-                    local_string.append(dim_base_string)
-                    local_byte.append(bytes(dim_base_string, "utf-8"))
+        return output_logits, output_mapping, policy_sizes
 
-            output_logits.append(local_logits)
-            output_string_mapping.append(local_string)
-            output_byte_mapping.append(local_byte)
-            policy_sizes.append(len(local_logits))
-
-        return output_logits, output_string_mapping, output_byte_mapping, policy_sizes
+    @staticmethod
+    def decode_actions(last_actions):
+        # Flat action index of each leaf to the [type, x1, x2] action the dynamics network takes
+        return util.decode_action_codes(last_actions)
 
     @staticmethod
     def softmax_stable(x):
-        top_value = x - np.max(x)
-        top_value = np.exp(top_value)
-        bottom_value = np.exp(x - np.max(x)).sum()
-        return top_value / bottom_value
+        top_value = np.exp(x - np.max(x, axis=-1, keepdims=True))
+        return top_value / top_value.sum(axis=-1, keepdims=True)
 
     def fill_metadata(self) -> Dict[str, str]:
         return {'network_id': str(self.network.training_steps())}
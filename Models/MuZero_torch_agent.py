@@ -42,7 +42,7 @@ class MuZeroNetwork(AbstractNetwork):
             return policy_logits, value
 
     def representation(self, observation):
-        observation = {label: torch.from_numpy(value).float().to(config.DEVICE) for label, value in observation.items()}
+        observation = {label: torch.as_tensor(value).float().to(config.DEVICE) for label, value in observation.items()}
         return self.representation_network(observation)
 
     def dynamics(self, x, action):
@@ -245,7 +245,7 @@ class DynNetwork(torch.nn.Module):
         self.model_config = model_config
 
     def forward(self, hidden_state, action):
-        action = torch.from_numpy(action).to(config.DEVICE).to(torch.int64)
+        action = torch.as_tensor(action).to(config.DEVICE).to(torch.int64)
         one_hot_action = torch.nn.functional.one_hot(action[:, 0], config.ACTION_DIM[0])
         one_hot_target_a = torch.nn.functional.one_hot(action[:, 1], config.ACTION_DIM[1])
         one_hot_target_b = torch.nn.functional.one_hot(action[:, 2], config.ACTION_DIM[1])
@@ -4,7 +4,7 @@ import collections
 import torch
 import torch.nn.functional as F
 import numpy as np
-from Models.MCTS_Util import split_batch, sample_set_to_idx, create_target_and_mask
+from Concurrency.replay_columns import TIER_SPLITS
 
 Prediction = collections.namedtuple(
     'Prediction',
@@ -45,10 +45,11 @@ class Trainer(object):
         for param_group in self.optimizer.param_groups:
             param_group["lr"] = lr
 
+    # Returns the new priority of every sample, the error of the value of its first step
     def train_network(self, batch, train_step):
 
         observation, action_history, value_mask, reward_mask, policy_mask, target_value, target_reward, target_policy, \
-            sample_set, importance_weights, tier_set, final_tier_set, champion_set, position = batch
+            sample_set, importance_weights, tier_set, final_tier_set, champion_set, position = batch[:14]
 
         # disabling this for the moment while I get the rest working, will add back later.
         self.summary_writer.add_scalar('episode_info/average_position', position, train_step)
@@ -57,8 +58,6 @@ class Trainer(object):
 
         predictions = self.compute_forward(observation, action_history)
 
-        sample_set, target_policy = split_batch(sample_set, target_policy)
-
         self.compute_loss(predictions, target_value, target_reward, target_policy, sample_set,  value_mask,
                           reward_mask, policy_mask, importance_weights, tier_set, final_tier_set, champion_set)
 
@@ -66,6 +65,8 @@ class Trainer(object):
 
         self.write_summaries(train_step)
 
+        return np.abs(predictions[0].value.detach().cpu().numpy().reshape(-1) - target_value[:, 0])
+
     def compute_forward(self, observation, action_history):
         self.network.train()
         grad_scale = 0.5
@@ -109,10 +110,11 @@ class Trainer(object):
 
     def compute_loss(self, predictions, target_value, target_reward, target_policy, sample_set,
                      value_mask, reward_mask, policy_mask, importance_weights, tier_set, final_tier_set, champion_set):
-        value_mask = torch.from_numpy(value_mask).to(config.DEVICE)
-        reward_mask = torch.from_numpy(reward_mask).to(config.DEVICE)
-        policy_mask = torch.from_numpy(policy_mask).to(config.DEVICE)
-        importance_weights = torch.from_numpy(importance_weights).to(config.DEVICE)
+        # These can already be on the device, see BatchPrefetcher
+        value_mask = torch.as_tensor(value_mask).to(config.DEVICE)
+        reward_mask = torch.as_tensor(reward_mask).to(config.DEVICE)
+        policy_mask = torch.as_tensor(policy_mask).to(config.DEVICE)
+        importance_weights = torch.as_tensor(importance_weights).to(config.DEVICE)
 
         target_value = self.encode_target(
             target_value, self.network.value_encoder).to(config.DEVICE)
@@ -145,7 +147,8 @@ class Trainer(object):
             reward_loss = self.value_or_reward_loss(step_reward, step_target_reward)
             self.scale_loss(reward_loss)
 
-            step_target_policy = self.fill_policy(target_policy[tstep], sample_set[tstep])
+            step_target_policy = self.fill_policy(target_policy[:, tstep],
+                                                  None if sample_set is None else sample_set[:, tstep])
             if config.CHAMP_DECIDER:
                 policy_loss = self.decider_policy_loss(prediction.policy_logits, step_target_policy)
             else:
@@ -154,21 +157,18 @@ class Trainer(object):
             if config.CHAMP_DECIDER:
                 policy_loss.register_hook(lambda grad: grad * (1 / len(config.CHAMP_DECIDER_ACTION_DIM)))
 
-            # TODO: Figure out how to speed up the tier, final_tier, and champion losses
-            tier_target = [tier_set[a][tstep] for a in range(config.BATCH_SIZE)]
-            tier_target = [list(b) for b in zip(*tier_target)]
+            # [batch_size, label_size] labels for every head
+            tier_target = np.split(tier_set[:, tstep], TIER_SPLITS, axis=-1)
             tier_loss = self.supervised_loss(prediction.comp, tier_target)
             self.scale_loss(tier_loss)
             tier_loss.register_hook(lambda grad: grad * (1 / len(config.TEAM_TIERS_VECTOR)))
 
-            final_tier_target = [final_tier_set[a][tstep] for a in range(config.BATCH_SIZE)]
-            final_tier_target = [list(b) for b in zip(*final_tier_target)]
+            final_tier_target = np.split(final_tier_set, TIER_SPLITS, axis=-1)
             final_tier_loss = self.supervised_loss(prediction.final_comp, final_tier_target)
             self.scale_loss(final_tier_loss)
             final_tier_loss.register_hook(lambda grad: grad * (1 / len(config.TEAM_TIERS_VECTOR)))
 
-            champion_target = [champion_set[a][tstep] for a in range(config.BATCH_SIZE)]
-            champion_target = [list(b) for b in zip(*champion_target)]
+            champion_target = champion_set[:, tstep].swapaxes(0, 1)
             champ_loss = self.supervised_loss(prediction.champ, champion_target)
             self.scale_loss(tier_loss)
             champ_loss.register_hook(lambda grad: grad * (1 / len(config.CHAMPION_LIST_DIM)))
@@ -301,19 +301,19 @@ class Trainer(object):
         )
         return target_reshaped
 
-    # TODO: Maybe turn this off
-    # prediction [ [batch_size, action_dim_1], ...]
-    # target [ [batch_size, sampled_action_dim_1], ...] (smaller than prediction)
-    # sample_set [ [batch_size, sampled_action_dim_1], ...]
-    # We need to mask the prediction so that only the sampled actions are used in the loss.
-    # We also need to fill the target with zeros where the prediction is masked.
+    # target [batch_size, sampled_actions], zero padded
+    # sample_set [batch_size, sampled_actions], the action codes of the sampled actions
+    # Fills the target of the whole policy head with the sampled probabilities and zeros everywhere else.
+    # The padding adds 0 to action 0, so it doesn't change the target.
+    # With the champ decider the target is the concatenated heads and it is split into [batch_size, dim] targets.
     def fill_policy(self, target, sample_set):
+        target = torch.as_tensor(target).to(config.DEVICE)
         if not config.CHAMP_DECIDER:
-            idx_set = sample_set_to_idx(sample_set)
-            target = create_target_and_mask(target, idx_set)
-            target = torch.from_numpy(target).to(config.DEVICE)
+            index = torch.as_tensor(sample_set).to(config.DEVICE).long()
+            target = torch.zeros((target.shape[0], config.POLICY_HEAD_SIZE), device=config.DEVICE) \
+                .scatter_add_(1, index, target)
         else:
-            target = [torch.tensor(target_dim).to(config.DEVICE) for target_dim in target]
+            target = list(torch.split(target, config.CHAMP_DECIDER_ACTION_DIM, dim=-1))
 
         return target
 
@@ -0,0 +1,185 @@
+import copy
+from typing import List, Tuple
+import numpy as np
+import torch
+import config
+
+# Order of the observation tensors taken by InferenceNetwork.initial
+OBSERVATION_KEYS = ["scalars", "shop", "board", "bench", "items", "traits", "other_players"]
+PRECISIONS = ["fp32", "bf16", "int8"]
+
+
+class InferenceNetwork(torch.nn.Module):
+    """
+    Inference only copy of the representation, dynamics and prediction networks of a MuZeroNetwork.
+
+    It only computes what the search needs: hidden states, policy logits and the decoded value and reward.
+    The observation comes in as tensors that are already stacked. The action comes in as the int64 [batch, 3]
+    action, and its encoding is a lookup of three rows of the action layer instead of a matmul of a one hot.
+    It's made to be scripted, see export_inference.
+    """
+    def __init__(self, network, model_config):
+        super().__init__()
+        representation = network.representation_network
+        self.scalar_encoder = representation.scalar_encoder
+        self.shop_encoder = representation.shop_encoder
+        self.board_encoder = representation.board_encoder
+        self.bench_encoder = representation.bench_encoder
+        self.items_encoder = representation.items_encoder
+        self.traits_encoder = representation.traits_encoder
+        self.other_players_encoder = representation.other_players_encoder
+        self.feature_to_hidden = representation.feature_to_hidden
+
+        dynamics = network.dynamics_network
+        # The action layer is a single Linear of the concatenated one hot actions
+        action_layer = dynamics.action_encodings[0]
+        self.register_buffer("action_weight", action_layer.weight.detach().t().contiguous())
+        self.register_buffer("action_bias", action_layer.bias.detach().clone())
+        self.register_buffer("action_offsets", torch.tensor([0, config.ACTION_DIM[0],
+                                                             config.ACTION_DIM[0] + config.ACTION_DIM[1]]))
+        self.lstm = dynamics.dynamics_memory[0].lstm
+        self.rnn_sizes: List[int] = list(model_config.RNN_SIZES)
+        self.reward_network = dynamics.dynamics_reward_network
+
+        self.value_network = network.prediction_network.prediction_value_network
+        self.policy_network = network.prediction_network.policy_network
+
+        # decode_softmax of the value and reward encoders is softmax(logits) @ support and the inverse mapping
+        value_encoder = network.value_encoder
+        self.register_buffer("value_support", (value_encoder.step_range_float * value_encoder.step_size +
+                                               value_encoder.min_value).float())
+        reward_encoder = network.reward_encoder
+        self.register_buffer("reward_support", (reward_encoder.step_range_float * reward_encoder.step_size +
+                                                reward_encoder.min_value).float())
+
+    @staticmethod
+    def normalize(x: torch.Tensor) -> torch.Tensor:
+        min_encoded_state = x.min(1, keepdim=True)[0]
+        max_encoded_state = x.max(1, keepdim=True)[0]
+        scale_encoded_state = max_encoded_state - min_encoded_state
+        scale_encoded_state = torch.where(scale_encoded_state < 1e-5, scale_encoded_state + 1e-5, scale_encoded_state)
+        return (x - min_encoded_state) / scale_encoded_state
+
+    @staticmethod
+    def decode(logits: torch.Tensor, support: torch.Tensor) -> torch.Tensor:
+        value = torch.softmax(logits.float(), dim=-1) @ support
+        # inverse_contractive_mapping with eps = 0.001
+        eps = 0.001
+        return torch.sign(value) * (torch.square((torch.sqrt(4 * eps * (torch.abs(value) + 1. + eps) + 1.) - 1.) /
+                                                 (2. * eps)) - 1.)
+
+    def predict(self, hidden_state: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        policy_logits = self.policy_network(hidden_state)
+        value = self.decode(self.value_network(hidden_state), self.value_support)
+        return policy_logits, value
+
+    @torch.jit.export
+    def initial(self, scalars: torch.Tensor, shop: torch.Tensor, board: torch.Tensor, bench: torch.Tensor,
+                items: torch.Tensor, traits: torch.Tensor,
+                other_players: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """returns hidden state, policy logits and value"""
+        full_state = torch.cat((self.scalar_encoder(scalars), self.shop_encoder(shop), self.board_encoder(board),
+                                self.bench_encoder(bench), self.items_encoder(items), self.traits_encoder(traits),
+                                self.other_players_encoder(other_players)), -1)
+        hidden_state = self.feature_to_hidden(full_state)
+        policy_logits, value = self.predict(hidden_state)
+        return hidden_state, policy_logits, value
+
+    @torch.jit.export
+    def recurrent(self, hidden_state: torch.Tensor,
+                  action: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        """returns next hidden state, reward, policy logits and value"""
+        rows = self.action_weight.index_select(0, (action + self.action_offsets).reshape(-1))
+        action_encoding = rows.reshape(action.shape[0], 3, -1).sum(1) + self.action_bias
+
+        # Same layout of the lstm state as MemoryLayer
+        h0 = []
+        c0 = []
+        index = 0
+        for size in self.rnn_sizes:
+            h0.append(hidden_state[:, index:index + size])
+            c0.append(hidden_state[:, index + size:index + 2 * size])
+            index += 2 * size
+        _, (h, c) = self.lstm(action_encoding[:, None, :].to(hidden_state.dtype),
+                              (torch.stack(h0, 0).contiguous(), torch.stack(c0, 0).contiguous()))
+        next_hidden_state = self.normalize(torch.cat(list(h.unbind(0)) + list(c.unbind(0)), -1))
+
+        reward = self.decode(self.reward_network(next_hidden_state), self.reward_support)
+        policy_logits, value = self.predict(next_hidden_state)
+        return next_hidden_state, reward, policy_logits, value
+
+
+def export_inference(network, model_config, precision="fp32", script=True):
+    """
+    Inference copy of a MuZeroNetwork.
+
+    args:
+        network: MuZeroNetwork, it is copied and not changed
+        precision: "fp32", "bf16" for bfloat16 weights and hidden states or "int8" for dynamic int8 quantization of the
+            Linear and LSTM layers on the cpu
+        script: compile it with TorchScript
+    returns:
+        InferenceNetwork, a torch.jit.ScriptModule of it when scripted
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision}, expected one of {PRECISIONS}")
+    module = InferenceNetwork(copy.deepcopy(network).eval(), model_config).eval()
+    module = module.to(next(network.parameters()).device)
+    if precision == "bf16":
+        module = module.to(torch.bfloat16)
+        # The value and reward are decoded in fp32
+        module.value_support = module.value_support.float()
+        module.reward_support = module.reward_support.float()
+    elif precision == "int8":
+        module = torch.ao.quantization.quantize_dynamic(module.cpu(), {torch.nn.Linear, torch.nn.LSTM},
+                                                        dtype=torch.qint8)
+    if script:
+        module = torch.jit.script(module)
+    return module
+
+
+class ExportedNetwork:
+    """
+    Network for MCTS that runs the inference export of a MuZeroNetwork.
+    It has the same initial_inference and recurrent_inference as the network, without the training outputs and the
+    value and reward logits. set_weights loads the weights into the network and exports it again.
+    """
+    def __init__(self, network, model_config, precision="fp32", script=True):
+        self.network = network
+        self.model_config = model_config
+        self.precision = precision
+        self.script = script
+        self.device = "cpu" if precision == "int8" else next(network.parameters()).device
+        self.dtype = torch.bfloat16 if precision == "bf16" else torch.float32
+        self.module = export_inference(network, model_config, precision, script)
+
+    def initial_inference(self, observation):
+        inputs = [torch.from_numpy(np.asarray(observation[key], dtype=np.float32)).to(self.device, self.dtype)
+                  for key in OBSERVATION_KEYS]
+        with torch.no_grad():
+            hidden_state, policy_logits, value = self.module.initial(*inputs)
+        return {
+            "value": value,
+            "reward": torch.zeros(hidden_state.shape[0]),
+            "policy_logits": policy_logits.float(),
+            "hidden_state": hidden_state
+        }
+
+    def recurrent_inference(self, hidden_state, action):
+        action = torch.from_numpy(np.asarray(action, dtype=np.int64)).to(self.device)
+        with torch.no_grad():
+            hidden_state, reward, policy_logits, value = \
+                self.module.recurrent(hidden_state.to(self.device, self.dtype), action)
+        return {
+            "value": value,
+            "reward": reward,
+            "policy_logits": policy_logits.float(),
+            "hidden_state": hidden_state
+        }
+
+    def get_weights(self):
+        return self.network.get_weights()
+
+    def set_weights(self, weights):
+        self.network.set_weights(weights)
+        self.module = export_inference(self.network, self.model_config, self.precision, self.script)
@@ -2,13 +2,16 @@ import numpy as np
 import config
 import ray
 from Models.replay_muzero_buffer import ReplayBuffer
+from Concurrency.replay_columns import OpponentTable
 from sklearn import preprocessing
 
 
 @ray.remote(num_gpus=config.BUFFER_GPU_SIZE, num_cpus=0.2)
 class BufferWrapper:
     def __init__(self):
-        self.buffers = {"player_" + str(i): ReplayBuffer() for i in range(config.NUM_PLAYERS)}
+        # The players of the game share one table of the observations of their opponents
+        self.opponents = OpponentTable()
+        self.buffers = {"player_" + str(i): ReplayBuffer(self.opponents) for i in range(config.NUM_PLAYERS)}
     
     def store_replay_buffer(self, key, *args):
         self.buffers[key].store_replay_buffer(args[0], args[1], args[2], args[3], args[4], args[5], args[6], args[7])
@@ -53,10 +56,15 @@ class BufferWrapper:
             index += rewardLens[i]
     
     def store_global_buffer(self, global_buffer):
-        for b in self.buffers.values():
-            b.store_global_buffer(global_buffer)
+        # All players of the game at once, so that their opponent table is only sent and stored once
+        games = [game for game in (b.game_samples() for b in self.buffers.values()) if game is not None]
+        if games:
+            priorities = np.concatenate([priorities for priorities, _ in games])
+            columns = {key: np.concatenate([columns[key] for _, columns in games]) for key in games[0][1]}
+            global_buffer.store_replay_sequence([priorities, columns, self.opponents.table()])
 
     def reset_buffers(self):
-        self.buffers = {"player_" + str(i): ReplayBuffer() for i in range(config.NUM_PLAYERS)}
+        self.opponents = OpponentTable()
+        self.buffers = {"player_" + str(i): ReplayBuffer(self.opponents) for i in range(config.NUM_PLAYERS)}
         return True
     
\ No newline at end of file
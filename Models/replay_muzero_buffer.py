@@ -2,9 +2,12 @@ import numpy as np
 import time
 import config
 from Models.MCTS_Util import split_sample_decide
+from Concurrency.replay_columns import allocate_columns, policy_width, OpponentTable, STORED_OBSERVATION_KEYS
 
 class ReplayBuffer:
-    def __init__(self):
+    # opponents is the OpponentTable of the game, shared by the buffers of all of its players
+    def __init__(self, opponents=None):
+        self.opponents = opponents if opponents is not None else OpponentTable()
         self.gameplay_experiences = []
         self.rewards = []
         self.policy_distributions = []
@@ -32,6 +35,9 @@ class ReplayBuffer:
         # Records a single step of gameplay experience
         # First few are self-explanatory
         # done is boolean if game is done after taking said action
+        # The opponents in other_players are kept once per game in the opponent table, the step keeps their rows
+        observation = dict(observation)
+        observation["opponents"] = self.opponents.add(observation.pop("other_players"))
         self.gameplay_experiences.append(observation)
         self.action_history.append(action)
         np.clip(reward, config.MINIMUM_REWARD, config.MAXIMUM_REWARD)
@@ -61,7 +67,15 @@ class ReplayBuffer:
         self.ending_position = ending_position
 
     def store_global_buffer(self, global_buffer):
+        game = self.game_samples()
+        if game is not None:
+            global_buffer.store_replay_sequence(list(game) + [self.opponents.table()])
 
+    def game_samples(self):
+        """
+        The priorities of the samples of the game and the samples in the fields of the replay schema,
+        None if the game is too short to sample.
+        """
         # Putting this if case here in case the episode length is less than 72 which is 8 more than the batch size
         # In general, we are having episodes of 200 or so but the minimum possible is close to 20
         samples_per_player = config.SAMPLES_PER_PLAYER \
@@ -76,124 +90,75 @@ class ReplayBuffer:
             # samples = range(0, len(self.gameplay_experiences) - config.UNROLL_STEPS)
             samples = range(0, len(self.gameplay_experiences))
             num_steps = len(self.gameplay_experiences)
-            reward_correction = []
-            prev_reward = 0
-            output_sample_set = []
-            for reward in self.rewards:
-                reward_correction.append(reward - prev_reward)  # Getting instant rewards not cumulative
-                prev_reward = reward
-            for sample in samples:
-                # Hard coding because I would be required to do a transpose if I didn't
-                # and that takes a lot of time.
-                action_set = []
-                value_mask_set = []
-                reward_mask_set = []
-                policy_mask_set = []
-                value_set = []
-                reward_set = []
-                policy_set = []
-                sample_set = []
-                priority_set = []
-                tier_set = []
-                final_tier_set = []
-                champion_set = []
+            # One row for every sample in each field of the replay schema
+            columns = allocate_columns(num_steps)
+            # Getting instant rewards not cumulative
+            reward_correction = np.diff(np.asarray(self.rewards, dtype=np.float64), prepend=0.)
+            values = self.bootstrap_values(reward_correction)
 
-                for current_index in range(sample, sample + config.UNROLL_STEPS + 1):
-                    if config.TD_STEPS > 0:
-                        bootstrap_index = current_index + config.TD_STEPS
-                    else:
-                        bootstrap_index = len(reward_correction)
-                    if config.TD_STEPS > 0 and bootstrap_index < len(self.root_values):
-                        value = self.root_values[bootstrap_index] * config.DISCOUNT ** config.TD_STEPS
-                    else:
-                        value = 0.0
-                    # bootstrapping value back from rewards 
-                    for i, reward_corrected in enumerate(reward_correction[current_index:bootstrap_index]):
-                        value += reward_corrected * config.DISCOUNT ** i
-                    
-                    priority = 0.001
-                    if current_index < num_steps:
-                        priority = np.maximum(priority, np.abs(self.root_values[current_index] - value))
-                    priority_set.append(priority)
+            # The priority of a sample is the error of the root value of its first step, like the trainer
+            # computes it when it updates the priorities
+            priorities = np.maximum(0.001, np.abs(np.asarray(self.root_values, dtype=np.float64) - values))
 
-                    reward_mask = 1.0 if current_index > sample else 0.0
-                    if current_index < num_steps - 1:
-                        if current_index != sample:
-                            action_set.append(np.asarray(self.action_history[current_index]))
-                        else:
-                            if config.CHAMP_DECIDER:
-                                action_set.append([0 for _ in range(len(config.CHAMP_DECIDER_ACTION_DIM))])
-                            else:
-                                # To weed this out later when sampling the global buffer
-                                action_set.append([0, 0, 0])
-                        value_mask_set.append(1.0)
-                        reward_mask_set.append(reward_mask)
-                        policy_mask_set.append(1.0)
-                        value_set.append(value)
-                        # This is current_index - 1 in the Google's code but in my version
-                        # This is simply current_index since I store the reward with the same time stamp
-                        reward_set.append(reward_correction[current_index])
-                        policy_set.append(self.policy_distributions[current_index])
-                        sample_set.append(self.string_samples[current_index])
-                        tier_set.append(self.team_tiers[current_index])
-                        final_tier_set.append(self.team_tiers[-1])
-                        champion_set.append(self.team_champions[current_index])
-                    elif current_index == num_steps - 1:
-                        if config.CHAMP_DECIDER:
-                            action_set.append([0 for _ in range(len(config.CHAMP_DECIDER_ACTION_DIM))])
-                        else:
-                            # To weed this out later when sampling the global buffer
-                            action_set.append([0, 0, 0])
-                        value_mask_set.append(0.0)
-                        reward_mask_set.append(reward_mask)
-                        policy_mask_set.append(0.0)
-                        # This is 0.0 in Google's code but thinking this should be the same as the reward?
-                        # The value of the terminal state should equal
-                        # the value of the cumulative reward at the given state.
-                        value_set.append(0.0)
-                        reward_set.append(reward_correction[current_index])
-                        # 0 is ok here because this get masked out anyway
-                        policy_set.append(self.policy_distributions[0])
-                        sample_set.append(self.string_samples[0])
-                        tier_set.append(self.team_tiers[-1])
-                        final_tier_set.append(self.team_tiers[-1])
-                        champion_set.append(self.team_champions[-1])
-                    else:
-                        # States past the end of games is treated as absorbing states.
-                        if config.CHAMP_DECIDER:
-                            action_set.append([0 for _ in range(len(config.CHAMP_DECIDER_ACTION_DIM))])
-                        else:
-                            # To weed this out later when sampling the global buffer
-                            action_set.append([0, 0, 0])
-                        # I'm pretty sure this should be 0 and not 1.
-                        value_mask_set.append(0.0)
-                        reward_mask_set.append(0.0)
-                        policy_mask_set.append(0.0)
-                        value_set.append(0.0)
-                        reward_set.append(0.0)
-                        policy_set.append(self.policy_distributions[0])
-                        sample_set.append(self.string_samples[0])
-                        tier_set.append(self.team_tiers[-1])
-                        final_tier_set.append(self.team_tiers[-1])
-                        champion_set.append(self.team_champions[-1])
+            # The step of every unroll step of every sample, [num_steps, UNROLL_STEPS + 1]
+            index = np.asarray(samples)[:, None] + np.arange(config.UNROLL_STEPS + 1)[None, :]
+            # Steps before the last step of the game have all of their targets. The last step only has its reward and
+            # states past the end of games is treated as absorbing states.
+            in_game = index < num_steps - 1
+            until_end = index < num_steps
+            # The targets past the end of the game come from the last step, or from step 0 for the policy,
+            # which is ok because they get masked out anyway
+            step = np.where(in_game, index, num_steps - 1)
+            policy_step = np.where(in_game, index, 0)
 
-                if config.CHAMP_DECIDER:
-                    for i in range(len(sample_set)):
-                        split_mapping, split_policy = split_sample_decide(sample_set[i], policy_set[i])
-                        sample_set[i] = split_mapping
-                        policy_set[i] = split_policy
+            for key in STORED_OBSERVATION_KEYS:
+                columns[key][:] = [observation[key] for observation in self.gameplay_experiences]
+            # The action of the first step is 0, the unrolled steps take the actions after it
+            columns["action"][:] = np.where(in_game[:, 1:, None], np.asarray(self.action_history)[step[:, 1:]], 0)
+            columns["value_mask"][:] = in_game
+            columns["reward_mask"][:] = until_end
+            columns["reward_mask"][:, 0] = 0.0
+            columns["policy_mask"][:] = in_game
+            columns["value"][:] = np.where(in_game, values[step], 0.0)
+            # This is current_index - 1 in the Google's code but in my version
+            # This is simply current_index since I store the reward with the same time stamp
+            columns["reward"][:] = np.where(until_end, reward_correction[np.minimum(index, num_steps - 1)], 0.0)
+            for key, table in self.policy_table().items():
+                columns[key][:] = table[policy_step]
+            tiers = np.stack([np.concatenate(team_tiers) for team_tiers in self.team_tiers])
+            columns["tier"][:] = tiers[step]
+            columns["final_tier"][:] = tiers[-1]
+            columns["champion"][:] = np.asarray(self.team_champions)[step]
+            columns["position"][:] = self.ending_position
 
-                # formula for priority over unroll steps,
-                # adding small randomness to get around a priority queue error where it crashes if you add two items
-                # with identical priorities
-                priority = priority_set[0]
-                div = -priority
-                for i in priority_set:
-                    div += i
-                priority = 1 / (priority / div) + np.random.rand() * 0.00001
+            return priorities, columns
+        return None
 
-                # priority = 1 / priority because priority queue stores in ascending order.
-                output_sample_set.append([priority, [self.gameplay_experiences[sample], action_set, value_mask_set,
-                                                     reward_mask_set, policy_mask_set, value_set, reward_set,
-                                                     policy_set, sample_set, tier_set, final_tier_set, champion_set]])
-            global_buffer.store_replay_sequence([output_sample_set, self.ending_position])
+    def bootstrap_values(self, reward_correction):
+        """
+        The value target of every step, its discounted rewards up to TD_STEPS steps ahead, or to the end of the game
+        when TD_STEPS isn't positive, and the discounted root value TD_STEPS steps ahead if that is in the game.
+        """
+        num_steps = len(reward_correction)
+        window = config.TD_STEPS if config.TD_STEPS > 0 else num_steps
+        # value[t] = sum over i < window of reward_correction[t + i] * DISCOUNT ** i, zero past the end of the game
+        discounts = config.DISCOUNT ** np.arange(window)
+        values = np.correlate(np.concatenate([reward_correction, np.zeros(window - 1)]), discounts, mode="valid")
+        if config.TD_STEPS > 0:
+            bootstrap = np.asarray(self.root_values[config.TD_STEPS:], dtype=np.float64)
+            values[:len(bootstrap)] += bootstrap * config.DISCOUNT ** config.TD_STEPS
+        return values
+
+    def policy_table(self):
+        """The policy target fields of every step of the game, see replay_schema"""
+        num_steps = len(self.policy_distributions)
+        if config.CHAMP_DECIDER:
+            return {"policy": np.stack([np.concatenate(split_sample_decide(string_samples, policy)[1])
+                                        for string_samples, policy in
+                                        zip(self.string_samples, self.policy_distributions)]).astype(np.float32)}
+        table = {"policy": np.zeros((num_steps, policy_width()), dtype=np.float32),
+                 "policy_index": np.zeros((num_steps, policy_width()), dtype=np.int16)}
+        for step, (string_samples, policy) in enumerate(zip(self.string_samples, self.policy_distributions)):
+            table["policy"][step, :len(policy)] = policy
+            table["policy_index"][step, :len(policy)] = string_samples
+        return table
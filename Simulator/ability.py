@@ -5,7 +5,7 @@ import Simulator.champion_functions as champion_functions
 import Simulator.item_stats as item_stats
 import Simulator.origin_class as origin_class
 import Simulator.items as items
-import random
+from Simulator import handlers
 from math import ceil, floor
 
 
@@ -44,7 +44,7 @@ def default_ability_calls(champion):
 
     champion.mana_cost_increased = False
     champion.mana = 0
-    champion.castMS = champion_functions.MILLIS()
+    champion.castMS = champion.millis()
 
 
 # treat the ult as an attack --> apply cooldown
@@ -79,7 +79,7 @@ def aatrox(champion):
         target_neighbors = field.find_neighbors(champion.target.y, champion.target.x)
 
         for n in target_neighbors:
-            c = field.coordinates[n[0]][n[1]]
+            c = champion.battle.coordinates[n[0]][n[1]]
             if c is None:
                 free_hexes.append(n)
 
@@ -102,7 +102,7 @@ def aatrox_ability(champion, data):
     neighbors = field.find_neighbors(data['y'], data['x'])
     neighbors.append([data['y'], data['x']])
 
-    c = field.coordinates
+    c = champion.battle.coordinates
     for n in neighbors:
         if c[n[0]][n[1]] and c[n[0]][n[1]].team != champion.team and c[n[0]][n[1]].champion:
             champion.spell(c[n[0]][n[1]], stats.ABILITY_DMG[champion.name][champion.stars])
@@ -206,14 +206,14 @@ def annie(champion):
     neighbors = field.find_neighbors(cone_center[0], cone_center[1])
     neighbors.append(cone_center)
     for n in neighbors:
-        if n != leave_out and n[0] >= 0 and n[1] >= 0 and n[0] < 8 and n[1] < 7 and field.coordinates[n[0]][n[1]] \
-                and field.coordinates[n[0]][n[1]].team != champion.team and field.coordinates[n[0]][n[1]].champion:
-            champion.spell(field.coordinates[n[0]][n[1]], stats.ABILITY_DMG[champion.name][champion.stars])
+        if n != leave_out and n[0] >= 0 and n[1] >= 0 and n[0] < 8 and n[1] < 7 and champion.battle.coordinates[n[0]][n[1]] \
+                and champion.battle.coordinates[n[0]][n[1]].team != champion.team and champion.battle.coordinates[n[0]][n[1]].champion:
+            champion.spell(champion.battle.coordinates[n[0]][n[1]], stats.ABILITY_DMG[champion.name][champion.stars])
 
     apply_attack_cooldown(champion)
     shield_amount = stats.SHIELD_AMOUNT[champion.name][champion.stars] * champion.SP
     champion.add_que('shield', 0, None, None,
-                     {'amount': shield_amount, 'identifier': champion_functions.MILLIS() * shield_amount,
+                     {'amount': shield_amount, 'identifier': champion.millis() * shield_amount,
                       'applier': champion, 'original_amount': shield_amount},
                      {'increase': True, 'expires': stats.SHIELD_LENGTH[champion.name]})
 
@@ -223,9 +223,9 @@ def aphelios(champion):
 
     c = None
     while c is None:
-        y = random.randint(0, 7)
-        x = random.randint(0, 6)
-        if y == 0 or y == 7 and x == 0 or x == 6 and field.coordinates[y][x] is None:
+        y = champion.battle.random.randint(0, 7)
+        x = champion.battle.random.randint(0, 6)
+        if y == 0 or y == 7 and x == 0 or x == 6 and champion.battle.coordinates[y][x] is None:
             c = [y, x]
 
     turret = champion.spawn('aphelios_turret', champion.stars, c[0], c[1], champion.team, False)
@@ -282,7 +282,7 @@ def azir(champion):
             # if some line is longer, skip the rest of the iterations regarding this line
             if len(affected_hexes[j]) > i:
                 # current coordinate
-                c = field.coordinates[affected_hexes[j][i][0]][affected_hexes[j][i][1]]
+                c = champion.battle.coordinates[affected_hexes[j][i][0]][affected_hexes[j][i][1]]
                 if c and c.team != champion.team and c.champion and c not in already_targeted:
 
                     # if this coordinate is within the pushing range, find a new coordinate for the minion
@@ -291,7 +291,7 @@ def azir(champion):
                         push_counter = 1
                         while not push_coordinates:
                             if i + push_counter < len(affected_hexes[j]):
-                                if field.coordinates[affected_hexes[j][i + push_counter][0]][
+                                if champion.battle.coordinates[affected_hexes[j][i + push_counter][0]][
                                                      affected_hexes[j][i + push_counter][1]] is None:
                                     push_coordinates = [affected_hexes[j][i + push_counter][0],
                                                         affected_hexes[j][i + push_counter][1]]
@@ -354,7 +354,7 @@ def cassiopeia(champion):
         print("Someone figure out why cassiopeia is dying")
         return
     line_end_point = line_end_point[0]
-    # line_end_point = line_end_point[random.randint(0,len(line_end_point) - 1)]
+    # line_end_point = line_end_point[champion.battle.random.randint(0,len(line_end_point) - 1)]
 
     # find the cone corners. rules: 2 hexes from cone end, 4 hexes from champion
     cone_corners = []
@@ -435,13 +435,13 @@ def cassiopeia(champion):
     # deal the damage and stun the targets etc
     already_targeted = []
     for c in cone:
-        coords = field.coordinates
+        coords = champion.battle.coordinates
         if 7 >= c[0] >= 0 <= c[1] <= 6:
             h = coords[c[0]][c[1]]
             if h and h.team != champion.team and h.champion and h not in already_targeted:
                 # h.add_que('change_stat', -1, None, 'stunned', True)
                 # adding this when creating 'quicksilver' but seems like we had a reason to stun them here locally
-                if not ('quicksilver' in h.items and champion_functions.MILLIS() <=
+                if not ('quicksilver' in h.items and champion.millis() <=
                         item_stats.item_change_length['quicksilver']):
                     h.print(' {} {} --> {}'.format('stunned', h.stunned, True))
                     h.stunned = True
@@ -470,7 +470,7 @@ def diana(champion):
     default_ability_calls(champion)
     champion.add_que('change_stat', -1, None, 'ability_active', True)
 
-    shield_identifier = champion_functions.MILLIS() * stats.SHIELD_AMOUNT[champion.name][champion.stars] * champion.SP
+    shield_identifier = champion.millis() * stats.SHIELD_AMOUNT[champion.name][champion.stars] * champion.SP
     shield_amount = stats.SHIELD_AMOUNT[champion.name][champion.stars] * champion.SP
     champion.add_que('shield', 0, None, None, {'amount': shield_amount, 'identifier': shield_identifier,
                                                'applier': champion, 'original_amount': shield_amount},
@@ -495,7 +495,7 @@ def diana_ability(champion, data):
     turn_speed_per_hex = 1500 / 6
 
     # hit the enemy if there's someone in the orb's coordinates
-    c = field.coordinates[data['y']][data['x']]
+    c = champion.battle.coordinates[data['y']][data['x']]
     if c and c.team != champion.team and c.champion:
 
         if data in data['orbs']:
@@ -511,7 +511,7 @@ def diana_ability(champion, data):
                         ' {} {} --> {}'.format('shield', ceil(shield_before), ceil(champion.shield_amount())))
                     break
 
-            shield_identifier = champion_functions.MILLIS() * stats.SHIELD_AMOUNT[champion.name][
+            shield_identifier = champion.millis() * stats.SHIELD_AMOUNT[champion.name][
                 champion.stars] * champion.SP
             shield_amount = stats.SHIELD_AMOUNT[champion.name][champion.stars] * champion.SP
 
@@ -556,7 +556,7 @@ def elise(champion):
 def evelynn(champion):
     default_ability_calls(champion)
 
-    r = random.randint(1, 100) / 100
+    r = champion.battle.random.randint(1, 100) / 100
     targets = 1
     if r > stats.ABILITY_TARGET_PROBABILITIES[champion.name][3]:
         targets = 3
@@ -603,7 +603,7 @@ def evelynn(champion):
         teleport_hexes = list(filter(lambda x: x[0] < target_y, teleport_hexes))
 
     if len(teleport_hexes) > 0:
-        teleport_target = teleport_hexes[random.randint(0, len(teleport_hexes) - 1)]
+        teleport_target = teleport_hexes[champion.battle.random.randint(0, len(teleport_hexes) - 1)]
         champion.clear_que_idle()
         champion.move(teleport_target[0], teleport_target[1], True)
 
@@ -639,7 +639,7 @@ def ezreal_ability(champion, data):
             # if some line is longer, skip the rest of the iterations regarding this line
             if len(affected_hexes[j]) > i:
                 # current coordinate
-                c = field.coordinates[affected_hexes[j][i][0]][affected_hexes[j][i][1]]
+                c = champion.battle.coordinates[affected_hexes[j][i][0]][affected_hexes[j][i][1]]
                 if c and c.team != champion.team and c.champion and c not in already_targeted:
                     champion.spell(c, stats.ABILITY_DMG[champion.name][champion.stars])
 
@@ -712,7 +712,7 @@ def garen_ability(champion, data):
     team = champion.team
     enemies_around = []
     for n in neighbors:
-        c = field.coordinates[n[0]][n[1]]
+        c = champion.battle.coordinates[n[0]][n[1]]
         if c and c.team != team and c.champion:
             enemies_around.append(c)
 
@@ -735,7 +735,7 @@ def hecarim(champion):
 def hecarim_ability(champion, data):
     neighbors = field.find_neighbors(champion.y, champion.x)
 
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for n in neighbors:
         c = coords[n[0]][n[1]]
         if c and c.team != champion.team and c.champion:
@@ -765,7 +765,7 @@ def irelia(champion):
 
             # if some line is longer, skip the rest of the iterations regarding this line
             if len(affected_hexes[j]) > i:
-                c = field.coordinates[affected_hexes[j][i][0]][affected_hexes[j][i][1]]
+                c = champion.battle.coordinates[affected_hexes[j][i][0]][affected_hexes[j][i][1]]
                 if c and c.team != champion.team and c.champion and c not in already_targeted:
                     champion.spell(c, stats.ABILITY_DMG[champion.name][champion.stars])
 
@@ -801,7 +801,7 @@ def janna(champion):
                     a.print(' {} {} --> {}'.format('shield', ceil(shield_before), ceil(a.shield_amount())))
                     break
 
-        identifier = champion_functions.MILLIS() * stats.SHIELD_AMOUNT[champion.name][champion.stars]
+        identifier = champion.millis() * stats.SHIELD_AMOUNT[champion.name][champion.stars]
         shield_amount = stats.SHIELD_AMOUNT[champion.name][champion.stars] * champion.SP
         a.add_que('shield', -1, None, None, {'amount': shield_amount, 'identifier': identifier, 'applier': champion,
                                              'original_amount': shield_amount},
@@ -831,7 +831,7 @@ def jarvaniv(champion):
 
     # find the hex where jarvan moves to (closest free hex to the target)
     hexes = []
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for i in range(0, 8):
         for j in range(0, 7):
             distance = field.distance({'y': i, 'x': j}, {'y': target.y, 'x': target.x}, False)
@@ -948,16 +948,16 @@ def kayn(champion, data={'redash': False}):
         default_ability_calls(champion)
         distance = field.distance(champion, champion.target, True)
 
-        r = random.randint(0, 100)
+        r = champion.battle.random.randint(0, 100)
         if ((distance > 1 or r > 50) and not data['redash']) or (r > 50 and data['redash']):
             target_neighbors = field.find_neighbors(champion.target.y, champion.target.x)
             empty_neighbors = []
-            coords = field.coordinates
+            coords = champion.battle.coordinates
             for n in target_neighbors:
                 if not coords[n[0]][n[1]]:
                     empty_neighbors.append(n)
                     if len(empty_neighbors) > 1:
-                        dash_coords = empty_neighbors[random.randint(0, len(empty_neighbors) - 1)]
+                        dash_coords = empty_neighbors[champion.battle.random.randint(0, len(empty_neighbors) - 1)]
                     else:
                         dash_coords = empty_neighbors[0]
                     champion.move(dash_coords[0], dash_coords[1], True)
@@ -968,7 +968,7 @@ def kayn(champion, data={'redash': False}):
             ability_dmg = stats.ABILITY_DMG[champion.name][champion.stars]
 
             if champion.kayn_form == 'shadow_assassin' \
-                    and champion_functions.MILLIS() < stats.ABILITY_EXTRA_DAMAGE_LENGTH[champion.name]:
+                    and champion.millis() < stats.ABILITY_EXTRA_DAMAGE_LENGTH[champion.name]:
                 ability_dmg *= stats.ABILITY_EXTRA_DAMAGE[champion.name][champion.stars]
 
             champion.spell(e, ability_dmg)
@@ -1005,12 +1005,8 @@ def kayn(champion, data={'redash': False}):
             champion.add_que('execute_function', 350, [kayn, {'redash': True}])
 
 
-kennen_hits = []
-
-
 def kennen(champion):
-    global kennen_hits
-    kennen_hits = list(filter(lambda x: x[0] != champion, kennen_hits))
+    champion.battle.kennen_hits = list(filter(lambda x: x[0] != champion, champion.battle.kennen_hits))
 
     # for kenny not to ult when there's no targets in range
     # brings some extra cpu load
@@ -1026,7 +1022,7 @@ def kennen(champion):
 
 
 def kennen_ability(champion, data):
-    global kennen_hits
+    kennen_hits = champion.battle.kennen_hits
     targets = field.enemies_in_distance(champion, champion.y, champion.x, stats.ABILITY_RADIUS[champion.name])
 
     if not champion.stunned:
@@ -1080,7 +1076,7 @@ def kindred(champion):
 
     # find all hexes that are within 3 distance of kindred and log the distance from target to all those hexes
     potential_hexes = []
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for i in range(0, 7):
         for j in range(0, 6):
             distance_to_champion = field.distance({'y': champion.y, 'x': champion.x}, {'y': i, 'x': j}, False)
@@ -1094,7 +1090,7 @@ def kindred(champion):
         while len(potential_hexes[0]) < 2 and potential_hexes[0][2] > 3:
             potential_hexes = potential_hexes[1:]
         potential_hexes = list(filter(lambda x: (x[2] == potential_hexes[0][2]), potential_hexes))
-        leap_hex = potential_hexes[random.randint(0, len(potential_hexes) - 1)]
+        leap_hex = potential_hexes[champion.battle.random.randint(0, len(potential_hexes) - 1)]
 
     else:
         leap_hex = [champion.y, champion.x]
@@ -1145,7 +1141,7 @@ def leesin(champion):
                 else:
                     end_point[1] = 6
 
-        coords = field.coordinates
+        coords = champion.battle.coordinates
         kick_coords = None
         kick_out = False
         deal = False
@@ -1373,7 +1369,7 @@ def lissandra(champion):
     dagger_path = field.line({'y': champion.y, 'x': champion.x}, {'y': target.y, 'x': target.x})
 
     dagger_target = None
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for d in dagger_path:
         if 0 <= d[0] < 8 and 0 <= d[1] < 7:
             # print("IN LISSANDRA ABILITY")
@@ -1447,18 +1443,16 @@ def lissandra(champion):
 
     champion.spell(dagger_target, stats.ABILITY_DMG[champion.name][champion.stars])
 
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for c in cone:
         hex_data = coords[c[0]][c[1]]
         if hex_data and champion.team != hex_data.team and hex_data.champion:
             champion.spell(hex_data, stats.ABILITY_SECONDARY_DMG[champion.name][champion.stars])
 
 
-lulu_targeted = []
-
-
 def lulu(champion):
     default_ability_calls(champion)
+    lulu_targeted = champion.battle.lulu_targeted
     own_team = champion.own_team()
     own_team_hp = []
 
@@ -1504,7 +1498,7 @@ def lux(champion):
                 path = field.line({'y': champion.y, 'x': champion.x}, {'y': target.y, 'x': target.x})
             except AttributeError or ValueError:
                 path = field.line({'y': champion.y, 'x': champion.x}, {'y': 0, 'x': 0})
-            coords = field.coordinates
+            coords = champion.battle.coordinates
             for p in path:
                 if 0 <= p[0] < 8 and 0 <= p[1] < 7:
                     # print("IN LUX ABILITY")
@@ -1562,7 +1556,7 @@ def maokai(champion):
         if len(two_away) > 0:
             targeted_hexes.append([two_away[0][0], two_away[0][1]])
 
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for t in targeted_hexes:
         if 0 <= t[0] <= 7 and 0 <= t[1] <= 6:
             c = coords[t[0]][t[1]]
@@ -1583,7 +1577,8 @@ def morgana(champion):
 
     # between two random targets cast where it hits the most units
     enemies = champion.enemy_team()
-    random.shuffle(enemies)
+    champion.battle.random.shuffle(enemies)
+    champion.battle.team_changed()  # the shuffle reorders the enemy team itself
 
     circle0 = field.enemies_in_distance(champion, enemies[0].y, enemies[0].x, stats.ABILITY_RADIUS[champion.name])
     circle1 = []
@@ -1599,11 +1594,8 @@ def morgana(champion):
         champion.add_que('execute_function', current_ms, [morgana_ability, {'coordinates': target, 'ms': current_ms}])
 
 
-morgana_MR_list = []
-
-
 def morgana_ability(champion, data):
-    global morgana_MR_list
+    morgana_MR_list = champion.battle.morgana_MR_list
     targets = field.enemies_in_distance(champion, data['coordinates'][0], data['coordinates'][1],
                                         stats.ABILITY_RADIUS[champion.name])
 
@@ -1630,7 +1622,7 @@ def morgana_ability(champion, data):
     # clear the list at the end of the last slice
     if (data['ms'] == stats.ABILITY_LENGTH[champion.name] - (
             stats.ABILITY_LENGTH[champion.name] / stats.ABILITY_SLICES[champion.name])):
-        morgana_MR_list = list(filter(lambda x: (x[0] != champion), morgana_MR_list))
+        champion.battle.morgana_MR_list = list(filter(lambda x: (x[0] != champion), morgana_MR_list))
 
 
 def nami(champion):
@@ -1665,7 +1657,7 @@ def nidalee(champion):
            1:]
     dmg = stats.ABILITY_DMG[champion.name][champion.stars]
 
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for p in path:
         dmg *= (1 + stats.ABILITY_DAMAGE_ADDITION_PERCENTAGE[champion.name])
         if 0 < p[0] < 8 and 0 < p[1] < 7:
@@ -1714,7 +1706,7 @@ def pyke(champion):
     target_neighbor_distances = sorted(target_neighbor_distances, key=lambda x: x[1], reverse=True)
 
     dash_target = None
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for t in target_neighbor_distances:
         if not coords[t[0][0]][t[0][1]]:
             dash_target = t[0]
@@ -1725,7 +1717,7 @@ def pyke(champion):
     # then replace the original target with some enemy next to the new dash target
     if not dash_target:
         second_degree_neighbors = field.hexes_in_distance(target.y, target.x, 2)
-        random.shuffle(second_degree_neighbors)
+        champion.battle.random.shuffle(second_degree_neighbors)
         for t in second_degree_neighbors:
             if not coords[t[0]][t[1]]:
                 dash_target = t
@@ -1733,7 +1725,7 @@ def pyke(champion):
 
         if dash_target:
             dash_target_neighbors = field.find_neighbors(dash_target[0], dash_target[1])
-            random.shuffle(dash_target_neighbors)
+            champion.battle.random.shuffle(dash_target_neighbors)
             for n in dash_target_neighbors:
                 c = coords[n[0]][n[1]]
                 if c and c.team != champion.team and c.champion:
@@ -1776,7 +1768,7 @@ def pyke(champion):
 
 
 def pyke_ability(champion, data):
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for p in data['path']:
         if 0 <= p[0] <= 7 and 0 <= p[1] <= 6:
             c = coords[p[0]][p[1]]
@@ -1787,14 +1779,11 @@ def pyke_ability(champion, data):
                 champion.spell(c, stats.ABILITY_DMG[champion.name][champion.stars])
 
 
-riven_counter = []
-riven_identifier_list = []
-
-
 def riven(champion):
     if riven_helper(champion, {}):
 
-        global riven_counter
+        riven_counter = champion.battle.riven_counter
+        riven_identifier_list = champion.battle.riven_identifier_list
         default_ability_calls(champion)
         # riven_counter needs to sustain multiple rivens on the field,
         # so there's gonna be every riven's data on the same array
@@ -1822,7 +1811,7 @@ def riven(champion):
                 d = field.distance({'y': champion.y, 'x': champion.x}, {'y': t[0], 'x': t[1]}, False)
                 target_neighbors[i] = [t, d]
 
-            coords = field.coordinates
+            coords = champion.battle.coordinates
 
             # the wave of damage
             if riven_counter[index][1] == 3:
@@ -1866,7 +1855,7 @@ def riven(champion):
             # damage ALL neighboring enemies
             else:
 
-                random.shuffle(target_neighbors)
+                champion.battle.random.shuffle(target_neighbors)
                 target_neighbors = sorted(target_neighbors, key=lambda x: x[1], reverse=True)
 
                 for t in target_neighbors:
@@ -1877,7 +1866,7 @@ def riven(champion):
                             champion.move(t[0], t[1], True)
                             break
 
-                shield_identifier = champion_functions.MILLIS() * stats.SHIELD_AMOUNT[champion.name][
+                shield_identifier = champion.millis() * stats.SHIELD_AMOUNT[champion.name][
                     champion.stars] * champion.SP
                 shield_amount = stats.SHIELD_AMOUNT[champion.name][champion.stars] * champion.SP
                 if shield_identifier in riven_identifier_list:
@@ -1936,7 +1925,7 @@ def sejuani(champion):
 
 def sejuani_ability(champion, data):
     target_hexes = field.hexes_in_distance(data['target'][0], data['target'][1], stats.ABILITY_RADIUS[champion.name])
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for t in target_hexes:
         c = coords[t[0]][t[1]]
         if (c and c.team != champion.team and c.champion):
@@ -1998,7 +1987,7 @@ def sett(champion):
 
             # go through the possibilities and try to find a free hex
             free_hex = None
-            coords = field.coordinates
+            coords = champion.battle.coordinates
             for s in smash_targets:
                 if s[0] >= 0 and s[0] <= 7 and s[1] >= 0 and s[1] <= 6:
                     c = coords[s[0]][s[1]]
@@ -2019,7 +2008,7 @@ def sett(champion):
         target_dmg = champion.target.max_health * stats.ABILITY_DMG[champion.name][champion.stars]
         secondary_target_dmg = champion.target.max_health * stats.ABILITY_SECONDARY_DMG[champion.name][champion.stars]
         champion.spell(champion.target, target_dmg)
-        coords = field.coordinates
+        coords = champion.battle.coordinates
         for d in damaged_hexes:
             c = coords[d[0]][d[1]]
             if c and c.team != champion.team and c.champion:
@@ -2035,14 +2024,14 @@ def shen(champion):
         d = field.distance({'y': champion.y, 'x': champion.x}, {'y': t[0], 'x': t[1]}, False)
         target_neighbors[i] = [t, d]
 
-    random.shuffle(target_neighbors)
+    champion.battle.random.shuffle(target_neighbors)
     target_neighbors = sorted(target_neighbors, key=lambda x: x[1], reverse=True)
 
     # dash to a neighbor of the target that's as far as possible from shen
     # if there are no free hexes, stay at the current hex
     dash_target = [champion.y, champion.x]
 
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for t in target_neighbors:
         t = t[0]
         c = coords[t[0]][t[1]]
@@ -2053,7 +2042,7 @@ def shen(champion):
     if dash_target != [champion.y, champion.x]:
         champion.move(dash_target[0], dash_target[1], True)
 
-    shield_identifier = champion_functions.MILLIS() * stats.SHIELD_AMOUNT[champion.name][champion.stars] * champion.SP
+    shield_identifier = champion.millis() * stats.SHIELD_AMOUNT[champion.name][champion.stars] * champion.SP
     shield_amount = stats.SHIELD_AMOUNT[champion.name][champion.stars] * champion.SP
     champion.add_que('shield', 0, None, None,
                      {'amount': shield_amount, 'identifier': shield_identifier, 'applier': champion,
@@ -2094,7 +2083,7 @@ def sylas(champion):
 
             # print("SYLAS ABILITY SMASH LINE")
             # print(smash_line)
-            coords = field.coordinates
+            coords = champion.battle.coordinates
             for s in smash_line:
                 # print("IN SYLAS ABILITY")
                 # print(coords)
@@ -2181,9 +2170,9 @@ def talon(champion):
 def talon_ability(champion, data):
     if data['target'].health > 0:
         target_neighbors = field.find_neighbors(data['target'].y, data['target'].x)
-        random.shuffle(target_neighbors)
+        champion.battle.random.shuffle(target_neighbors)
         jump_target = None
-        coords = field.coordinates
+        coords = champion.battle.coordinates
         for t in target_neighbors:
             c = coords[t[0]][t[1]]
             if not c:
@@ -2217,16 +2206,9 @@ def teemo(champion):
 
     # if two teemo ults will be active at the same time, just fill the spell deals back to 6 (teemo's ability slices)
     # if teemo is a mage, just let him double cast and deal the full damage
-    if not ((origin_class.get_origin_class_tier(champion.team, 'mage') > 0
+    if not ((origin_class.get_origin_class_tier(champion.battle, champion.team, 'mage') > 0
              and origin_class.is_trait(champion, 'mage'))):
-        for i in range(0, 5):
-            que = champion.que_return()
-            for q in que:
-                for t in targets:
-                    if q[1] is champion and q[0] == 'execute_function' \
-                            and q[3][0] == teemo_ability and 'target' in q[3][1] and q[3][1]['target'] == t:
-                        que.remove(q)
-            champion.que_replace(que)
+        champion.clear_que_function(teemo_ability, lambda q: 'target' in q[3][1] and q[3][1]['target'] in targets)
 
     slice_length = stats.ABILITY_BLIND_DURATION[champion.name][champion.stars] / stats.ABILITY_SLICES[champion.name]
     for i in range(1, stats.ABILITY_SLICES[champion.name] + 1):
@@ -2262,7 +2244,7 @@ def thresh(champion):
 
     shielded_allies = [target]
 
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for t in target_neighbors:
         c = coords[t[0]][t[1]]
         if c and c.team == champion.team and c.champion:
@@ -2277,7 +2259,7 @@ def thresh(champion):
                     a.print(' {} {} --> {}'.format('shield', ceil(shield_before), ceil(a.shield_amount())))
                     break
 
-        identifier = champion_functions.MILLIS() * stats.SHIELD_AMOUNT[champion.name][champion.stars] * champion.SP
+        identifier = champion.millis() * stats.SHIELD_AMOUNT[champion.name][champion.stars] * champion.SP
         shield_amount = stats.SHIELD_AMOUNT[champion.name][champion.stars] * champion.SP
         a.add_que('shield', -1, None, None, {'amount': shield_amount, 'identifier': identifier, 'applier': champion,
                                              'original_amount': shield_amount},
@@ -2332,7 +2314,7 @@ def twistedfate(champion):
                 all_hit_hexes.append(side_line1)
 
         already_targeted = []
-        coords = field.coordinates
+        coords = champion.battle.coordinates
         for a in all_hit_hexes:
             for h in a:
                 c = coords[h[0]][h[1]]
@@ -2423,11 +2405,9 @@ def veigar(champion):
         champion.print(' {} {} --> {}'.format('SP', round(start_value, 2), round(champion.SP, 2)))
 
 
-vi_armor_list = []
-
-
 def vi(champion):
     default_ability_calls(champion)
+    vi_armor_list = champion.battle.vi_armor_list
     target = champion.target
     distance = field.distance(champion, target, True)
 
@@ -2450,7 +2430,7 @@ def vi(champion):
 
         affected_hexes = field.hexes_in_distance(x_away[0][0], x_away[0][1], 1)
 
-        coords = field.coordinates
+        coords = champion.battle.coordinates
         for a in affected_hexes:
             c = coords[a[0]][a[1]]
             if c and c.team != champion.team and c.champion:
@@ -2466,7 +2446,7 @@ def vi(champion):
                     if ar[0] == champion:
 
                         # amount of ms when reduced last time
-                        diff = champion_functions.MILLIS() - ar[2]
+                        diff = champion.millis() - ar[2]
                         # if more than reduction length, allow new reduction
                         if diff > stats.ABILITY_LENGTH[champion.name]:
                             can_be_changed = True
@@ -2483,7 +2463,7 @@ def vi(champion):
                     c.add_que('change_stat', stats.ABILITY_LENGTH[champion.name], None, 'armor', None,
                               {'vi': stats.ABILITY_ARMOR_DECREASE[champion.name][champion.stars]})
 
-                    vi_armor_list.append([champion, c, champion_functions.MILLIS()])
+                    vi_armor_list.append([champion, c, champion.millis()])
 
                 champion.spell(c, stats.ABILITY_DMG[champion.name][champion.stars])
 
@@ -2557,7 +2537,7 @@ def yasuo(champion):
 #               add to list and sort the list by distances to yasuo
 def yasuo_ability(champion, data):
     hexes = field.hexes_in_distance(0, 0, 20)
-    coords = field.coordinates
+    coords = champion.battle.coordinates
 
     possible_hexes = []
 
@@ -2589,23 +2569,18 @@ def yasuo_ability(champion, data):
     return (possible_hexes)
 
 
-yone_list = []
-yone_checking = False
-
-
 # welcome to the loop city
 # the sir lord mayor is named 'for'
 # dude's a dick tho
 def yone(champion):
-    global yone_list
-    global yone_checking
+    yone_list = champion.battle.yone_list
     default_ability_calls(champion)
 
-    if (not yone_checking):
+    if (not champion.battle.yone_checking):
         champion.add_que('execute_function', 0, [yone_ability, {'loop': True}])
-        yone_checking = True
+        champion.battle.yone_checking = True
 
-    coords = field.coordinates
+    coords = champion.battle.coordinates
 
     # Seal Fate
     if champion.maxmana == stats.MAXMANA[champion.name] and champion.target:
@@ -2640,7 +2615,7 @@ def yone(champion):
             d = field.distance({'y': p[0], 'x': p[1]}, {'y': dash_coordinate[0], 'x': dash_coordinate[1]}, False)
             possible_targets[i].append(d)
 
-        random.shuffle(possible_targets)
+        champion.battle.random.shuffle(possible_targets)
         possible_targets = sorted(possible_targets, key=lambda x: x[2])
 
         # go through the sorted list of path hexes and find the first one that's free
@@ -2708,7 +2683,7 @@ def yone(champion):
         # go through every unit's every neighbor until we have a free one
         for m in marked_enemies:
             neighbors = field.find_neighbors(m[0].y, m[0].x)
-            random.shuffle(neighbors)
+            champion.battle.random.shuffle(neighbors)
             for n in neighbors:
                 c = coords[n[0]][n[1]]
                 if not c:
@@ -2732,10 +2707,8 @@ def yone(champion):
 
 # check if someone on the list has died
 def yone_ability(champion, data):
-    global yone_list
-
     old_length = yone_helper(champion)
-    yone_list = list(filter(lambda x: x[1].health > 0, yone_list))
+    champion.battle.yone_list = list(filter(lambda x: x[1].health > 0, champion.battle.yone_list))
     new_length = yone_helper(champion)
     if (new_length != old_length):
         champion.print(' list length {} --> {}'.format(old_length, new_length))
@@ -2749,9 +2722,8 @@ def yone_ability(champion, data):
 
 
 def yone_helper(champion):
-    global yone_list
     counter = 0
-    for y in yone_list:
+    for y in champion.battle.yone_list:
         if (y[0] == champion):
             counter += 1
     return counter
@@ -2803,13 +2775,13 @@ def yuumi(champion):
         second_target = team_distances[0][0]
 
         # find the closest free coordinate next to the second target
-        coords = field.coordinates
+        coords = champion.battle.coordinates
         possible_targets = field.hexes_in_distance(second_target.y, second_target.x, 2)
         for i, p in enumerate(possible_targets):
             d = field.distance({'y': p[0], 'x': p[1]}, {'y': second_target.y, 'x': second_target.x}, False)
             possible_targets[i].append(d)
 
-        random.shuffle(possible_targets)
+        champion.battle.random.shuffle(possible_targets)
         possible_targets = sorted(possible_targets, key=lambda x: x[2])
 
         # go through the sorted list of path hexes and find the first one that's free
@@ -2892,3 +2864,6 @@ def galio_ability(champion, data):
     targets = field.enemies_in_distance(champion, champion.y, champion.x, radius)
     for t in targets:
         champion.spell(t, stats.ABILITY_DMG[champion.name][champion.stars])
+
+
+handlers.register_champions(handlers.ABILITIES, globals())
@@ -1,7 +1,8 @@
+import Simulator.config as config
 import Simulator.stats as stats
 import Simulator.field as field
 import Simulator.origin_class_stats as origin_class_stats
-import random
+from Simulator import handlers
 
 
 # changing the stat manually since we have shenanigans in place for AD change in the section that makes stat changes
@@ -11,11 +12,8 @@ def jhin_init(champion):
     champion.print(' {} {} --> {}'.format('AS', None, champion.AS))
 
 
-jhin_shots = []
-
-
 def jhin(champion, target):
-    global jhin_shots
+    jhin_shots = champion.battle.jhin_shots
 
     found = False
     index = -1
@@ -42,10 +40,8 @@ def jhin(champion, target):
         return {'damage': 0, 'true_damage': False, 'crit_random': None, 'dodge_random': None}
 
 
-kalista_targets = []
-
-
 def kalista(champion, target):
+    kalista_targets = champion.battle.kalista_targets
     if target:
         found = False
         index = -1
@@ -91,10 +87,8 @@ def tahmkench_init(champion):
     champion.print(' {} {} --> {}'.format('damage_reduction', 0, champion.damage_reduction))
 
 
-vayne_targets = []
-
-
 def vayne(champion, target):
+    vayne_targets = champion.battle.vayne_targets
     found = False
     index = -1
     # target = champion.target
@@ -129,8 +123,8 @@ def warwick(champion, target):
         
         damage = champion.AD
 
-        dodge_random = random.randint(1, 100)/100
-        crit_random = random.randint(1, 100)/100
+        dodge_random = champion.battle.random.randint(1, 100)/100
+        crit_random = champion.battle.random.randint(1, 100)/100
 
         if target.armor >= 0:
             damage = damage * (100/(100+target.armor))
@@ -172,7 +166,7 @@ def warwick(champion, target):
             # howling
             """ 
             target_neighbors = field.find_neighbors(target.y, target.x)
-            coords = field.coordinates
+            coords = champion.battle.coordinates
             for t in target_neighbors:
                 c = coords[t[0]][t[1]]
                 if(c and c.team != champion.team and c.champion):
@@ -187,11 +181,8 @@ def warwick(champion, target):
         return {'damage': 0, 'true_damage': False, 'crit_random': None, 'dodge_random': None}
 
 
-zed_counter = []
-
-
 def zed(champion, target):
-    global zed_counter
+    zed_counter = champion.battle.zed_counter
 
     found = False
     index = -1
@@ -225,3 +216,7 @@ def zed(champion, target):
         champion.spell(champion.target, stats.ACTIVE_DMG[champion.name][champion.stars])
 
     return {'damage': 0, 'true_damage': False, 'crit_random': None, 'dodge_random': None}
+
+
+handlers.register_champions(handlers.INIT_HOOKS, globals(), stats.INITIATIVE_ACTIVE, '_init')
+handlers.register_champions(handlers.ATTACK_PASSIVES, globals(), config.ATTACK_PASSIVES)
@@ -1,3 +1,4 @@
+import collections
 from Simulator.pool_stats import cost_star_values
 import numpy as np
 
@@ -36,3 +37,76 @@ def alt_auto_battle(player_1, player_2, round_damage=0):
         return 1, blue_score - red_score + round_damage
     elif red_score > blue_score:
         return 2, red_score - blue_score + round_damage
+
+
+COST_STAR_VALUES = np.array(cost_star_values)
+
+# Packed boards for alt_auto_battles, one row per player.
+# costs, stars: (N, 28) with one column per board hex, stars is 0 where the hex is empty
+# team_composition, team_tiers: (N, traits) the values of player.team_composition and player.team_tiers
+PackedBoards = collections.namedtuple('PackedBoards', ['costs', 'stars', 'team_composition', 'team_tiers'])
+
+
+def pack_boards(players):
+    """
+    Packs the boards alt_auto_battle looks at into arrays. The arrays are a copy, moving units afterwards
+    doesn't change them.
+
+    args:
+        players: List of players, one row each
+
+    returns:
+        PackedBoards
+    """
+    # One pass over the boards with cost and stars in one int, reading the units is most of the work here
+    units = np.fromiter([unit.stars * 8 + unit.cost if unit else 0
+                         for player in players for column in player.board for unit in column],
+                        dtype=np.int64, count=len(players) * 28).reshape(len(players), 28)
+    team_composition = np.fromiter([value for player in players for value in player.team_composition.values()],
+                                   dtype=np.int64).reshape(len(players), -1)
+    team_tiers = np.fromiter([value for player in players for value in player.team_tiers.values()],
+                             dtype=np.int64).reshape(len(players), -1)
+    return PackedBoards(units & 7, units >> 3, team_composition, team_tiers)
+
+
+def board_scores(boards):
+    """The score alt_auto_battle gives every packed board. Returns an array of N scores"""
+    # Negative indexes wrap around like they do in alt_auto_battle, a 0 cost sandguard counts as a 5 cost unit.
+    unit_values = COST_STAR_VALUES[boards.costs - 1, boards.stars - 1] * (boards.stars > 0)
+    return unit_values.sum(axis=1) + (boards.team_composition * boards.team_tiers).sum(axis=1)
+
+
+def alt_auto_battles(blue_boards, red_boards, round_damage=0):
+    """
+    alt_auto_battle for N board pairs at once.
+
+    args:
+        blue_boards: PackedBoards of the players on the blue side
+        red_boards: PackedBoards of the players on the red side, same order
+        round_damage: Base damage of the round, an int or an array of N
+
+    returns:
+        index_won, damage: arrays of N with the same values alt_auto_battle returns for each pair
+    """
+    difference = board_scores(blue_boards) - board_scores(red_boards)
+    index_won = np.where(difference > 0, 1, np.where(difference < 0, 2, 0))
+    damage = np.abs(difference) + round_damage
+    return index_won, damage
+
+
+def alt_auto_battle_pairs(pairs, round_damage=0):
+    """
+    Packs the pairs and plays them with alt_auto_battles.
+
+    args:
+        pairs: List of (blue player, red player)
+
+    returns:
+        List of (index_won, damage), one per pair
+    """
+    if not pairs:
+        return []
+    blue_boards = pack_boards([blue for blue, _ in pairs])
+    red_boards = pack_boards([red for _, red in pairs])
+    index_won, damage = alt_auto_battles(blue_boards, red_boards, round_damage)
+    return list(zip(index_won.tolist(), damage.tolist()))
@@ -0,0 +1,137 @@
+import collections
+import random
+import config
+from Simulator import origin_class_stats
+from Simulator.alt_autobattler import alt_auto_battle
+from Simulator.combat_pool import CombatResult, combat_job, run_combat_job
+
+
+class BattleCache:
+    """
+    Remembers the outcome of battles between the same two boards.
+
+    The key of a battle is made by battle_key: the description of both boards from combat_pool.describe_board
+    (position, name, stars, items, chosen and kayn form of every unit plus the win streak of the player)
+    together with the base damage of the round.
+
+    Combat uses random, so one battle doesn't tell much about a board pair. The first `samples` battles of a pair are
+    really played and their results kept. After that every battle of the pair gets one of those results picked at
+    random, so the cached outcomes follow the same distribution as the real ones.
+    alt_auto_battle has no randomness and is cached after a single battle.
+
+    args:
+        size: int, number of board pairs to keep. The least recently used pair is dropped first.
+        samples: int, number of real battles of a board pair before cached results are handed out.
+    """
+    def __init__(self, size, samples=1):
+        self.size = size
+        self.samples = max(1, samples)
+        self.entries = collections.OrderedDict()  # key -> List[CombatResult]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def run(self, player_1, player_2, round_damage=0):
+        """
+        champion.run through the cache. The battle is played on a copy of the boards, the players are not touched.
+
+        returns:
+            CombatResult with the positions of the units that survived on both sides.
+        """
+        key = battle_key(player_1, player_2, round_damage)
+        result = self.get(key, self.samples)
+        if result is None:
+            result = run_combat_job(key + (random.getrandbits(32),))
+            self.put(key, result)
+        return result
+
+    def alt_auto_battle(self, player_1, player_2, round_damage=0):
+        """alt_auto_battle through the cache. Returns index_won, damage like alt_auto_battle"""
+        key = ('alt',) + battle_key(player_1, player_2, round_damage)
+        result = self.get(key, 1)
+        if result is None:
+            index_won, damage = alt_auto_battle(player_1, player_2, round_damage)
+            result = CombatResult(index_won, damage, [], [])
+            self.put(key, result)
+        return result.index_won, result.damage
+
+    def get(self, key, samples):
+        """
+        A cached result of the battle. None if it hasn't been played often enough yet.
+        Counts as a hit or a miss.
+        """
+        results = self.entries.get(key)
+        if results is not None:
+            self.entries.move_to_end(key)
+            if len(results) >= samples:
+                self.hits += 1
+                return random.choice(results)
+        self.misses += 1
+        return None
+
+    def put(self, key, result):
+        results = self.entries.get(key)
+        if results is None:
+            results = self.entries[key] = []
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        results.append(result)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0,
+            'evictions': self.evictions,
+            'board_pairs': len(self.entries),
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+def battle_key(player_1, player_2, round_damage):
+    """
+    The cache key of a battle, combat_job without the seed.
+
+    The win streak only changes a battle through the warlord trait, so it is left out of the key of a board
+    without warlords. Otherwise the key of the same board would change after every round.
+    """
+    blue_board, red_board, round_damage, _ = combat_job(player_1, player_2, round_damage, None)
+    return without_streak(blue_board), without_streak(red_board), round_damage
+
+
+def without_streak(board):
+    win_streak, units = board
+    if win_streak and not any(has_warlord(unit) for unit in units):
+        return 0, units
+    return board
+
+
+def has_warlord(unit):
+    _, _, name, _, items, chosen, _, _ = unit
+    return 'warlord' in origin_class_stats.origin_class[name] or chosen == 'warlord' or 'warlords_banner' in items
+
+
+_shared_cache = None
+
+
+def shared_cache():
+    """
+    The cache used by Game_Round when none is given. There is one per process and it's only created
+    when config.BATTLE_CACHE_SIZE is above 0.
+
+    returns:
+        BattleCache or None when the battles should not be cached
+    """
+    global _shared_cache
+    if config.BATTLE_CACHE_SIZE <= 0:
+        return None
+    if _shared_cache is None:
+        _shared_cache = BattleCache(config.BATTLE_CACHE_SIZE, config.BATTLE_CACHE_SAMPLES)
+    return _shared_cache
@@ -0,0 +1,137 @@
+import random
+import Simulator.config as config
+from Simulator.event_queue import EventQueue
+from Simulator.combat_log import CombatLog, MESSAGE
+
+# Length of a single combat tick in milliseconds
+TICK_LENGTH = 25
+
+
+class BattleContext:
+    """
+    Holds all of the state of a single battle.
+
+    Everything that used to live in module globals across champion, champion_functions, field, ability, active,
+    items and origin_class is kept here instead. Every unit created for a battle carries a reference to its context
+    (unit.battle) so that the combat functions can reach the state through the champion they are called with.
+    Because nothing is shared between contexts, any number of battles can run in the same interpreter.
+
+    args:
+        blue_win_streak: int, win streak of the blue player. Used by the warlord trait.
+        red_win_streak: int, win streak of the red player. Used by the warlord trait.
+        rng: Random number generator used by the battle. Defaults to the global random module.
+        event_skipping: bool, run the battle with the event skipping clock. Defaults to config.EVENT_SKIPPING.
+        tracing: bool, record the combat log of the battle. Defaults to config.TRACE_COMBAT.
+    """
+    def __init__(self, blue_win_streak=0, red_win_streak=0, rng=None, event_skipping=None, tracing=None):
+        # Teams, event que and combat log
+        self.blue = []
+        self.red = []
+        # Units of each team that have the champion flag set, so the ones that could be attacked.
+        # Built on demand and thrown away by team_changed()
+        self.living = {'blue': None, 'red': None}
+        self.que = EventQueue()
+        self.tracing = config.TRACE_COMBAT if tracing is None else tracing
+        self.events = CombatLog()
+
+        # The whole hex board. Indexed as coordinates[y][x]
+        self.coordinates = [[None] * 7 for _ in range(8)]
+
+        self.milliseconds = 0
+        self.event_skipping = config.EVENT_SKIPPING if event_skipping is None else event_skipping
+        self.random = rng if rng is not None else random
+        self.warlord_wins = {'blue': blue_win_streak, 'red': red_win_streak}
+
+        # champion_functions
+        self.damage_dealt = []
+        self.damage_dealt_teams = {'blue': 0, 'red': 0}
+        self.galio_spawned = {'blue': False, 'red': False}
+
+        # ability
+        self.kennen_hits = []
+        self.lulu_targeted = []
+        self.morgana_MR_list = []
+        self.riven_counter = []
+        self.riven_identifier_list = []
+        self.vi_armor_list = []
+        self.yone_list = []
+        self.yone_checking = False
+
+        # active
+        self.jhin_shots = []
+        self.kalista_targets = []
+        self.vayne_targets = []
+        self.zed_counter = []
+
+        # items
+        self.bramble_vest_list = []
+        self.deathblade_list = []
+        self.frozen_heart_list = []
+        self.gargoyle_stoneplate_list = []
+        self.hextech_gunblade_list = []
+        self.ionic_spark_list = []
+        self.last_whisper_list = []  # [target, ms]
+        self.statikk_shiv_list = []
+        self.titans_resolve_list = []  # [champion, stacks, maxxed]
+
+        # origin_class
+        self.cultist_stars = {'blue': 0, 'red': 0}  # chosen's stars counts as double
+        self.total_health_teams = {'blue': 0, 'red': 0}
+        self.galio_spawn_time = {'blue': 0, 'red': 0}
+        self.amounts = {trait: {'blue': 0, 'red': 0} for trait in TRAITS}
+        self.divine_attack_list = []  # [champion, attack_amount]
+        self.divine_list = []  # champion, champion, champion
+        self.elderwood_list = {'blue': 0, 'red': 0}
+        self.spirit_list = []  # champion, champion, champion (the ones who have casted)
+        self.duelist_helper_list = []  # [champion, stacks]
+        self.shade_helper_list = []  # [champion, attacks]
+
+    def millis(self):
+        return self.milliseconds
+
+    def millis_increase(self):
+        self.milliseconds += TICK_LENGTH
+
+    def team(self, team):
+        if team == 'blue':
+            return self.blue
+        if team == 'red':
+            return self.red
+        raise TypeError("unknown team {}".format(team))
+
+    def living_units(self, team):
+        """
+        The units of a team that can be attacked as long as they have health left.
+        Cached until a unit dies, spawns or its champion flag changes.
+        """
+        units = self.living[team]
+        if units is None:
+            units = self.living[team] = [unit for unit in self.team(team) if unit.champion]
+        return units
+
+    def team_changed(self):
+        """Call after a unit joined or left a team or its champion flag changed"""
+        self.living = {'blue': None, 'red': None}
+
+    @property
+    def log(self):
+        """The combat log as lines of text. Empty unless the battle is traced."""
+        return self.events.lines()
+
+    def trace(self, unit, code, *args):
+        """Records an event of a unit in the combat log. The codes and their args are listed in combat_log."""
+        if self.tracing:
+            self.events.record(self.milliseconds, unit, code, args)
+
+    def printt(self, msg):
+        if self.tracing:
+            self.events.record(self.milliseconds, None, MESSAGE, (msg,))
+
+
+# Every trait that is counted in BattleContext.amounts.
+# The order matters: total_origin_class() initiates the traits in this order and some of them use the rng.
+TRAITS = [
+    'cultist', 'divine', 'dusk', 'elderwood', 'enlightened', 'exile', 'ninja', 'spirit', 'the_boss', 'warlord',
+    'adept', 'assassin', 'brawler', 'dazzler', 'duelist', 'emperor', 'hunter', 'keeper', 'mage', 'mystic', 'shade',
+    'sharpshooter', 'vanguard', 'fortune', 'moonlight', 'tormented'
+]
@@ -3,25 +3,31 @@ import Simulator.origin_class as origin_class
 import Simulator.origin_class_stats as origin_class_stats
 import Simulator.champion_functions as champion_functions
 import time
-import random
 import itertools
 
 from math import ceil
 from Simulator.stats import AD, HEALTH, ARMOR, MR, AS, RANGE, MANA, MAXMANA, COST, MANALOCK, ABILITY_REQUIRES_TARGET, \
-    DODGE, INITIATIVE_ACTIVE, ABILITY_LENGTH, DAMAGE_PER_UNIT
-from Simulator.champion_functions import attack, die, MILLIS, MILLISECONDS_INCREASE, add_damage_dealt
-from Simulator import ability, active, field, item_stats, items
-
-que = []
-log = []
+    DODGE, ABILITY_LENGTH, DAMAGE_PER_UNIT
+from Simulator.champion_functions import attack, die, add_damage_dealt
+from Simulator import ability, active, combat_log, field, handlers, item_stats, items
+from Simulator.battle_context import BattleContext, TICK_LENGTH
 
+test_multiple = {'blue': 0, 'red': 0, 'bugged out': 0, 'draw': 0}
 
-def printt(msg):
-    if config.PRINTMESSAGES:
-        log.append(msg)
+# Base stats of every unit that don't depend on the stars, looked up once instead of on every spawn.
+# name -> (AS, armor, MR, range, mana, maxmana, cost, manalock, ability_requires_target)
+BASE_STATS = {name: (AS[name], ARMOR[name], MR[name], RANGE[name], MANA[name], MAXMANA[name], COST[name],
+                     MANALOCK[name], ABILITY_REQUIRES_TARGET[name]) for name in AS}
+# (name, stars) -> (health, AD). Filled in by star_stats()
+STAR_STATS = {}
 
 
-test_multiple = {'blue': 0, 'red': 0, 'bugged out': 0, 'draw': 0}
+def star_stats(name, stars):
+    stats = STAR_STATS.get((name, stars))
+    if stats is None:
+        multiplier = config.STARMULTIPLIER ** (stars - 1)
+        stats = STAR_STATS[(name, stars)] = (round(HEALTH[name] * multiplier, 1), round(AD[name] * multiplier, 1))
+    return stats
 
 
 # I am going to have to add cost information but that should be about it.
@@ -30,36 +36,57 @@ test_multiple = {'blue': 0, 'red': 0, 'bugged out': 0, 'draw': 0}
 
 
 class champion:
+    # A battle creates a lot of these so there's no __dict__. Every attribute a unit can have has to be listed here.
+    __slots__ = (
+        'battle', 'champion', 'champion_id', 'name', 'stars', 'cost', 'team', 'items', 'num_items', 'chosen', 'kayn_form',
+        'target_dummy', 'origin',
+        # stats
+        'health', 'max_health', 'AD', 'SP', 'AS', 'armor', 'MR', 'range', 'dodge', 'movement_delay', 'mana',
+        'maxmana', 'manalock', 'mana_cost_increased', 'mana_generation', 'castMS', 'ability_requires_target',
+        'crit_chance', 'crit_damage',
+        # targeting and position
+        'target', 'target_y', 'target_x', 'x', 'y', 'starting_x', 'starting_y', 'bench_loc',
+        # status
+        'immune', 'autoimmune', 'targetable', 'stunned', 'burning', 'disarmed', 'blinded', 'shields', 'idle',
+        'ability_active', 'will_revive',
+        # damage and healing modifiers
+        'receive_increased_damage', 'receive_decreased_damage', 'damage_reduction', 'deal_increased_damage',
+        'deal_bonus_true_damage', 'spell_damage_reduction_percentage', 'heal_per_attack', 'lifesteal',
+        'lifesteal_spells', 'healing_strength',
+        # summons
+        'underlords', 'overlord', 'overlord_coordinates', 'sandguard_overlord_coordinates',
+        # item and trait helpers
+        'ionic_sparked', 'spell_has_used_ludens', 'AD_reduction_cc', 'pumped_up', 'done_situps',
+        # player side
+        'survive_combat', 'participated_in_combat', 'start_time',
+    )
+
     def __init__(self, name, team=None, y=-1, x=-1, stars=1, itemlist=None, overlord=None,
-                 sandguard_overlord_coordinates=None, chosen=False, kayn_form=None, target_dummy=False):
+                 sandguard_overlord_coordinates=None, chosen=False, kayn_form=None, target_dummy=False, battle=None):
 
         if itemlist is None:
             itemlist = []
         self.champion = True
+        # The battle this unit fights in. Units on a player's board or bench are not in a battle.
+        self.battle = battle
 
         self.name = name
+        # index of the name in the handler tables of handlers.py
+        self.champion_id = handlers.CHAMPION_IDS[name]
         self.stars = stars
 
         # in case we're spawning a construct, galio or a turret, the rest are handled at the bottom of the object
         if name != 'construct' and name != 'galio' and name != 'aphelios_turret':
-            self.health = round(HEALTH[name] * config.STARMULTIPLIER ** (stars - 1), 1)
-            self.max_health = round(HEALTH[name] * config.STARMULTIPLIER ** (stars - 1), 1)
-            self.AD = round(AD[name] * config.STARMULTIPLIER ** (stars - 1), 1)
+            self.health, self.AD = star_stats(name, stars)
+            self.max_health = self.health
 
         self.SP = config.SP
 
-        self.AS = AS[name]
-        self.armor = ARMOR[name]
-        self.MR = MR[name]
-        self.range = RANGE[name]
+        (self.AS, self.armor, self.MR, self.range, self.mana, self.maxmana, self.cost, self.manalock,
+         self.ability_requires_target) = BASE_STATS[name]
         self.dodge = DODGE
         self.movement_delay = config.MOVEMENTDELAY
 
-        self.mana = MANA[name]
-        self.maxmana = MAXMANA[name]
-        self.cost = COST[name]
-
-        self.manalock = MANALOCK[name]
         # not going to start changing the whole structure of the manalock code since that could create some bugs
         # shen is the only unit whose manalock scales by stars so just forcing the change here.
         if self.name == 'shen':
@@ -68,7 +95,6 @@ class champion:
         self.mana_cost_increased = False
         self.mana_generation = 1  # enlightened - trait
         self.castMS = -50000  # the timestamp of the last cast
-        self.ability_requires_target = ABILITY_REQUIRES_TARGET[name]
 
         self.target = None
         self.target_y = None
@@ -117,7 +143,8 @@ class champion:
 
         self.will_revive = [[None], [None]]  # consists of [[zilean_champion], [GA]]
 
-        field.coordinates[y][x] = self
+        if battle:
+            battle.coordinates[y][x] = self
 
         self.idle = True
         self.ability_active = False
@@ -139,9 +166,8 @@ class champion:
         self.target_dummy = target_dummy
 
         if chosen:
-            self.health = round(HEALTH[name] * config.STARMULTIPLIER ** (stars - 1), 1)
-            self.max_health = round(HEALTH[name] * config.STARMULTIPLIER ** (stars - 1), 1)
-            self.AD = round(AD[name] * config.STARMULTIPLIER ** (stars - 1), 1)
+            self.health, self.AD = star_stats(name, stars)
+            self.max_health = self.health
             self.stars = 2
             # self.cost = cost_star_values[COST[name]][self.stars]
             self.health += 200
@@ -150,8 +176,9 @@ class champion:
         if name != 'aphelios_turret':
             items.initiate(self)
 
-        if name in INITIATIVE_ACTIVE:
-            getattr(active, name + '_init')(self)
+        init_hook = handlers.INIT_HOOKS[self.champion_id]
+        if init_hook:
+            init_hook(self)
 
         # zzrot_portal's construct uses the same object so we have to correct the data a little
         if name == 'construct':
@@ -161,10 +188,10 @@ class champion:
 
         if name == 'galio':
             self.health = HEALTH[name][stars] + HEALTH[name][stars] * config.GALIO_MULTIPLIER * \
-                          origin_class.cultist_stars[team]
+                          battle.cultist_stars[team]
             self.max_health = HEALTH[name][stars] + HEALTH[name][stars] * config.GALIO_MULTIPLIER * \
-                              origin_class.cultist_stars[team]
-            self.AD = AD[name][stars] + AD[name][stars] * config.GALIO_MULTIPLIER * origin_class.cultist_stars[team]
+                              battle.cultist_stars[team]
+            self.AD = AD[name][stars] + AD[name][stars] * config.GALIO_MULTIPLIER * battle.cultist_stars[team]
 
         if name == 'aphelios_turret':
             self.health = 1
@@ -173,9 +200,8 @@ class champion:
             self.AS = self.overlord.AS
 
     def attack(self, bonus_dmg=0, target=None, item_attack=False, trait_attack='', set_AD=None):
-        attackable_enemies = list(filter(lambda x: (x.champion and x.health > 0), self.enemy_team()))
         if target or self.target:
-            if (not self.target or self.target.health <= 0) and len(attackable_enemies) > 0:
+            if (not self.target or self.target.health <= 0) and self.has_attackable_enemies():
                 field.find_target(self)
             if not target or target.health <= 0:
                 target = self.target
@@ -242,7 +268,7 @@ class champion:
             if target.immune:
                 damage = 0
 
-            crit_random = random.randint(1, 100) / 100
+            crit_random = self.battle.random.randint(1, 100) / 100
             crit_string = ''
             # jeweled gauntlet -item     #bramble vest -item
             if 'jeweled_gauntlet' in self.items and crit_random < self.crit_chance \
@@ -255,7 +281,7 @@ class champion:
             # it's long as shit but gets the job done
             if crit_random < self.crit_chance and self != target and not 'bramble_vest' in target.items \
                     and not item_damage and crit_string == '' and origin_class.is_trait(self, 'assassin') \
-                    and origin_class.get_origin_class_tier(self.team, 'assassin') > 0:
+                    and origin_class.get_origin_class_tier(self.battle, self.team, 'assassin') > 0:
                 damage *= self.crit_damage
                 crit_string = 'crit'
 
@@ -272,7 +298,7 @@ class champion:
                 trait_string = ' {}'.format(trait_damage)
 
             # if the target has died to luden's, don't continue
-            if target in eval(enemy_team):
+            if target in self.battle.team(enemy_team):
 
                 if self.lifesteal_spells > 0 and not item_damage:
                     self.add_que('heal', -1, None, None, damage * self.lifesteal_spells)
@@ -299,17 +325,16 @@ class champion:
                 items.deathblade(self, target)  # deathblade
                 items.hextech_gunblade(self, damage)  # hextech_gunblade
 
-                self.print(' deals ' + '{:<8}'.format(enemy_team) + ' ' + '{:<13}'.format(target.name) +
-                           '{:<5}--> {:<8}   shield {:<5}--> {:<5} {}{}{}{}'.
-                           format(ceil(target.health), ceil(target.health - damage), ceil(shield_old),
-                                  ceil(target.shield_amount()), crit_string, burn_string, item_string, trait_string))
+                if self.battle.tracing:
+                    self.trace(combat_log.DAMAGE, enemy_team, target, target.health, damage, shield_old,
+                               target.shield_amount(), crit_string, burn_string, item_string, trait_string)
                 target.health -= damage
-                if MILLIS() > target.castMS + target.manalock and not target.ability_active and target.maxmana > 0:
+                if self.millis() > target.castMS + target.manalock and not target.ability_active and target.maxmana > 0:
                     if not target.name == 'riven' or ability.riven_helper(target, {}):
                         old_mana = target.mana
                         target.mana += min((damage * config.MANA_DAMAGE_GAIN) *
                                            target.mana_generation, config.MAX_MANA_FROM_DAMAGE)
-                        target.print(' mana {} --> {}'.format(round(old_mana, 1), round(target.mana, 1)))
+                        target.trace(combat_log.ROUNDED_STAT, 'mana', old_mana, target.mana, 1)
 
                 # titans_resolve -item
                 # add bonus damage and armors after the values have been used.
@@ -340,12 +365,12 @@ class champion:
             if sett:
                 self.print(' moves from sit-ups   to   ({} , {})        '.format(y, x))
             else:
-                self.print(' moves from ({} , {})   to   ({} , {})        '.format(self.y, self.x, y, x))
+                self.trace(combat_log.MOVE, self.y, self.x, y, x)
 
-            field.coordinates[self.y][self.x] = None
+            self.battle.coordinates[self.y][self.x] = None
             self.x = x
             self.y = y
-            field.coordinates[y][x] = self
+            self.battle.coordinates[y][x] = self
             self.idle = False
             self.add_que('clear_idle', self.movement_delay)
 
@@ -367,23 +392,31 @@ class champion:
 
     def enemy_team(self):
         enemy_team = 'red' if self.team == 'blue' else 'blue'
-        return eval(enemy_team)
+        return self.battle.team(enemy_team)
+
+    def has_attackable_enemies(self):
+        enemy_team = 'red' if self.team == 'blue' else 'blue'
+        for unit in self.battle.living_units(enemy_team):
+            if unit.health > 0:
+                return True
+        return False
 
     def own_team(self):
         try:
-            return eval(self.team)
-        except TypeError:
+            return self.battle.team(self.team)
+        except (TypeError, AttributeError):
             return False
 
     def ability(self):
-        attackable_enemies = list(filter(lambda x: (x.champion and x.health > 0), self.enemy_team()))
-        if not self.target and len(attackable_enemies) > 0:
+        if not self.target and self.has_attackable_enemies():
             field.find_target(self)
         if self.target:  # if still no target, the remaining enemies are under GA or zilean revive
-            getattr(ability, self.name)(self)
-            if origin_class.get_origin_class_tier(self.team, 'mage') > 0 and origin_class.is_trait(self, 'mage'):
+            cast = handlers.ABILITIES[self.champion_id]
+            cast(self)
+            if origin_class.get_origin_class_tier(self.battle, self.team, 'mage') > 0 \
+                    and origin_class.is_trait(self, 'mage'):
                 if len(self.enemy_team()) > 0:
-                    getattr(ability, self.name)(self)
+                    cast(self)
 
     def active(self):
         pass
@@ -398,16 +431,19 @@ class champion:
         if data is None:
             data = {}
         if 'underlord' in data.keys():
-            que.append([action, data['underlord'], MILLIS() + length, function, stat, value, data])
+            if self.battle:
+                return self.battle.que.push([action, data['underlord'], self.millis() + length, function, stat,
+                                             value, data])
         else:
             if action == 'change_stat' and length < 1:
                 change_stat(self, action, length, function, stat, value, data)
             elif action == 'shield' and length < 1:
                 shield(self, action, length, function, stat, value, data)
-            else:
-                que.append([action, self, MILLIS() + length, function, stat, value, data])
-
-        que.sort(key=lambda x: x[2])
+            elif self.battle:
+                # Units outside of a battle have nowhere to que to. Only the immediate effects above apply to them.
+                # The returned handle can be given to battle.que.cancel()
+                return self.battle.que.push([action, self, self.millis() + length, function, stat, value, data])
+        return None
 
     def burn(self, target):
         target.clear_que_burn_removal()
@@ -421,59 +457,49 @@ class champion:
 
         pass
 
+    # the tags are handed out by event_queue.entry_tags()
     def clear_que_idle(self):
-        # not very beautiful is it? not trying to impress anyone tho
-        for i in range(0, 15):
-            for q in que:
-                if q[1] is self and q[0] == 'clear_idle':
-                    que.remove(q)
+        self.battle.que.cancel_tag(('clear_idle', self))
 
     def clear_que_healing_reduction(self):
-        for q in que:
-            if q[1] is self and q[0] == 'change_stat' and q[4] == 'healing_strength' and q[5] == 1:
-                que.remove(q)
+        self.battle.que.cancel_tag(('healing_reduction', self))
 
     def clear_que_stunned_removal(self):
-        for q in que:
-            if q[1] is self and q[0] == 'change_stat' and q[4] == 'stunned' and not q[5]:
-                que.remove(q)
+        self.battle.que.cancel_tag(('stunned_removal', self))
 
     def clear_que_blinded_removal(self):
-        for q in que:
-            if q[1] is self and q[0] == 'change_stat' and q[4] == 'blinded' and not q[5]:
-                que.remove(q)
+        self.battle.que.cancel_tag(('blinded_removal', self))
 
     def clear_que_armor_removal(self):
-        for q in que:
-            if q[1] is self and q[0] == 'change_stat' and q[4] == 'armor':
-                que.remove(q)
+        self.battle.que.cancel_tag(('armor_removal', self))
 
     def clear_que_burn_removal(self):
-        for i in range(0, 15):
-            for q in que:
-                if q[0] == 'burn' and q[5] == self:
-                    que.remove(q)
+        self.battle.que.cancel_tag(('burn', self))
 
     def clear_que_dazzler(self):
-        for i in range(0, 15):
-            for q in que:
-                if q[1] == self and q[0] == 'change_stat' and 'dazzler' in q[6]:
-                    que.remove(q)
+        self.battle.que.cancel_tag(('dazzler', self))
+
+    # clears the execute_function entries of this unit that call the given function
+    def clear_que_function(self, function, predicate=None):
+        self.battle.que.cancel_tag(('execute_function', self, function), predicate)
 
     def red_append(self, champion):
-        red.append(champion)
+        self.battle.red.append(champion)
+        self.battle.team_changed()
 
     def blue_append(self, champion):
-        blue.append(champion)
+        self.battle.blue.append(champion)
+        self.battle.team_changed()
 
     def red_return(self):
-        return red
+        return self.battle.red
 
     def blue_return(self):
-        return blue
+        return self.battle.blue
 
+    # a copy of the que as a list, in the order the entries will be executed
     def que_return(self):
-        return que
+        return list(self.battle.que)
 
     def spawn(self, name, stars, y, x, team=None, is_champion=True):
         if not team:
@@ -486,24 +512,28 @@ class champion:
             for i in self.items:
                 if i == 'spear_of_shojin':
                     items.append(i)
-        unit = champion(name, stars=stars, team=team, y=y, x=x, itemlist=items, overlord=overlord)
+        unit = champion(name, stars=stars, team=team, y=y, x=x, itemlist=items, overlord=overlord, battle=self.battle)
         unit.champion = is_champion
-        eval(team).append(unit)
+        self.battle.team(team).append(unit)
+        self.battle.team_changed()
         return unit
 
     def que_replace(self, q):
-        global que
-        que = q
+        self.battle.que.replace(q)
 
     def millis(self):
-        return MILLIS()
+        if self.battle:
+            return self.battle.millis()
+        return 0
 
     def print(self, msg):
-        if self.team:
-            printt('{:<120}'.format('{:<8}'.format(self.team) + '{:<15}'.format(self.name) + msg)
-                   + '{:<12}'.format(str(MILLIS())) + str(time.time_ns() - self.start_time))
-        else:
-            printt('{:<120}'.format('team_unassigned' + '{:<15}'.format(self.name) + msg) + str(MILLIS()))
+        if self.battle:
+            self.battle.trace(self, combat_log.TEXT, msg)
+
+    def trace(self, code, *args):
+        """Records an event of the unit in the combat log of its battle, see combat_log for the codes"""
+        if self.battle:
+            self.battle.trace(self, code, *args)
 
     def golden(self):
         self.stars += 1
@@ -532,31 +562,45 @@ class champion:
         return False
 
 
-global blue
-global red
-
-blue = []
-red = []
-
-
 # I think I am going to redo parts of this function. 
 # Essentially, I am just going to change the first 10 lines so it reads in the data from the two teams.
 # This will be an area I will look to optimize on later if need be but for now,
 # I want to keep things as simple as possible.
-def run(champion_q, player_1, player_2, round_damage=0):
-    reset_global_variables()
+def run(champion_q, player_1, player_2, round_damage=0, battle=None):
+    """
+    Plays out a battle between the boards of two players.
+
+    args:
+        champion_q: The champion class used to create the units for the battle.
+        player_1: Player on the blue side.
+        player_2: Player on the red side.
+        round_damage: Base damage of the current round.
+        battle: BattleContext to run the battle in. A fresh one is created when not given.
+                Pass one in when the log or other state of the battle is needed afterwards.
+
+    returns:
+        index_won: 0 for a draw, 1 if player_1 won and 2 if player_2 won.
+        damage: Damage dealt to the losing player.
+    """
+    if battle is None:
+        battle = BattleContext(player_1.win_streak, player_2.win_streak)
+    blue = battle.blue
+    red = battle.red
+    printt = battle.printt
 
     for x in range(0, 7):
         for y in range(0, 4):
             if player_1.board[x][y]:
                 blue.append(champion_q(player_1.board[x][y].name, 'blue', y, x, player_1.board[x][y].stars,
                                        player_1.board[x][y].items, False, None, player_1.board[x][y].chosen
-                                       , player_1.board[x][y].kayn_form, player_1.board[x][y].target_dummy))
+                                       , player_1.board[x][y].kayn_form, player_1.board[x][y].target_dummy,
+                                       battle=battle))
             if player_2.board[x][y]:
                 # Inverting because the combat system uses the whole board and does not mirror at start.
                 red.append(champion_q(player_2.board[x][y].name, 'red', 7 - y, 6 - x, player_2.board[x][y].stars,
                                       player_2.board[x][y].items, False, None, player_2.board[x][y].chosen,
-                                      player_2.board[x][y].kayn_form, player_2.board[x][y].target_dummy))
+                                      player_2.board[x][y].kayn_form, player_2.board[x][y].target_dummy,
+                                      battle=battle))
 
     printt('Player 1 (Blue) Team')
     for unit in blue:
@@ -592,8 +636,8 @@ def run(champion_q, player_1, player_2, round_damage=0):
     items.zzrot_portal(blue[0])  # zzrot_portal
     items.zephyr(blue[0])  # zephyr
 
-    origin_class.total_health(blue, red)
-    origin_class.total_origin_class(blue[0], red[0])  # count and execute some traits
+    origin_class.total_health(battle)
+    origin_class.total_origin_class(battle)  # count and execute some traits
     # Not sure what changed the length of one of these arrays at this point but this seems to fix the issue
     if len(blue) == 0 or len(red) == 0:
         return 0, round_damage
@@ -602,16 +646,19 @@ def run(champion_q, player_1, player_2, round_damage=0):
     # infinity_edge made sure that the crit damage bonus gets registered after everything else has gone through
 
     while True:
-        if MILLIS() > 150000:
+        millis = battle.millis()
+        if millis > 150000:
             test_multiple['bugged out'] += 1
             break
-        if MILLIS() > 0 and MILLIS() % origin_class_stats.length['elderwood'] == 0:
-            origin_class.elderwood(blue, red)  # elderwood -trait
-        if MILLIS() > 0 and MILLIS() % \
-                origin_class_stats.threshold['hunter'][origin_class.get_origin_class_tier('blue', 'hunter')] == 0:
+        if millis > 0 and millis % origin_class_stats.length['elderwood'] == 0:
+            origin_class.elderwood(battle)  # elderwood -trait
+        if millis > 0 and millis % \
+                origin_class_stats.threshold['hunter'][origin_class.get_origin_class_tier(battle, 'blue', 'hunter')] \
+                == 0:
             origin_class.hunter(blue)  # hunter -trait
-        if MILLIS() > 0 and MILLIS() % \
-                origin_class_stats.threshold['hunter'][origin_class.get_origin_class_tier('red', 'hunter')] == 0:
+        if millis > 0 and millis % \
+                origin_class_stats.threshold['hunter'][origin_class.get_origin_class_tier(battle, 'red', 'hunter')] \
+                == 0:
             origin_class.hunter(red)  # hunter -trait
 
         for b, o in itertools.zip_longest(blue, red):
@@ -620,62 +667,60 @@ def run(champion_q, player_1, player_2, round_damage=0):
             if o and not o.target_dummy:
                 field.action(o)
 
-        while len(que) > 0 and MILLIS() > que[0][2]:
-            champion_q = que[0][1]
-            data = que[0][6]
+        que = battle.que
+        while que and battle.millis() > que.peek()[2]:
+            entry = que.pop()
+            champion_q = entry[1]
+            data = entry[6]
             # make sure that teemo's poison darts deal damage even after teemo himself has died
             # morgana deals if the ult is running and she dies
             # if ahri dies, she will still ult. range reduced in the executed function
             if (champion_q in blue or champion_q in red) or \
-                    (champion_q.name == 'teemo' and champion_q.health <= 0 and que[0][3] and 'target' in que[0][3][1]) \
-                    or (champion_q.name == 'morgana' and champion_q.health <= 0 and que[0][3] and
-                        'coordinates' in que[0][3][1]) or \
-                    (champion_q.name == 'ahri' and champion_q.health <= 0 and que[0][3] and 'y' in que[0][3][1]):
+                    (champion_q.name == 'teemo' and champion_q.health <= 0 and entry[3] and 'target' in entry[3][1]) \
+                    or (champion_q.name == 'morgana' and champion_q.health <= 0 and entry[3] and
+                        'coordinates' in entry[3][1]) or \
+                    (champion_q.name == 'ahri' and champion_q.health <= 0 and entry[3] and 'y' in entry[3][1]):
 
-                if que[0][0] == 'clear_idle':
+                if entry[0] == 'clear_idle':
                     champion_q.idle = True
                     champion_q.print(' cleared idle     ')
 
-                if que[0][0] == 'change_stat':
-                    change_stat(champion_q, que[0][0], 0, que[0][3], que[0][4], que[0][5], data)
+                if entry[0] == 'change_stat':
+                    change_stat(champion_q, entry[0], 0, entry[3], entry[4], entry[5], data)
 
-                if que[0][0] == 'heal':
-                    start_value = round(champion_q.health, 2)
-                    champion_q.health += (que[0][5] * champion_q.healing_strength)
+                if entry[0] == 'heal':
+                    start_value = champion_q.health
+                    champion_q.health += (entry[5] * champion_q.healing_strength)
                     if champion_q.health > champion_q.max_health:
                         champion_q.health = champion_q.max_health
-                    champion_q.print(' {} {} --> {}'.format('health', start_value, round(champion_q.health, 2)))
+                    champion_q.trace(combat_log.ROUNDED_STAT, 'health', start_value, champion_q.health, 2)
 
-                if que[0][0] == 'shield':
-                    shield(champion_q, que[0][0], 0, que[0][3], que[0][4], que[0][5], data)
+                if entry[0] == 'shield':
+                    shield(champion_q, entry[0], 0, entry[3], entry[4], entry[5], data)
 
-                if que[0][0] == 'change_target':
+                if entry[0] == 'change_target':
                     old_target = champion_q.target
-                    new_target = que[0][5]
+                    new_target = entry[5]
                     if new_target and new_target.health > 0:
                         champion_q.target = new_target
                         champion_q.target_y = new_target.y
                         champion_q.target_x = new_target.x
                         if champion_q.target != old_target:
-                            champion_q.print(' has a new target: ' + '{:<8}'.format(champion_q.target.team) +
-                                             '{:<8}'.format(champion_q.target.name) +
-                                             '  [{}, {}]'.format(champion_q.target.y, champion_q.target.x))
+                            champion_q.trace(combat_log.NEW_TARGET, new_target, new_target.y, new_target.x)
                     else:
                         field.find_target(champion_q)
 
-                if que[0][0] == 'execute_function':
-                    if len(que[0][3]) > 1:
-                        (que[0][3][0])(champion_q, que[0][3][1])
+                if entry[0] == 'execute_function':
+                    if len(entry[3]) > 1:
+                        (entry[3][0])(champion_q, entry[3][1])
 
-                if que[0][0] == 'burn':
-                    champion_q.spell(que[0][5], 0, que[0][5].max_health * config.BURN_DMG_PER_SLICE, True, True)
+                if entry[0] == 'burn':
+                    champion_q.spell(entry[5], 0, entry[5].max_health * config.BURN_DMG_PER_SLICE, True, True)
 
-                if que[0][0] == 'kill':
-                    que[0][5].die()
+                if entry[0] == 'kill':
+                    entry[5].die()
 
-            que.pop(0)
-
-        MILLISECONDS_INCREASE()
+        battle.millis_increase()
         if len(blue) == 0 or len(red) == 0:
             if len(red) == 0:
                 printt('BLUE TEAM WON')
@@ -692,12 +737,56 @@ def run(champion_q, player_1, player_2, round_damage=0):
                 survive_combat(player_2, red)
                 return 2, (round_damage + DAMAGE_PER_UNIT[len(red)])
             break
-        if MILLIS() > 150000:
+        if battle.event_skipping:
+            next_millis = next_tick(battle)
+            if next_millis is None or next_millis > 150000:
+                next_millis = 150000 + TICK_LENGTH
+            battle.milliseconds = max(battle.millis(), next_millis)
+        if battle.millis() > 150000:
             # print("Round has gone on too long")
             return 0, round_damage
     return 0, round_damage
 
 
+def next_tick(battle):
+    """
+    The first tick, starting from the current one, where anything can happen in the battle.
+    That is the first tick after the next que entry, the next elderwood or hunter trigger
+    or the next tick where one of the units can move, attack or cast.
+    Every tick before it would do nothing at all so the clock can jump straight to it.
+
+    returns:
+        millis of that tick or None if nothing is left to happen
+    """
+    millis = battle.millis()
+    ticks = []
+
+    entry = battle.que.peek()
+    if entry:
+        # que entries are handled on the first tick that is past their time
+        ticks.append((int(entry[2] // TICK_LENGTH) + 1) * TICK_LENGTH)
+
+    teams = {'blue': battle.blue, 'red': battle.red}
+    for team in teams:
+        if origin_class.get_origin_class_tier(battle, team, 'elderwood') > 0 and battle.elderwood_list[team] < 5:
+            ticks.append(next_multiple(millis, origin_class_stats.length['elderwood']))
+        hunter_tier = origin_class.get_origin_class_tier(battle, team, 'hunter')
+        if hunter_tier > 0 and teams[team]:
+            ticks.append(next_multiple(millis, origin_class_stats.threshold['hunter'][hunter_tier]))
+        for unit in teams[team]:
+            if not unit.target_dummy:
+                action_time = field.next_action_time(unit)
+                if action_time is not None:
+                    ticks.append(action_time)
+
+    return min(ticks) if ticks else None
+
+
+def next_multiple(millis, interval):
+    # first positive multiple of the interval that is not before millis
+    return max(ceil(millis / interval), 1) * interval
+
+
 def shield(champion, action, length, function, stat, value, data):
     shield_before = champion.shield_amount()
     if 'shield_before' in data and data['shield_before']:
@@ -725,8 +814,8 @@ def shield(champion, action, length, function, stat, value, data):
                     break
     except KeyError:
         pass
-    if action_happened:
-        champion.print(' {} {} --> {}'.format('shield', round(shield_before, 2), round(champion.shield_amount(), 2)))
+    if action_happened and champion.battle.tracing:
+        champion.trace(combat_log.ROUNDED_STAT, 'shield', shield_before, champion.shield_amount(), 2)
 
 
 def change_stat(a_champion, action, length, function, stat, value, data):
@@ -740,14 +829,16 @@ def change_stat(a_champion, action, length, function, stat, value, data):
 
         start_value = a_champion.AD
         a_champion.AD += AD_change
-        a_champion.print(' {} {} --> {}'.format('AD', round(start_value, 2), round(a_champion.AD, 2)))
+        a_champion.trace(combat_log.ROUNDED_STAT, 'AD', start_value, a_champion.AD, 2)
 
     else:
-        if not ('quicksilver' in a_champion.items and MILLIS() <= item_stats.item_change_length['quicksilver'] and
+        if not ('quicksilver' in a_champion.items and
+                a_champion.millis() <= item_stats.item_change_length['quicksilver'] and
                 value and (stat == 'stunned' or stat == 'disarmed' or stat == 'blinded')):
             if not ('rapid_firecannon' in a_champion.items and value and stat == 'blinded'):
-                if not (a_champion.name == 'galio' and (MILLIS() - origin_class.galio_spawn_time[a_champion.team] <=
-                                                        origin_class_stats.cc_immune['cultist'])
+                if not (a_champion.name == 'galio' and
+                        (a_champion.millis() - a_champion.battle.galio_spawn_time[a_champion.team] <=
+                         origin_class_stats.cc_immune['cultist'])
                         and (stat == 'stunned' or stat == 'disarmed' or stat == 'blinded')):
                     end_value = value
                     start_value = getattr(a_champion, stat)
@@ -770,72 +861,16 @@ def change_stat(a_champion, action, length, function, stat, value, data):
                             start_value = round(start_value, 3)
                         if isinstance(end_value, float):
                             end_value = round(end_value, 3)
-                        a_champion.print(' {} {} --> {}'.format(stat, start_value, end_value))
+                        a_champion.trace(combat_log.STAT, stat, start_value, end_value)
                     setattr(a_champion, stat, end_value)
+                    if stat == 'champion' and a_champion.battle:
+                        a_champion.battle.team_changed()
             else:
                 a_champion.print(' not blinded because wears rapid firecannon')
         else:
             a_champion.print(' not {} because wears quicksilver'.format(stat))
 
 
-def reset_global_variables():
-    global blue
-    global red
-    global que
-    global log
-    blue = []
-    red = []
-    que = []
-    log = []
-
-    champion_functions.MILLISECONDS = 0
-    champion_functions.damage_dealt = []
-    champion_functions.damage_dealt_teams = {'blue': 0, 'red': 0}
-    champion_functions.galio_spawned = {'blue': False, 'red': False}
-
-    # global kennen_hits
-    # global l
-    ability.kennen_hits = []
-    ability.lulu_targeted = []
-    ability.morgana_MR_list = []
-    ability.riven_counter = []
-    ability.riven_identifier_list = []
-    ability.vi_armor_list = []
-    ability.yone_list = []
-    ability.yone_checking = False
-
-    active.jhin_shots = []
-    active.kalista_targets = []
-    active.vayne_targets = []
-    active.zed_counter = []
-
-    field.coordinates = [[None] * 7 for _ in range(8)]
-
-    items.bramble_vest_list = []
-    items.deathblade_list = []
-    items.frozen_heart_list = []
-    items.gargoyle_stoneplate_list = []
-    items.hextech_gunblade_list = []
-    items.ionic_spark_list = []
-    items.last_whisper_list = []
-    items.statikk_shiv_list = []
-    items.titans_resolve_list = []
-
-    origin_class.cultist_stars = {'blue': 0, 'red': 0}
-    origin_class.total_health_teams = {'blue': 0, 'red': 0}
-    origin_class.galio_spawn_time = {'blue': 0, 'red': 0}
-
-    for o in origin_class.amounts:
-        origin_class.amounts[o] = {'blue': 0, 'red': 0}
-
-    origin_class.divine_attack_list = []
-    origin_class.divine_list = []
-    origin_class.elderwood_list = {'blue': 0, 'red': 0}
-    origin_class.spirit_list = []
-    origin_class.duelist_helper_list = []
-    origin_class.shade_helper_list = []
-
-
 def survive_combat(player, champ_list):
     for champ in champ_list:
         if player.board[champ.starting_x][champ.starting_y]:
@@ -2,38 +2,19 @@ import Simulator.config as config
 import Simulator.origin_class as origin_class
 import Simulator.origin_class_stats as origin_class_stats
 import Simulator.stats as stats
-import random
-from math import ceil
-from Simulator import ability, active, field, item_stats, items
+from Simulator import ability, active, combat_log, field, handlers, item_stats, items
 from Simulator.stats import *
 
-MILLISECONDS = 0
 
-
-def MILLIS():
-    return MILLISECONDS
-
-
-def MILLISECONDS_INCREASE():
-    global MILLISECONDS
-    MILLISECONDS += 25
-
-
-damage_dealt = []
-damage_dealt_teams = {'blue': 0, 'red': 0}
-
-
-def get_damage_dealt():
-    return damage_dealt
-
-
-galio_spawned = {'blue': False, 'red': False}
+def get_damage_dealt(battle):
+    return battle.damage_dealt
 
 
 def add_damage_dealt(champion, damage, target):
-    global damage_dealt
-    global damage_dealt_teams
-    global galio_spawned
+    battle = champion.battle
+    damage_dealt = battle.damage_dealt
+    damage_dealt_teams = battle.damage_dealt_teams
+    galio_spawned = battle.galio_spawned
     added = False
 
     if champion.team == 'blue':
@@ -44,9 +25,9 @@ def add_damage_dealt(champion, damage, target):
     # cultists galio spawning
     teams = [['blue', 'red'], ['red', 'blue']]
     for t in teams:
-        if (not galio_spawned[t[0]] and origin_class.amounts['cultist'][t[0]]
+        if (not galio_spawned[t[0]] and battle.amounts['cultist'][t[0]]
                 >= origin_class_stats.tiers['cultist'][0]):
-            if damage_dealt_teams[t[1]] > origin_class.total_health_teams[t[0]] * config.GALIO_TEAM_HEALTH_PERCENTAGE:
+            if damage_dealt_teams[t[1]] > battle.total_health_teams[t[0]] * config.GALIO_TEAM_HEALTH_PERCENTAGE:
                 galio_spawned[t[0]] = True
                 origin_class.cultist(target, t[0])
 
@@ -63,12 +44,11 @@ def reset_stat(champion, stat):
     if stat in ['movement_delay']:
         return config.MOVEMENTDELAY
     else:
-        return eval(stat)[champion.name]
+        return handlers.STAT_TABLES[stat][champion.name]
 
 
 def attack(champion, target, bonus_dmg=0, item_attack=False, trait_attack='', set_ad=None):
-    attackable_enemies = list(filter(lambda x: (x.champion and x.health > 0), champion.enemy_team()))
-    if not target and len(attackable_enemies) > 0:
+    if not target and champion.has_attackable_enemies():
         field.find_target(champion)
         target = champion.target
         # allow forced attacks (xinzhao spin etc.)
@@ -79,8 +59,8 @@ def attack(champion, target, bonus_dmg=0, item_attack=False, trait_attack='', se
         if champion.AS > 5:
             champion.add_que('change_stat', -1, None, 'AS', 5.00)
 
-        dodge_random = random.randint(1, 100) / 100
-        crit_random = random.randint(1, 100) / 100
+        dodge_random = champion.battle.random.randint(1, 100) / 100
+        crit_random = champion.battle.random.randint(1, 100) / 100
 
         items.deathblade(champion, target)  # deathblade (needs to take effect before AD is used)
         items.gargoyle_stoneplate(target)  # gargoyle_stoneplate (needs to take effect before armor or MR is used)
@@ -100,9 +80,10 @@ def attack(champion, target, bonus_dmg=0, item_attack=False, trait_attack='', se
         damage = 0
 
         # passives
-        if champion.name in config.ATTACK_PASSIVES:
+        passive = handlers.ATTACK_PASSIVES[champion.champion_id]
+        if passive:
             if not item_attack:
-                active_data = getattr(active, champion.name)(champion, target)
+                active_data = passive(champion, target)
                 if active_data['true_damage']:
                     true_damage += active_data['damage'] * items.giant_slayer(champion, target)  # gians_slayer -item
                 else:
@@ -193,21 +174,18 @@ def attack(champion, target, bonus_dmg=0, item_attack=False, trait_attack='', se
                 # since the spear_pull happens just the same time as the auto,
                 # but is registered before, the target may already be dead (also happens with zed)
                 if target.health > 0:
-                    champion.print(' attacks ' + '{:<8}'.format(enemy_team) + ' ' + '{:<13}'.format(
-                        target.name) + '{:<5}--> {:<8}   shield {:<5}--> {:<5} {}{}{}{}'.format(ceil(target.health),
-                                                                                                ceil(
-                                                                                                    target.health - damage),
-                                                                                                ceil(shield_old), ceil(
-                            target.shield_amount()), crit_string, dodge_string, item_string, trait_string))
+                    if champion.battle.tracing:
+                        champion.trace(combat_log.ATTACK, enemy_team, target, target.health, damage, shield_old,
+                                       target.shield_amount(), crit_string, dodge_string, item_string, trait_string)
                     # dealing the damage and killing the enemy if necessary
                     target.health -= damage
-                    if (MILLIS() > target.castMS + target.manalock
+                    if (champion.millis() > target.castMS + target.manalock
                             and not target.ability_active and target.maxmana > 0):
                         if not target.name == 'riven' or ability.riven_helper(target, {}):
                             old_mana = target.mana
                             target.mana += min((damage * config.MANA_DAMAGE_GAIN) * target.mana_generation,
                                                config.MAX_MANA_FROM_DAMAGE)
-                            target.print(' mana {} --> {}'.format(round(old_mana, 1), round(target.mana, 1)))
+                            target.trace(combat_log.ROUNDED_STAT, 'mana', old_mana, target.mana, 1)
 
                     # titans_resolve -item
                     # add bonus damage and armors after the values have been used.
@@ -233,7 +211,7 @@ def attack(champion, target, bonus_dmg=0, item_attack=False, trait_attack='', se
                         origin_class.sharpshooter(champion, target, None, bonus_dmg, False)
 
                 # apply manalock. only give mana of the attack if it has been 1000ms since the last ability cast
-                if (champion.champion and MILLIS() > champion.castMS + champion.manalock
+                if (champion.champion and champion.millis() > champion.castMS + champion.manalock
                         and not champion.ability_active and champion.maxmana > 0
                         and not item_attack and not trait_attack):
                     if not champion.name == 'riven' or ability.riven_helper(champion, {}):
@@ -241,16 +219,15 @@ def attack(champion, target, bonus_dmg=0, item_attack=False, trait_attack='', se
                         champion.mana += (config.MANA_PER_ATTACK * champion.mana_generation)
                         champion.mana += (
                                 items.spear_of_shojin(champion) * champion.mana_generation)  # spear of shojin -item
-                        champion.print(' mana {} --> {}'.format(round(old_mana, 1), round(champion.mana, 1)))
+                        champion.trace(combat_log.ROUNDED_STAT, 'mana', old_mana, champion.mana, 1)
 
                 # aphelios turret triggering aphelios's shojins
                 if champion.name == 'aphelios_turret' and \
-                        MILLIS() > champion.overlord.castMS + champion.overlord.manalock and not trait_attack:
+                        champion.millis() > champion.overlord.castMS + champion.overlord.manalock and not trait_attack:
                     old_mana = champion.overlord.mana
                     champion.overlord.mana += (items.spear_of_shojin(champion) * champion.overlord.mana_generation)
                     # spear of shojin -item
-                    champion.overlord.print(' mana {} --> {}'.format(round(old_mana, 1),
-                                                                     round(champion.overlord.mana, 1)))
+                    champion.overlord.trace(combat_log.ROUNDED_STAT, 'mana', old_mana, champion.overlord.mana, 1)
 
                 if champion.heal_per_attack > 0:
                     health_old = champion.health
@@ -258,7 +235,7 @@ def attack(champion, target, bonus_dmg=0, item_attack=False, trait_attack='', se
 
                     if champion.health > champion.max_health:
                         champion.health = champion.max_health
-                    champion.print(' heals ' + '{:<5}--> {:<8}'.format(ceil(health_old), ceil(champion.health)))
+                    champion.trace(combat_log.HEAL, health_old, champion.health)
 
                 # applying attack speed pause
                 champion.idle = False
@@ -285,11 +262,12 @@ def die(champion):
     if not champion.will_revive[0][0] and not champion.will_revive[1][0]:
 
         # free the coordinates
-        field.coordinates[champion.y][champion.x] = None
+        champion.battle.coordinates[champion.y][champion.x] = None
         # Ran into a bug with this being removed. I'll look into where own_team is defined later
         if champion in champion.own_team():
             champion.own_team().remove(champion)
-        champion.print(' dies ')
+            champion.battle.team_changed()
+        champion.trace(combat_log.DIES)
 
         # zzrot_portal
         if 'zzrot_portal' in champion.items:
@@ -304,10 +282,11 @@ def die(champion):
             for c in enemy_team:
                 if c.target == u:
                     c.target = None
-            field.coordinates[u.y][u.x] = None
+            champion.battle.coordinates[u.y][u.x] = None
             if u.name == 'aphelios_turret' or (u.name == 'sandguard' and u.health >= 0):
                 if u in champion.own_team():
                     champion.own_team().remove(u)
+                    champion.battle.team_changed()
                     champion.print(' {:<15}'.format(u.name) + ' dies ')
 
     # if the champion has zilean orb or guardian angel equipped
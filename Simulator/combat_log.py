@@ -0,0 +1,102 @@
+import time
+from math import ceil
+
+# Structured combat log.
+# Every event is stored as (millis, unit, event code, args, wall clock in ns) and only turned into text when the log
+# is read. Nothing at all is recorded unless the battle is traced, see BattleContext.tracing.
+# The text is the same as the one champion.print used to build for every message.
+
+# A line of the battle itself, not of a unit. args: (text,)
+MESSAGE = 0
+# Free text of a unit. args: (text,)
+TEXT = 1
+# A stat of a unit changed. args: (stat, old value, new value)
+STAT = 2
+# A stat changed by an item, floats are rounded to 2 digits. args: (stat, old value, new value, message)
+ITEM_STAT = 3
+# A stat changed, both values are rounded to the given digits. args: (stat, old value, new value, digits)
+ROUNDED_STAT = 4
+# The unit picked a new target. args: (target, y, x)
+NEW_TARGET = 5
+# An auto attack. args: (enemy team, target, health, damage, old shield, new shield, *notes)
+ATTACK = 6
+# Damage from a spell, an item or a trait. args: same as ATTACK
+DAMAGE = 7
+# args: (old health, new health)
+HEAL = 8
+# args: (old y, old x, new y, new x)
+MOVE = 9
+# args: ()
+DIES = 10
+
+
+def item_stat_text(stat, old, new, message):
+    if isinstance(old, float):
+        old = round(old, 2)
+    if isinstance(new, float):
+        new = round(new, 2)
+    return ' {} {} --> {} {}'.format(stat, old, new, message)
+
+
+def rounded_stat_text(stat, old, new, digits):
+    return ' {} {} --> {}'.format(stat, round(old, digits), round(new, digits))
+
+
+def new_target_text(target, y, x):
+    return ' has a new target: ' + '{:<8}'.format(target.team) + '{:<8}'.format(target.name) + \
+        '  [{}, {}]'.format(y, x)
+
+
+def hit_text(verb, enemy_team, target, health, damage, old_shield, new_shield, *notes):
+    return verb + '{:<8}'.format(enemy_team) + ' ' + '{:<13}'.format(target.name) + \
+        '{:<5}--> {:<8}   shield {:<5}--> {:<5} {}{}{}{}'.format(ceil(health), ceil(health - damage), ceil(old_shield),
+                                                                ceil(new_shield), *notes)
+
+
+# event code -> function that turns the args into the message of the unit
+TEXTS = {
+    MESSAGE: lambda text: text,
+    TEXT: lambda text: text,
+    STAT: lambda stat, old, new: ' {} {} --> {}'.format(stat, old, new),
+    ITEM_STAT: item_stat_text,
+    ROUNDED_STAT: rounded_stat_text,
+    NEW_TARGET: new_target_text,
+    ATTACK: lambda *args: hit_text(' attacks ', *args),
+    DAMAGE: lambda *args: hit_text(' deals ', *args),
+    HEAL: lambda old, new: ' heals ' + '{:<5}--> {:<8}'.format(ceil(old), ceil(new)),
+    MOVE: lambda old_y, old_x, y, x: ' moves from ({} , {})   to   ({} , {})        '.format(old_y, old_x, y, x),
+    DIES: lambda: ' dies ',
+}
+
+
+def format_event(millis, unit, code, args, time_ns):
+    """The line of the text log for an event"""
+    msg = TEXTS[code](*args)
+    if unit is None:
+        return msg
+    if unit.team:
+        return '{:<120}'.format('{:<8}'.format(unit.team) + '{:<15}'.format(unit.name) + msg) + \
+            '{:<12}'.format(str(millis)) + str(time_ns - unit.start_time)
+    return '{:<120}'.format('team_unassigned' + '{:<15}'.format(unit.name) + msg) + str(millis)
+
+
+class CombatLog:
+    """
+    The events of a traced battle in the order they happened.
+
+    Iterating over the log replays it into the text lines of the old combat log.
+    """
+    def __init__(self):
+        self.events = []
+
+    def record(self, millis, unit, code, args):
+        self.events.append((millis, unit, code, args, time.time_ns()))
+
+    def lines(self):
+        return [format_event(*event) for event in self.events]
+
+    def __iter__(self):
+        return iter(self.lines())
+
+    def __len__(self):
+        return len(self.events)
@@ -0,0 +1,139 @@
+import collections
+import multiprocessing
+import random
+import config
+from concurrent.futures import ProcessPoolExecutor
+from Simulator import champion
+from Simulator.battle_context import BattleContext
+
+# Outcome of a single battle run by a CombatExecutor.
+# The survivors are the (x, y) board positions of the units that made it through the battle.
+CombatResult = collections.namedtuple(
+    'CombatResult', ['index_won', 'damage', 'blue_survivors', 'red_survivors'])
+
+
+class CombatExecutor:
+    """
+    Runs the battles of a round in a pool of worker processes.
+
+    Every job is a compact description of the two boards (see combat_job) so that only a few tuples
+    have to be sent to the workers instead of the whole player objects. Each job carries its own seed,
+    which makes the outcome of a battle independent of the worker it lands on and of the order the
+    workers finish in. Results come back in the order of the jobs.
+
+    args:
+        workers: int, number of worker processes. With 0 the battles run one after another in the calling process,
+                 which gives the same results as the pool.
+    """
+    def __init__(self, workers):
+        self.workers = workers
+        self.pool = None
+        if workers > 0:
+            # spawn instead of fork. Forking a process that already runs torch or ray threads can deadlock.
+            self.pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def run(self, jobs):
+        """
+        args:
+            jobs: List of jobs made by combat_job
+
+        returns:
+            List[CombatResult] in the same order as the jobs
+        """
+        if self.pool is None or len(jobs) <= 1:
+            return [run_combat_job(job) for job in jobs]
+        return list(self.pool.map(run_combat_job, jobs))
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+
+_shared_executor = None
+
+
+def shared_executor():
+    """
+    The executor used by Game_Round when none is given. There is one per process and it's only created
+    when config.COMBAT_WORKERS is above 0.
+
+    returns:
+        CombatExecutor or None when the battles should run the usual way
+    """
+    global _shared_executor
+    if config.COMBAT_WORKERS <= 0:
+        return None
+    if _shared_executor is None:
+        _shared_executor = CombatExecutor(config.COMBAT_WORKERS)
+    return _shared_executor
+
+
+def describe_board(player):
+    """
+    Everything champion.run needs to know about the board of a player or a minion round.
+
+    returns:
+        (win_streak, ((x, y, name, stars, items, chosen, kayn_form, target_dummy), ...))
+    """
+    units = []
+    for x in range(len(player.board)):
+        for y in range(len(player.board[x])):
+            unit = player.board[x][y]
+            if unit:
+                units.append((x, y, unit.name, unit.stars, tuple(unit.items), unit.chosen, unit.kayn_form,
+                              unit.target_dummy))
+    return player.win_streak, tuple(units)
+
+
+def combat_job(player_1, player_2, round_damage, seed):
+    """
+    Describes a battle between two players for CombatExecutor.run
+
+    args:
+        player_1: Player on the blue side.
+        player_2: Player or minion round on the red side.
+        round_damage: Base damage of the current round.
+        seed: Seed of the rng the battle runs with.
+    """
+    return describe_board(player_1), describe_board(player_2), round_damage, seed
+
+
+def run_combat_job(job):
+    blue_board, red_board, round_damage, seed = job
+    player_1 = BoardPlayer(blue_board)
+    player_2 = BoardPlayer(red_board)
+    battle = BattleContext(player_1.win_streak, player_2.win_streak, random.Random(seed))
+    index_won, damage = champion.run(champion.champion, player_1, player_2, round_damage, battle)
+    return CombatResult(index_won, damage, player_1.survivors(), player_2.survivors())
+
+
+def apply_survivors(player, survivors):
+    """Marks the units of the player that survived the battle, same as champion.survive_combat"""
+    for x, y in survivors:
+        if player.board[x][y]:
+            player.board[x][y].survive_combat = True
+
+
+class BoardUnit:
+    """The parts of a champion on the board that champion.run reads"""
+    def __init__(self, name, stars, items, chosen, kayn_form, target_dummy):
+        self.name = name
+        self.stars = stars
+        self.items = list(items)
+        self.chosen = chosen
+        self.kayn_form = kayn_form
+        self.target_dummy = target_dummy
+        self.survive_combat = False
+
+
+class BoardPlayer:
+    """Stand in for a player that is rebuilt from describe_board in the worker processes"""
+    def __init__(self, description):
+        self.win_streak, units = description
+        self.board = [[None for _ in range(4)] for _ in range(7)]
+        for x, y, name, stars, items, chosen, kayn_form, target_dummy in units:
+            self.board[x][y] = BoardUnit(name, stars, items, chosen, kayn_form, target_dummy)
+
+    def survivors(self):
+        return [(x, y) for x in range(7) for y in range(4) if self.board[x][y] and self.board[x][y].survive_combat]
@@ -16,13 +16,19 @@ MAX_ITEMS_IN_SET = len(list(items.keys()))
 
 NUM_PLAYERS = config.NUM_PLAYERS
 LOG_COMBAT = False
+# Jump the combat clock straight to the next tick where something can happen instead of running every 25 ms tick
+EVENT_SKIPPING = True
 
 PRINTMESSAGES = True
 LOGMESSAGES = True
+# Record the combat log of every battle. Only log_to_file_combat reads it, so it's off unless combat is logged.
+TRACE_COMBAT = PRINTMESSAGES and LOG_COMBAT
 MANA_DAMAGE_GAIN = 0.06
 MAX_MANA_FROM_DAMAGE = 42.5
 
 MOVEMENTDELAY = 550
+# Walk the actual shortest path instead of the greedy search of field.find_path. Changes the outcome of battles.
+BFS_PATHFINDING = False
 STARMULTIPLIER = 1.8
 
 ATTACK_PASSIVES = ["vayne", "jhin", "kalista", "warwick", "zed"]
@@ -39,8 +45,6 @@ CHOSEN = None
 GALIO_MULTIPLIER = 0.14
 GALIO_TEAM_HEALTH_PERCENTAGE = 0.50
 
-WARLORD_WINS = {"blue": 0, "red": 0}
-
 LEAP_DELAY = 395  # assassins and shades
 
 MATCHMAKING_WEIGHTS = 10
@@ -0,0 +1,131 @@
+import heapq
+import itertools
+
+# Every que entry is a list of [action, unit, time, function, stat, value, data].
+# These are the indexes of that list.
+ACTION = 0
+UNIT = 1
+TIME = 2
+FUNCTION = 3
+STAT = 4
+VALUE = 5
+DATA = 6
+
+
+class EventQueue:
+    """
+    Priority que of the combat events.
+
+    Entries are ordered by (time, sequence number). The sequence number counts up for every pushed entry so
+    entries with the same time come out in the order they were added, exactly like the old list that was
+    appended to and then stable sorted by time.
+
+    Removing entries is lazy. A cancelled entry stays in the heap and is skipped once it reaches the top.
+    Entries can be cancelled one by one with the handle that push returns or all at once with a tag.
+    The tags of an entry are worked out from the entry itself by entry_tags() when it's pushed.
+    """
+    def __init__(self):
+        self._heap = []  # [time, seq, entry, tags]. entry is None once it's been cancelled or popped
+        self._seq = itertools.count()
+        self._tags = {}  # tag -> {seq: handle}
+        self._live = 0
+
+    def __len__(self):
+        return self._live
+
+    def __bool__(self):
+        return self._live > 0
+
+    def __iter__(self):
+        """Live entries in the order they will be popped"""
+        return (handle[2] for handle in sorted(self._heap) if handle[2] is not None)
+
+    def push(self, entry):
+        tags = entry_tags(entry)
+        handle = [entry[TIME], next(self._seq), entry, tags]
+        heapq.heappush(self._heap, handle)
+        for tag in tags:
+            self._tags.setdefault(tag, {})[handle[1]] = handle
+        self._live += 1
+        return handle
+
+    def peek(self):
+        """The next entry without removing it. None when the que is empty"""
+        self._drop_cancelled()
+        return self._heap[0][2] if self._heap else None
+
+    def pop(self):
+        self._drop_cancelled()
+        handle = heapq.heappop(self._heap)
+        entry = handle[2]
+        self._release(handle)
+        return entry
+
+    def cancel(self, handle):
+        """Cancels a single entry. Cancelling an entry that already left the que does nothing"""
+        if handle[2] is not None:
+            self._release(handle)
+
+    def cancel_tag(self, tag, predicate=None):
+        """
+        Cancels every live entry with the given tag.
+
+        args:
+            tag: tuple, one of the tags made by entry_tags()
+            predicate: function(entry) -> bool, if given only the entries it accepts are cancelled
+        """
+        handles = self._tags.get(tag)
+        if not handles:
+            return
+        for handle in list(handles.values()):
+            if predicate is None or predicate(handle[2]):
+                self._release(handle)
+
+    def replace(self, entries):
+        """Throws away the current content and pushes the entries in the given order"""
+        self._heap = []
+        self._tags = {}
+        self._live = 0
+        for entry in entries:
+            self.push(entry)
+
+    def _release(self, handle):
+        for tag in handle[3]:
+            del self._tags[tag][handle[1]]
+        handle[2] = None
+        self._live -= 1
+
+    def _drop_cancelled(self):
+        heap = self._heap
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+
+
+def entry_tags(entry):
+    """
+    The tags an entry can be cancelled with. They match the clear_que_* helpers of the champion class.
+    """
+    action = entry[ACTION]
+    unit = entry[UNIT]
+    tags = []
+    if action == 'clear_idle':
+        tags.append(('clear_idle', unit))
+    elif action == 'change_stat':
+        stat = entry[STAT]
+        value = entry[VALUE]
+        if stat == 'healing_strength' and value == 1:
+            tags.append(('healing_reduction', unit))
+        elif stat == 'stunned' and not value:
+            tags.append(('stunned_removal', unit))
+        elif stat == 'blinded' and not value:
+            tags.append(('blinded_removal', unit))
+        elif stat == 'armor':
+            tags.append(('armor_removal', unit))
+        if 'dazzler' in entry[DATA]:
+            tags.append(('dazzler', unit))
+    elif action == 'burn':
+        # burn entries sit on the unit that applied the burn. the cleared burn is the one on the target
+        tags.append(('burn', entry[VALUE]))
+    elif action == 'execute_function' and entry[FUNCTION]:
+        tags.append(('execute_function', unit, entry[FUNCTION][0]))
+    return tags
@@ -1,8 +1,9 @@
 import math
 import Simulator.stats as stats
 import Simulator.items as items
-
-coordinates = [[None] * 7 for _ in range(8)]
+import Simulator.config as config
+from Simulator import combat_log, hex_grid
+from Simulator.battle_context import TICK_LENGTH
 
 
 def action(champion):
@@ -15,9 +16,7 @@ def action(champion):
                 and champion.millis() > champion.castMS + stats.MANALOCK[champion.name]:
             champion.ability()
 
-        attackable_enemies = list(filter(lambda x: (x.champion and x.health > 0), champion.enemy_team()))
-
-        if champion.idle and len(attackable_enemies) > 0:
+        if champion.idle and champion.has_attackable_enemies():
             # if not target --> find one
             if champion.target is None:
                 find_target(champion)
@@ -58,21 +57,50 @@ def action(champion):
     return None
 
 
+def next_action_time(champion):
+    """
+    The first tick, starting from the current one, where action(champion) can do anything.
+    Only holds as long as nothing else happens to the champion before that tick.
+    Used by the event skipping clock of champion.run to know which ticks it can jump over.
+
+    returns:
+        millis of that tick or None if the champion waits for something else to happen (a que entry)
+    """
+    millis = champion.millis()
+    enemy_team = champion.enemy_team()
+    if len(enemy_team) == 0 or champion.stunned:
+        return None
+    if millis == 0:
+        return millis
+
+    # an idle champion looks for something to do on every tick
+    if champion.idle and champion.has_attackable_enemies():
+        return millis
+
+    # global cast that is only waiting for the manalock to run out
+    if champion.champion and not champion.ability_requires_target \
+            and 0 < champion.maxmana <= champion.mana \
+            and not (champion.disarmed and not stats.ABILITY_WHILE_DISARMED[champion.name]):
+        manalock_end = champion.castMS + stats.MANALOCK[champion.name]
+        if millis > manalock_end:
+            return millis
+        return (int(manalock_end // TICK_LENGTH) + 1) * TICK_LENGTH
+    return None
+
+
 # find a tile that takes the champion one step closer to the target
 # doesn't require a clear path to the target (like 'find_path' does)
 def find_next_ranged_move(champion):
-    neighbors_original = find_neighbors(champion.y, champion.x)
+    coordinates = champion.battle.coordinates
+    distances = hex_grid.DISTANCE[hex_grid.index(champion.target.y, champion.target.x)]
     neighbors = []
 
-    for n in neighbors_original:
-        if not (coordinates[n[0]][n[1]] and coordinates[n[0]][n[1]] is not champion.target):
-            neighbors.append(n)
-
-    for n in neighbors:
-        dist = distance({'y': n[0], 'x': n[1]}, {'y': champion.target.y, 'x': champion.target.x}, False)
-        n.append(dist)
+    for n in hex_grid.NEIGHBORS[hex_grid.index(champion.y, champion.x)]:
+        y, x = hex_grid.COORDS[n]
+        if not (coordinates[y][x] and coordinates[y][x] is not champion.target):
+            neighbors.append([y, x, distances[n]])
 
-    neighbors = sorted(neighbors, key=lambda x: x[2])
+    neighbors.sort(key=lambda x: x[2])
 
     if neighbors:
         return neighbors[0]
@@ -80,85 +108,83 @@ def find_next_ranged_move(champion):
         return None
 
 
-# finds the shortest path from a champion's location to some target coordinates
+# finds a path from a champion's location to some target coordinates
+# by default the path is found with the old greedy search below, the battles are tuned on its paths.
+# with config.BFS_PATHFINDING the actual shortest path is used instead.
+# returns the hexes of the path without the starting point or None if the target can't be reached
+def find_path(champion, target_y, target_x):
+    start = hex_grid.index(champion.y, champion.x)
+    goal = hex_grid.index(target_y, target_x)
+    # the hexes taken by other units. the target's own hex is free to walk into
+    blocked = hex_grid.occupancy(champion.battle.coordinates, champion.target)
+
+    if config.BFS_PATHFINDING:
+        path = hex_grid.bfs_path(start, goal, blocked)
+        if path is None:
+            return None
+        return [list(hex_grid.COORDS[i]) for i in path]
+
+    path = greedy_path(start, goal, blocked, False)
+    secondary_path = greedy_path(start, goal, blocked, True)
+
+    # if there was no answer found
+    if path[-1] != goal and secondary_path[-1] != goal:
+        return None
+
+    # return the shortest path of the two test runs
+    if len(secondary_path) < len(path):
+        path = secondary_path
+    # dont include the starting point
+    return [list(hex_grid.COORDS[i]) for i in path[1:]]
+
+
 # the algorithm is not perfect
 # find the neighbors of the current tile under review,
 # sort them by distance to the target and follow the closest tile until at target.
-# not allowing visits at tiles that are already visited.
-# runs twice: 
+# tiles that are taken by other units are skipped unless they were visited already.
+# find_path runs it twice:
 # 1. execute using the rules three lines above
 # 2. if there are two neighbor tiles with same distance to the target, use the second one instaed of the first one.
 # this sometimes brings a different, better result. a big clumsy way of doing it, but more or less does the job.
-def find_path(champion, target_y, target_x, use_second=False, secondary_result=[]):
-    path = []
-    visited = []
-    start_y = champion.y
-    stary_x = champion.x
-
-    path.append([start_y, stary_x])
-    visited.append([start_y, stary_x])
+def greedy_path(start, goal, blocked, use_second):
+    distances = hex_grid.DISTANCE[goal]
+    path = [start]
+    visited = {start}
 
     count = 0
-    while path[len(path) - 1] != [target_y, target_x]:
+    while path[-1] != goal:
         count += 1
         if count > 50:
             break
-        neighbors_original = find_neighbors(path[-1][0], path[-1][1])
         neighbors = []
-        # add into the neighbor -list if the tile is not visited, it's free or it contains the campion's target
-        for n in neighbors_original:
-            if not (coordinates[n[0]][n[1]] and coordinates[n[0]][n[1]] is not champion.target) or n in visited:
+        # add into the neighbor -list if the tile is visited, it's free or it contains the campion's target
+        for n in hex_grid.NEIGHBORS[path[-1]]:
+            if not blocked >> n & 1 or n in visited:
                 neighbors.append(n)
 
-        for n in neighbors:
-            dist = distance({'y': n[0], 'x': n[1]}, {'y': target_y, 'x': target_x}, False)
-            n.append(dist)
-
-        # sort the neighbors by 'distance to the target hex'
-        neighbors = sorted(neighbors, key=lambda x: x[2])
-
-        # if 'use_second' is True AND the first two elements in the sorted list are of same distance, flip them
-        if len(neighbors) > 1 and neighbors[0][2] == neighbors[1][2] and use_second is True:
-            a, b = neighbors[0], neighbors[1]
-            neighbors[1] = a
-            neighbors[0] = b
-
         if len(neighbors) == 0:
             break
-            # return None
 
-        path.append([neighbors[0][0], neighbors[0][1]])
-        visited.append([neighbors[0][0], neighbors[0][1]])
-
-    if not use_second:
-        return find_path(champion, target_y, target_x, True, path)
+        # sort the neighbors by 'distance to the target hex'
+        neighbors.sort(key=distances.__getitem__)
 
-    else:
-        if secondary_result and path:
-            # if there was no answer found
-            target = [target_y, target_x]
-            if [path[-1][0], path[-1][1]] != target and [secondary_result[-1][0], secondary_result[-1][1]] != target:
-                return None
+        # if 'use_second' is True AND the first two elements in the sorted list are of same distance, take the second
+        step = neighbors[0]
+        if len(neighbors) > 1 and distances[neighbors[0]] == distances[neighbors[1]] and use_second:
+            step = neighbors[1]
 
-            # return the shortest path of the two test runs
-            # dont include the starting point
-            elif len(path) < len(secondary_result):
-                return path[1:]
-            else:
-                return secondary_result[1:]
+        path.append(step)
+        visited.add(step)
+    return path
 
 
 def find_neighbors(y, x, allow_outside_map=False):
-    directions = [
-        [[+1, 0], [+1, +1], [0, -1],
-         [0, +1], [-1, 0], [-1, +1]],
-        [[+1, -1], [+1, 0], [0, -1],
-         [0, +1], [-1, -1], [-1, 0]],
-    ]
+    if not allow_outside_map and hex_grid.on_board(y, x):
+        return [list(hex_grid.COORDS[n]) for n in hex_grid.NEIGHBORS[hex_grid.index(y, x)]]
 
     parity = y & 1
     neighbors = []
-    for c in directions[parity]:
+    for c in hex_grid.DIRECTIONS[parity]:
         nY = c[0] + y
         nX = c[1] + x
         if allow_outside_map or (0 <= nY <= 7 and 0 <= nX <= 6):
@@ -166,36 +192,48 @@ def find_neighbors(y, x, allow_outside_map=False):
     return neighbors
 
 
+def attackable_by(unit, c):
+    return unit is not None and unit.team is not c.team and unit.champion and unit.health > 0
+
+
+# the closest enemy that can be attacked.
+# on a tie the one that comes first on the board (row by row) wins
 def find_target(c):
-    c_coords = to_cube_coords(c)
     old_target = c.target
-
-    current_target = {'champion': None, 'distance': None}
-
-    # roll through everyone
-    # find the closest one
-    for y in coordinates:
-        for x in y:
-            if x is not None and x.team is not c.team and x.champion and x.health > 0:
-                x_coords = to_cube_coords(x)
-                dist = (abs(c_coords['x'] - x_coords['x']) + abs(c_coords['y'] - x_coords['y'])
-                        + abs(c_coords['z'] - x_coords['z'])) / 2
-                if not current_target['distance'] or dist < current_target['distance']:
-                    current_target['champion'] = x
-                    current_target['distance'] = dist
-
-    if current_target['champion']:
-        c.target = current_target['champion']
-        c.target_y = current_target['champion'].y
-        c.target_x = current_target['champion'].x
+    coordinates = c.battle.coordinates
+    rings = hex_grid.RINGS[hex_grid.index(c.y, c.x)]
+
+    new_target = None
+    if attackable_by(coordinates[c.y][c.x], c):
+        # an enemy got placed on this champion's hex. the first enemy found after it always replaces it
+        new_distance = None
+        for i, distance_to in enumerate(hex_grid.DISTANCE[rings[0][0]]):
+            y, x = hex_grid.COORDS[i]
+            if attackable_by(coordinates[y][x], c) and (not new_distance or distance_to < new_distance):
+                new_target = coordinates[y][x]
+                new_distance = distance_to
+    else:
+        # walk the rings outwards, the first enemy found is the closest one
+        for ring in rings[1:]:
+            for i in ring:
+                y, x = hex_grid.COORDS[i]
+                if attackable_by(coordinates[y][x], c):
+                    new_target = coordinates[y][x]
+                    break
+            if new_target:
+                break
+
+    if new_target:
+        c.target = new_target
+        c.target_y = new_target.y
+        c.target_x = new_target.x
         if c.target != old_target and c.target.team:
-            c.print(' has a new target: ' + '{:<8}'.format(c.target.team) + '{:<8}'.format(c.target.name) +
-                    '  [{}, {}]'.format(c.target.y, c.target.x))
+            c.trace(combat_log.NEW_TARGET, new_target, new_target.y, new_target.x)
 
 
 # find enemies and sort them by distance
 def find_enemies(champion):
-    c = coordinates
+    c = champion.battle.coordinates
     enemies = []
     for i, a_line in enumerate(c):
         for j, col in enumerate(a_line):
@@ -207,28 +245,33 @@ def find_enemies(champion):
 
 
 # find enemies in x distance of a coordinate
+# the row and the column of the units are measured the other way around (y = column, x = row).
+# left like that on purpose, the abilities that use this are balanced around it.
 def enemies_in_distance(champion, target_y, target_x, radius):
     enemies_within = []
-    c = coordinates
+    c = champion.battle.coordinates
     for i, line in enumerate(c):
-        for j, col in enumerate(line):
-            if (c[i][j] and
-                    c[i][j].team != champion.team and
-                    c[i][j].champion and
-                    distance({'y': j, 'x': i}, {'y': target_y, 'x': target_x}, False) <= radius):
-                enemies_within.append(c[i][j])
+        for j, unit in enumerate(line):
+            if (unit and
+                    unit.team != champion.team and
+                    unit.champion and
+                    hex_grid.hex_distance(j, i, target_y, target_x) <= radius):
+                enemies_within.append(unit)
 
     return enemies_within
 
 
 # find hexes that are within a certain distance
 def hexes_in_distance(target_y, target_x, radius, allow_outside_map=False):
+    if not allow_outside_map and hex_grid.on_board(target_y, target_x):
+        mask = hex_grid.within_mask(hex_grid.index(target_y, target_x), radius)
+        return [[y, x] for i, (y, x) in enumerate(hex_grid.COORDS) if mask >> i & 1]
+
     hexes_within = []
-    c = coordinates
     for i in range(-100, 100):
         for j in range(-100, 100):
             if allow_outside_map or (i >= 0 and i <= 7 and j >= 0 and j <= 6):
-                if distance({'y': i, 'x': j}, {'y': target_y, 'x': target_x}, False) <= radius:
+                if hex_grid.cube_distance(i, j, target_y, target_x) <= radius:
                     hexes_within.append([i, j])
 
     return hexes_within
@@ -236,11 +279,17 @@ def hexes_in_distance(target_y, target_x, radius, allow_outside_map=False):
 
 # find hexes exactly x away from a coordinate
 def hexes_distance_away(target_y, target_x, radius, allow_outside_map=False):
+    if not allow_outside_map and hex_grid.on_board(target_y, target_x):
+        rings = hex_grid.RINGS[hex_grid.index(target_y, target_x)]
+        if radius != int(radius) or not 0 <= radius < len(rings):
+            return []
+        return [list(hex_grid.COORDS[i]) for i in rings[int(radius)]]
+
     hexes_within = []
     for i in range(-10, 20):
         for j in range(-10, 20):
             if allow_outside_map or (i >= 0 and i <= 7 and j >= 0 and j <= 6):
-                if distance({'y': i, 'x': j}, {'y': target_y, 'x': target_x}, False) == radius:
+                if hex_grid.cube_distance(i, j, target_y, target_x) == radius:
                     hexes_within.append([i, j])
 
     return hexes_within
@@ -248,16 +297,8 @@ def hexes_distance_away(target_y, target_x, radius, allow_outside_map=False):
 
 def distance(champion1, champion2, objects):
     if objects:
-        c1_coords = to_cube_coords(champion1)
-        c2_coords = to_cube_coords(champion2)
-    else:
-        c1_coords = to_cube_coords_nonobj(champion1)
-        c2_coords = to_cube_coords_nonobj(champion2)
-
-    dist = (abs(c1_coords['x'] - c2_coords['x']) +
-            abs(c1_coords['y'] - c2_coords['y']) +
-            abs(c1_coords['z'] - c2_coords['z'])) / 2
-    return dist
+        return hex_grid.hex_distance(champion1.y, champion1.x, champion2.y, champion2.x)
+    return hex_grid.hex_distance(champion1['y'], champion1['x'], champion2['y'], champion2['x'])
 
 
 def to_cube_coords(c):
@@ -390,6 +431,7 @@ def rectangle_from_champion_to_wall_behind_target(champion, width, target_y, tar
 
 def leap_to_back_line(champion, data):
     trait = data['trait']
+    coordinates = champion.battle.coordinates
 
     # set the preferred coordinate which matches the other side of the baord (y-wise) at still somewhat same x-line
     if champion.y <= 3:
@@ -3,15 +3,15 @@ import config as global_config
 import time
 import random
 import numpy as np
-from Simulator import champion, minion
-from Simulator.champion_functions import MILLIS
+from Simulator import champion, minion, combat_pool, battle_cache
+from Simulator.battle_context import BattleContext
 from Simulator.carousel import carousel
-from Simulator.alt_autobattler import alt_auto_battle
+from Simulator.alt_autobattler import alt_auto_battle, alt_auto_battle_pairs
 from copy import deepcopy
 
 
 class Game_Round:
-    def __init__(self, game_players, pool_obj, step_func_obj):
+    def __init__(self, game_players, pool_obj, step_func_obj, combat_executor=None, cache=None):
         # Amount of damage taken as a base per round. First number is max round, second is damage
         self.ROUND_DAMAGE = [
             [3, 0],
@@ -24,6 +24,10 @@ class Game_Round:
         self.PLAYERS = game_players
         self.pool_obj = pool_obj
         self.step_func_obj = step_func_obj
+        # Runs the battles of a round in worker processes. None plays them one after another like usual.
+        self.combat_executor = combat_executor if combat_executor is not None else combat_pool.shared_executor()
+        # Remembers the outcomes of battles between the same boards. None plays every battle.
+        self.battle_cache = cache if cache is not None else battle_cache.shared_cache()
 
         self.NUM_DEAD = 0
         self.current_round = 0
@@ -88,7 +92,12 @@ class Game_Round:
         round_index = 0
         while player_round > self.ROUND_DAMAGE[round_index][0]:
             round_index += 1
-        for match in self.matchups:
+        if self.combat_executor:
+            return self.pooled_combat_phase(players, round_index)
+        round_damage = self.ROUND_DAMAGE[round_index][1]
+        standard_battles = self.draw_battles()
+        alt_results = self.alt_battles(players, standard_battles, round_damage)
+        for i, match in enumerate(self.matchups):
             if not match[1] == "ghost":
                 # Assigning a battle
                 players[match[0]].opponent = players[match[1]]
@@ -96,82 +105,190 @@ class Game_Round:
                 # Fixing the time signature to see how long battles take.
                 players[match[0]].start_time = time.time_ns()
                 players[match[1]].start_time = time.time_ns()
-                config.WARLORD_WINS['blue'] = players[match[0]].win_streak
-                config.WARLORD_WINS['red'] = players[match[1]].win_streak
 
-                standard_battle = global_config.AUTO_BATTLER_PERCENTAGE < np.random.rand()
-                if standard_battle:
+                if standard_battles[i]:
                     # Main simulation call
-                    index_won, damage = champion.run(champion.champion, players[match[0]], players[match[1]],
-                                                     self.ROUND_DAMAGE[round_index][1])
+                    index_won, damage, battle = self.run_battle(players[match[0]], players[match[1]], round_damage)
+                    # Every battle of the round is written as it finishes
+                    log_to_file_combat(battle)
                 else:
-                    index_won, damage = alt_auto_battle(players[match[0]], players[match[1]],
-                                                        self.ROUND_DAMAGE[round_index][1])
-
-                # Draw
-                if index_won == 0:
-                    players[match[0]].loss_round(damage)
-                    players[match[0]].health -= damage
-                    players[match[1]].loss_round(damage)
-                    players[match[1]].health -= damage
-                    for player in players.values():
-                        if player != players[match[0]] and player != players[match[1]]:
-                            if player:  # Not sure if there can be a dead player here.
-                                player.spill_reward(damage / (len(players) - 2))
-                    if len(players) == 2:
-                        players[match[0]].spill_reward(damage)
-                        players[match[1]].spill_reward(damage)
-
-                # Blue side won
-                if index_won == 1:
-                    players[match[0]].won_round(damage)
-                    players[match[1]].loss_round(damage)
-                    players[match[1]].health -= damage
-
-                # Red side won
-                if index_won == 2:
-                    players[match[0]].loss_round(damage)
-                    players[match[0]].health -= damage
-                    players[match[1]].won_round(damage)
-
-                # If the battle was very close.
-                # TODO: Change to <= when running the software in non-test mode
-                if damage - self.ROUND_DAMAGE[round_index][1] < self.ROUND_DAMAGE[round_index][1] and standard_battle:
-                    self.save_current_battle["player_" + str(players[match[0]].player_num)] = True
-                    self.save_current_battle["player_" + str(players[match[1]].player_num)] = True
+                    index_won, damage = alt_results[i]
+                self.matchup_result(players, match, round_index, index_won, damage, standard_battles[i])
+
+            else:
+                players[match[0]].start_time = time.time_ns()
+                players[match[0]].opponent = players[match[2]]
+                if standard_battles[i]:
+                    index_won, damage, battle = self.run_battle(players[match[0]], players[match[2]], round_damage)
+                    log_to_file_combat(battle)
                 else:
-                    self.save_current_battle["player_" + str(players[match[0]].player_num)] = False
-                    self.save_current_battle["player_" + str(players[match[1]].player_num)] = False
-                players[match[0]].combat = True
-                players[match[1]].combat = True
+                    index_won, damage = alt_results[i]
+                self.ghost_result(players, match, index_won, damage)
+        return True
+
+    def draw_battles(self):
+        """
+        Decides for every matchup of the round if it is a standard battle or an alt_auto_battle.
+
+        returns:
+            List of booleans in the order of self.matchups, True for a standard battle
+        """
+        return [global_config.AUTO_BATTLER_PERCENTAGE < np.random.rand() for _ in self.matchups]
+
+    def alt_battles(self, players, standard_battles, round_damage):
+        """
+        Plays all the alt_auto_battles of the round in one batch.
+
+        returns:
+            List in the order of self.matchups with (index_won, damage) for the alt_auto_battles
+            and None for the standard battles
+        """
+        pairs = []
+        for match, standard_battle in zip(self.matchups, standard_battles):
+            if not standard_battle:
+                opponent = match[2] if match[1] == "ghost" else match[1]
+                pairs.append((players[match[0]], players[opponent]))
+        outcomes = iter(alt_auto_battle_pairs(pairs, round_damage))
+        return [None if standard_battle else next(outcomes) for standard_battle in standard_battles]
+
+    def run_battle(self, player_1, player_2, round_damage):
+        """
+        Plays a battle between two players, through the battle cache when there is one.
 
+        returns:
+            index_won, damage and the BattleContext of the battle. The context is None when the battle cache was used.
+        """
+        if self.battle_cache:
+            result = self.battle_cache.run(player_1, player_2, round_damage)
+            combat_pool.apply_survivors(player_1, result.blue_survivors)
+            combat_pool.apply_survivors(player_2, result.red_survivors)
+            return result.index_won, result.damage, None
+        battle = BattleContext(player_1.win_streak, player_2.win_streak)
+        index_won, damage = champion.run(champion.champion, player_1, player_2, round_damage, battle)
+        return index_won, damage, battle
+
+    def pooled_combat_phase(self, players, round_index):
+        """
+        combat_phase with the standard battles run by the combat executor.
+
+        Every battle gets a seed drawn from the global rng in matchup order, so the outcome of a round only depends
+        on the seed and not on the workers. Results are applied in the same order as in combat_phase.
+        The ghost battle goes last because it needs the win streak of the ghost after its own battle.
+        The battles run in other processes so they are not written to the combat log.
+        """
+        round_damage = self.ROUND_DAMAGE[round_index][1]
+        standard_battles = self.draw_battles()
+        alt_results = self.alt_battles(players, standard_battles, round_damage)
+        matches = []
+        jobs = []
+        for i, match in enumerate(self.matchups):
+            if not match[1] == "ghost":
+                # Assigning a battle
+                players[match[0]].opponent = players[match[1]]
+                players[match[1]].opponent = players[match[0]]
+                # Fixing the time signature to see how long battles take.
+                players[match[0]].start_time = time.time_ns()
+                players[match[1]].start_time = time.time_ns()
+
+                key = None
+                cached = None
+                if standard_battles[i]:
+                    if self.battle_cache:
+                        key = battle_cache.battle_key(players[match[0]], players[match[1]], round_damage)
+                        cached = self.battle_cache.get(key, self.battle_cache.samples)
+                    if cached is None:
+                        jobs.append(combat_pool.combat_job(players[match[0]], players[match[1]], round_damage,
+                                                           random.getrandbits(32)))
+                matches.append((i, match, key, cached))
+
+        results = iter(self.combat_executor.run(jobs))
+        for i, match, key, cached in matches:
+            if standard_battles[i]:
+                result = cached
+                if result is None:
+                    result = next(results)
+                    if self.battle_cache:
+                        self.battle_cache.put(key, result)
+                combat_pool.apply_survivors(players[match[0]], result.blue_survivors)
+                combat_pool.apply_survivors(players[match[1]], result.red_survivors)
+                index_won, damage = result.index_won, result.damage
             else:
+                index_won, damage = alt_results[i]
+            self.matchup_result(players, match, round_index, index_won, damage, standard_battles[i])
+
+        for i, match in enumerate(self.matchups):
+            if match[1] == "ghost":
                 players[match[0]].start_time = time.time_ns()
                 players[match[0]].opponent = players[match[2]]
-                config.WARLORD_WINS['blue'] = players[match[0]].win_streak
-                config.WARLORD_WINS['red'] = players[match[2]].win_streak
-                if global_config.AUTO_BATTLER_PERCENTAGE < np.random.rand():
-                    index_won, damage = champion.run(champion.champion, players[match[0]], players[match[2]],
-                                                     self.ROUND_DAMAGE[round_index][1])
+                if standard_battles[i] and self.battle_cache:
+                    index_won, damage, _ = self.run_battle(players[match[0]], players[match[2]], round_damage)
+                elif standard_battles[i]:
+                    job = combat_pool.combat_job(players[match[0]], players[match[2]], round_damage,
+                                                 random.getrandbits(32))
+                    result = self.combat_executor.run([job])[0]
+                    combat_pool.apply_survivors(players[match[0]], result.blue_survivors)
+                    combat_pool.apply_survivors(players[match[2]], result.red_survivors)
+                    index_won, damage = result.index_won, result.damage
                 else:
-                    index_won, damage = alt_auto_battle(players[match[0]], players[match[2]],
-                                                        self.ROUND_DAMAGE[round_index][1])
-                if index_won == 2 or index_won == 0:
-                    players[match[0]].health -= damage
-                    players[match[0]].loss_round(damage)
-                    players[match[0]].combat = True
-                    # if the alive player loses to a dead player, the dead player's reward is
-                    # given out to all other alive players
-                    alive = []
-                    for other in players.values():
-                        if other:
-                            if other.health > 0 and other is not players[match[0]]:
-                                alive.append(other)
-                    for other in alive:
-                        other.spill_reward(damage / len(alive))
-        log_to_file_combat()
+                    index_won, damage = alt_results[i]
+                self.ghost_result(players, match, index_won, damage)
         return True
 
+    def matchup_result(self, players, match, round_index, index_won, damage, standard_battle):
+        """Hands out the damage and rewards of a battle between two players"""
+        # Draw
+        if index_won == 0:
+            players[match[0]].loss_round(damage)
+            players[match[0]].health -= damage
+            players[match[1]].loss_round(damage)
+            players[match[1]].health -= damage
+            for player in players.values():
+                if player != players[match[0]] and player != players[match[1]]:
+                    if player:  # Not sure if there can be a dead player here.
+                        player.spill_reward(damage / (len(players) - 2))
+            if len(players) == 2:
+                players[match[0]].spill_reward(damage)
+                players[match[1]].spill_reward(damage)
+
+        # Blue side won
+        if index_won == 1:
+            players[match[0]].won_round(damage)
+            players[match[1]].loss_round(damage)
+            players[match[1]].health -= damage
+
+        # Red side won
+        if index_won == 2:
+            players[match[0]].loss_round(damage)
+            players[match[0]].health -= damage
+            players[match[1]].won_round(damage)
+
+        # If the battle was very close.
+        # TODO: Change to <= when running the software in non-test mode
+        if damage - self.ROUND_DAMAGE[round_index][1] < self.ROUND_DAMAGE[round_index][1] and standard_battle:
+            self.save_current_battle["player_" + str(players[match[0]].player_num)] = True
+            self.save_current_battle["player_" + str(players[match[1]].player_num)] = True
+        else:
+            self.save_current_battle["player_" + str(players[match[0]].player_num)] = False
+            self.save_current_battle["player_" + str(players[match[1]].player_num)] = False
+        players[match[0]].combat = True
+        players[match[1]].combat = True
+
+    def ghost_result(self, players, match, index_won, damage):
+        """Hands out the damage of a battle against a ghost. The ghost itself takes no damage"""
+        if index_won == 2 or index_won == 0:
+            players[match[0]].health -= damage
+            players[match[0]].loss_round(damage)
+            players[match[0]].combat = True
+            # if the alive player loses to a dead player, the dead player's reward is
+            # given out to all other alive players
+            alive = []
+            for other in players.values():
+                if other:
+                    if other.health > 0 and other is not players[match[0]]:
+                        alive.append(other)
+            for other in alive:
+                other.spill_reward(damage / len(alive))
+
     def single_combat_phase(self, players):
         """
         Plays a single round of combat between 2 players. Used by the positioning and item models for an environment.
@@ -183,19 +300,51 @@ class Game_Round:
         # Fixing the time signature to see how long battles take.
         players[0].start_time = time.time_ns()
         players[1].start_time = time.time_ns()
-        config.WARLORD_WINS['blue'] = players[0].win_streak
-        config.WARLORD_WINS['red'] = players[1].win_streak
 
         standard_battle = global_config.AUTO_BATTLER_PERCENTAGE < np.random.rand()
 
-        player_0 = deepcopy(players[0])
-        player_1 = deepcopy(players[1])
-        if standard_battle:
-            # Main simulation call
-            index_won, damage = champion.run(champion.champion, player_0, player_1)
+        battle = None
+        if self.battle_cache:
+            # the cache plays its battles on copies of the boards already
+            if standard_battle:
+                result = self.battle_cache.run(players[0], players[1])
+                index_won, damage = result.index_won, result.damage
+            else:
+                index_won, damage = self.battle_cache.alt_auto_battle(players[0], players[1])
         else:
-            index_won, damage = alt_auto_battle(player_0, player_1)
+            player_0 = deepcopy(players[0])
+            player_1 = deepcopy(players[1])
+            if standard_battle:
+                # Main simulation call
+                battle = BattleContext(player_0.win_streak, player_1.win_streak)
+                index_won, damage = champion.run(champion.champion, player_0, player_1, battle=battle)
+            else:
+                index_won, damage = alt_auto_battle(player_0, player_1)
+
+        self.single_combat_result(players, index_won, damage)
+        log_to_file_combat(battle)
+        return index_won, damage
 
+    def alt_combat_phase(self, player_pairs):
+        """
+        single_combat_phase with alt_auto_battle for many pairs of players, played in one batch.
+        Lets the positioning and item environments play the cheap battles of all their boards together.
+
+        args:
+            player_pairs: List[List[player 0, player 1]]
+
+        returns:
+            List of (index_won, damage), one per pair
+        """
+        outcomes = alt_auto_battle_pairs(player_pairs)
+        for players, (index_won, damage) in zip(player_pairs, outcomes):
+            players[0].start_time = time.time_ns()
+            players[1].start_time = time.time_ns()
+            self.single_combat_result(players, index_won, damage)
+        return outcomes
+
+    def single_combat_result(self, players, index_won, damage):
+        """Tracks the reward of a single_combat_phase battle"""
         # Draw
         if index_won == 0:
             players[0].loss_round(damage)
@@ -211,9 +360,6 @@ class Game_Round:
             players[0].loss_round(damage)
             players[1].won_round(damage)
 
-        log_to_file_combat()
-        return index_won, damage
-
     def decide_player_combat(self):
         player_list = []
         self.matchups = []
@@ -299,8 +445,11 @@ class Game_Round:
         for player in self.PLAYERS.values():
                 log_to_file(player)
 
-        for player in self.PLAYERS.values():
-            minion.minion_round(player, 0, self.PLAYERS.values())
+        if self.combat_executor:
+            minion.minion_combats(list(self.PLAYERS.values()), 0, self.PLAYERS.values(), self.combat_executor)
+        else:
+            for player in self.PLAYERS.values():
+                minion.minion_round(player, 0, self.PLAYERS.values())
         # False stands for no one died
         return False
 
@@ -316,9 +465,13 @@ class Game_Round:
                 player.end_turn_actions()
                 player.combat = False
 
-        for player in self.PLAYERS.values():
-            if player:
-                minion.minion_round(player, self.current_round, self.PLAYERS.values())
+        if self.combat_executor:
+            minion.minion_combats([player for player in self.PLAYERS.values() if player], self.current_round,
+                                  self.PLAYERS.values(), self.combat_executor)
+        else:
+            for player in self.PLAYERS.values():
+                if player:
+                    minion.minion_round(player, self.current_round, self.PLAYERS.values())
         return False
 
     # r stands for round or game_round but round is a keyword so using r instead
@@ -334,7 +487,6 @@ class Game_Round:
         # Will implement check dead later
         # if self.check_dead(agent, buffer, game_episode):
         #     return True
-        log_to_file_combat()
         return False
 
     # executes carousel round for all players
@@ -380,18 +532,20 @@ def log_end_turn(game_round):
 
 
 # This one is for the champion and logging the battles.
-def log_to_file_combat():
-    if config.LOGMESSAGES and config.LOG_COMBAT:
+# Takes the BattleContext of the battle to log. Nothing is written when no battle was simulated.
+def log_to_file_combat(battle):
+    if config.LOGMESSAGES and config.LOG_COMBAT and battle:
         with open('log.txt', "a") as out:
-            if len(champion.log) > 0:
-                if MILLIS() < 75000:
-                    if champion.log[-1] == 'BLUE TEAM WON':
+            # replays the structured log of the battle into text
+            log = battle.log
+            if len(log) > 0:
+                if battle.millis() < 75000:
+                    if log[-1] == 'BLUE TEAM WON':
                         champion.test_multiple['blue'] += 1
-                    if champion.log[-1] == 'RED TEAM WON':
+                    if log[-1] == 'RED TEAM WON':
                         champion.test_multiple['red'] += 1
-                elif MILLIS() < 200000:
+                elif battle.millis() < 200000:
                     champion.test_multiple['draw'] += 1
-                for line in champion.log:
+                for line in log:
                     out.write(str(line))
                     out.write('\n')
-    champion.log = []
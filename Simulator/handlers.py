@@ -0,0 +1,42 @@
+import Simulator.stats as stats
+
+# Every function combat looks up by the name of a champion, an item or a trait.
+#
+# The tables are filled in at the bottom of the module that defines the functions, when it's imported.
+# This module only imports the stat tables so any combat module can import it without running into an import cycle.
+# champion.py imports all of them, so the tables are complete before the first unit is created.
+
+# Champion ids. champion.champion_id is the index of the name in CHAMPION_NAMES.
+CHAMPION_NAMES = list(stats.AS)
+CHAMPION_IDS = {name: i for i, name in enumerate(CHAMPION_NAMES)}
+
+# champion id -> ability of the champion. None for units without one. Filled in by ability.py
+ABILITIES = [None] * len(CHAMPION_NAMES)
+# champion id -> function run when the unit is created, stats.INITIATIVE_ACTIVE. Filled in by active.py
+INIT_HOOKS = [None] * len(CHAMPION_NAMES)
+# champion id -> passive that runs on every auto attack, config.ATTACK_PASSIVES. Filled in by active.py
+ATTACK_PASSIVES = [None] * len(CHAMPION_NAMES)
+
+# item name -> function run when a unit is created with the item, item_stats.initiative_items. Filled in by items.py
+ITEM_INITS = {}
+
+# Functions of origin_class_stats.initiate_traits in the order they run at the start of a battle.
+# Filled in by origin_class.py
+TRAIT_INITS = []
+
+# stat -> base value of every champion that champion_functions.reset_stat goes back to
+STAT_TABLES = {'AD': stats.AD, 'AS': stats.AS, 'MR': stats.MR}
+
+
+def register_champions(table, functions, names=None, suffix=''):
+    """
+    Fills a champion table.
+
+    args:
+        table: one of the champion id tables above
+        functions: globals() of the module that defines the functions
+        names: champions to register, all of them by default
+        suffix: added to the champion name to get the function name, e.g. '_init'
+    """
+    for name in CHAMPION_NAMES if names is None else names:
+        table[CHAMPION_IDS[name]] = functions.get(name + suffix)
@@ -0,0 +1,119 @@
+from collections import deque
+
+# Precomputed tables of the combat board.
+# The board is 8 rows (y) by 7 columns (x) of hexes. Hexes are indexed as y * WIDTH + x.
+# Odd rows are shifted to the right, see field.find_neighbors.
+HEIGHT = 8
+WIDTH = 7
+SIZE = HEIGHT * WIDTH
+
+# Same order as field.find_neighbors. The order matters, the path finding breaks ties with it.
+DIRECTIONS = [
+    [[+1, 0], [+1, +1], [0, -1],
+     [0, +1], [-1, 0], [-1, +1]],
+    [[+1, -1], [+1, 0], [0, -1],
+     [0, +1], [-1, -1], [-1, 0]],
+]
+
+
+def index(y, x):
+    return y * WIDTH + x
+
+
+def on_board(y, x):
+    return 0 <= y < HEIGHT and 0 <= x < WIDTH
+
+
+def hex_distance(y1, x1, y2, x2):
+    """
+    Distance in hexes between two coordinates. Works outside the board too.
+    Returns a float, same as field.distance always has.
+    """
+    if 0 <= y1 < HEIGHT and 0 <= x1 < WIDTH and 0 <= y2 < HEIGHT and 0 <= x2 < WIDTH:
+        return DISTANCE[y1 * WIDTH + x1][y2 * WIDTH + x2]
+    return cube_distance(y1, x1, y2, x2)
+
+
+def cube_distance(y1, x1, y2, x2):
+    # the same math as field.to_cube_coords and field.distance without building the dicts
+    dx = (x1 - (y1 + (y1 & 1)) / 2) - (x2 - (y2 + (y2 & 1)) / 2)
+    dz = y1 - y2
+    return (abs(dx) + abs(dx + dz) + abs(dz)) / 2
+
+
+# (y, x) of every index
+COORDS = tuple((i // WIDTH, i % WIDTH) for i in range(SIZE))
+
+# DISTANCE[a][b] is the distance between hex a and hex b
+DISTANCE = tuple(tuple(cube_distance(y1, x1, y2, x2) for y2, x2 in COORDS) for y1, x1 in COORDS)
+
+# NEIGHBORS[a] are the indexes of the hexes next to a that are on the board
+NEIGHBORS = tuple(tuple(index(y + dy, x + dx) for dy, dx in DIRECTIONS[y & 1] if on_board(y + dy, x + dx))
+                  for y, x in COORDS)
+
+# RINGS[a][r] are the indexes exactly r hexes away from a, in index order
+MAX_DISTANCE = int(max(max(row) for row in DISTANCE))
+RINGS = tuple(tuple(tuple(b for b in range(SIZE) if DISTANCE[a][b] == r) for r in range(MAX_DISTANCE + 1))
+              for a in range(SIZE))
+
+# RING_MASKS[a][r] is the bitmask of all hexes within r hexes of a
+RING_MASKS = tuple(tuple(sum(1 << b for b in range(SIZE) if DISTANCE[a][b] <= r) for r in range(MAX_DISTANCE + 1))
+                   for a in range(SIZE))
+
+
+def within_mask(a, radius):
+    """Bitmask of the hexes within the radius of hex a"""
+    if radius < 0:
+        return 0
+    return RING_MASKS[a][min(int(radius), MAX_DISTANCE)]
+
+
+def occupancy(coordinates, ignore=None):
+    """
+    Bitmask of the occupied hexes of a battle.
+
+    args:
+        coordinates: BattleContext.coordinates
+        ignore: unit whose hex doesn't count as occupied, e.g. the target of a path
+    """
+    mask = 0
+    bit = 1
+    for row in coordinates:
+        for unit in row:
+            if unit and unit is not ignore:
+                mask |= bit
+            bit <<= 1
+    return mask
+
+
+def bfs_path(start, goal, blocked):
+    """
+    Shortest path on the board with a breadth first search.
+
+    args:
+        start: index of the first hex
+        goal: index of the hex to get to
+        blocked: bitmask of the hexes that can't be walked through. The start and the goal are always allowed.
+
+    returns:
+        List of the indexes after the start up to and including the goal. None if the goal can't be reached.
+    """
+    if start == goal:
+        return []
+    came_from = {start: None}
+    queue = deque([start])
+    while queue:
+        current = queue.popleft()
+        for n in NEIGHBORS[current]:
+            if n in came_from or (blocked >> n & 1 and n != goal):
+                continue
+            came_from[n] = current
+            if n == goal:
+                path = []
+                while n != start:
+                    path.append(n)
+                    n = came_from[n]
+                path.reverse()
+                return path
+            queue.append(n)
+    return None
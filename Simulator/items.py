@@ -1,8 +1,5 @@
-from Simulator import field, item_stats
-import Simulator.champion_functions as champion_functions
+from Simulator import combat_log, field, handlers, item_stats
 import Simulator.stats as stats
-import Simulator.origin_class as origin_class
-import random
 
 # ALL FUNCTIONS REGARDING ITEMS ARE HERE
 # functions are named as just 'item_name'
@@ -20,12 +17,10 @@ def change_stat(champion, stat, value, message=''):
             change_stat(champion, 'max_health', value)
 
     if value != start_value and champion.health > 0:
-        if isinstance(start_value, float):
-            start_value = round(start_value, 2)
-        if isinstance(end_value, float):
-            end_value = round(value, 2)
-        champion.print(' {} {} --> {} {}'.format(stat, start_value, end_value, message))
+        champion.trace(combat_log.ITEM_STAT, stat, start_value, end_value, message)
     setattr(champion, stat, value)
+    if stat == 'champion' and champion.battle:
+        champion.battle.team_changed()
 
 
 def initiate(champion):
@@ -45,8 +40,9 @@ def initiate(champion):
             else:
                 change_stat(champion, stat, original_value + value, 'initiate_item_stat_change')
             
-        if i in item_stats.initiative_items:
-            eval(i)(champion)
+        item_init = handlers.ITEM_INITS.get(i)
+        if item_init:
+            item_init(champion)
 
 # where item functions are based at
 
@@ -56,9 +52,9 @@ def blue_buff(champion):
         change_stat(champion, 'mana', 20)
 
 
-bramble_vest_list = []
 def bramble_vest(champion):
-    millis = champion_functions.MILLIS()
+    millis = champion.millis()
+    bramble_vest_list = champion.battle.bramble_vest_list
 
     if('bramble_vest' in champion.items):
         item_amount = len(list(filter(lambda x: x == 'bramble_vest', champion.items)))
@@ -78,7 +74,7 @@ def chalice_of_power(champion):
     units = champion.own_team() + champion.enemy_team()
     holders = list(filter(lambda x: 'chalice_of_power' in x.items, units))
 
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for holder in holders:
         item_amount = len(list(filter(lambda x: x == 'chalice_of_power', holder.items)))
 
@@ -94,9 +90,9 @@ def chalice_of_power(champion):
 
 #adding stack whenever dealing damage to a target
 #at the same time checking if any of the old stacked enemies are dead. if so, add x AD
-deathblade_list = []
 def deathblade(champion, target):
     if('deathblade' in champion.items):
+        deathblade_list = champion.battle.deathblade_list
         item_amount = len(list(filter(lambda x: x == 'deathblade', champion.items)))
 
         old_list = list(filter(lambda x: x[0] == champion, deathblade_list))
@@ -109,9 +105,9 @@ def deathblade(champion, target):
             deathblade_list.append([champion, target])
 
 
-frozen_heart_list = []
 def frozen_heart(champion):
     units = champion.own_team() + champion.enemy_team()
+    frozen_heart_list = champion.battle.frozen_heart_list
 
     #if a unit has died and they had some enemies affected, clear those debuffs
     for i in range(0, 5):
@@ -165,11 +161,9 @@ def frozen_heart(champion):
                     break
 
 
-gargoyle_stoneplate_list = []
-
-
 def gargoyle_stoneplate(target):
     if 'gargoyle_stoneplate' in target.items:
+        gargoyle_stoneplate_list = target.battle.gargoyle_stoneplate_list
         item_amount = len(list(filter(lambda x: x == 'gargoyle_stoneplate', target.items)))
         
         # current enemies targeting this unit
@@ -221,7 +215,7 @@ def hand_of_justice(champion):
         item_amount = len(list(filter(lambda x: x == 'hand_of_justice', h.items)))
 
         for i in range(0, item_amount):
-            r = random.randint(1, 2)
+            r = champion.battle.random.randint(1, 2)
             if r == 1:
                 change_stat(h, 'SP', h.SP + item_stats.SP['hand_of_justice'])
                 change_stat(h, 'AD', h.AD * item_stats.AD_percentage['hand_of_justice'])
@@ -230,11 +224,9 @@ def hand_of_justice(champion):
                 change_stat(h, 'lifesteal_spells', h.lifesteal_spells + item_stats.lifesteal_spells['hand_of_justice'])
 
 
-hextech_gunblade_list = []
-
-
 def hextech_gunblade(champion, damage):
     if 'hextech_gunblade' in champion.items:
+        hextech_gunblade_list = champion.battle.hextech_gunblade_list
         item_amount = len(list(filter(lambda x: x == 'hextech_gunblade', champion.items)))
         
         healable = champion.max_health - champion.health
@@ -281,7 +273,7 @@ def hextech_gunblade(champion, damage):
             # PROBABLY COULD'VE JUST MODIFIED THE OLD SHIELD THO
             # when I rly think about it
             
-            shield_identifier = round(champion_functions.MILLIS() * heal)
+            shield_identifier = round(champion.millis() * heal)
             # setting these shields to expire a long long time after the battle is over.
             # this way we can just remove the old shield here.
             champion.add_que('shield', 0, None, None, {'amount': heal, 'identifier': shield_identifier,
@@ -313,9 +305,6 @@ def infinity_edge(champion):
 
 
 # how many ionic spark holding enemies are in the range
-ionic_spark_list = []
-
-
 def ionic_spark(champion):
     units = champion.own_team() + champion.enemy_team()
     for u in units:
@@ -334,9 +323,9 @@ def ionic_spark(champion):
             change_stat(u, 'MR', u.MR / item_stats.item_mr_decrease['ionic_spark'])
 
 
-last_whisper_list = [] #[target, ms]
 def last_whisper(champion, target):
-    millis = champion_functions.MILLIS()
+    millis = champion.millis()
+    last_whisper_list = champion.battle.last_whisper_list
 
     if('last_whisper' in champion.items):
 
@@ -355,7 +344,7 @@ def locket_of_the_iron_solari(champion):
     units = champion.own_team() + champion.enemy_team()
     holders = list(filter(lambda x: 'locket_of_the_iron_solari' in x.items, units))
 
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for holder in holders:
         item_amount = len(list(filter(lambda x: x == 'locket_of_the_iron_solari', holder.items)))
 
@@ -371,7 +360,7 @@ def locket_of_the_iron_solari(champion):
             if(h and h.team == holder.team and h.champion):
                 shield_size = item_stats.shield['locket_of_the_iron_solari'][holder.stars] * item_amount
 
-                shield_identifier = round(champion_functions.MILLIS() * shield_size + holder.armor)
+                shield_identifier = round(champion.millis() * shield_size + holder.armor)
                 shield_length = item_stats.item_change_length['locket_of_the_iron_solari']
                 h.add_que('shield', -1, None, None, {'amount': shield_size, 'identifier': shield_identifier, 'applier': holder, 'original_amount': shield_size}, {'increase': True, 'expires': shield_length})
 
@@ -437,7 +426,7 @@ def runaans_hurricane(champion, target):
             
             enemy_team = champion.enemy_team() 
             targets = list(filter(lambda x: x != target, enemy_team))
-            random.shuffle(targets)
+            champion.battle.random.shuffle(targets)
 
             runaans_target = target
             if(len(targets) > 0): runaans_target = targets[0]
@@ -483,7 +472,7 @@ def shroud_of_stillness(champion):
                     affected_hexes.append([i, j])
                     
 
-        coords = field.coordinates
+        coords = champion.battle.coordinates
         for h in affected_hexes:
             c = coords[h[0]][h[1]]
             if(c and c.team != champion.team and c.champion):
@@ -493,7 +482,7 @@ def shroud_of_stillness(champion):
                     mana_reduce_amount = c.maxmana * item_stats.item_mana_cost_increase['shroud_of_stillness']
                     start_value = c.mana
                     c.mana -= mana_reduce_amount
-                    c.print(' {} {} --> {}'.format('mana', round(start_value,1), round(c.mana,1)))
+                    c.trace(combat_log.ROUNDED_STAT, 'mana', start_value, c.mana, 1)
                     c.add_que('change_stat', -1, None, 'mana_cost_increased', True)
 
 
@@ -507,9 +496,9 @@ def spear_of_shojin(champion):
 
 
 
-statikk_shiv_list = []
 def statikk_shiv(champion, target):
     if('statikk_shiv' in champion.items):
+        statikk_shiv_list = champion.battle.statikk_shiv_list
         item_amount = len(list(filter(lambda x: x == 'statikk_shiv', champion.items)))
 
         inx = -1
@@ -529,7 +518,7 @@ def statikk_shiv(champion, target):
                 #find all enemy units except current target and randomize the list
                 enemy_team = champion.enemy_team() 
                 targets = list(filter(lambda x: x != target, enemy_team))
-                random.shuffle(targets)
+                champion.battle.random.shuffle(targets)
 
                 #limit the list to the max extra targets specified in item_stats.py
                 #finally add the current target to the list
@@ -555,7 +544,7 @@ def sunfire_cape(champion, data = {'loop': False}):
     else:
 
         enemies = field.enemies_in_distance(champion, champion.y, champion.x, item_stats.item_range['sunfire_cape'])
-        random.shuffle(enemies)
+        champion.battle.random.shuffle(enemies)
         if(len(enemies) > 0):
             target = enemies[0]
 
@@ -568,7 +557,6 @@ def sunfire_cape(champion, data = {'loop': False}):
 def thieves_gloves(champion):
     ...
 
-titans_resolve_list = [] #[champion, stacks, maxxed]
 def titans_resolve(champion, target, crit):
 
     # attacker in spells and physical attacks
@@ -584,6 +572,7 @@ def titans_resolve(champion, target, crit):
 
 
 def titans_resolve_helper(unit):
+    titans_resolve_list = unit.battle.titans_resolve_list
     current_stacks = list(filter(lambda x: x[0] == unit, titans_resolve_list))
     maxxed = False
     if len(current_stacks) == 0:
@@ -629,7 +618,7 @@ def zekes_herald(champion):
     units = champion.own_team() + champion.enemy_team()
     holders = list(filter(lambda x: 'zekes_herald' in x.items, units))
 
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for holder in holders:
         item_amount = len(list(filter(lambda x: x == 'zekes_herald', holder.items)))
 
@@ -650,7 +639,7 @@ def zephyr(champion):
     units = champion.own_team() + champion.enemy_team()
     holders = list(filter(lambda x: 'zephyr' in x.items, units))
 
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     for holder in holders:
         item_amount = len(list(filter(lambda x: x == 'zephyr', holder.items)))
 
@@ -690,12 +679,12 @@ def zzrot_portal_helper(champion):
     item_amount = len(list(filter(lambda x: x == 'zzrot_portal', champion.items)))
     spawn_hexes = field.hexes_in_distance(champion.y, champion.x, 3)
 
-    coords = field.coordinates
+    coords = champion.battle.coordinates
 
     for i, s in enumerate(spawn_hexes):
         d = field.distance({'y': s[0], 'x': s[1]}, {'y': champion.y, 'x': champion.x}, False)
         spawn_hexes[i].append(d)
-    random.shuffle(spawn_hexes)
+    champion.battle.random.shuffle(spawn_hexes)
     spawn_hexes = sorted(spawn_hexes, key=lambda x: x[2])
 
     # find us a list of free hexes
@@ -708,48 +697,51 @@ def zzrot_portal_helper(champion):
 
 
 def duelists_zeal(champion):
-    if champion.team:
-        origin_class.amounts['duelist'][champion.team] += \
+    if champion.battle and champion.team:
+        champion.battle.amounts['duelist'][champion.team] += \
             len(list(filter(lambda x: x == 'duelists_zeal', champion.items)))
 
 
 def elderwood_heirloom(champion):
-    if champion.team:
-        origin_class.amounts['elderwood'][champion.team] += \
+    if champion.battle and champion.team:
+        champion.battle.amounts['elderwood'][champion.team] += \
             len(list(filter(lambda x: x == 'elderwood_heirloom', champion.items)))
 
 
 def mages_cap(champion):
-    if champion.team:
-        origin_class.amounts['mage'][champion.team] += \
+    if champion.battle and champion.team:
+        champion.battle.amounts['mage'][champion.team] += \
             len(list(filter(lambda x: x == 'mages_cap', champion.items)))
 
 
 def mantle_of_dusk(champion):
-    if champion.team:
-        origin_class.amounts['dusk'][champion.team] += \
+    if champion.battle and champion.team:
+        champion.battle.amounts['dusk'][champion.team] += \
             len(list(filter(lambda x: x == 'mantle_of_dusk', champion.items)))
 
 
 def sword_of_the_divine(champion):
-    if champion.team:
-        origin_class.amounts['divine'][champion.team] +=\
+    if champion.battle and champion.team:
+        champion.battle.amounts['divine'][champion.team] +=\
             len(list(filter(lambda x: x == 'sword_of_the_divine', champion.items)))
 
 
 def vanguards_cuirass(champion):
-    if champion.team:
-        origin_class.amounts['vanguard'][champion.team] += \
+    if champion.battle and champion.team:
+        champion.battle.amounts['vanguard'][champion.team] += \
             len(list(filter(lambda x: x == 'vanguards_cuirass', champion.items)))
 
 
 def warlords_banner(champion):
-    if champion.team:
-        origin_class.amounts['warlord'][champion.team] += \
+    if champion.battle and champion.team:
+        champion.battle.amounts['warlord'][champion.team] += \
             len(list(filter(lambda x: x == 'warlords_banner', champion.items)))
 
 
 def youmuus_ghostblade(champion):
-    if champion.team:
-        origin_class.amounts['assassin'][champion.team] += \
+    if champion.battle and champion.team:
+        champion.battle.amounts['assassin'][champion.team] += \
             len(list(filter(lambda x: x == 'youmuus_ghostblade', champion.items)))
+
+
+handlers.ITEM_INITS.update({item: globals()[item] for item in item_stats.initiative_items})
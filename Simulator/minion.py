@@ -1,6 +1,7 @@
+import random
 import config
 import Simulator.config as config
-from Simulator import champion
+from Simulator import champion, combat_pool
 from Simulator.loot_orb import LootOrb, gen_loot, gen_orb_reward, gen_orbs, give_loot
 
 
@@ -211,45 +212,82 @@ class Herald(Minion):
 
 def minion_round(player, round, others):
     # simulate minion round here
+    enemy = round_minions(round)
+    if enemy:
+        minion_combat(player, enemy, round, others)
+
+
+def minion_combats(players, round, others, executor):
+    """
+    Plays the minion round of every player with the battles run by a CombatExecutor.
+    The battles are seeded in the order of the players and their results are handed out in that order too.
+
+    args:
+        players: List of the players that fight the minions.
+        round: int, current round.
+        others: All players of the game. Used to spill the reward of a lost round.
+        executor: CombatExecutor that runs the battles.
+    """
+    matches = []
+    jobs = []
+    for player in players:
+        enemy = round_minions(round)
+        if enemy:
+            round_damage = start_minion_combat(player, enemy, round)
+            matches.append((player, enemy))
+            jobs.append(combat_pool.combat_job(player, enemy, round_damage, random.getrandbits(32)))
+    for (player, enemy), result in zip(matches, executor.run(jobs)):
+        combat_pool.apply_survivors(player, result.blue_survivors)
+        end_minion_combat(player, enemy, result.index_won, result.damage, others)
+
+
+def round_minions(round):
+    """The minions to fight in the given round. None if it isn't a minion round"""
     # 2 melee minions - give 1 item component
     if round == 0:
-        minion_combat(player, FirstMinion(), round, others)
+        return FirstMinion()
 
     # 2 melee and 1 ranged minion - give 1 item component and 1 3 cost champion
     elif round == 1:
-        minion_combat(player, SecondMinion(), round, others)
+        return SecondMinion()
 
     # 2 melee minions and 2 ranged minions - give 3 gold and 1 item component
     elif round == 2:
-        minion_combat(player, ThirdMinion(), round, others)
+        return ThirdMinion()
 
     # 3 Krugs - give 3 gold and 3 item components
     elif round == 8:
-        minion_combat(player, Krug(), round, others)
+        return Krug()
 
     # 1 Greater Murk Wolf and 4 Murk Wolves - give 3 gold and 3 item components
     elif round == 14:
-        minion_combat(player, Wolf(), round, others)
+        return Wolf()
 
     # 1 Crimson Raptor and 4 Raptors - give 6 gold and 4 item components
     elif round == 20:
-        minion_combat(player, Raptor(), round, others)
+        return Raptor()
 
     # 1 Nexus Minion - give 6 gold and a full item
     elif round == 26:
-        minion_combat(player, Nexus(), round, others)
+        return Nexus()
 
     # Rift Herald - give 6 gold and a full item
     elif round >= 33:
-        minion_combat(player, Herald(), round, others)
+        return Herald()
 
     # invalid round! Do nothing
-    else:
-        return
+    return None
 
 
 # modeled after combat_phase from game_round.py, except with a minion "player" versus the player
 def minion_combat(player, enemy, round, others):
+    round_damage = start_minion_combat(player, enemy, round)
+    index_won, damage = champion.run(champion.champion, player, enemy, round_damage)
+    end_minion_combat(player, enemy, index_won, damage, others)
+
+
+# gets the player ready for the fight and returns the base damage of the round
+def start_minion_combat(player, enemy, round):
     ROUND_DAMAGE = [
             [3, 0],
             [9, 2],
@@ -258,7 +296,6 @@ def minion_combat(player, enemy, round, others):
             [27, 8],
             [10000, 15]
         ]
-    config.WARLORD_WINS['blue'] = player.win_streak
     player.end_turn_actions()
 
     round_index = 0
@@ -267,8 +304,11 @@ def minion_combat(player, enemy, round, others):
 
     player.opponent = enemy
     enemy.opponent = player
+    return ROUND_DAMAGE[round_index][1]
+
 
-    index_won, damage = champion.run(champion.champion, player, enemy, ROUND_DAMAGE[round_index][1])
+# hands out the loot or the damage of the fight
+def end_minion_combat(player, enemy, index_won, damage, others):
     # list of currently alive players at the conclusion of combat
     alive = []
     for o in others:
@@ -1,8 +1,8 @@
 import Simulator.config as config
 import Simulator.origin_class_stats as origin_class_stats
-from Simulator import field, item_stats, items, champion_functions
+from Simulator import field, handlers, item_stats, items
+from Simulator.battle_context import TRAITS
 import Simulator.stats as stats
-import random
 import time
 
 # ORIGINS AND CLASSES
@@ -10,39 +10,6 @@ import time
 
 starting_time = time.time_ns()
 
-cultist_stars = {'blue': 0, 'red': 0}  # chosen's stars counts as double
-total_health_teams = {'blue': 0, 'red': 0}
-galio_spawn_time = {'blue': 0, 'red': 0}
-
-amounts = {
-    'cultist': {'blue': 0, 'red': 0},           # 0  in champion.py: champion object, champion.champion_functions.py
-    'divine': {'blue': 0, 'red': 0},            # 1  in champion.py: spell(), champion_functions.py: attack()
-    'dusk': {'blue': 0, 'red': 0},              # 2  in origin_class.py: total_origin_class()
-    'elderwood': {'blue': 0, 'red': 0},         # 3  in champion.py: main()
-    'enlightened': {'blue': 0, 'red': 0},       # 4  in origin_class.py: total_origin_class()
-    'exile': {'blue': 0, 'red': 0},             # 5  in origin_class.py: total_origin_class()
-    'ninja': {'blue': 0, 'red': 0},             # 6  in origin_class.py: total_origin_class()
-    'spirit': {'blue': 0, 'red': 0},            # 7  in ability.py: default_ability_calls()
-    'the_boss': {'blue': 0, 'red': 0},          # 8  in champion.py: spell(), champion_functions.py: attack()
-    'warlord': {'blue': 0, 'red': 0},           # 9  in origin_class.py: total_origin_class()
-    'adept': {'blue': 0, 'red': 0},             # 10 in origin_class.py: total_origin_class()
-    'assassin': {'blue': 0, 'red': 0},          # 11 in origin_class.py: total_origin_class()
-    'brawler': {'blue': 0, 'red': 0},           # 12 in origin_class.py: total_origin_class()
-    'dazzler': {'blue': 0, 'red': 0},           # 13 in champion.py: clear_que_dazzler(), spell()
-    'duelist': {'blue': 0, 'red': 0},           # 14 in origin_class.py: total_origin_class(), champion.py: attack()
-    'emperor': {'blue': 0, 'red': 0},           # 15 in origin_class.py: total_origin_class()
-    'hunter': {'blue': 0, 'red': 0},            # 16 in champion.py: main()
-    'keeper': {'blue': 0, 'red': 0},            # 17 in origin_class.py: total_origin_class()
-    'mage': {'blue': 0, 'red': 0},              # 18 in origin_class.py: total_origin_class(), champion.py: ability()
-    'mystic': {'blue': 0, 'red': 0},            # 19 in origin_class.py: total_origin_class()
-    'shade': {'blue': 0, 'red': 0},             # 20 in origin_class.py: total_origin_class()
-    'sharpshooter': {'blue': 0, 'red': 0},      # 21 in champion_functions.py: attack(), champion.py: spell()
-    'vanguard': {'blue': 0, 'red': 0},          # 22 in origin_class.py: total_origin_class()
-    'fortune': {'blue': 0, 'red': 0},           # 23 in player
-    'moonlight': {'blue': 0, 'red': 0},         # 24 in origin_class.py: My own implementation
-    'tormented': {'blue': 0, 'red': 0}
-}
-
 team_traits = {
     'cultist': 0,
     'divine': 0,
@@ -82,7 +49,8 @@ game_comp_tiers = [team_traits.copy() for _ in range(config.NUM_PLAYERS)]
 def chosen(champion, value):
     if value:
         if champion.team:
-            amounts[value][champion.team] += 1
+            if champion.battle:
+                champion.battle.amounts[value][champion.team] += 1
             stat_change = list(filter(lambda x: x['champion'] == champion.name, origin_class_stats.chosen))[0]
             if stat_change['stat'] == 'maxmana':
                 items.change_stat(champion, stat_change['stat'],
@@ -94,17 +62,16 @@ def chosen(champion, value):
     return False
 
 
-def total_health(blue, red):
-    global total_health_teams
-    for b in blue:
-        total_health_teams['blue'] += b.health
-    for r in red:
-        total_health_teams['red'] += r.health
+def total_health(battle):
+    for b in battle.blue:
+        battle.total_health_teams['blue'] += b.health
+    for r in battle.red:
+        battle.total_health_teams['red'] += r.health
 
 
-def get_origin_class_tier(team, trait):
+def get_origin_class_tier(battle, team, trait):
     try:
-        amount = amounts[trait][team]
+        amount = battle.amounts[trait][team]
         amount_limits = origin_class_stats.tiers[trait]
 
         if trait != 'ninja':
@@ -127,11 +94,12 @@ def get_origin_class_tier(team, trait):
 
 
 # calculate the amount of traits per team and mark them to the 'amounts' -dict
-def total_origin_class(blue_champion, red_champion):
+def total_origin_class(battle):
+    amounts = battle.amounts
     traits = list(amounts.keys())
 
-    blue_team = blue_champion.own_team()
-    red_team = red_champion.own_team()
+    blue_team = battle.blue
+    red_team = battle.red
     champion_data = origin_class_stats.origin_class
 
     counted = []
@@ -143,11 +111,10 @@ def total_origin_class(blue_champion, red_champion):
                     amounts[t][c.team] += 1
                     counted.append([team, t, c.name])
 
-    for t in traits:
-        if t in origin_class_stats.initiate_traits:
-            eval(t)(blue_team, red_team)  # origin_class_stats.py: initiate_traits
+    for trait_init in handlers.TRAIT_INITS:
+        trait_init(battle)  # origin_class_stats.py: initiate_traits
 
-    calculate_cultist_stars(blue_team, red_team)
+    calculate_cultist_stars(battle)
 
 
 def team_origin_class(player):
@@ -175,10 +142,11 @@ def is_trait(champion, trait):
     return False
 
 
-def calculate_cultist_stars(blue, red):
+def calculate_cultist_stars(battle):
+    cultist_stars = battle.cultist_stars
     teams = ['blue', 'red']
     for t in teams:
-        for c in eval(t):
+        for c in battle.team(t):
             if is_trait(c, 'cultist'):
                 cultist_stars[t] += c.stars
                 if c.chosen == 'cultist':
@@ -186,15 +154,15 @@ def calculate_cultist_stars(blue, red):
 
 
 def cultist(champion, team):
-    galio_stars = get_origin_class_tier(team, 'cultist')
-    galio_spawn_time[team] = champion_functions.MILLIS()
+    galio_stars = get_origin_class_tier(champion.battle, team, 'cultist')
+    champion.battle.galio_spawn_time[team] = champion.millis()
     # find the spawn point
     # which free hex has the lowest total distance to all enemy units
     enemies = champion.enemy_team()
 
     all_hexes = field.hexes_in_distance(0, 0, 20)
     current_spawn_hex = [[], 9999]
-    coords = field.coordinates
+    coords = champion.battle.coordinates
 
     for h in all_hexes:
         total_distance = 0
@@ -236,17 +204,15 @@ def cultist_helper(champion, damage, target):
         champion.spell(t, damage)
 
 
-divine_attack_list = []  # [champion, attack_amount]
-divine_list = []  # champion, champion, champion
-
-
 def divine(champion, target, attack):
+    divine_attack_list = champion.battle.divine_attack_list
+    divine_list = champion.battle.divine_list
 
     # counting the x attacks for ascending
-    if is_trait(champion, 'divine') and get_origin_class_tier(champion.team, 'divine') > 0 \
+    if is_trait(champion, 'divine') and get_origin_class_tier(champion.battle, champion.team, 'divine') > 0 \
             and not champion in divine_list:
         if attack:
-            divine_tier = get_origin_class_tier(champion.team, 'divine')
+            divine_tier = get_origin_class_tier(champion.battle, champion.team, 'divine')
 
             if len(list(filter(lambda x: x[0] == champion, divine_attack_list))) == 0:
                 divine_attack_list.append([champion, 1])
@@ -259,15 +225,16 @@ def divine(champion, target, attack):
                             divine_helper(champion, divine_tier)
 
     # following target hp (directed here from spells and attacks)
-    if is_trait(target, 'divine') and get_origin_class_tier(target.team, 'divine') > 0 and not target in divine_list:
-        divine_tier = get_origin_class_tier(target.team, 'divine')
+    if is_trait(target, 'divine') and get_origin_class_tier(target.battle, target.team, 'divine') > 0 \
+            and not target in divine_list:
+        divine_tier = get_origin_class_tier(target.battle, target.team, 'divine')
         if(target.health / target.max_health < 0.5):
             divine_helper(target, divine_tier)
 
 
 # ascend champion
 def divine_helper(champion, divine_tier):
-    divine_list.append(champion)
+    champion.battle.divine_list.append(champion)
     champion.print(' ascends for {} seconds [divine]'.format(origin_class_stats.length['divine'][divine_tier] / 1000))
 
     items.change_stat(champion, 'stunned', False, 'divine')
@@ -283,12 +250,12 @@ def divine_helper(champion, divine_tier):
     champion.add_que('change_stat', origin_class_stats.length['divine'][divine_tier], None, 'deal_bonus_true_damage', 0)
 
 
-def dusk(blue_team, red_team):
+def dusk(battle):
 
-    teams = {'blue': blue_team, 'red': red_team}
+    teams = {'blue': battle.blue, 'red': battle.red}
 
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'dusk')
+        tier = get_origin_class_tier(battle, t, 'dusk')
         if tier > 0:
             for c in teams[t]:
                 items.change_stat(c, 'SP', c.SP + origin_class_stats.SP_secondary['dusk'][tier], 'dusk')
@@ -296,41 +263,38 @@ def dusk(blue_team, red_team):
                     items.change_stat(c, 'SP', c.SP + origin_class_stats.SP['dusk'][tier], 'dusk')
 
 
-elderwood_list = {'blue': 0, 'red': 0}
-
-
-def elderwood(blue_team, red_team):
+def elderwood(battle):
 
-    teams = {'blue': blue_team, 'red': red_team}
+    teams = {'blue': battle.blue, 'red': battle.red}
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'elderwood')
-        if tier > 0 and elderwood_list[t] < 5:
+        tier = get_origin_class_tier(battle, t, 'elderwood')
+        if tier > 0 and battle.elderwood_list[t] < 5:
             for c in teams[t]:
                 if is_trait(c, 'elderwood'):
                     items.change_stat(c, 'AD', c.AD + origin_class_stats.AD['elderwood'][tier], 'elderwood')
                     items.change_stat(c, 'SP', c.SP + origin_class_stats.SP['elderwood'][tier], 'elderwood')
                     items.change_stat(c, 'MR', c.MR + origin_class_stats.MR['elderwood'][tier], 'elderwood')
                     items.change_stat(c, 'armor', c.armor + origin_class_stats.armor['elderwood'][tier], 'elderwood')
-            elderwood_list[t] += 1
+            battle.elderwood_list[t] += 1
 
 
-def enlightened(blue_team, red_team):
-    teams = {'blue': blue_team, 'red': red_team}
+def enlightened(battle):
+    teams = {'blue': battle.blue, 'red': battle.red}
 
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'enlightened')
+        tier = get_origin_class_tier(battle, t, 'enlightened')
         if(tier > 0):
             for c in teams[t]:
                 if(is_trait(c, 'enlightened')):
                     items.change_stat(c, 'mana_generation', origin_class_stats.mana_generation['enlightened'][tier], 'enlightened')
 
 
-def exile(blue_team, red_team):
-    teams = {'blue': blue_team, 'red': red_team}
+def exile(battle):
+    teams = {'blue': battle.blue, 'red': battle.red}
 
-    coords = field.coordinates
+    coords = battle.coordinates
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'exile')
+        tier = get_origin_class_tier(battle, t, 'exile')
         if tier > 0:
             for c in teams[t]:
                 if is_trait(c, 'exile'):
@@ -355,11 +319,11 @@ def exile(blue_team, red_team):
                             items.change_stat(c, 'lifesteal', lifesteal, 'exile')
 
 
-def ninja(blue_team, red_team):
-    teams = {'blue': blue_team, 'red': red_team}
+def ninja(battle):
+    teams = {'blue': battle.blue, 'red': battle.red}
 
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'ninja')
+        tier = get_origin_class_tier(battle, t, 'ninja')
         if(tier > 0):
             for c in teams[t]:
                 if(is_trait(c, 'ninja')):
@@ -368,9 +332,9 @@ def ninja(blue_team, red_team):
                     items.change_stat(c, 'SP', c.SP + origin_class_stats.SP['ninja'][tier], 'ninja')
 
 
-spirit_list = [] # champion, champion, champion (the ones who have casted)
 def spirit(champion):
-    tier = get_origin_class_tier(champion.team, 'spirit')
+    spirit_list = champion.battle.spirit_list
+    tier = get_origin_class_tier(champion.battle, champion.team, 'spirit')
     if(tier > 0 and champion not in spirit_list):
         multiplier = origin_class_stats.AS['spirit'][tier]
         own_team = champion.own_team()
@@ -383,7 +347,7 @@ def the_boss(champion):
     champion.done_situps = True
 
     own_team = champion.own_team()
-    coords = field.coordinates
+    coords = champion.battle.coordinates
     if len(own_team) > 1:
         # set champion.champion = False
         # free the hex he's at
@@ -405,7 +369,7 @@ def the_boss(champion):
 
 # do sit-ups and return when needed
 def the_boss_helper(champion):
-    coords = field.coordinates
+    coords = champion.battle.coordinates
 
     if len(champion.own_team()) > 1:
         champion.print(' sit-up')
@@ -447,15 +411,15 @@ def the_boss_helper(champion):
         champion.add_que('execute_function', origin_class_stats.length['the_boss'], [the_boss_helper, {}])
 
 
-def warlord(blue_team, red_team):
-    teams = {'blue': blue_team, 'red': red_team}
+def warlord(battle):
+    teams = {'blue': battle.blue, 'red': battle.red}
 
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'warlord')
+        tier = get_origin_class_tier(battle, t, 'warlord')
         if tier > 0:
             for c in teams[t]:
                 if is_trait(c, 'warlord'):
-                    wins = config.WARLORD_WINS[t]
+                    wins = battle.warlord_wins[t]
                     if wins > 5:
                         wins = 5
 
@@ -469,11 +433,11 @@ def warlord(blue_team, red_team):
                     items.change_stat(c, 'SP', c.SP + SP_add, 'warlord')
 
 
-def adept(blue_team, red_team):
-    teams = {'blue': blue_team, 'red': red_team}
+def adept(battle):
+    teams = {'blue': battle.blue, 'red': battle.red}
 
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'adept')
+        tier = get_origin_class_tier(battle, t, 'adept')
         if tier > 0:
             enemies = teams[t][0].enemy_team()
             for e in enemies:
@@ -482,11 +446,11 @@ def adept(blue_team, red_team):
                           {'ezreal': origin_class_stats.AS['adept']})
 
 
-def assassin(blue_team, red_team):
-    teams = {'blue': blue_team, 'red': red_team}
+def assassin(battle):
+    teams = {'blue': battle.blue, 'red': battle.red}
 
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'assassin')
+        tier = get_origin_class_tier(battle, t, 'assassin')
         for c in teams[t]:
             if is_trait(c, 'assassin'):
 
@@ -498,17 +462,17 @@ def assassin(blue_team, red_team):
 
                 items.change_stat(c, 'champion', False, '  assassin')
                 items.change_stat(c, 'stunned', True, '  assassin')
-                field.coordinates[c.y][c.x] = None
+                battle.coordinates[c.y][c.x] = None
                 # allows the units to "swap" places instead of treating the hex as taken
 
                 c.add_que('execute_function', config.LEAP_DELAY, [field.leap_to_back_line, {'trait': '  assassin'}])
 
 
-def brawler(blue_team, red_team):
-    teams = {'blue': blue_team, 'red': red_team}
+def brawler(battle):
+    teams = {'blue': battle.blue, 'red': battle.red}
 
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'brawler')
+        tier = get_origin_class_tier(battle, t, 'brawler')
         if tier > 0:
             for c in teams[t]:
                 if is_trait(c, 'brawler'):
@@ -519,7 +483,7 @@ def brawler(blue_team, red_team):
 
 
 def dazzler(champion, target):
-    tier = get_origin_class_tier(champion.team, 'dazzler')
+    tier = get_origin_class_tier(champion.battle, champion.team, 'dazzler')
 
     if tier > 0:
         # self.AD_reduction_cc = False #ludens counts dazzler ad reduction as crowd control so adding a flag for dat
@@ -539,11 +503,11 @@ def dazzler(champion, target):
 
 
 # change the movement speed of the units
-def duelist(blue_team, red_team):
-    teams = {'blue': blue_team, 'red': red_team}
+def duelist(battle):
+    teams = {'blue': battle.blue, 'red': battle.red}
 
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'duelist')
+        tier = get_origin_class_tier(battle, t, 'duelist')
         if tier > 0:
             for c in teams[t]:
                 if is_trait(c, 'duelist'):
@@ -553,12 +517,10 @@ def duelist(blue_team, red_team):
 
 
 # AS changes
-duelist_helper_list = []  # [champion, stacks]
-
-
 def duelist_helper(champion):
+    duelist_helper_list = champion.battle.duelist_helper_list
 
-    tier = get_origin_class_tier(champion.team, 'duelist')
+    tier = get_origin_class_tier(champion.battle, champion.team, 'duelist')
     stacks = -1
     if tier > 0:
 
@@ -579,7 +541,7 @@ def duelist_helper(champion):
 
 
 # set the emperor to be the overlord of the statue thingy
-def emperor(blue_team, red_team):
+def emperor(battle):
     ...
     # teams = {'blue': blue_team, 'red': red_team}
     #
@@ -600,7 +562,7 @@ def fortune():
 def hunter(team):
     if team:
         ally_unit = team[0]
-        tier = get_origin_class_tier(ally_unit.team, 'hunter')
+        tier = get_origin_class_tier(ally_unit.battle, ally_unit.team, 'hunter')
         if tier > 0:
             for c in team:
                 enemy_team = ally_unit.enemy_team()
@@ -613,12 +575,12 @@ def hunter(team):
                     c.attack(bonus_damage, target, False, 'hunter')
 
 
-def keeper(blue_team, red_team):
-    teams = {'blue': blue_team, 'red': red_team}
-    coords = field.coordinates
+def keeper(battle):
+    teams = {'blue': battle.blue, 'red': battle.red}
+    coords = battle.coordinates
 
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'keeper')
+        tier = get_origin_class_tier(battle, t, 'keeper')
         if tier > 0:
             for c in teams[t]:
                 if is_trait(c, 'keeper'):
@@ -643,22 +605,22 @@ def keeper(blue_team, red_team):
                                       {'increase': True, 'expires': length})
 
 
-def mage(blue_team, red_team):
-    teams = {'blue': blue_team, 'red': red_team}
+def mage(battle):
+    teams = {'blue': battle.blue, 'red': battle.red}
 
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'mage')
+        tier = get_origin_class_tier(battle, t, 'mage')
         if tier > 0:
             for c in teams[t]:
                 if is_trait(c, 'mage'):
                     items.change_stat(c, 'SP', c.SP + (origin_class_stats.SP['mage'][tier] - 1), 'mage')
 
 
-def moonlight(blue_team, red_team):
-    teams = {'blue': blue_team, 'red': red_team}
+def moonlight(battle):
+    teams = {'blue': battle.blue, 'red': battle.red}
 
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'moonlight')
+        tier = get_origin_class_tier(battle, t, 'moonlight')
         if tier > 0:
             c_level = []
             for i, c in enumerate(teams[t]):
@@ -669,40 +631,38 @@ def moonlight(blue_team, red_team):
                 teams[t][c_level[i][2]].golden()
 
 
-def mystic(blue_team, red_team):
-    teams = {'blue': blue_team, 'red': red_team}
+def mystic(battle):
+    teams = {'blue': battle.blue, 'red': battle.red}
 
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'mystic')
+        tier = get_origin_class_tier(battle, t, 'mystic')
         if tier > 0:
             for c in teams[t]:
                 if is_trait(c, 'mystic'):
                     items.change_stat(c, 'MR', c.MR + origin_class_stats.MR['mystic'][tier], 'mystic')
 
 
-def shade(blue_team, red_team):
-    teams = {'blue': blue_team, 'red': red_team}
+def shade(battle):
+    teams = {'blue': battle.blue, 'red': battle.red}
 
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'shade')
+        tier = get_origin_class_tier(battle, t, 'shade')
         for c in teams[t]:
             if is_trait(c, 'shade'):
 
                 items.change_stat(c, 'champion', False, '  shade')
                 items.change_stat(c, 'stunned', True, '  shade')
-                field.coordinates[c.y][c.x] = None
+                battle.coordinates[c.y][c.x] = None
                 # allows the units to "swap" places instead of treating the hex as taken
 
                 c.add_que('execute_function', config.LEAP_DELAY, [field.leap_to_back_line, {'trait': '  shade'}])
 
 
-shade_helper_list = []  # [champion, attacks]
-
-
 def shade_helper(champion):
     if not champion.target: field.find_target(champion)
+    shade_helper_list = champion.battle.shade_helper_list
 
-    tier = get_origin_class_tier(champion.team, 'shade')
+    tier = get_origin_class_tier(champion.battle, champion.team, 'shade')
     if tier > 0:
         attacks = 1
         if len(list(filter(lambda x: x[0] == champion, shade_helper_list))) == 0:
@@ -725,7 +685,7 @@ def shade_helper(champion):
 
 
 def sharpshooter(champion, target, damage, true_damage, spell):
-    tier = get_origin_class_tier(champion.team, 'sharpshooter')
+    tier = get_origin_class_tier(champion.battle, champion.team, 'sharpshooter')
     if tier > 0 and is_trait(champion, 'sharpshooter'):
 
         bounces = origin_class_stats.targets['sharpshooter'][tier]
@@ -738,7 +698,7 @@ def sharpshooter(champion, target, damage, true_damage, spell):
         for i in range(0, bounces):
             enemy_team = champion.enemy_team()
             possible_targets = list(filter(lambda x: x != last_target, enemy_team))
-            random.shuffle(possible_targets)
+            champion.battle.random.shuffle(possible_targets)
 
             # continue if total more than one enemy left
             if len(possible_targets) > 0:
@@ -757,12 +717,15 @@ def tormented():
     return
 
 
-def vanguard(blue_team, red_team):
-    teams = {'blue': blue_team, 'red': red_team}
+def vanguard(battle):
+    teams = {'blue': battle.blue, 'red': battle.red}
 
     for t in ['blue', 'red']:
-        tier = get_origin_class_tier(t, 'vanguard')
+        tier = get_origin_class_tier(battle, t, 'vanguard')
         if tier > 0:
             for c in teams[t]:
                 if is_trait(c, 'vanguard'):
                     items.change_stat(c, 'armor', c.armor + origin_class_stats.armor['vanguard'][tier], 'vanguard')
+
+
+handlers.TRAIT_INITS[:] = [globals()[trait] for trait in TRAITS if trait in origin_class_stats.initiate_traits]
@@ -1747,7 +1747,7 @@ class Player:
         for x in range(9):
             if self.bench[x]:
                 if self.bench[x].name == 'kayn':
-                    self.bench[x].kaynform = kayn_item
+                    self.bench[x].kayn_form = kayn_item
 
     def update_team_tiers(self):
         """Updates the team_tiers dictionary with the current team composition.
@@ -1,5 +1,6 @@
 import Simulator.config as config
 import numpy as np
+from Simulator.observation.token.action import ActionToken
 from functools import wraps
 from time import time
 
@@ -46,6 +47,10 @@ def timed(f):
 def decode_action(str_actions):
     actions = []
     for str_action in str_actions:
+        if not isinstance(str_action, str):
+            # Flat index in the 55x38 action space, that's what the MCTS returns
+            actions.append(np.asarray(ActionToken.action_space_to_action(int(str_action))))
+            continue
         num_items = str_action.count("_")
         split_action = str_action.split("_")
         element_list = []
@@ -35,11 +35,16 @@ class AIInterface:
         while True:
             weights = global_agent.get_weights()
             buffers = BufferWrapper(global_buffer)
+            stored = global_buffer.gameplay_experiences.stored
             data_workers.collect_gameplay_experience(env, buffers, weights)
 
-            while global_buffer.available_batch():
+            # Sampling doesn't take samples out of the buffer, so train a batch for every batch worth of new samples
+            if not global_buffer.available_batch():
+                continue
+            for _ in range((global_buffer.gameplay_experiences.stored - stored) // global_buffer.batch_size):
                 gameplay_experience_batch = global_buffer.sample_batch()
-                trainer.train_network(gameplay_experience_batch, train_step)
+                priorities = trainer.train_network(gameplay_experience_batch, train_step)
+                global_buffer.update_priorities(gameplay_experience_batch[-1], priorities)
                 train_step += 1
                 if train_step % 100 == 0:
                     global_agent.tft_save_model(train_step)
@@ -1,11 +1,12 @@
 import config
 import numpy as np
-from Concurrency.priority_queue import PriorityBuffer
+from Concurrency.sum_tree import SumTreeBuffer
+from Concurrency.replay_columns import ReplayColumns, OBSERVATION_SIZES
 
 class GlobalBuffer:
     def __init__(self):
-        self.gameplay_experiences = PriorityBuffer(10000)
-        self.average_position = PriorityBuffer(10000)
+        self.gameplay_experiences = SumTreeBuffer(config.GLOBAL_BUFFER_SIZE, config.PRIORITY_ALPHA)
+        self.replay_columns = ReplayColumns(config.GLOBAL_BUFFER_SIZE)
         self.batch_size = config.BATCH_SIZE
 
     def sample_batch(self):
@@ -17,73 +18,35 @@ class GlobalBuffer:
                     - There is enough data in the buffer to train on.
 
                 Returns:
-                    A prepared batch ready for training.
+                    A prepared batch ready for training. The last entry is the ids of the samples for
+                    update_priorities.
                 """
-        obs_tensor_batch, action_history_batch, target_value_batch, policy_mask_batch = [], [], [], []
-        target_reward_batch, target_policy_batch, value_mask_batch, reward_mask_batch = [], [], [], []
-        sample_set_batch, tier_batch, final_tier_batch, champion_batch, position_batch = [], [], [], [], []
-        importance_weights = []
-        for batch_num in range(self.batch_size):
-            # Setting the position gameplay_experiences get and position get next to each other to minimize
-            # the number of multiprocessing errors that could occur by having them too far apart.
-            # If these two commands become out of sync, it would cause the position logging to not match the rest
-            # of the training logs, but it would not break training.
-            [observation, action_history, value_mask, reward_mask, policy_mask, value, reward, policy,
-             sample_set, tier_set, final_tier_set, champion_set], priority = self.gameplay_experiences.extractMax()
-            position, _ = self.average_position.extractMax()
-            position_batch.append(position)
-            obs_tensor_batch.append(observation)
-            action_history_batch.append(action_history[1:])
-            value_mask_batch.append(value_mask)
-            reward_mask_batch.append(reward_mask)
-            policy_mask_batch.append(policy_mask)
-            target_value_batch.append(value)
-            target_reward_batch.append(reward)
-            target_policy_batch.append(policy)
-            sample_set_batch.append(sample_set)
-            tier_batch.append(tier_set)
-            final_tier_batch.append(final_tier_set)
-            champion_batch.append(champion_set)
-            importance_weights.append(1 / self.batch_size / priority)
-
-        observation_batch = self.reshape_observation(obs_tensor_batch)
-        action_history_batch = np.asarray(action_history_batch)
-        target_value_batch = np.asarray(target_value_batch).astype('float32')
-        target_reward_batch = np.asarray(target_reward_batch).astype('float32')
-        value_mask_batch = np.asarray(value_mask_batch).astype('float32')
-        reward_mask_batch = np.asarray(reward_mask_batch).astype('float32')
-        policy_mask_batch = np.asarray(policy_mask_batch).astype('float32')
-        importance_weights_batch = np.asarray(importance_weights).astype('float32')
-        importance_weights_batch = importance_weights_batch / np.max(importance_weights_batch)
-        position_batch = np.asarray(position_batch)
-        position_batch = np.mean(position_batch)
+        slots, sample_ids, importance_weights_batch = self.gameplay_experiences.sample(self.batch_size, config.PRIORITY_BETA)
+        batch = self.replay_columns.read(slots)
 
+        observation_batch = {key: batch[key] for key in OBSERVATION_SIZES}
         data_list = [
-            observation_batch, action_history_batch, value_mask_batch, reward_mask_batch,
-            policy_mask_batch, target_value_batch, target_reward_batch, target_policy_batch, sample_set_batch,
-            importance_weights_batch, tier_batch, final_tier_batch, champion_batch, np.array(position_batch)
+            observation_batch, batch["action"].astype(np.int64), batch["value_mask"], batch["reward_mask"],
+            batch["policy_mask"], batch["value"], batch["reward"], batch["policy"], batch.get("policy_index"),
+            importance_weights_batch, batch["tier"], batch["final_tier"], batch["champion"],
+            np.array(np.mean(batch["position"])), sample_ids
         ]
         return np.array(data_list, dtype=object)
 
-    def reshape_observation(self, obs_batch):
-        obs_reshaped = {}
-
-        for obs in obs_batch:
-            for key in obs:
-                if key not in obs_reshaped:
-                    obs_reshaped[key] = []
-                obs_reshaped[key].append(obs[key])
-
-        for key in obs_reshaped:
-            obs_reshaped[key] = np.stack(obs_reshaped[key], axis=0)
-
-        return obs_reshaped
-
     def store_replay_sequence(self, samples):
-        for sample in samples[0]:
-            if self.gameplay_experiences.size / 25000 < 0.9 and sample[0] > 1:
-                self.gameplay_experiences.insert(sample[0], sample[1])
-                self.average_position.insert(sample[0], samples[1])
+        priorities, columns, opponents = samples
+        stored = np.isfinite(priorities)
+        if not stored.all():
+            priorities = priorities[stored]
+            columns = {key: column[stored] for key, column in columns.items()}
+        sample_ids = self.gameplay_experiences.insert(priorities)
+        # Only the newest samples are kept if there are more than fit into the buffer
+        dropped = len(priorities) - len(sample_ids)
+        self.replay_columns.write(sample_ids % config.GLOBAL_BUFFER_SIZE,
+                                  {key: column[dropped:] for key, column in columns.items()}, opponents)
+
+    def update_priorities(self, sample_ids, priorities):
+        self.gameplay_experiences.update_priorities(sample_ids, priorities)
 
     def available_batch(self):
         queue_length = self.gameplay_experiences.size
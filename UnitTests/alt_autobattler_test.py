@@ -0,0 +1,22 @@
+from Simulator.alt_autobattler import alt_auto_battle, alt_auto_battle_pairs
+from Simulator.champion import champion
+from Simulator.player import Player
+from Simulator.pool import pool
+from UnitTests.combat_pool_test import setup
+
+
+def test_batch_matches_alt_auto_battle():
+    player1, player2 = setup()
+    player1.update_team_tiers()
+    player2.update_team_tiers()
+    empty = Player(pool(), 2)
+    other = Player(pool(), 3)
+    other.board[2][1] = champion("yone", None, 0, 0, 3, None, None, None, False)
+    other.update_team_tiers()
+
+    pairs = [(player1, player2), (player2, player1), (player1, player1), (empty, player2), (other, player1),
+             (empty, empty)]
+    for round_damage in [0, 3]:
+        expected = [alt_auto_battle(blue, red, round_damage) for blue, red in pairs]
+        assert alt_auto_battle_pairs(pairs, round_damage) == expected
+    assert alt_auto_battle_pairs([]) == []
@@ -0,0 +1,39 @@
+import asyncio
+import numpy as np
+from Concurrency.batch_prefetcher import BatchPrefetcher
+
+
+class CountingBuffer:
+    def __init__(self):
+        self.batch_ready = asyncio.Event()
+        self.sampled = 0
+
+    async def wait_for_batch(self):
+        await self.batch_ready.wait()
+
+    async def sample_batch(self):
+        self.sampled += 1
+        return np.array([self.sampled], dtype=object)
+
+
+def test_prefetcher_keeps_depth_batches_ready():
+    async def run():
+        buffer = CountingBuffer()
+        prefetcher = BatchPrefetcher(buffer, depth=2, device="cpu")
+        prefetcher.start()
+        await asyncio.sleep(0.01)
+        # Nothing is sampled before the buffer holds a batch
+        assert buffer.sampled == 0
+        buffer.batch_ready.set()
+        await asyncio.sleep(0.01)
+        assert prefetcher.ready() == 2
+
+        batch, _ = await prefetcher.get()
+        assert batch[0] == 1
+        await asyncio.sleep(0.01)
+        assert prefetcher.ready() == 2
+        batch, _ = await prefetcher.get()
+        assert batch[0] == 2
+        prefetcher.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,26 @@
+from Simulator.battle_cache import BattleCache
+from Simulator.combat_pool import CombatResult
+from UnitTests.combat_pool_test import setup
+
+
+def test_samples_before_hits():
+    cache = BattleCache(10, samples=3)
+    player1, player2 = setup()
+    results = [cache.run(player1, player2, 3) for _ in range(20)]
+
+    assert cache.misses == 3
+    assert cache.hits == 17
+    # every cached result is one of the battles that were really played
+    played = cache.entries[next(iter(cache.entries))]
+    assert len(played) == 3
+    assert all(result in played for result in results)
+
+
+def test_least_recently_used_dropped():
+    cache = BattleCache(2)
+    for key in ['a', 'b', 'c']:
+        cache.put(key, CombatResult(1, 0, [], []))
+        cache.get('a', 1)
+    assert list(cache.entries) == ['c', 'a']
+    assert cache.evictions == 1
+    assert cache.stats()['board_pairs'] == 2
@@ -0,0 +1,70 @@
+import random
+from Simulator.player import Player
+from Simulator.pool import pool
+from Simulator.champion import champion, run
+from Simulator.battle_context import BattleContext
+
+
+def setup():
+    """Creates two players with a small board each"""
+    base_pool = pool()
+    player1 = Player(base_pool, 0)
+    player2 = Player(base_pool, 1)
+    player1.board[0][0] = champion("zilean", None, 0, 0, 2, None, None, None, False)
+    player1.board[3][1] = champion("yone", None, 0, 0, 2, ['bf_sword'], None, None, False)
+    player1.board[5][0] = champion("jhin", None, 0, 0, 1, None, None, None, False)
+    player2.board[1][0] = champion("nunu", None, 0, 0, 2, None, None, None, False)
+    player2.board[4][2] = champion("riven", None, 0, 0, 2, None, None, None, False)
+    player2.board[6][3] = champion("vayne", None, 0, 0, 1, None, None, None, False)
+    return player1, player2
+
+
+def run_seeded(seed, event_skipping=None, tracing=True):
+    player1, player2 = setup()
+    battle = BattleContext(player1.win_streak, player2.win_streak, random.Random(seed), event_skipping, tracing)
+    result = run(champion, player1, player2, 3, battle)
+    return result, battle
+
+
+def combat_log(battle):
+    """The log without the wall clock column that every unit line ends with"""
+    return [str(line)[:132] for line in battle.log]
+
+
+def test_seeded_battle_is_deterministic():
+    result_1, battle_1 = run_seeded(5)
+    result_2, battle_2 = run_seeded(5)
+    assert result_1 == result_2
+    assert combat_log(battle_1) == combat_log(battle_2)
+    assert battle_1.millis() == battle_2.millis()
+
+
+def test_event_skipping_matches_fixed_ticks():
+    for seed in range(5):
+        result_ticks, battle_ticks = run_seeded(seed, event_skipping=False)
+        result_skipping, battle_skipping = run_seeded(seed, event_skipping=True)
+        assert result_ticks == result_skipping
+        assert combat_log(battle_ticks) == combat_log(battle_skipping)
+        assert battle_ticks.millis() == battle_skipping.millis()
+
+
+def test_tracing_does_not_change_the_battle():
+    result_traced, battle_traced = run_seeded(3)
+    result, battle = run_seeded(3, tracing=False)
+    assert result == result_traced
+    assert battle.millis() == battle_traced.millis()
+    assert len(battle.events) == 0 and battle.log == []
+    assert 'BLUE TEAM WON' in battle_traced.log or 'RED TEAM WON' in battle_traced.log
+
+
+def test_battles_do_not_share_state():
+    result_1, battle_1 = run_seeded(5)
+    log_1 = list(battle_1.log)
+    que_1 = list(battle_1.que)
+
+    run_seeded(6)
+
+    # the second battle must not touch anything that belongs to the first one
+    assert battle_1.log == log_1
+    assert list(battle_1.que) == que_1
+    assert all(u.battle is battle_1 for u in battle_1.blue + battle_1.red)
@@ -0,0 +1,50 @@
+import random
+from Simulator.player import Player
+from Simulator.pool import pool
+from Simulator.champion import champion, run
+from Simulator.battle_context import BattleContext
+from Simulator.combat_pool import CombatExecutor, combat_job, apply_survivors
+
+
+def setup():
+    """Creates two players with a small board each"""
+    base_pool = pool()
+    player1 = Player(base_pool, 0)
+    player2 = Player(base_pool, 1)
+    player1.board[0][0] = champion("zilean", None, 0, 0, 2, None, None, None, False)
+    player1.board[3][1] = champion("yone", None, 0, 0, 2, ['bf_sword'], None, None, False)
+    player1.board[5][0] = champion("jhin", None, 0, 0, 1, None, None, None, False)
+    player2.board[1][0] = champion("nunu", None, 0, 0, 2, None, None, None, False)
+    player2.board[4][2] = champion("riven", None, 0, 0, 2, None, None, None, False)
+    player2.board[6][3] = champion("vayne", None, 0, 0, 1, None, None, None, False)
+    return player1, player2
+
+
+def survivors(player):
+    return [(x, y) for x in range(7) for y in range(4) if player.board[x][y] and player.board[x][y].survive_combat]
+
+
+def test_job_matches_battle_on_the_players():
+    for seed in range(4):
+        player1, player2 = setup()
+        battle = BattleContext(player1.win_streak, player2.win_streak, random.Random(seed))
+        expected = run(champion, player1, player2, 3, battle)
+
+        pool_player1, pool_player2 = setup()
+        result = CombatExecutor(0).run([combat_job(pool_player1, pool_player2, 3, seed)])[0]
+        apply_survivors(pool_player1, result.blue_survivors)
+        apply_survivors(pool_player2, result.red_survivors)
+
+        assert (result.index_won, result.damage) == expected
+        assert survivors(pool_player1) == survivors(player1)
+        assert survivors(pool_player2) == survivors(player2)
+
+
+def test_pool_matches_in_process():
+    player1, player2 = setup()
+    jobs = [combat_job(player1, player2, 3, seed) for seed in range(6)]
+    executor = CombatExecutor(2)
+    try:
+        assert executor.run(jobs) == CombatExecutor(0).run(jobs)
+    finally:
+        executor.shutdown()
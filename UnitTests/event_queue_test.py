@@ -0,0 +1,47 @@
+from Simulator.event_queue import EventQueue
+
+
+def entry(action, unit, time, stat=None, value=None, data=None):
+    return [action, unit, time, None, stat, value, data if data is not None else {}]
+
+
+def test_same_order_as_stable_sort():
+    """Entries with the same time come out in the order they were added, like the old sorted list"""
+    que = EventQueue()
+    entries = [entry('heal', 'a', t) for t in [50, 25, 50, 0, 25, 50, -1]]
+    for e in entries:
+        que.push(e)
+    expected = sorted(entries, key=lambda x: x[2])
+    assert list(que) == expected
+    assert [que.pop() for _ in range(len(entries))] == expected
+    assert len(que) == 0
+
+
+def test_cancel_by_handle_and_tag():
+    que = EventQueue()
+    idle = que.push(entry('clear_idle', 'a', 10))
+    que.push(entry('change_stat', 'a', 20, 'stunned', False))
+    que.push(entry('change_stat', 'a', 30, 'stunned', True))
+    que.push(entry('change_stat', 'b', 40, 'stunned', False))
+    que.push(entry('change_stat', 'a', 50, 'stunned', False))
+
+    que.cancel(idle)
+    que.cancel_tag(('stunned_removal', 'a'))
+    assert len(que) == 2
+    assert [e[2] for e in que] == [30, 40]
+    assert que.peek()[2] == 30
+
+    # cancelling something that already left the que does nothing
+    que.cancel(idle)
+    assert len(que) == 2
+
+
+def test_replace():
+    que = EventQueue()
+    que.push(entry('heal', 'a', 10))
+    kept = entry('clear_idle', 'b', 20)
+    que.push(kept)
+    que.replace([kept])
+    assert list(que) == [kept]
+    que.cancel_tag(('clear_idle', 'b'))
+    assert not que
@@ -0,0 +1,21 @@
+import Simulator.config as config
+from Simulator import ability, active, handlers, item_stats, items, origin_class, origin_class_stats, stats
+from Simulator.battle_context import TRAITS
+
+
+def test_tables_match_the_modules():
+    for name in handlers.CHAMPION_NAMES:
+        champion_id = handlers.CHAMPION_IDS[name]
+        assert handlers.ABILITIES[champion_id] is getattr(ability, name, None)
+        if name in stats.INITIATIVE_ACTIVE:
+            assert handlers.INIT_HOOKS[champion_id] is getattr(active, name + '_init')
+        else:
+            assert handlers.INIT_HOOKS[champion_id] is None
+        if name in config.ATTACK_PASSIVES:
+            assert handlers.ATTACK_PASSIVES[champion_id] is getattr(active, name)
+        else:
+            assert handlers.ATTACK_PASSIVES[champion_id] is None
+
+    assert handlers.ITEM_INITS == {item: getattr(items, item) for item in item_stats.initiative_items}
+    assert handlers.TRAIT_INITS == [getattr(origin_class, trait) for trait in TRAITS
+                                    if trait in origin_class_stats.initiate_traits]
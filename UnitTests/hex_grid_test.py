@@ -0,0 +1,40 @@
+from Simulator import field, hex_grid
+
+
+def test_tables_match_field():
+    for a, (y1, x1) in enumerate(hex_grid.COORDS):
+        assert sorted(hex_grid.NEIGHBORS[a]) == sorted(b for b in range(hex_grid.SIZE)
+                                                      if hex_grid.DISTANCE[a][b] == 1)
+        for b, (y2, x2) in enumerate(hex_grid.COORDS):
+            expected = field.distance({'y': y1, 'x': x1}, {'y': y2, 'x': x2}, False)
+            assert hex_grid.DISTANCE[a][b] == expected
+            assert b in hex_grid.RINGS[a][int(expected)]
+            assert (hex_grid.RING_MASKS[a][int(expected)] >> b) & 1
+
+
+def test_bfs_walks_around_a_wall():
+    start = hex_grid.index(0, 3)
+    goal = hex_grid.index(4, 3)
+    # wall over the whole second row except the last hex
+    wall = 0
+    for x in range(hex_grid.WIDTH - 1):
+        wall |= 1 << hex_grid.index(2, x)
+
+    path = hex_grid.bfs_path(start, goal, wall)
+    assert path[-1] == goal
+    assert hex_grid.index(2, hex_grid.WIDTH - 1) in path
+    assert all(not (wall >> i) & 1 for i in path)
+    # every step goes to a neighbor
+    for a, b in zip([start] + path, path):
+        assert b in hex_grid.NEIGHBORS[a]
+
+
+def test_bfs_blocked_goal():
+    start = hex_grid.index(0, 0)
+    goal = hex_grid.index(7, 6)
+    closed = 0
+    for n in hex_grid.NEIGHBORS[goal]:
+        closed |= 1 << n
+    assert hex_grid.bfs_path(start, goal, closed) is None
+    # the goal itself may be taken, that's the unit the path leads to
+    assert hex_grid.bfs_path(start, goal, 1 << goal)[-1] == goal
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+import torch
+import config
+
+if not torch.cuda.is_available():
+    config.DEVICE = "cpu"
+
+from Models.MuZero_torch_agent import MuZeroNetwork
+from Models.inference_export import ExportedNetwork
+
+OBSERVATION_SIZES = {
+    "scalars": config.SCALAR_INPUT_SIZE,
+    "shop": config.SHOP_INPUT_SIZE,
+    "board": config.BOARD_INPUT_SIZE,
+    "bench": config.BENCH_INPUT_SIZE,
+    "items": config.ITEMS_INPUT_SIZE,
+    "traits": config.TRAIT_INPUT_SIZE,
+    "other_players": config.OTHER_PLAYER_INPUT_SIZE
+}
+
+# Largest absolute difference to the network of the hidden state and policy logits, and of the value and reward
+TOLERANCES = {"fp32": (1e-4, 1e-2), "bf16": (0.1, 0.5), "int8": (0.1, 0.5)}
+
+
+@pytest.mark.parametrize("precision", ["fp32", "bf16", "int8"])
+def test_exported_network_matches_the_network(precision):
+    torch.manual_seed(0)
+    rng = np.random.default_rng(0)
+    model_config = config.ModelConfig()
+    network = MuZeroNetwork(model_config).eval()
+    exported = ExportedNetwork(network, model_config, precision)
+    observation = {key: rng.random((8, size), dtype=np.float32) for key, size in OBSERVATION_SIZES.items()}
+    action = np.stack([rng.integers(0, config.ACTION_DIM[0], 8), rng.integers(0, config.ACTION_DIM[1], 8),
+                       rng.integers(0, config.ACTION_DIM[1], 8)], axis=-1)
+
+    state_tolerance, value_tolerance = TOLERANCES[precision]
+    with torch.no_grad():
+        expected = network.initial_inference(observation)
+        output = exported.initial_inference(observation)
+        for key, tolerance in (("hidden_state", state_tolerance), ("policy_logits", state_tolerance),
+                               ("value", value_tolerance)):
+            assert (output[key].float().cpu() - expected[key].cpu()).abs().max() <= tolerance
+
+        # Both step from the hidden state of the network, so the differences don't add up
+        hidden_state = expected["hidden_state"]
+        expected = network.recurrent_inference(hidden_state, action)
+        output = exported.recurrent_inference(hidden_state, action)
+        for key, tolerance in (("hidden_state", state_tolerance), ("policy_logits", state_tolerance),
+                               ("value", value_tolerance), ("reward", value_tolerance)):
+            assert (output[key].float().cpu() - expected[key].cpu()).abs().max() <= tolerance
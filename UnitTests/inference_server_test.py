@@ -0,0 +1,51 @@
+import asyncio
+import numpy as np
+import torch
+from Concurrency.inference_server import InferenceBatcher
+
+
+class AddNetwork:
+    """Adds the action to the hidden state and remembers the size of every batch"""
+    def __init__(self):
+        self.batch_sizes = []
+
+    def initial_inference(self, observation):
+        self.batch_sizes.append(len(observation["shop"]))
+        return {"hidden_state": torch.as_tensor(observation["shop"]), "value": torch.zeros(len(observation["shop"]))}
+
+    def recurrent_inference(self, hidden_state, action):
+        self.batch_sizes.append(len(action))
+        return {"hidden_state": hidden_state + torch.as_tensor(action), "value": hidden_state.sum(-1)}
+
+
+def test_requests_are_batched_and_scattered():
+    network = AddNetwork()
+    batcher = InferenceBatcher(network, max_batch_size=12, timeout=10, device="cpu")
+
+    async def requests():
+        return await asyncio.gather(*[
+            batcher.recurrent_inference(torch.full((4, 3), float(i)), np.full((4, 3), i)) for i in range(3)])
+
+    outputs = asyncio.run(requests())
+    # 12 rows start the batch right away, without waiting for the timeout
+    assert network.batch_sizes == [12]
+    for i, output in enumerate(outputs):
+        assert torch.equal(output["hidden_state"], torch.full((4, 3), 2. * i))
+        assert torch.equal(output["value"], torch.full((4,), 3. * i))
+    assert batcher.stats()['mean_batch_size'] == 12
+
+
+def test_partial_batch_runs_after_timeout():
+    network = AddNetwork()
+    batcher = InferenceBatcher(network, max_batch_size=64, timeout=0.01, device="cpu")
+
+    async def requests():
+        first = await batcher.initial_inference({"shop": np.ones((2, 5), dtype=np.float32)})
+        second = await asyncio.gather(batcher.initial_inference({"shop": np.zeros((1, 5), dtype=np.float32)}),
+                                      batcher.recurrent_inference(torch.zeros((3, 3)), np.ones((3, 3))))
+        return first, second
+
+    first, (second, recurrent) = asyncio.run(requests())
+    assert network.batch_sizes == [2, 1, 3]
+    assert first["hidden_state"].shape == (2, 5) and second["hidden_state"].shape == (1, 5)
+    assert torch.equal(recurrent["hidden_state"], torch.ones((3, 3), dtype=torch.float64))
@@ -0,0 +1,146 @@
+import numpy as np
+import config
+import core.ctree.cytree as tree
+from Models.MCTS_torch import MCTS
+from Models import MCTS_Util as utils
+from Simulator.observation.token.action import ActionToken
+
+
+def test_action_codes_match_action_space():
+    for code in range(55 * 38):
+        assert list(utils.decode_action_codes([code])[0]) == ActionToken.action_space_to_action(code)
+
+
+def test_tree_returns_action_codes():
+    codes = [1976, 1786, 1599, 0]
+    roots = tree.Roots(2, 1, len(codes))
+    # the second root only has 2 actions, the rest of its row is padding
+    roots.prepare_no_noise(np.zeros(2, dtype=np.float32), np.zeros((2, 4), dtype=np.float32),
+                           np.array([codes, codes], dtype=np.int32), np.array([3, 2], dtype=np.int32))
+    assert [len(distribution) for distribution in roots.get_distributions()] == [3, 2]
+
+    results = tree.ResultsWrapper(2)
+    x, y, last_actions = tree.batch_traverse(roots, 19652, 1.25, 0.997, tree.MinMaxStatsList(2), results)
+    assert list(x) == [0, 0] and list(y) == [0, 1]
+    assert last_actions[0] in codes[:3] and last_actions[1] in codes[:2]
+    assert utils.decode_action_codes(last_actions).shape == (2, 3)
+
+
+def test_sample_is_padded_and_legal():
+    mcts = MCTS(None, config.ModelConfig)
+    mcts.NUM_ALIVE = 3
+    mask = np.zeros((3, 55, 38))
+    mask[0, 52, 0] = 1
+    mask[1, 0, :] = 1
+    mask[2] = 1
+    policy_logits, legal_actions = mcts.encode_action_to_str(np.random.rand(3, 55 * 38), mask)
+    logits, mappings, sizes = mcts.sample(policy_logits, 30)
+
+    assert sizes[0] == 1 and mappings[0][0] == 52 * 38
+    assert logits.shape == mappings.shape == (3, max(sizes))
+    for i in range(3):
+        assert all(legal_actions[i][mappings[i][:sizes[i]]])
+        assert len(set(mappings[i][:sizes[i]])) == sizes[i]
+        assert np.isclose(logits[i].sum(), 1)
+        assert not logits[i][sizes[i]:].any()
+
+
+def test_tree_reset_between_searches():
+    roots = tree.Roots(1, 2, 2)
+    min_max_stats = tree.MinMaxStatsList(1)
+    results = tree.ResultsWrapper(1)
+    for num in [1, 4, 2]:
+        roots.reset(num)
+        min_max_stats.reset(num)
+        policy = np.zeros((num, 2), dtype=np.float32)
+        mappings = np.tile(np.array([52 * 38, 53 * 38], dtype=np.int32), (num, 1))
+        sizes = np.full(num, 2, dtype=np.int32)
+        roots.prepare_no_noise(np.zeros(num, dtype=np.float32), policy, mappings, sizes)
+        # more simulations than the pool was made for
+        for simulation in range(10):
+            tree.batch_traverse(roots, 19652, 1.25, 0.997, min_max_stats, results)
+            tree.batch_back_propagate(simulation + 1, 0.997, np.zeros(num, dtype=np.float32),
+                                      np.ones(num, dtype=np.float32), policy, min_max_stats, results, mappings, sizes)
+        assert roots.num == num
+        assert roots.node_num == num * (1 + 2 * 11)
+        assert [sum(distribution) for distribution in roots.get_distributions()] == [10] * num
+
+
+def test_kept_subtree_is_grafted():
+    roots = tree.Roots(2, 10, 2)
+    min_max_stats = tree.MinMaxStatsList(2)
+    results = tree.ResultsWrapper(2)
+    policy = np.zeros((2, 2), dtype=np.float32)
+    mappings = np.tile(np.array([52 * 38, 53 * 38], dtype=np.int32), (2, 1))
+    sizes = np.full(2, 2, dtype=np.int32)
+    roots.prepare_no_noise(np.zeros(2, dtype=np.float32), policy, mappings, sizes)
+    for simulation in range(10):
+        tree.batch_traverse(roots, 19652, 1.25, 0.997, min_max_stats, results)
+        tree.batch_back_propagate(simulation + 1, 0.997, np.zeros(2, dtype=np.float32), np.ones(2, dtype=np.float32),
+                                  policy, min_max_stats, results, mappings, sizes)
+    visits = roots.get_distributions()[1][0]
+    assert visits > 1
+
+    # the first child of the second root becomes the first root, the second root starts over
+    roots.keep(np.array([1, -1], dtype=np.int32), np.array([0, 0], dtype=np.int32))
+    roots.reset(2)
+    min_max_stats.reset(2)
+    roots.prepare_no_noise(np.zeros(2, dtype=np.float32), policy, mappings, sizes)
+    sources, targets, rows = roots.graft(11, 0.997, min_max_stats)
+
+    # every visit after the first one expanded a node under the child
+    assert [sum(distribution) for distribution in roots.get_distributions()] == [visits - 1, 0]
+    assert rows == len(sources) == visits - 1
+    assert all(sources % 2 == 1)
+    assert list(targets) == [(11 + row) * 2 for row in range(rows)]
+
+
+def test_sequential_halving_schedule():
+    assert utils.considered_visits(4, 8) == (0, 0, 0, 0, 1, 1, 2, 2)
+    assert utils.considered_visits(1, 3) == (0, 1, 2)
+    assert len(utils.considered_visits(16, 50)) == 50
+
+
+def test_gumbel_top_k_is_legal_without_repeats():
+    logits = np.random.rand(2, 55 * 38)
+    logits[0, 5:] = -np.inf
+    gumbel, picked_logits, columns, sizes = utils.gumbel_top_k(logits, 16)
+    assert list(sizes) == [5, 16]
+    assert sorted(columns[0][:5]) == list(range(5))
+    assert len(set(columns[1])) == 16
+    assert np.array_equal(picked_logits[1], logits[1][columns[1]].astype(np.float32))
+
+
+def test_root_actions_are_forced():
+    codes = np.array([[52 * 38, 53 * 38, 0], [52 * 38, 53 * 38, 0]], dtype=np.int32)
+    roots = tree.Roots(2, 1, 3)
+    roots.prepare_no_noise(np.zeros(2, dtype=np.float32), np.zeros((2, 3), dtype=np.float32), codes,
+                           np.array([3, 3], dtype=np.int32))
+    results = tree.ResultsWrapper(2)
+    _, _, last_actions = tree.batch_traverse(roots, 19652, 1.25, 0.997, tree.MinMaxStatsList(2), results,
+                                             np.array([2, 1], dtype=np.int32))
+    assert list(last_actions) == [0, 53 * 38]
+
+
+def test_dirichlet_noise_matches_the_distribution():
+    np.random.seed(0)
+    alpha, width = 0.5, 6
+    valid = np.zeros((20000, 8), dtype=bool)
+    valid[:, :width] = True
+    noise = utils.dirichlet_noise(alpha, valid)
+    assert np.allclose(noise.sum(axis=1), 1) and not noise[:, width:].any()
+    # The entries of a symmetric dirichlet are beta(alpha, (width - 1) * alpha)
+    variance = (width - 1) / (width ** 2 * (width * alpha + 1))
+    assert np.allclose(noise[:, :width].mean(axis=0), 1 / width, atol=0.01)
+    assert np.allclose(noise[:, :width].var(axis=0), variance, rtol=0.1)
+
+
+def test_select_actions_matches_the_visit_distribution():
+    np.random.seed(0)
+    visits = np.tile(np.array([10, 0, 30, 60, 7], dtype=np.intc), (20000, 1))
+    valid = np.tile(np.array([True, True, True, True, False]), (20000, 1))
+    for temperature in [1.0, 0.5]:
+        expected = np.array([10, 0, 30, 60, 0]) ** (1 / temperature)
+        picked = utils.select_actions(visits, valid, temperature)
+        assert np.allclose(np.bincount(picked, minlength=5) / len(picked), expected / expected.sum(), atol=0.01)
+    assert (utils.select_actions(visits[:2], valid[:2], deterministic=True) == 3).all()
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+import config
+from Models.replay_muzero_buffer import ReplayBuffer
+from Concurrency.replay_columns import OpponentTable, ReplayColumns, NUM_OPPONENTS, OPPONENT_SIZE
+
+
+@pytest.mark.parametrize("td_steps", [-1, 3])
+def test_bootstrap_values_match_the_discounted_returns(td_steps, monkeypatch):
+    monkeypatch.setattr(config, "TD_STEPS", td_steps)
+    rng = np.random.default_rng(0)
+    buffer = ReplayBuffer()
+    buffer.root_values = rng.normal(size=12).tolist()
+    reward_correction = rng.normal(size=12)
+
+    expected = []
+    for step in range(12):
+        end = step + td_steps if td_steps > 0 else 12
+        value = buffer.root_values[end] * config.DISCOUNT ** td_steps if td_steps > 0 and end < 12 else 0.0
+        for i, reward in enumerate(reward_correction[step:end]):
+            value += reward * config.DISCOUNT ** i
+        expected.append(value)
+    assert np.allclose(buffer.bootstrap_values(reward_correction), expected)
+
+
+def test_other_players_are_stored_once_per_game():
+    public = np.random.default_rng(0).random((config.NUM_PLAYERS, OPPONENT_SIZE), dtype=np.float32)
+    # Every player sees the public observations of the others
+    other_players = np.stack([np.concatenate([public[opponent] for opponent in range(config.NUM_PLAYERS)
+                                              if opponent != player]) for player in range(config.NUM_PLAYERS)])
+    opponents = OpponentTable()
+    rows = np.stack([opponents.add(observation) for observation in other_players])
+    assert len(opponents.table()) == config.NUM_PLAYERS
+
+    columns = ReplayColumns(3, {"opponents": ((NUM_OPPONENTS,), np.int32)})
+    columns.write(np.arange(3), {"opponents": rows[:3]}, opponents.table())
+    assert np.array_equal(columns.read(np.array([2, 0]))["other_players"], other_players[[2, 0]])
+    # The table of a game is dropped with its last sample
+    columns.write(np.arange(3), {"opponents": rows[3:6]}, opponents.table())
+    assert list(columns.opponent_tables) == [1]
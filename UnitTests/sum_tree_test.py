@@ -0,0 +1,59 @@
+import numpy as np
+import config
+from Concurrency.global_buffer import GlobalBuffer
+from Concurrency.sum_tree import SumTreeBuffer
+from Concurrency.replay_columns import ReplayColumns
+
+
+def test_sampling_is_proportional_to_priority():
+    np.random.seed(0)
+    buffer = SumTreeBuffer(5)
+    buffer.insert([1., 2., 3., 4.])
+    assert buffer.size == 4 and np.isclose(buffer.total(), 10)
+    slots, _, _ = buffer.sample(40000)
+    counts = np.bincount(slots, minlength=4)
+    assert np.allclose(counts / counts.sum(), [0.1, 0.2, 0.3, 0.4], atol=0.01)
+    # Sampling doesn't take anything out
+    assert buffer.size == 4
+
+
+def test_importance_weights():
+    buffer = SumTreeBuffer(4)
+    buffer.insert([1., 3.])
+    slots, _, weights = buffer.sample(2, beta=1.0)
+    # (size * probability) ** -1 is 2 and 2 / 3, scaled by the largest one
+    expected = {0: 1., 1: 1 / 3}
+    assert np.allclose(weights, [expected[slot] for slot in slots])
+
+
+def test_ring_overwrites_and_drops_stale_updates():
+    buffer = SumTreeBuffer(3)
+    ids = [buffer.insert([1.])[0] for _ in range(4)] + buffer.insert([1.]).tolist()
+    assert ids == [0, 1, 2, 3, 4] and buffer.size == 3
+    assert sorted(buffer.ids.tolist()) == [2, 3, 4]
+    # Sample 0 and 1 were overwritten by 3 and 4, so only the update of sample 2 counts
+    buffer.update_priorities([0, 1, 2], [10., 10., 5.])
+    assert np.isclose(buffer.total(), 7)
+    slots, sample_ids, _ = buffer.sample(3)
+    assert np.array_equal(sample_ids % 3, slots)
+
+
+def test_replay_columns_read_the_rows_of_the_slots():
+    schema = {"value": ((2,), np.float32), "tier": ((2, 3), np.int8), "position": ((), np.float32)}
+    columns = ReplayColumns(4, schema)
+    columns.write(np.array([3, 0]), {"value": [[1., 2.], [3., 4.]], "tier": np.ones((2, 2, 3)), "position": [5., 6.]})
+    batch = columns.read(np.array([0, 3, 3]))
+    assert np.array_equal(batch["value"], [[3., 4.], [1., 2.], [1., 2.]])
+    assert batch["tier"].shape == (3, 2, 3) and batch["tier"].dtype == np.int8
+    assert np.array_equal(batch["position"], [6., 5., 5.])
+
+
+def test_untrained_samples_count_down_with_training():
+    buffer = GlobalBuffer()
+    buffer.gameplay_experiences.insert(np.ones(config.GLOBAL_BUFFER_SIZE + 10))
+    # The ring is full, but nothing has been trained on yet
+    assert buffer.gameplay_experiences.size == config.GLOBAL_BUFFER_SIZE
+    assert buffer.untrained_samples() == config.GLOBAL_BUFFER_SIZE + 10
+    _, sample_ids, _ = buffer.gameplay_experiences.sample(config.BATCH_SIZE)
+    buffer.update_priorities(sample_ids, np.ones(config.BATCH_SIZE))
+    assert buffer.untrained_samples() == config.GLOBAL_BUFFER_SIZE + 10 - config.BATCH_SIZE
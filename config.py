@@ -65,12 +65,29 @@ GPU_SIZE_PER_WORKER = get_float_env("GPU_SIZE_PER_WORKER", 0.2) if DEVICE == "cu
 STORAGE_GPU_SIZE = get_float_env("STORAGE_GPU_SIZE", 0.1) if DEVICE == "cuda" else 0
 BUFFER_GPU_SIZE = get_float_env("BUFFER_GPU_SIZE", 0.02) if DEVICE == "cuda" else 0
 TRAINER_GPU_SIZE = get_float_env("TRAINER_GPU_SIZE", 0.2) if DEVICE == "cuda" else 0
+INFERENCE_SERVER_GPU_SIZE = get_float_env("INFERENCE_SERVER_GPU_SIZE", 0.2) if DEVICE == "cuda" else 0
+
+# Run the network of the data workers on one inference server that batches the searches of every game together
+INFERENCE_SERVER = get_bool_env("INFERENCE_SERVER")
+# Pending rows that start a batch of the inference server and the seconds the first request waits for more
+INFERENCE_BATCH_SIZE = get_int_env("INFERENCE_BATCH_SIZE", 256)
+INFERENCE_TIMEOUT = get_float_env("INFERENCE_TIMEOUT", 0.002)
+# Search with an inference only TorchScript export of the network, "fp32", "bf16" or "int8" (cpu only), "" is off
+INFERENCE_EXPORT = environ.get("INFERENCE_EXPORT", "")
 
 ### TIME RELATED VALUES ###
 ACTIONS_PER_TURN = get_int_env("ACTIONS_PER_TURN", 15)
 CONCURRENT_GAMES = get_int_env("CONCURRENT_GAMES", 1)
+# Games that every data worker plays in lockstep, with one search for the players of all of them
+GAMES_PER_WORKER = get_int_env("GAMES_PER_WORKER", 1)
 NUM_PLAYERS = get_int_env("NUM_PLAYERS", 8)
 AUTO_BATTLER_PERCENTAGE = get_int_env("AUTO_BATTLER_PERCENTAGE", 0)
+# Worker processes that run the battles of a round in parallel. 0 runs them one by one in the game's own process.
+COMBAT_WORKERS = get_int_env("COMBAT_WORKERS", 0)
+# Board pairs whose battle outcomes are remembered. 0 turns the battle cache off.
+BATTLE_CACHE_SIZE = get_int_env("BATTLE_CACHE_SIZE", 0)
+# Real battles of a board pair before the cache starts handing out one of their results.
+BATTLE_CACHE_SAMPLES = get_int_env("BATTLE_CACHE_SAMPLES", 8)
 DEBUG = get_bool_env("DEBUG", "True")
 CHECKPOINT_STEPS = get_int_env("CHECKPOINT_STEPS", 100)
 STARTING_EPISODE = get_int_env("STARTING_EPISODE", 0)
@@ -103,6 +120,10 @@ ACTION_DIM = [7, 38, 38]
 # Buffer settings and sample management
 CHANCE_BUFFER_SEND = get_int_env("CHANCE_BUFFER_SEND", 1)
 GLOBAL_BUFFER_SIZE = get_int_env("GLOBAL_BUFFER_SIZE", 20000)
+# Prioritized replay, samples are drawn proportionally to priority ** ALPHA and the importance weights are
+# (size * probability) ** -BETA, the defaults are the ones of the proportional variant of the paper
+PRIORITY_ALPHA = get_float_env("PRIORITY_ALPHA", 0.6)
+PRIORITY_BETA = get_float_env("PRIORITY_BETA", 0.4)
 ITEM_POSITIONING_BUFFER_SIZE = get_int_env("ITEM_POSITIONING_BUFFER_SIZE", 4000)
 MINIMUM_POP_AMOUNT = get_int_env("MINIMUM_POP_AMOUNT", 100)
 
@@ -117,6 +138,8 @@ UNROLL_STEPS = get_int_env("UNROLL_STEPS", 5)
 
 ### TRAINING CONFIGURATIONS ###
 BATCH_SIZE = get_int_env("BATCH_SIZE", 1024)
+# Batches the trainer keeps assembled, and copied to the device if there is one, ahead of the training steps
+PREFETCH_BATCHES = get_int_env("PREFETCH_BATCHES", 2)
 INIT_LEARNING_RATE = get_float_env("INIT_LEARNING_RATE", 0.01)
 LR_DECAY_FUNCTION = get_float_env("LR_DECAY_FUNCTION", 0.1)
 WEIGHT_DECAY = get_float_env("WEIGHT_DECAY", 1e-5)
@@ -174,6 +197,12 @@ class ModelConfig:
     N_LAYERS = 4
     NUM_SAMPLES = get_int_env("NUM_SAMPLES", 30)
     NUM_SIMULATIONS = get_int_env("NUM_SIMULATIONS", 50)
+    # Start the search of a move from the subtree of the last move when the player is still in the same action phase
+    TREE_REUSE = get_bool_env("TREE_REUSE")
+    # Gumbel MuZero root: GUMBEL_ACTIONS children drawn without replacement, the simulations spread over them by
+    # sequential halving. Replaces the dirichlet noise and the sampled root, the tree is not reused with it.
+    GUMBEL = get_bool_env("GUMBEL")
+    GUMBEL_ACTIONS = get_int_env("GUMBEL_ACTIONS", 16)
 
     ITEM_EMBEDDING_DIM = get_int_env("ITEM_EMBEDDING_DIM", 60)
     CHAMPION_EMBEDDING_DIM = get_int_env("CHAMPION_EMBEDDING_DIM", 512)
@@ -55,6 +55,12 @@ namespace tools {
 
     CMinMaxStatsList::~CMinMaxStatsList() {}
 
+    // Fresh stats for a new search of num players, without allocating when the list is large enough
+    void CMinMaxStatsList::reset(int num) {
+        this->num = num;
+        this->stats_lst.assign(num, CMinMaxStats());
+    }
+
     float CMinMaxStatsList::get_max(int index) {
         float max;
         max = this->stats_lst[index].get_max();
@@ -32,6 +32,8 @@ namespace tools {
             CMinMaxStatsList(int num);
             ~CMinMaxStatsList();
 
+            void reset(int num);
+
             float get_max(int index);
             float get_min(int index);
     };
@@ -7,62 +7,90 @@ namespace tree {
     }
 
     CSearchResults::CSearchResults(int num) {
-        this->num = num;
-        for(int i = 0; i < num; ++i){
-            this->search_paths.push_back(std::vector<CNode*>());
-        }
+        this->reset(num);
     }
 
     CSearchResults::~CSearchResults() {}
 
+    // Empties the results for the next traverse, the vectors keep their memory
+    void CSearchResults::reset(int num) {
+        this->num = num;
+        this->hidden_state_index_x_lst.clear();
+        this->hidden_state_index_y_lst.clear();
+        this->search_lens.clear();
+        this->last_actions.clear();
+        this->nodes.clear();
+        this->search_paths.resize(num);
+        for(int i = 0; i < num; ++i) {
+            this->search_paths[i].clear();
+        }
+    }
+
     //*********************************************************
 
-    CNode::CNode() {
-        this->prior = 0;
-        this->action_num = 0;
-        this->visit_count = 0;
-        this->value_sum = 0;
-        this->reward = 0.0;
-        this->ptr_node_pool = nullptr;
-        this->mappings = std::vector<std::string>{};
+    CNodePool::CNodePool() {
+        this->size = 0;
+    }
+
+    CNodePool::CNodePool(int capacity) {
+        this->size = 0;
+        this->reserve(capacity);
     }
 
-    CNode::CNode(float prior, std::vector<CNode>* ptr_node_pool) {
-        this->prior = prior;
-        this->action_num = 0;
-        this->visit_count = 0;
-        this->value_sum = 0;
-        this->reward = 0.0;
-        this->ptr_node_pool = ptr_node_pool;
-        this->hidden_state_index_x = -1;
-        this->hidden_state_index_y = -1;
-        this->mappings = std::vector<std::string>{};
+    CNodePool::~CNodePool() {}
+
+    void CNodePool::reserve(int capacity) {
+        if(capacity <= (int) this->prior.size()) {
+            return;
+        }
+        this->prior.resize(capacity);
+        this->reward.resize(capacity);
+        this->value_sum.resize(capacity);
+        this->visit_count.resize(capacity);
+        this->hidden_state_index_x.resize(capacity);
+        this->hidden_state_index_y.resize(capacity);
+        this->children_start.resize(capacity);
+        this->action_num.resize(capacity);
+        this->action.resize(capacity);
     }
 
-    CNode::~CNode() {}
+    void CNodePool::reset() {
+        this->size = 0;
+    }
+
+    int CNodePool::add(float prior, int action) {
+        int node = this->size;
+        if(node >= (int) this->prior.size()) {
+            this->reserve(2 * node + 1);
+        }
+        this->size += 1;
+
+        this->prior[node] = prior;
+        this->reward[node] = 0.0;
+        this->value_sum[node] = 0;
+        this->visit_count[node] = 0;
+        this->hidden_state_index_x[node] = -1;
+        this->hidden_state_index_y[node] = -1;
+        this->children_start[node] = 0;
+        this->action_num[node] = 0;
+        this->action[node] = action;
+        return node;
+    }
 
     // I am not able to find a definite answer to we use the sampled policy as the base for the prior
     // or if we do a weighted softmax which is what is done below.
     // The alpha-go paper uses .67 as their weight but we appear to use e instead.
-    void CNode::expand(int hidden_state_index_x, int hidden_state_index_y, float reward,
-                       const std::vector<float> &policy_logits, const std::vector<char*> &py_mappings, int act_num) {
+    void CNodePool::expand(int node, int hidden_state_index_x, int hidden_state_index_y, float reward,
+                           const float *policy_logits, const int *py_mappings, int act_num) {
         // Index for finding the hidden state on python side, x is search path location, y is the player
-        this->hidden_state_index_x = hidden_state_index_x;
-        this->hidden_state_index_y = hidden_state_index_y;
-        this->reward = reward;
-        // Mapping to turn a set of samples into a 3 dimensional output that the simulation can understand
-        this->mappings = std::vector<std::string> {};
-        for (std::vector<char*>::size_type i = 0; i < py_mappings.size(); i++) {
-            this->mappings.push_back(std::string(py_mappings[i]));
-        }
+        this->hidden_state_index_x[node] = hidden_state_index_x;
+        this->hidden_state_index_y[node] = hidden_state_index_y;
+        this->reward[node] = reward;
 
         // number of unique actions this node contains. Changes based on number of unique samples
-        this->action_num = act_num;
+        this->action_num[node] = act_num;
+        this->children_start[node] = this->size;
 
-        float temp_policy;
-        // sum is a float instead of a tensor since we handle 1 player at a time
-        float policy_sum = 0.0;
-        std::vector<float> policy(action_num);
         float policy_max = FLOAT_MIN;
         // Find the maximum
         for(int a = 0; a < act_num; ++a){
@@ -71,80 +99,84 @@ namespace tree {
             }
         }
 
-        // Calculate the sum and create a temp policy with the exp of each
+        // sum is a float instead of a tensor since we handle 1 player at a time
+        float policy_sum = 0.0;
+        // Add all of the nodes children to the pool with the exp of their logit as the prior for now.
+        // Action of every sample, decoded into the 3 dimensional action on the python side.
+        // The mappings can be padded past the number of actions
         for(int a = 0; a < act_num; ++a) {
             // exp is e ^ value and since all values are negative, all values in temp_policy are between 0 and 1
-            temp_policy = exp(policy_logits[a] - policy_max);
+            float temp_policy = exp(policy_logits[a] - policy_max);
             policy_sum += temp_policy;
-            policy[a] = temp_policy;
+            this->add(temp_policy, py_mappings[a]);
         }
 
-        float prior;
-        std::vector<CNode>* ptr_node_pool = this->ptr_node_pool;
-
-        for(int a = 0; a < act_num; ++a) {
-            // Normalizes the array
-            prior = policy[a] / policy_sum;
-            int index = ptr_node_pool->size();
-            this->children_index.push_back(index);
-
-            // Add all of the nodes children to the ptr_node_pool
-            ptr_node_pool->push_back(CNode(prior, ptr_node_pool));
+        // Normalizes the priors
+        int start = this->children_start[node];
+        for(int child = start; child < start + act_num; ++child) {
+            this->prior[child] /= policy_sum;
         }
     }
 
     // This method is not currently used because we need to apply noise before taking samples
     // This is done on the python side. Leaving the method here to preserve the core MuZero methods.
     // If you wish to use a pure MuZero implementation, use this noise instead of the python side.
-    void CNode::add_exploration_noise(float exploration_fraction, const std::vector<float> &noises) {
-        float noise, prior;
-        for(int a = 0; a < this->action_num; ++a) {
-            noise = noises[a];
-            CNode* child = this->get_child(a);
-
-            prior = child->prior;
-            child->prior = prior * (1 - exploration_fraction) + noise * exploration_fraction;
+    void CNodePool::add_exploration_noise(int node, float exploration_fraction, const std::vector<float> &noises) {
+        int start = this->children_start[node];
+        for(int a = 0; a < this->action_num[node]; ++a) {
+            float prior = this->prior[start + a];
+            this->prior[start + a] = prior * (1 - exploration_fraction) + noises[a] * exploration_fraction;
         }
     }
 
-    int CNode::expanded() {
-        int child_num = this->children_index.size();
-        if(child_num > 0) {
-            return 1;
-        }
-        else {
-            return 0;
-        }
+    int CNodePool::expanded(int node) {
+        return this->action_num[node] > 0;
     }
 
-    float CNode::value() {
-        if(this->visit_count == 0) {
+    float CNodePool::value(int node) {
+        if(this->visit_count[node] == 0) {
             return 0;
         }
         else {
-            return this->value_sum / this->visit_count;
+            return this->value_sum[node] / this->visit_count[node];
         }
     }
 
-    float CNode::qvalue(float discount) {
-        return discount * this->value() + this->reward;
+    float CNodePool::qvalue(int node, float discount) {
+        return discount * this->value(node) + this->reward[node];
     }
 
-    std::vector<int> CNode::get_children_distribution() {
-        std::vector<int> distribution;
-        distribution.reserve(this->action_num);
-        if(this->expanded()) {
-            for(int a = 0; a < this->action_num; ++a) {
-                CNode* child = this->get_child(a);
-                distribution.push_back(child->visit_count);
-            }
-        }
-        return distribution;
+    std::vector<int> CNodePool::get_children_distribution(int node) {
+        int start = this->children_start[node];
+        return std::vector<int>(this->visit_count.begin() + start,
+                                this->visit_count.begin() + start + this->action_num[node]);
     }
 
-    CNode* CNode::get_child(int action) {
-        int index = this->children_index[action];
-        return &((*(this->ptr_node_pool))[index]);
+    //*********************************************************
+
+    // Copies src_node with everything under it into dst_node. The children of a node stay contiguous.
+    void copy_subtree(CNodePool &src, int src_node, CNodePool &dst, int dst_node) {
+        std::vector<std::pair<int, int>> queue;
+        queue.push_back(std::make_pair(src_node, dst_node));
+        for(size_t q = 0; q < queue.size(); ++q) {
+            int s = queue[q].first;
+            int d = queue[q].second;
+            dst.prior[d] = src.prior[s];
+            dst.reward[d] = src.reward[s];
+            dst.value_sum[d] = src.value_sum[s];
+            dst.visit_count[d] = src.visit_count[s];
+            dst.hidden_state_index_x[d] = src.hidden_state_index_x[s];
+            dst.hidden_state_index_y[d] = src.hidden_state_index_y[s];
+            dst.action[d] = src.action[s];
+            dst.action_num[d] = src.action_num[s];
+            dst.children_start[d] = dst.size;
+
+            int start = src.children_start[s];
+            for(int a = 0; a < src.action_num[s]; ++a) {
+                int child = dst.add(0, 0);
+                queue.push_back(std::make_pair(start + a, child));
+            }
+        }
     }
 
     //*********************************************************
@@ -152,49 +184,130 @@ namespace tree {
     CRoots::CRoots() {
         this->root_num = 0;
         this->pool_size = 0;
+        this->kept_root_num = 0;
     }
 
     // root_num is the number of agents in the batch (NUM_PLAYERS in our base case)
-    // pool_size is in place to speed up the vectors and to allocate a given amount of memory at the start
-    // Setting this to be the number of samples for now but someone should check if that is correct
+    // pool_size is the number of nodes a single search of one agent can make,
+    // the pool is allocated for that many nodes per agent at the start
     CRoots::CRoots(int root_num, int pool_size) {
-        // For whatever reason, print statements do not work inside this function.
-        this->root_num = root_num;
         this->pool_size = pool_size;
+        this->kept_root_num = 0;
+        this->reset(root_num);
+    }
 
-        this->node_pools.reserve(root_num);
-        this->roots.reserve(root_num);
+    CRoots::~CRoots() {}
 
+    // Drops the last search and makes root_num new roots. Only allocates if the pool has never been this large.
+    void CRoots::reset(int root_num) {
+        this->root_num = root_num;
+        this->pool.reset();
+        this->pool.reserve(root_num * (this->pool_size + 1));
         for(int i = 0; i < root_num; ++i) {
-            this->node_pools.push_back(std::vector<CNode>());
-            this->node_pools[i].reserve(pool_size);
+            this->pool.add(0, 0);
+        }
+    }
 
-            this->roots.push_back(CNode(0, &this->node_pools[i]));
+    // Keeps the subtree under child children[i] of root roots[i] of the last search for the i-th root of the next one.
+    // A negative root starts from scratch. Has to be called before reset, which drops the last search.
+    void CRoots::keep(const int *roots, const int *children, int num) {
+        this->kept.reset();
+        this->kept_roots.assign(num, -1);
+        this->kept_root_num = this->root_num;
+        for(int i = 0; i < num; ++i) {
+            int root = roots[i];
+            if(root < 0 || root >= this->root_num || children[i] < 0 || children[i] >= this->pool.action_num[root]) {
+                continue;
+            }
+            int node = this->kept.add(0, 0);
+            copy_subtree(this->pool, this->pool.children_start[root] + children[i], this->kept, node);
+            this->kept_roots[i] = node;
         }
     }
 
-    CRoots::~CRoots() {}
+    // Puts the visited children of the kept subtrees under the children of the new roots that take the same action.
+    // The new children keep the prior of the new root, the roots get the visits and values of what was grafted.
+    // The hidden states of the grafted nodes move to hidden_state_index_x and the rows after it, graft_sources and
+    // graft_targets say where the python side copies them from and to. Called after prepare, returns the number of
+    // hidden state rows the grafted nodes take.
+    int CRoots::graft(int hidden_state_index_x, float discount, tools::CMinMaxStatsList *min_max_stats_lst) {
+        this->graft_sources.clear();
+        this->graft_targets.clear();
+        int rows = 0;
+        int num = std::min(this->root_num, (int) this->kept_roots.size());
+        for(int i = 0; i < num; ++i) {
+            int kept_root = this->kept_roots[i];
+            if(kept_root < 0 || !this->kept.expanded(kept_root)) {
+                continue;
+            }
+            int states = 0;
+            auto move_node = [&](int node) {
+                if(this->pool.hidden_state_index_x[node] >= 0) {
+                    this->graft_sources.push_back(this->pool.hidden_state_index_x[node] * this->kept_root_num +
+                                                  this->pool.hidden_state_index_y[node]);
+                    this->graft_targets.push_back((hidden_state_index_x + states) * this->root_num + i);
+                    this->pool.hidden_state_index_x[node] = hidden_state_index_x + states;
+                    this->pool.hidden_state_index_y[node] = i;
+                    states += 1;
+                }
+                if(this->pool.visit_count[node] > 0) {
+                    min_max_stats_lst->stats_lst[i].update(this->pool.qvalue(node, discount));
+                }
+            };
+            int start = this->pool.children_start[i];
+            int kept_start = this->kept.children_start[kept_root];
+            for(int a = 0; a < this->pool.action_num[i]; ++a) {
+                int child = start + a;
+                for(int b = 0; b < this->kept.action_num[kept_root]; ++b) {
+                    int kept_child = kept_start + b;
+                    if(this->kept.action[kept_child] != this->pool.action[child] ||
+                       this->kept.visit_count[kept_child] == 0) {
+                        continue;
+                    }
+                    float prior = this->pool.prior[child];
+                    int first = this->pool.size;
+                    copy_subtree(this->kept, kept_child, this->pool, child);
+                    this->pool.prior[child] = prior;
+                    this->pool.visit_count[i] += this->pool.visit_count[child];
+                    this->pool.value_sum[i] += this->pool.reward[child] * this->pool.visit_count[child] +
+                                               discount * this->pool.value_sum[child];
+
+                    // The child and the nodes copied under it
+                    move_node(child);
+                    for(int node = first; node < this->pool.size; ++node) {
+                        move_node(node);
+                    }
+                    break;
+                }
+            }
+            rows = std::max(rows, states);
+        }
+        this->kept.reset();
+        this->kept_roots.clear();
+        return rows;
+    }
 
     // This method is not used in our implementation. Leaving it in case we switch back to a pure MuZero implementation
     // This method is only used if you need to apply noise to the input. We apply noise before sampling and before
     // Creating the tree so this method does not get called.
+    // policies and mappings are row major [root_num, policy_width] arrays
     void CRoots::prepare(float root_exploration_fraction, const std::vector<std::vector<float>> &noises,
-                         const std::vector<float> &value_prefixs, const std::vector<std::vector<float>> &policies,
-                         const std::vector<std::vector<char*>> &mappings, const std::vector<int> &action_nums) {
+                         const float *value_prefixs, const float *policies, int policy_width, const int *mappings,
+                         const int *action_nums) {
         for(int i = 0; i < this->root_num; ++i) {
-            this->roots[i].expand(0, i, value_prefixs[i], policies[i], mappings[i], action_nums[i]);
-            this->roots[i].add_exploration_noise(root_exploration_fraction, noises[i]);
-            this->roots[i].visit_count += 1;
+            this->pool.expand(i, 0, i, value_prefixs[i], policies + i * policy_width, mappings + i * policy_width,
+                              action_nums[i]);
+            this->pool.add_exploration_noise(i, root_exploration_fraction, noises[i]);
+            this->pool.visit_count[i] += 1;
         }
     }
 
-    void CRoots::prepare_no_noise(const std::vector<float> &value_prefixs,
-                                  const std::vector<std::vector<float>> &policies,
-                                  const std::vector<std::vector<char*>> &mappings,
-                                  const std::vector<int> &action_nums) {
+    void CRoots::prepare_no_noise(const float *value_prefixs, const float *policies, int policy_width,
+                                  const int *mappings, const int *action_nums) {
         for(int i = 0; i < this->root_num; ++i) {
-            this->roots[i].expand(0, i, value_prefixs[i], policies[i], mappings[i], action_nums[i]);
-            this->roots[i].visit_count += 1;
+            this->pool.expand(i, 0, i, value_prefixs[i], policies + i * policy_width, mappings + i * policy_width,
+                              action_nums[i]);
+            this->pool.visit_count[i] += 1;
         }
     }
 
@@ -203,7 +316,7 @@ namespace tree {
         distributions.reserve(this->root_num);
 
         for(int i = 0; i < this->root_num; ++i) {
-            distributions.push_back(this->roots[i].get_children_distribution());
+            distributions.push_back(this->pool.get_children_distribution(i));
         }
         return distributions;
     }
@@ -211,41 +324,13 @@ namespace tree {
     std::vector<float> CRoots::get_values() {
         std::vector<float> values;
         for(int i = 0; i < this->root_num; ++i) {
-            values.push_back(this->roots[i].value());
+            values.push_back(this->pool.value(i));
         }
         return values;
     }
 
-    // Takes in a string action like "2_15_30" and turns into a vector of [2, 15, 30]
-    std::vector<int> decode_action(std::string& action) {
-        size_t index = action.find("_");
-        size_t last_index = 0;
-        std::vector<int> element_list;
-        while(index != std::string::npos) {
-            size_t next_index = action.find("_", index + 1);
-            if(next_index > action.size()) {
-                next_index = action.size();
-            }
-            std::string newstr = action.substr(last_index, next_index - index - 1);
-            element_list.push_back(std::stoi(newstr));
-            last_index = index + 1;
-            index = action.find("_", index + 1);
-        }
-        std::string newstr = action.substr(last_index, action.size() - last_index);
-        element_list.push_back(std::stoi(newstr));
-
-        if(index != std::string::npos) {
-            std::string newstr = action.substr(index + 1, 1);
-            element_list.push_back(std::stoi(newstr));
-        }
-        while(element_list.size() < 3) {
-            element_list.push_back(0);
-        }
-        return element_list;
-    }
-
-    void cback_propagate(std::vector<CNode*> &search_path, tools::CMinMaxStats &min_max_stats, float value,
-                         float discount) {
+    void cback_propagate(CNodePool &pool, std::vector<int> &search_path, tools::CMinMaxStats &min_max_stats,
+                         float value, float discount) {
         // Value from the dynamics network.
         float bootstrap_value = value;
         // How far from root we are.
@@ -253,57 +338,63 @@ namespace tree {
         // For each node on our path back to root.
         for(int i = path_len - 1; i >= 0; --i) {
             // Our current node
-            CNode* node = search_path[i];
+            int node = search_path[i];
             // Update the value of our node.
             // (bootstrap_value can be negative so this doesn't scale to infinite)
-            node->value_sum += bootstrap_value;
-            node->visit_count += 1;
+            pool.value_sum[node] += bootstrap_value;
+            pool.visit_count[node] += 1;
 
             // update minimum and maximum
-            min_max_stats.update(node->qvalue(discount));
+            min_max_stats.update(pool.qvalue(node, discount));
 
             // update bootstrap for the next value
-            bootstrap_value = node->reward + discount * bootstrap_value;
+            bootstrap_value = pool.reward[node] + discount * bootstrap_value;
         }
     }
 
-    void cbatch_back_propagate(int hidden_state_index_x, float discount, const std::vector<float> &rewards,
-                               const std::vector<float> &values, const std::vector<std::vector<float>> &policy,
+    void cbatch_back_propagate(CRoots *roots, int hidden_state_index_x, float discount, const float *rewards,
+                               const float *values, const float *policy, int policy_width,
                                tools::CMinMaxStatsList *min_max_stats_lst, CSearchResults &results,
-                               std::vector<std::vector<char*>> &&mappings, const std::vector<int> &action_nums) {
+                               const int *mappings, const int *action_nums) {
         // For each player
         for(int i = 0; i < results.num; ++i) {
             // Expand the node
-            results.nodes[i]->expand(hidden_state_index_x, i, rewards[i], policy[i], mappings[i], action_nums[i]);
+            roots->pool.expand(results.nodes[i], hidden_state_index_x, i, rewards[i], policy + i * policy_width,
+                               mappings + i * policy_width, action_nums[i]);
 
             // Backprop back to the root node
-            cback_propagate(results.search_paths[i], min_max_stats_lst->stats_lst[i], values[i], discount);
+            cback_propagate(roots->pool, results.search_paths[i], min_max_stats_lst->stats_lst[i], values[i],
+                            discount);
         }
     }
 
-    int cselect_child(CNode* root, tools::CMinMaxStats &min_max_stats, int pb_c_base, float pb_c_init, float discount) {
+    int cselect_child(CNodePool &pool, int node, tools::CMinMaxStats &min_max_stats, int pb_c_base, float pb_c_init,
+                      float discount) {
         float max_score = FLOAT_MIN;
         const float epsilon = 0.00001;
-        std::vector<int> max_index_lst;
+        // The ties are kept on the stack, a node has fewer samples than that
+        int max_index_lst[256];
+        int max_index_num = 0;
+        int start = pool.children_start[node];
 
-        for(int a = 0; a < root->action_num; ++a) {
-            CNode* child = root->get_child(a);
+        for(int a = 0; a < pool.action_num[node]; ++a) {
             // find the usb score
-            float temp_score = cucb_score(child, min_max_stats, root->visit_count, pb_c_base, pb_c_init, discount);
+            float temp_score = cucb_score(pool, start + a, min_max_stats, pool.visit_count[node], pb_c_base, pb_c_init,
+                                          discount);
             // compare it to the max score and store index if it is the max
             if(max_score < temp_score) {
                 max_score = temp_score;
 
-                max_index_lst.clear();
-                max_index_lst.push_back(a);
+                max_index_lst[0] = a;
+                max_index_num = 1;
             }
-            else if(temp_score >= max_score - epsilon) {
-                max_index_lst.push_back(a);
+            else if(temp_score >= max_score - epsilon && max_index_num < 256) {
+                max_index_lst[max_index_num++] = a;
             }
         }
         int action = 0;
-        if(max_index_lst.size() > 0) {
-            int rand_index = rand() % max_index_lst.size();
+        if(max_index_num > 0) {
+            int rand_index = rand() % max_index_num;
             action = max_index_lst[rand_index];
         }
         return action;
@@ -311,20 +402,20 @@ namespace tree {
 
     // values are very high at the start of training compared to the priors so at the start
     // it will go down the tree almost equal to the number of simulations.
-    float cucb_score(CNode *child, tools::CMinMaxStats &min_max_stats, float total_children_visit_counts,
+    float cucb_score(CNodePool &pool, int child, tools::CMinMaxStats &min_max_stats, float total_children_visit_counts,
                      float pb_c_base, float pb_c_init, float discount) {
         float pb_c = 0.0, prior_score = 0.0, value_score = 0.0;
         // the usb formula
         pb_c = log((total_children_visit_counts + pb_c_base + 1) / pb_c_base) + pb_c_init;
-        pb_c *= (sqrt(total_children_visit_counts) / (child->visit_count + 1));
+        pb_c *= (sqrt(total_children_visit_counts) / (pool.visit_count[child] + 1));
 
-        prior_score = pb_c * child->prior;
-        if (child->visit_count == 0) {
+        prior_score = pb_c * pool.prior[child];
+        if (pool.visit_count[child] == 0) {
             value_score = 0;
         }
         else {
             // ensure that the value_score is between 0 and 1, (normally between -300 and 300)
-            value_score = min_max_stats.normalize(child->qvalue(discount));
+            value_score = min_max_stats.normalize(pool.qvalue(child, discount));
         }
 
         // Some testing should occur to see if this is helpful, I think I should delete these lines
@@ -334,35 +425,38 @@ namespace tree {
         return prior_score + value_score;
     }
 
+    // root_actions is the child every root has to take or nullptr. A negative child lets the root pick.
     void cbatch_traverse(CRoots *roots, int pb_c_base, float pb_c_init, float discount,
-                         tools::CMinMaxStatsList *min_max_stats_lst, CSearchResults &results) {
-        // Last action is a multidimensional action so a vector is required. 3 dimensions in our case
-        std::vector<int> last_action{0};
-
-        results.search_lens = std::vector<int>();
+                         tools::CMinMaxStatsList *min_max_stats_lst, CSearchResults &results,
+                         const int *root_actions) {
+        CNodePool &pool = roots->pool;
+        results.reset(roots->root_num);
 
         // For each player
         for(int i = 0; i < results.num; ++i) {
-            CNode *node = &(roots->roots[i]);
+            // The roots are the first nodes of the pool
+            int node = i;
+            int parent = i;
             int search_len = 0;
             // Add current node to search path.
             // This can be a node that has already been explored
             results.search_paths[i].push_back(node);
-            while(node->expanded()) {
+            while(pool.expanded(node)) {
 
                 // pick the next action to simulate
-                int action = cselect_child(node, min_max_stats_lst->stats_lst[i], pb_c_base, pb_c_init, discount);
-
-                // Error here on seg fault, decode_action on stoi.
-                // Pick the action from the mappings.
-                std::string str_action = node->mappings[action];
-
-
-                // Turn the internal next action into one that the model and environment can understand
-                last_action = decode_action(str_action);
+                int action;
+                if(node == i && root_actions != nullptr && root_actions[i] >= 0 &&
+                   root_actions[i] < pool.action_num[node]) {
+                    action = root_actions[i];
+                }
+                else {
+                    action = cselect_child(pool, node, min_max_stats_lst->stats_lst[i], pb_c_base, pb_c_init,
+                                           discount);
+                }
 
                 // get next node
-                node = node->get_child(action);
+                parent = node;
+                node = pool.children_start[node] + action;
 
                 // Add Node to the search path for exploration purposes
                 results.search_paths[i].push_back(node);
@@ -370,12 +464,12 @@ namespace tree {
             }
 
             // These are all for return values back to the python code. Defined in the cytree.pyx file.
-            CNode* parent = results.search_paths[i][results.search_paths[i].size() - 2];
-            results.hidden_state_index_x_lst.push_back(parent->hidden_state_index_x);
-            results.hidden_state_index_y_lst.push_back(parent->hidden_state_index_y);
-            results.last_actions.push_back(last_action);
+            results.hidden_state_index_x_lst.push_back(pool.hidden_state_index_x[parent]);
+            results.hidden_state_index_y_lst.push_back(pool.hidden_state_index_y[parent]);
+            // Flat index of the last action, the python side turns it into the 3 dimensional action
+            results.last_actions.push_back(pool.action[node]);
             results.search_lens.push_back(search_len);
             results.nodes.push_back(node);
         }
     }
-}
\ No newline at end of file
+}
@@ -3,7 +3,6 @@
 
 #include <vector>
 #include <stack>
-#include <string>
 #include <cmath>
 #include <algorithm>
 #include "cminimax.h"
@@ -12,49 +11,63 @@
 
 namespace tree {
 
-    class CNode {
+    // All nodes of a search, one column per field. A node is its index in the columns.
+    // The pool is sized once and only grows when a search needs more nodes than it ever had,
+    // reset empties it without freeing anything.
+    class CNodePool {
         public:
-            int visit_count, action_num, hidden_state_index_x, hidden_state_index_y;
-            float reward, prior, value_sum;
-            std::vector<int> children_index;
-            std::vector<CNode>* ptr_node_pool;
-            // This is used to map the action from the 1d to the multi dim that the environment can use
-            // I wish this could be a string vector but Cython does not support strings, only char *
-            std::vector<std::string> mappings;
-
-            CNode();
-            CNode(float prior, std::vector<CNode> *ptr_node_pool);
-            ~CNode();
-
-            void expand(int hidden_state_index_x, int hidden_state_index_y, float reward,
-                        const std::vector<float> &policy_logits, const std::vector<char*> &py_mappings,
-                        int act_num);
-            void add_exploration_noise(float exploration_fraction, const std::vector<float> &noises);
-
-            int expanded();
-
-            float value();
-            float qvalue(float discount);
-
-            std::vector<int> get_children_distribution();
-            CNode* get_child(int action);
+            int size;
+            std::vector<float> prior, reward, value_sum;
+            std::vector<int> visit_count, hidden_state_index_x, hidden_state_index_y;
+            // The children of a node are the action_num nodes that start at children_start
+            std::vector<int> children_start, action_num;
+            // Flat index in the 55x38 action space of the action that leads to the node
+            std::vector<int> action;
+
+            CNodePool();
+            CNodePool(int capacity);
+            ~CNodePool();
+
+            void reserve(int capacity);
+            void reset();
+            int add(float prior, int action);
+
+            void expand(int node, int hidden_state_index_x, int hidden_state_index_y, float reward,
+                        const float *policy_logits, const int *py_mappings, int act_num);
+            void add_exploration_noise(int node, float exploration_fraction, const std::vector<float> &noises);
+
+            int expanded(int node);
+
+            float value(int node);
+            float qvalue(int node, float discount);
+
+            std::vector<int> get_children_distribution(int node);
     };
 
     class CRoots{
         public:
             int root_num, pool_size;
-            std::vector<CNode> roots;
-            std::vector<std::vector<CNode>> node_pools;
+            // The roots are the first root_num nodes of the pool
+            CNodePool pool;
+            // Subtrees of the last search that are kept for the next one, one root in kept per new root or -1
+            int kept_root_num;
+            CNodePool kept;
+            std::vector<int> kept_roots;
+            // Hidden states of the grafted nodes, flat index in the last search and in this one
+            std::vector<int> graft_sources, graft_targets;
 
             CRoots();
             CRoots(int root_num, int pool_size);
             ~CRoots();
 
+            void reset(int root_num);
+            void keep(const int *roots, const int *children, int num);
             void prepare(float root_exploration_fraction, const std::vector<std::vector<float>> &noises,
-                         const std::vector<float> &rewards, const std::vector<std::vector<float>> &policies,
-                         const std::vector<std::vector<char*>> &mappings, const std::vector<int> &action_nums);
-            void prepare_no_noise(const std::vector<float> &rewards, const std::vector<std::vector<float>> &policies,
-                                  const std::vector<std::vector<char*>> &mappings, const std::vector<int> &action_nums);
+                         const float *rewards, const float *policies, int policy_width, const int *mappings,
+                         const int *action_nums);
+            void prepare_no_noise(const float *rewards, const float *policies, int policy_width, const int *mappings,
+                                  const int *action_nums);
+            int graft(int hidden_state_index_x, float discount, tools::CMinMaxStatsList *min_max_stats_lst);
             std::vector<std::vector<int>> get_distributions();
             std::vector<float> get_values();
 
@@ -63,31 +76,33 @@ namespace tree {
     class CSearchResults{
         public:
             int num;
-            std::vector<int> hidden_state_index_x_lst, hidden_state_index_y_lst, search_lens;
-            std::vector<std::vector<int>> last_actions;
-            std::vector<CNode*> nodes;
-            std::vector<std::vector<CNode*>> search_paths;
+            std::vector<int> hidden_state_index_x_lst, hidden_state_index_y_lst, search_lens, last_actions;
+            std::vector<int> nodes;
+            std::vector<std::vector<int>> search_paths;
 
             CSearchResults();
             CSearchResults(int num);
             ~CSearchResults();
 
+            void reset(int num);
     };
 
 
     //*********************************************************
-    std::vector<int> decode_action(std::string& action);
-    void cback_propagate(std::vector<CNode*> &search_path, tools::CMinMaxStats &min_max_stats, float value,
-                         float discount);
-    void cbatch_back_propagate(int hidden_state_index_x, float discount, const std::vector<float> &rewards,
-                               const std::vector<float> &values, const std::vector<std::vector<float>> &policy,
+    void copy_subtree(CNodePool &src, int src_node, CNodePool &dst, int dst_node);
+    void cback_propagate(CNodePool &pool, std::vector<int> &search_path, tools::CMinMaxStats &min_max_stats,
+                         float value, float discount);
+    void cbatch_back_propagate(CRoots *roots, int hidden_state_index_x, float discount, const float *rewards,
+                               const float *values, const float *policy, int policy_width,
                                tools::CMinMaxStatsList *min_max_stats_lst, CSearchResults &results,
-                               std::vector<std::vector<char*>> &mappings, const std::vector<int> &action_nums);
-    int cselect_child(CNode* root, tools::CMinMaxStats &min_max_stats, int pb_c_base, float pb_c_init, float discount);
-    float cucb_score(CNode *child, tools::CMinMaxStats &min_max_stats, float total_children_visit_counts,
+                               const int *mappings, const int *action_nums);
+    int cselect_child(CNodePool &pool, int node, tools::CMinMaxStats &min_max_stats, int pb_c_base, float pb_c_init,
+                      float discount);
+    float cucb_score(CNodePool &pool, int child, tools::CMinMaxStats &min_max_stats, float total_children_visit_counts,
                      float pb_c_base, float pb_c_init, float discount);
     void cbatch_traverse(CRoots *roots, int pb_c_base, float pb_c_init, float discount,
-                         tools::CMinMaxStatsList *min_max_stats_lst, CSearchResults &results);
+                         tools::CMinMaxStatsList *min_max_stats_lst, CSearchResults &results,
+                         const int *root_actions);
 }
 
-#endif
\ No newline at end of file
+#endif
@@ -22,42 +22,48 @@ cdef extern from "cminimax.h" namespace "tools":
 
         float get_max(int index)
         float get_min(int index)
+        void reset(int num)
 
 cdef extern from "cnode.cpp":
     pass
 
 cdef extern from "cnode.h" namespace "tree":
-    cdef cppclass CNode:
-        CNode() except +
-        CNode(float prior, vector[CNode]* ptr_node_pool) except +
-        int visit_count, action_num, hidden_state_index_x, hidden_state_index_y
-        float reward, prior, value_sum
-        vector[int] children_index
-        vector[CNode]* ptr_node_pool
-        vector[char*] mappings
+    cdef cppclass CNodePool:
+        CNodePool() except +
+        CNodePool(int capacity) except +
+        int size
+        vector[float] prior, reward, value_sum
+        vector[int] visit_count, hidden_state_index_x, hidden_state_index_y
+        vector[int] children_start, action_num, action
 
-        void expand(int hidden_state_index_x, int hidden_state_index_y, float reward,
-                    vector[float] policy_logits, vector[char*] py_mappings, int act_num)
-        void add_exploration_noise(float exploration_fraction, vector[float] noises)
+        void reserve(int capacity)
+        void reset()
+        int add(float prior, int action)
+        void expand(int node, int hidden_state_index_x, int hidden_state_index_y, float reward,
+                    const float *policy_logits, const int *py_mappings, int act_num)
+        void add_exploration_noise(int node, float exploration_fraction, vector[float] noises)
 
-        int expanded()
-        float value()
-        float qvalue(float discount)
-        vector[int] get_children_distribution()
-        CNode* get_child(int action)
+        int expanded(int node)
+        float value(int node)
+        float qvalue(int node, float discount)
+        vector[int] get_children_distribution(int node)
 
     cdef cppclass CRoots:
         CRoots() except +
         CRoots(int root_num, int pool_size) except +
         int root_num, pool_size
-        vector[CNode] roots
-        vector[vector[CNode]] node_pools
+        CNodePool pool
+        vector[int] graft_sources, graft_targets
+
+        void reset(int root_num) except +
+        void keep(const int *roots, const int *children, int num) except +
+        int graft(int hidden_state_index_x, float discount, CMinMaxStatsList *min_max_stats_lst) except +
 
         void prepare(float root_exploration_fraction, const vector[vector[float]] &noises,
-                     const vector[float] &rewards, const vector[vector[float]] &policies,
-                     vector[vector[char*]] mappings, vector[int] action_nums)
-        void prepare_no_noise(const vector[float] &rewards, const vector[vector[float]] &policies,
-                              vector[vector[char*]] mappings, vector[int] action_nums)
+                     const float *rewards, const float *policies, int policy_width, const int *mappings,
+                     const int *action_nums)
+        void prepare_no_noise(const float *rewards, const float *policies, int policy_width, const int *mappings,
+                              const int *action_nums)
         vector[vector[int]] get_distributions()
         vector[float] get_values()
 
@@ -65,13 +71,17 @@ cdef extern from "cnode.h" namespace "tree":
         CSearchResults() except +
         CSearchResults(int num) except +
         int num
-        vector[int] hidden_state_index_x_lst, hidden_state_index_y_lst, search_lens
-        vector[vector[int]] last_actions
-        vector[CNode*] nodes
+        vector[int] hidden_state_index_x_lst, hidden_state_index_y_lst, search_lens, last_actions
+        vector[int] nodes
+
+        void reset(int num)
 
-    cdef void cback_propagate(vector[CNode*] &search_path, CMinMaxStats &min_max_stats, float value, float discount)
-    void cbatch_back_propagate(int hidden_state_index_x, float discount, vector[float] rewards,
-                               vector[float] values, vector[vector[float]] policy, CMinMaxStatsList *min_max_stats_lst,
-                               CSearchResults &results, vector[vector[char*]] mappings, vector[int] action_nums)
+    cdef void cback_propagate(CNodePool &pool, vector[int] &search_path, CMinMaxStats &min_max_stats, float value,
+                              float discount)
+    void cbatch_back_propagate(CRoots *roots, int hidden_state_index_x, float discount, const float *rewards,
+                               const float *values, const float *policy, int policy_width,
+                               CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, const int *mappings,
+                               const int *action_nums) except +
     void cbatch_traverse(CRoots *roots, int pb_c_base, float pb_c_init, float discount,
-                         CMinMaxStatsList *min_max_stats_lst, CSearchResults &results)
+                         CMinMaxStatsList *min_max_stats_lst, CSearchResults &results,
+                         const int *root_actions) except +
@@ -1,7 +1,7 @@
 # distutils: language=c++
 import ctypes
 cimport cython
-from ctree cimport CMinMaxStatsList, CNode, CRoots, CSearchResults, cbatch_back_propagate, cbatch_traverse
+from ctree cimport CMinMaxStatsList, CRoots, CSearchResults, cbatch_back_propagate, cbatch_traverse
 from libcpp.vector cimport vector
 from libc.stdlib cimport malloc, free
 from libcpp.list cimport list as cpplist
@@ -13,6 +13,24 @@ ctypedef np.npy_float FLOAT
 ctypedef np.npy_intp INTP
 
 
+# The policies and mappings are padded [num, width] arrays, every row is read up to its action num
+cdef check_policy(const float[:, ::1] policy, const int[:, ::1] mappings, const int[::1] action_nums, int num):
+    if policy.shape[0] < num or mappings.shape[0] < num or action_nums.shape[0] < num:
+        raise ValueError(f"Expected {num} policies, got {policy.shape[0]}")
+    if policy.shape[1] != mappings.shape[1]:
+        raise ValueError(f"Policy width {policy.shape[1]} does not match mapping width {mappings.shape[1]}")
+    for i in range(num):
+        if action_nums[i] > policy.shape[1]:
+            raise ValueError(f"Action num {action_nums[i]} is above the policy width {policy.shape[1]}")
+
+
+# Copy of a vector of the results into a numpy array
+cdef int_array(vector[int] &values):
+    if values.size() == 0:
+        return np.zeros(0, dtype=np.intc)
+    return np.asarray(<int[:values.size()]> values.data()).copy()
+
+
 cdef class MinMaxStatsList:
     cdef CMinMaxStatsList *cmin_max_stats_lst
 
@@ -24,13 +42,20 @@ cdef class MinMaxStatsList:
 
     def get_min(self, int num):
         return self.cmin_max_stats_lst[0].get_min(num)
-        
+
+    # Fresh stats for the next search of num players
+    def reset(self, int num):
+        self.cmin_max_stats_lst[0].reset(num)
+
     def __dealloc__(self):
         del self.cmin_max_stats_lst
 
 
+# Can be used for any number of traverses, each one empties the results first
 cdef class ResultsWrapper:
     cdef CSearchResults cresults
+    # The tree of the last traverse, the nodes of the results are in its pool
+    cdef Roots roots
 
     def __cinit__(self, int num):
         self.cresults = CSearchResults(num)
@@ -39,22 +64,48 @@ cdef class ResultsWrapper:
         return self.cresults.search_lens
 
 
+# One pool of nodes for the searches of every root. It's sized for root_num searches of tree_nodes simulations with
+# max_size samples and reset between searches, so a tree made once can be used for every move.
 cdef class Roots:
-    cdef int root_num
     cdef int pool_size
     cdef CRoots *roots
 
     def __cinit__(self, int root_num, int tree_nodes, max_size):
-        self.root_num = root_num
         self.pool_size = max_size * (tree_nodes + 2)
         self.roots = new CRoots(root_num, self.pool_size)
 
-    def prepare(self, float root_exploration_fraction, list noises, list reward_pool, list policy_logits_pool,
-                list mappings, list action_nums):
-        self.roots[0].prepare(root_exploration_fraction, noises, reward_pool, policy_logits_pool, mappings, action_nums)
-
-    def prepare_no_noise(self, list reward_pool, list policy_logits_pool, list mappings, list action_nums):
-        self.roots[0].prepare_no_noise(reward_pool, policy_logits_pool, mappings, action_nums)
+    # Drops the last search and makes root_num new roots
+    def reset(self, int root_num):
+        self.roots[0].reset(root_num)
+
+    # Keeps the subtree under child children[i] of root roots[i] of the last search for the i-th root of the next
+    # search, -1 for a root that starts from scratch. Called before reset.
+    def keep(self, const int[::1] roots, const int[::1] children):
+        if roots.shape[0] != children.shape[0]:
+            raise ValueError(f"Expected a child for each of the {roots.shape[0]} roots, got {children.shape[0]}")
+        if roots.shape[0] > 0:
+            self.roots[0].keep(&roots[0], &children[0], roots.shape[0])
+
+    # Grafts the kept subtrees under the children of the new roots with the same action. Called after prepare.
+    # returns the int32 flat indices of the hidden states of the grafted nodes in the [rows, num] hidden states of the
+    # last search and of this one, and the number of rows from hidden_state_index_x on that they take.
+    def graft(self, int hidden_state_index_x, float discount, MinMaxStatsList min_max_stats_lst):
+        if min_max_stats_lst.cmin_max_stats_lst[0].num < self.num:
+            raise ValueError(f"Expected min max stats for {self.num} roots")
+        rows = self.roots[0].graft(hidden_state_index_x, discount, min_max_stats_lst.cmin_max_stats_lst)
+        return int_array(self.roots[0].graft_sources), int_array(self.roots[0].graft_targets), rows
+
+    def prepare(self, float root_exploration_fraction, list noises, const float[::1] reward_pool,
+                const float[:, ::1] policy_logits_pool, const int[:, ::1] mappings, const int[::1] action_nums):
+        check_policy(policy_logits_pool, mappings, action_nums, self.roots[0].root_num)
+        self.roots[0].prepare(root_exploration_fraction, noises, &reward_pool[0], &policy_logits_pool[0, 0],
+                              policy_logits_pool.shape[1], &mappings[0, 0], &action_nums[0])
+
+    def prepare_no_noise(self, const float[::1] reward_pool, const float[:, ::1] policy_logits_pool,
+                         const int[:, ::1] mappings, const int[::1] action_nums):
+        check_policy(policy_logits_pool, mappings, action_nums, self.roots[0].root_num)
+        self.roots[0].prepare_no_noise(&reward_pool[0], &policy_logits_pool[0, 0], policy_logits_pool.shape[1],
+                                       &mappings[0, 0], &action_nums[0])
 
     def get_distributions(self):
         return self.roots[0].get_distributions()
@@ -62,44 +113,68 @@ cdef class Roots:
     def get_values(self):
         return self.roots[0].get_values()
 
+    # Visit counts and q values of the children of every root as padded [num, width] int32 and float32 arrays
+    def get_children_stats(self, float discount, int width):
+        cdef int num = self.roots[0].root_num
+        cdef int i, a, start, child
+        visits = np.zeros((num, width), dtype=np.intc)
+        qvalues = np.zeros((num, width), dtype=np.float32)
+        cdef int[:, ::1] visits_view = visits
+        cdef float[:, ::1] qvalues_view = qvalues
+        for i in range(num):
+            start = self.roots[0].pool.children_start[i]
+            for a in range(min(self.roots[0].pool.action_num[i], width)):
+                child = start + a
+                visits_view[i, a] = self.roots[0].pool.visit_count[child]
+                qvalues_view[i, a] = self.roots[0].pool.qvalue(child, discount)
+        return visits, qvalues
+
     def __dealloc__(self):
         del self.roots
 
     @property
     def num(self):
-        return self.root_num
-
-
-cdef class Node:
-    cdef CNode cnode
-
-    def __cinit__(self):
-        pass
-
-    def __cinit__(self, float prior, int action_num):
-        # self.cnode = CNode(prior, action_num)
-        pass
-
-    def expand(self, int hidden_state_index_x, int hidden_state_index_y, float value_prefix,
-               list policy_logits, list py_mappings, int act_num):
-        cdef vector[float] cpolicy = policy_logits
-        self.cnode.expand(hidden_state_index_x, hidden_state_index_y, value_prefix, cpolicy, py_mappings, act_num)
-
-def batch_back_propagate(int hidden_state_index_x, float discount, list rewards, list values, list policy,
-                         MinMaxStatsList min_max_stats_lst, ResultsWrapper results, list mappings, list action_nums):
-    cdef int i
-    cdef vector[float] crewards = rewards
-    cdef vector[float] cvalues = values
-    cdef vector[vector[float]] cpolicy = policy
-    cdef vector[int] caction_nums = action_nums
-
-    cbatch_back_propagate(hidden_state_index_x, discount, crewards, cvalues, cpolicy,
-                          min_max_stats_lst.cmin_max_stats_lst, results.cresults, mappings, caction_nums)
-
+        return self.roots[0].root_num
 
+    @property
+    def node_num(self):
+        return self.roots[0].pool.size
+
+
+# rewards and values are float32 arrays, policy a padded float32 [num, width] array,
+# mappings the int32 actions of the policy and action_nums the int32 number of actions of every row
+def batch_back_propagate(int hidden_state_index_x, float discount, const float[::1] rewards,
+                         const float[::1] values, const float[:, ::1] policy, MinMaxStatsList min_max_stats_lst,
+                         ResultsWrapper results, const int[:, ::1] mappings, const int[::1] action_nums):
+    cdef int num = results.cresults.num
+    if results.roots is None:
+        raise ValueError("batch_back_propagate needs the results of a batch_traverse")
+    check_policy(policy, mappings, action_nums, num)
+    if rewards.shape[0] < num or values.shape[0] < num:
+        raise ValueError(f"Expected {num} rewards and values")
+
+    cbatch_back_propagate(results.roots.roots, hidden_state_index_x, discount, &rewards[0], &values[0],
+                          &policy[0, 0], policy.shape[1], min_max_stats_lst.cmin_max_stats_lst, results.cresults,
+                          &mappings[0, 0], &action_nums[0])
+
+
+# returns int32 arrays of the hidden state index x and y of the parent of every leaf and the flat action index
+# that leads to the leaf. root_actions is an optional int32 array of the child every root has to take, -1 to let the
+# root pick like every other node.
 def batch_traverse(Roots roots, int pb_c_base, float pb_c_init, float discount, MinMaxStatsList min_max_stats_lst,
-                   ResultsWrapper results):
-
-    cbatch_traverse(roots.roots, pb_c_base, pb_c_init, discount, min_max_stats_lst.cmin_max_stats_lst, results.cresults)
-
-    return results.cresults.hidden_state_index_x_lst, results.cresults.hidden_state_index_y_lst, results.cresults.last_actions
+                   ResultsWrapper results, const int[::1] root_actions=None):
+    cdef const int *forced = NULL
+    if min_max_stats_lst.cmin_max_stats_lst[0].num < roots.num:
+        raise ValueError(f"Expected min max stats for {roots.num} roots")
+    if root_actions is not None:
+        if root_actions.shape[0] < roots.num:
+            raise ValueError(f"Expected {roots.num} root actions, got {root_actions.shape[0]}")
+        if roots.num > 0:
+            forced = &root_actions[0]
+
+    results.roots = roots
+    cbatch_traverse(roots.roots, pb_c_base, pb_c_init, discount, min_max_stats_lst.cmin_max_stats_lst, results.cresults,
+                    forced)
+
+    return int_array(results.cresults.hidden_state_index_x_lst), int_array(results.cresults.hidden_state_index_y_lst), \
+        int_array(results.cresults.last_actions)